@@ -15,9 +15,13 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import heapq
+import itertools
 import os
+import time
 
 import eventlet
+from eventlet import semaphore
 import netaddr
 from oslo.config import cfg
 
@@ -34,6 +38,7 @@ from neutron.common import utils
 from neutron import context
 from neutron import manager
 from neutron.openstack.common import importutils
+from neutron.openstack.common import lockutils
 from neutron.openstack.common import log as logging
 from neutron.openstack.common import loopingcall
 from neutron.openstack.common.rpc import common
@@ -43,6 +48,18 @@ from neutron import service as neutron_service
 
 LOG = logging.getLogger(__name__)
 
+# The helpers handling the events of a network, as queued for it. An event
+# replaces a pending reload or refresh of its network, and of the events
+# enabling or disabling DHCP for a network the last one wins.
+RELOAD = 'reload_dhcp_helper'
+REFRESH = 'refresh_dhcp_helper'
+ENABLE = 'enable_dhcp_helper'
+DISABLE = 'disable_dhcp_helper'
+
+# The events deleting resources are handled before the other ones.
+DELETE_PRIORITY = 0
+UPDATE_PRIORITY = 1
+
 
 class DhcpAgent(manager.Manager):
     OPTS = [
@@ -59,6 +76,10 @@ class DhcpAgent(manager.Manager):
                            "enable_isolated_metadata = True")),
         cfg.IntOpt('num_sync_threads', default=4,
                    help=_('Number of threads to use during sync process.')),
+        cfg.IntOpt('num_event_threads', default=4,
+                   help=_('Number of threads handling the network events. '
+                          'The events of a network are handled by one '
+                          'thread at a time.')),
         cfg.StrOpt('metadata_proxy_socket',
                    default='$state_path/metadata_proxy',
                    help=_('Location of Metadata Proxy UNIX domain '
@@ -70,6 +91,7 @@ class DhcpAgent(manager.Manager):
         self.needs_resync = False
         self.conf = cfg.CONF
         self.cache = NetworkCache()
+        self.queue = NetworkEventQueue()
         self.root_helper = config.get_root_helper(self.conf)
         self.dhcp_driver_cls = importutils.import_class(self.conf.dhcp_driver)
         ctx = context.get_admin_context_without_session()
@@ -111,6 +133,7 @@ class DhcpAgent(manager.Manager):
         """Activate the DHCP agent."""
         self.sync_state()
         self.periodic_resync()
+        self.start_event_threads()
 
     def call_driver(self, action, network, **action_kwargs):
         """Invoke an action on a DHCP driver instance."""
@@ -125,7 +148,9 @@ class DhcpAgent(manager.Manager):
                                           self.dhcp_version,
                                           self.plugin_rpc)
 
-            getattr(driver, action)(**action_kwargs)
+            # The state sync may configure a network an event is handled for
+            with lockutils.lock('dhcp-network-%s' % network.id):
+                getattr(driver, action)(**action_kwargs)
             return True
         except exceptions.Conflict:
             # No need to resync here, the agent will receive the event related
@@ -144,6 +169,31 @@ class DhcpAgent(manager.Manager):
                 LOG.exception(_('Unable to %(action)s dhcp for %(net_id)s.')
                               % {'net_id': network.id, 'action': action})
 
+    def _get_networks_to_sync(self):
+        """Return the ids of the active networks and the ones to configure.
+
+        Only the networks whose fingerprint differs from the one of the
+        cached network are fetched, unless the server does not compute
+        the fingerprints of the networks.
+        """
+        fingerprints = self.plugin_rpc.get_active_networks_fingerprints()
+        if fingerprints is None:
+            active_networks = self.plugin_rpc.get_active_networks_info()
+            return (set(network.id for network in active_networks),
+                    active_networks)
+
+        changed_ids = [network_id for network_id, fingerprint
+                       in fingerprints.iteritems()
+                       if getattr(self.cache.get_network_by_id(network_id),
+                                  'fingerprint', None) != fingerprint]
+        LOG.debug(_('%(changed)d of the %(active)d active networks changed'),
+                  {'changed': len(changed_ids), 'active': len(fingerprints)})
+        active_networks = []
+        if changed_ids:
+            active_networks = self.plugin_rpc.get_active_networks_info(
+                network_ids=changed_ids)
+        return set(fingerprints), active_networks
+
     @utils.synchronized('dhcp-agent')
     def sync_state(self):
         """Sync the local DHCP state with Neutron."""
@@ -152,8 +202,7 @@ class DhcpAgent(manager.Manager):
         known_network_ids = set(self.cache.get_network_ids())
 
         try:
-            active_networks = self.plugin_rpc.get_active_networks_info()
-            active_network_ids = set(network.id for network in active_networks)
+            active_network_ids, active_networks = self._get_networks_to_sync()
             for deleted_id in known_network_ids - active_network_ids:
                 try:
                     self.disable_dhcp_helper(deleted_id)
@@ -183,6 +232,27 @@ class DhcpAgent(manager.Manager):
         """Spawn a thread to periodically resync the dhcp state."""
         eventlet.spawn(self._periodic_resync_helper)
 
+    def _process_next_event(self):
+        """Wait for a network with queued events and handle them."""
+        network_id, helper = self.queue.get()
+        try:
+            getattr(self, helper)(network_id)
+        except Exception:
+            self.needs_resync = True
+            LOG.exception(_('Unable to handle the events of network %s.'),
+                          network_id)
+        finally:
+            self.queue.done(network_id)
+
+    def _event_thread(self):
+        while True:
+            self._process_next_event()
+
+    def start_event_threads(self):
+        """Spawn the threads handling the queued network events."""
+        for i in range(self.conf.num_event_threads):
+            eventlet.spawn(self._event_thread)
+
     def safe_get_network_info(self, network_id):
         try:
             network = self.plugin_rpc.get_network_info(network_id)
@@ -219,6 +289,12 @@ class DhcpAgent(manager.Manager):
                     self.cache.put(network)
                 break
 
+    def reload_dhcp_helper(self, network_id):
+        """Reload the allocations of a network from the cache."""
+        network = self.cache.get_network_by_id(network_id)
+        if network:
+            self.call_driver('reload_allocations', network)
+
     def disable_dhcp_helper(self, network_id):
         """Disable DHCP for a network known to the agent."""
         network = self.cache.get_network_by_id(network_id)
@@ -254,31 +330,34 @@ class DhcpAgent(manager.Manager):
         else:
             self.disable_dhcp_helper(network.id)
 
+    # The handlers of the notification events only update the cache and
+    # queue the events, which are handled by the event threads.
+
     @utils.synchronized('dhcp-agent')
     def network_create_end(self, context, payload):
         """Handle the network.create.end notification event."""
         network_id = payload['network']['id']
-        self.enable_dhcp_helper(network_id)
+        self.queue.put(network_id, ENABLE)
 
     @utils.synchronized('dhcp-agent')
     def network_update_end(self, context, payload):
         """Handle the network.update.end notification event."""
         network_id = payload['network']['id']
         if payload['network']['admin_state_up']:
-            self.enable_dhcp_helper(network_id)
+            self.queue.put(network_id, ENABLE)
         else:
-            self.disable_dhcp_helper(network_id)
+            self.queue.put(network_id, DISABLE)
 
     @utils.synchronized('dhcp-agent')
     def network_delete_end(self, context, payload):
         """Handle the network.delete.end notification event."""
-        self.disable_dhcp_helper(payload['network_id'])
+        self.queue.put(payload['network_id'], DISABLE, DELETE_PRIORITY)
 
     @utils.synchronized('dhcp-agent')
     def subnet_update_end(self, context, payload):
         """Handle the subnet.update.end notification event."""
         network_id = payload['subnet']['network_id']
-        self.refresh_dhcp_helper(network_id)
+        self.queue.put(network_id, REFRESH)
 
     # Use the update handler for the subnet create event.
     subnet_create_end = subnet_update_end
@@ -289,16 +368,16 @@ class DhcpAgent(manager.Manager):
         subnet_id = payload['subnet_id']
         network = self.cache.get_network_by_subnet_id(subnet_id)
         if network:
-            self.refresh_dhcp_helper(network.id)
+            self.queue.put(network.id, REFRESH, DELETE_PRIORITY)
 
     @utils.synchronized('dhcp-agent')
     def port_update_end(self, context, payload):
         """Handle the port.update.end notification event."""
-        updated_port = dhcp.DictModel(payload['port'])
+        updated_port = dhcp.PortModel(payload['port'])
         network = self.cache.get_network_by_id(updated_port.network_id)
         if network:
             self.cache.put_port(updated_port)
-            self.call_driver('reload_allocations', network)
+            self.queue.put(network.id, RELOAD)
 
     # Use the update handler for the port create event.
     port_create_end = port_update_end
@@ -310,7 +389,7 @@ class DhcpAgent(manager.Manager):
         if port:
             network = self.cache.get_network_by_id(port.network_id)
             self.cache.remove_port(port)
-            self.call_driver('reload_allocations', network)
+            self.queue.put(network.id, RELOAD, DELETE_PRIORITY)
 
     def enable_isolated_metadata_proxy(self, network):
 
@@ -373,10 +452,13 @@ class DhcpPluginApi(proxy.RpcProxy):
         1.0 - Initial version.
         1.1 - Added get_active_networks_info, create_dhcp_port,
               and update_dhcp_port methods.
+        1.5 - Added get_active_networks_fingerprints and the network_ids
+              of get_active_networks_info.
 
     """
 
     BASE_RPC_API_VERSION = '1.1'
+    FINGERPRINTS_VERSION = '1.5'
 
     def __init__(self, topic, context, use_namespaces):
         super(DhcpPluginApi, self).__init__(
@@ -384,13 +466,45 @@ class DhcpPluginApi(proxy.RpcProxy):
         self.context = context
         self.host = cfg.CONF.host
         self.use_namespaces = use_namespaces
+        # Cleared when the server turns out not to support
+        # get_active_networks_fingerprints
+        self.fingerprints_supported = True
 
-    def get_active_networks_info(self):
-        """Make a remote process call to retrieve all network info."""
-        networks = self.call(self.context,
-                             self.make_msg('get_active_networks_info',
-                                           host=self.host),
-                             topic=self.topic)
+    def get_active_networks_fingerprints(self):
+        """Make a remote process call to retrieve the network fingerprints.
+
+        Returns None when the server does not compute the fingerprints.
+        """
+        if self.fingerprints_supported:
+            try:
+                return self.call(
+                    self.context,
+                    self.make_msg('get_active_networks_fingerprints',
+                                  host=self.host),
+                    topic=self.topic, version=self.FINGERPRINTS_VERSION)
+            except common.RemoteError as e:
+                if e.exc_type not in ('UnsupportedRpcVersion',
+                                      'AttributeError'):
+                    raise
+                LOG.info(_("Server does not support "
+                           "get_active_networks_fingerprints, falling back "
+                           "to the full sync of the networks"))
+                self.fingerprints_supported = False
+
+    def get_active_networks_info(self, network_ids=None):
+        """Make a remote process call to retrieve all network info.
+
+        The networks are restricted to the given network_ids, if any.
+        """
+        if network_ids is None:
+            msg = self.make_msg('get_active_networks_info', host=self.host)
+            version = self.BASE_RPC_API_VERSION
+        else:
+            msg = self.make_msg('get_active_networks_info', host=self.host,
+                                network_ids=network_ids)
+            version = self.FINGERPRINTS_VERSION
+        networks = self.call(self.context, msg, topic=self.topic,
+                             version=version)
         return [dhcp.NetModel(self.use_namespaces, n) for n in networks]
 
     def get_network_info(self, network_id):
@@ -461,6 +575,8 @@ class NetworkCache(object):
         self.cache = {}
         self.subnet_lookup = {}
         self.port_lookup = {}
+        # The index of each port in the ports of its network, by network
+        self.port_indexes = {}
 
     def get_network_ids(self):
         return self.cache.keys()
@@ -485,9 +601,12 @@ class NetworkCache(object):
 
         for port in network.ports:
             self.port_lookup[port.id] = network.id
+        self.port_indexes[network.id] = dict(
+            (port.id, index) for index, port in enumerate(network.ports))
 
     def remove(self, network):
         del self.cache[network.id]
+        del self.port_indexes[network.id]
 
         for subnet in network.subnets:
             del self.subnet_lookup[subnet.id]
@@ -495,32 +614,39 @@ class NetworkCache(object):
         for port in network.ports:
             del self.port_lookup[port.id]
 
+    # The fingerprint of a network is the one of the network as fetched
+    # from the server. It is reset when the ports are updated from events.
+
     def put_port(self, port):
         network = self.get_network_by_id(port.network_id)
-        for index in range(len(network.ports)):
-            if network.ports[index].id == port.id:
-                network.ports[index] = port
-                break
-        else:
+        network.fingerprint = None
+        indexes = self.port_indexes[network.id]
+        index = indexes.get(port.id)
+        if index is None:
+            indexes[port.id] = len(network.ports)
             network.ports.append(port)
+        else:
+            network.ports[index] = port
 
         self.port_lookup[port.id] = network.id
 
     def remove_port(self, port):
         network = self.get_network_by_port_id(port.id)
+        network.fingerprint = None
 
-        for index in range(len(network.ports)):
-            if network.ports[index] == port:
-                del network.ports[index]
-                del self.port_lookup[port.id]
-                break
+        # The last port of the network takes the place of the removed one
+        indexes = self.port_indexes[network.id]
+        index = indexes.pop(port.id)
+        last_port = network.ports.pop()
+        if index < len(network.ports):
+            network.ports[index] = last_port
+            indexes[last_port.id] = index
+        del self.port_lookup[port.id]
 
     def get_port_by_id(self, port_id):
         network = self.get_network_by_port_id(port_id)
         if network:
-            for port in network.ports:
-                if port.id == port_id:
-                    return port
+            return network.ports[self.port_indexes[network.id][port_id]]
 
     def get_state(self):
         net_ids = self.get_network_ids()
@@ -536,6 +662,114 @@ class NetworkCache(object):
                 'ports': num_ports}
 
 
+class _QueuedEvents(object):
+    """The events queued for a network, merged in the helper to call."""
+
+    def __init__(self, helper, priority, sequence):
+        self.helper = helper
+        self.priority = priority
+        self.sequence = sequence
+        self.received_at = time.time()
+
+    def merge(self, helper, priority):
+        if helper in (ENABLE, DISABLE) or self.helper == RELOAD:
+            self.helper = helper
+        self.priority = min(self.priority, priority)
+
+
+class NetworkEventQueue(object):
+    """Queue of the networks with events to handle.
+
+    The events of a network already queued are merged with the ones
+    queued for it, so that a burst of events causes a single call of a
+    helper. The networks are handed out by priority, then in the order
+    their first event was queued, and a network is not handed out again
+    before it is done with.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        # The (priority, sequence, network id) of the networks to hand out.
+        # The entries out of date with the pending events are skipped.
+        self._heap = []
+        self._handled = {}
+        self._sequence = itertools.count()
+        self._ready = semaphore.Semaphore(0)
+        self.merged_events = 0
+        self.handled_events = 0
+        self._latency_sum = 0.0
+        self._latency_max = 0.0
+        self._latency_count = 0
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _push(self, network_id):
+        events = self._pending[network_id]
+        heapq.heappush(self._heap,
+                       (events.priority, events.sequence, network_id))
+
+    def put(self, network_id, helper, priority=UPDATE_PRIORITY):
+        """Queue an event of a network to be handled by a helper."""
+        events = self._pending.get(network_id)
+        if events:
+            self.merged_events += 1
+            previous_priority = events.priority
+            events.merge(helper, priority)
+            if (events.priority != previous_priority and
+                    network_id not in self._handled):
+                self._push(network_id)
+            return
+        self._pending[network_id] = _QueuedEvents(helper, priority,
+                                                  next(self._sequence))
+        if network_id not in self._handled:
+            self._push(network_id)
+            self._ready.release()
+
+    def get(self):
+        """Wait for a network to hand out, return its id and helper."""
+        self._ready.acquire()
+        while True:
+            priority, sequence, network_id = heapq.heappop(self._heap)
+            events = self._pending.get(network_id)
+            if (events and network_id not in self._handled and
+                    (events.priority, events.sequence) ==
+                    (priority, sequence)):
+                break
+        del self._pending[network_id]
+        self._handled[network_id] = events.received_at
+        return network_id, events.helper
+
+    def done(self, network_id):
+        """Mark the events handed out for a network as handled."""
+        latency = time.time() - self._handled.pop(network_id)
+        self.handled_events += 1
+        self._latency_sum += latency
+        self._latency_max = max(self._latency_max, latency)
+        self._latency_count += 1
+        if network_id in self._pending:
+            self._push(network_id)
+            self._ready.release()
+
+    def get_state(self):
+        """Return the queue depth and the latencies of the events.
+
+        The latencies, from the queuing of the first event of a network to
+        the end of its handling, are the ones of the events handled since
+        the previous call.
+        """
+        count = self._latency_count
+        state = {'queued_networks': len(self._pending),
+                 'merged_events': self.merged_events,
+                 'handled_events': self.handled_events,
+                 'event_latency_avg': round(
+                     count and self._latency_sum / count, 3),
+                 'event_latency_max': round(self._latency_max, 3)}
+        self._latency_sum = self._latency_max = 0.0
+        self._latency_count = 0
+        return state
+
+
 class DhcpAgentWithStateReport(DhcpAgent):
     def __init__(self, host=None):
         super(DhcpAgentWithStateReport, self).__init__(host=host)
@@ -561,6 +795,8 @@ class DhcpAgentWithStateReport(DhcpAgent):
         try:
             self.agent_state.get('configurations').update(
                 self.cache.get_state())
+            self.agent_state.get('configurations').update(
+                self.queue.get_state())
             ctx = context.get_admin_context_without_session()
             self.state_rpc.report_state(ctx, self.agent_state, self.use_call)
             self.use_call = False
@@ -104,6 +104,7 @@ class RouterInfo(object):
         self._snat_action = None
         self.internal_ports = []
         self.floating_ips = set()
+        self.revision = None
         self.root_helper = root_helper
         self.use_namespaces = use_namespaces
         # Invoke the setter for establishing initial SNAT action
@@ -124,6 +125,8 @@ class RouterInfo(object):
         self._router = value
         if not self._router:
             return
+        # Floating IP changes of the later revisions are applied as deltas
+        self.revision = self._router.get('revision')
         # enable_snat by default if it wasn't specified by plugin
         self._snat_enabled = self._router.get('enable_snat', True)
         # Set a SNAT action for the router
@@ -152,8 +155,10 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager):
             It was previously a list of routers in dict format.
             It is now a list of router IDs only.
             Per rpc versioning rules,  it is backwards compatible.
+        1.2 added the floatingips_updated method, which carries
+            the floating IPs changed by a revision of a router.
     """
-    RPC_API_VERSION = '1.1'
+    RPC_API_VERSION = '1.2'
 
     OPTS = [
         cfg.StrOpt('external_network_bridge', default='br-ex',
@@ -213,6 +218,7 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager):
         self.fullsync = True
         self.updated_routers = set()
         self.removed_routers = set()
+        self.updated_floatingips = {}
         self.sync_progress = False
 
         self._clean_stale_namespaces = self.conf.use_namespaces
@@ -484,10 +490,18 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager):
                                internal_cidrs, interface_name)
 
         # Process SNAT/DNAT rules for floating IPs
+        self._process_router_floating_ips(ri, ex_gw_port)
+
+        # Update ex_gw_port and enable_snat on the router info cache
+        ri.ex_gw_port = ex_gw_port
+        ri.enable_snat = ri.router.get('enable_snat')
+
+    def _process_router_floating_ips(self, ri, ex_gw_port):
+        """Configure the floating IPs of a router and report their status."""
         fip_statuses = {}
+        existing_floating_ips = ri.floating_ips
         try:
             if ex_gw_port:
-                existing_floating_ips = ri.floating_ips
                 self.process_router_floating_ip_nat_rules(ri)
                 ri.iptables_manager.defer_apply_off()
                 # Once NAT rules for floating IPs are safely in place
@@ -509,10 +523,6 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager):
             self.plugin_rpc.update_floatingip_statuses(
                 self.context, ri.router_id, fip_statuses)
 
-        # Update ex_gw_port and enable_snat on the router info cache
-        ri.ex_gw_port = ex_gw_port
-        ri.enable_snat = ri.router.get('enable_snat')
-
     def _handle_router_snat_rules(self, ri, ex_gw_port, internal_cidrs,
                                   interface_name, action):
         # Remove all the rules
@@ -734,6 +744,15 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager):
                 routers = [router['id'] for router in routers]
             self.updated_routers.update(routers)
 
+    def floatingips_updated(self, context, router_id, revision, floatingips,
+                            removed):
+        """Deal with the floating IPs changed by a revision of a router."""
+        LOG.debug(_('Got floating IPs updated notification for router '
+                    '%(router_id)s at revision %(revision)s'),
+                  {'router_id': router_id, 'revision': revision})
+        self.updated_floatingips.setdefault(router_id, []).append(
+            (revision, floatingips, removed))
+
     def router_removed_from_agent(self, context, payload):
         LOG.debug(_('Got router removed from agent :%r'), payload)
         self.removed_routers.add(payload['router_id'])
@@ -813,12 +832,56 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager):
                 self.removed_routers.update(updated_routers - fetched)
 
                 self._process_routers(routers)
+            if self.updated_floatingips:
+                updated_floatingips = self.updated_floatingips
+                self.updated_floatingips = {}
+                self._process_floatingip_updates(updated_floatingips)
             self._process_router_delete()
             LOG.debug(_("RPC loop successfully completed"))
         except Exception:
             LOG.exception(_("Failed synchronizing routers"))
             self.fullsync = True
 
+    def _process_floatingip_updates(self, updated_floatingips):
+        """Apply the floating IP changes of routers in revision order.
+
+        A router missing a revision is fetched whole on the next pass.
+        """
+        pool = eventlet.GreenPool()
+        for router_id, updates in updated_floatingips.iteritems():
+            ri = self.router_info.get(router_id)
+            if not ri or router_id in self.updated_routers:
+                continue
+            floating_ips = dict(
+                (fip['id'], fip)
+                for fip in ri.router.get(l3_constants.FLOATINGIP_KEY, []))
+            current = ri.revision
+            for revision, changed, removed in sorted(
+                    updates, key=lambda update: update[0]):
+                if current is not None and revision <= current:
+                    # Already part of the router fetched last
+                    continue
+                if current is None or revision > current + 1:
+                    LOG.debug(_('Missed floating IP updates of router %s, '
+                                'fetching it'), router_id)
+                    self.updated_routers.add(router_id)
+                    break
+                for fip_id in removed:
+                    floating_ips.pop(fip_id, None)
+                for fip in changed:
+                    floating_ips[fip['id']] = fip
+                current = revision
+            else:
+                if current == ri.revision:
+                    continue
+                ri.router[l3_constants.FLOATINGIP_KEY] = floating_ips.values()
+                ri.revision = current
+                if ri.ex_gw_port:
+                    ri.iptables_manager.defer_apply_on()
+                    pool.spawn_n(self._process_router_floating_ips, ri,
+                                 ri.ex_gw_port)
+        pool.waitall()
+
     def _process_router_delete(self):
         current_removed_routers = list(self.removed_routers)
         for router_id in current_removed_routers:
@@ -908,7 +971,9 @@ class L3NATAgentWithStateReport(L3NATAgent):
                 'external_network_bridge': self.conf.external_network_bridge,
                 'gateway_external_network_id':
                 self.conf.gateway_external_network_id,
-                'interface_driver': self.conf.interface_driver},
+                'interface_driver': self.conf.interface_driver,
+                # The server may notify the floating IP changes as deltas
+                'floatingip_deltas': True},
             'start_flag': True,
             'agent_type': l3_constants.AGENT_TYPE_L3}
         report_interval = cfg.CONF.AGENT.report_interval
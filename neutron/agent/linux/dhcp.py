@@ -17,6 +17,7 @@
 
 import abc
 import collections
+import hashlib
 import os
 import re
 import shutil
@@ -76,6 +77,11 @@ METADATA_PORT = 80
 WIN2k3_STATIC_DNS = 249
 NS_PREFIX = 'qdhcp-'
 
+# The lines of the hosts and addn_hosts files and the leases of a port,
+# with the key of the port attributes they were built from
+HostEntry = collections.namedtuple('HostEntry',
+                                   ['key', 'hosts', 'addn_hosts', 'leases'])
+
 
 class DictModel(object):
     """Convert dict into an object that provides attribute access to values."""
@@ -90,10 +96,63 @@ class DictModel(object):
             setattr(self, key, value)
 
 
+class SlotModel(object):
+    """Compact model of the given keys of a dict, in slots.
+
+    The other keys of the dict are left out. The dicts in the lists of the
+    kept keys are converted to the model given for the key, if any, or
+    else to DictModel.
+    """
+    __slots__ = ()
+    _item_models = {}
+
+    def __init__(self, d):
+        for key in self.__slots__:
+            if key not in d:
+                continue
+            value = d[key]
+            if isinstance(value, list):
+                model = self._item_models.get(key, DictModel)
+                value = [model(item) if isinstance(item, dict) else item
+                         for item in value]
+            elif isinstance(value, dict):
+                value = DictModel(value)
+
+            setattr(self, key, value)
+
+
+class FixedIpModel(SlotModel):
+    __slots__ = ('subnet_id', 'ip_address')
+
+
+class PortModel(SlotModel):
+    """Model of the port attributes used by the DHCP agent."""
+    __slots__ = ('id', 'network_id', 'tenant_id', 'mac_address',
+                 'admin_state_up', 'device_id', 'device_owner', 'fixed_ips',
+                 'extra_dhcp_opts')
+    _item_models = {'fixed_ips': FixedIpModel}
+
+
+class SubnetModel(SlotModel):
+    """Model of the subnet attributes used by the DHCP agent."""
+    __slots__ = ('id', 'network_id', 'tenant_id', 'ip_version', 'cidr',
+                 'gateway_ip', 'enable_dhcp', 'dns_nameservers',
+                 'host_routes')
+
+
 class NetModel(DictModel):
 
     def __init__(self, use_namespaces, d):
+        # The subnets and ports of the networks the agent keeps in its
+        # cache only have the attributes it uses
+        d = dict(d)
+        compact_items = [(key, model, d.pop(key)) for key, model in
+                         [('subnets', SubnetModel), ('ports', PortModel)]
+                         if key in d]
         super(NetModel, self).__init__(d)
+        for key, model, items in compact_items:
+            setattr(self, key, [model(item) if isinstance(item, dict)
+                                else item for item in items])
 
         self._ns_name = (use_namespaces and
                          "%s%s" % (NS_PREFIX, self.id) or None)
@@ -275,6 +334,12 @@ class Dnsmasq(DhcpLocalProcess):
     NEUTRON_RELAY_SOCKET_PATH_KEY = 'NEUTRON_RELAY_SOCKET_PATH'
     MINIMUM_VERSION = 2.59
 
+    # The digests of the config files last written for every network, so
+    # that the files left unchanged by an update are neither written nor
+    # reloaded by dnsmasq, and the host entries of their ports by port id
+    _conf_file_digests = {}
+    _host_entries = {}
+
     @classmethod
     def check_version(cls):
         ver = 0
@@ -387,11 +452,15 @@ class Dnsmasq(DhcpLocalProcess):
                         'turned off DHCP: %s'), self.network.id)
             return
 
+        digests = dict(self._conf_file_digests.get(self.network.id, {}))
         self._release_unused_leases()
         self._output_hosts_file()
         self._output_addn_hosts_file()
         self._output_opts_file()
-        if self.active:
+        if digests and digests == self._conf_file_digests[self.network.id]:
+            LOG.debug(_('Allocations of network %s are unchanged'),
+                      self.network.id)
+        elif self.active:
             cmd = ['kill', '-HUP', self.pid]
             utils.execute(cmd, self.root_helper)
         else:
@@ -399,23 +468,79 @@ class Dnsmasq(DhcpLocalProcess):
         LOG.debug(_('Reloading allocations for network: %s'), self.network.id)
         self.device_manager.update(self.network, self.interface_name)
 
-    def _iter_hosts(self):
-        """Iterate over hosts.
+    def _remove_config_files(self):
+        super(Dnsmasq, self)._remove_config_files()
+        self._conf_file_digests.pop(self.network.id, None)
+        self._host_entries.pop(self.network.id, None)
+
+    def _replace_conf_file(self, filename, data):
+        """Write a config file unless it was last written with the data."""
+        digest = hashlib.sha1(data).digest()
+        digests = self._conf_file_digests.setdefault(self.network.id, {})
+        if digests.get(filename) == digest:
+            LOG.debug(_('%s is unchanged'), filename)
+            return
+        utils.replace_file(filename, data)
+        digests[filename] = digest
 
-        For each host on the network we yield a tuple containing:
-        (
-            port,  # a DictModel instance representing the port.
-            alloc,  # a DictModel instance of the allocated ip and subnet.
-            host_name,  # Host name.
-            name,  # Host name and domain name in the format 'hostname.domain'.
-        )
+    def _get_host_entries(self):
+        """Return the host entries of the ports of the network.
+
+        The entries are kept by port id and only rebuilt for the ports whose
+        MAC address, IP addresses or extra DHCP options changed since they
+        were built.
         """
+        old_entries = self._host_entries.get(self.network.id, {})
+        entries = []
+        entries_by_port = {}
         for port in self.network.ports:
-            for alloc in port.fixed_ips:
-                hostname = 'host-%s' % alloc.ip_address.replace(
-                    '.', '-').replace(':', '-')
-                fqdn = '%s.%s' % (hostname, self.conf.dhcp_domain)
-                yield (port, alloc, hostname, fqdn)
+            key = (port.mac_address,
+                   tuple(alloc.ip_address for alloc in port.fixed_ips),
+                   bool(getattr(port, 'extra_dhcp_opts', False)))
+            entry = old_entries.get(port.id)
+            if entry is None or entry.key != key:
+                entry = self._make_host_entry(port, key)
+            entries.append(entry)
+            entries_by_port[port.id] = entry
+        self._host_entries[self.network.id] = entries_by_port
+        return entries
+
+    def _make_host_entry(self, port, key):
+        hosts = []
+        addn_hosts = []
+        leases = set()
+        for alloc in port.fixed_ips:
+            hostname = 'host-%s' % alloc.ip_address.replace(
+                '.', '-').replace(':', '-')
+            name = '%s.%s' % (hostname, self.conf.dhcp_domain)
+            leases.add((alloc.ip_address, port.mac_address))
+            set_tag = ''
+            # (dzyu) Check if it is legal ipv6 address, if so, need wrap
+            # it with '[]' to let dnsmasq to distinguish MAC address from
+            # IPv6 address.
+            ip_address = alloc.ip_address
+            if netaddr.valid_ipv6(ip_address):
+                ip_address = '[%s]' % ip_address
+
+            LOG.debug(_('Adding %(mac)s : %(name)s : %(ip)s'),
+                      {"mac": port.mac_address, "name": name,
+                       "ip": ip_address})
+
+            if getattr(port, 'extra_dhcp_opts', False):
+                if self.version >= self.MINIMUM_VERSION:
+                    set_tag = 'set:'
+
+                hosts.append('%s,%s,%s,%s%s\n' %
+                             (port.mac_address, name, ip_address,
+                              set_tag, port.id))
+            else:
+                hosts.append('%s,%s,%s\n' %
+                             (port.mac_address, name, ip_address))
+            # It is compulsory to write the `fqdn` before the `hostname` in
+            # order to obtain it in PTR responses.
+            addn_hosts.append('%s\t%s %s\n' % (alloc.ip_address, name,
+                                               hostname))
+        return HostEntry(key, ''.join(hosts), ''.join(addn_hosts), leases)
 
     def _output_hosts_file(self):
         """Writes a dnsmasq compatible dhcp hosts file.
@@ -433,35 +558,11 @@ class Dnsmasq(DhcpLocalProcess):
         should receive a dhcp lease, the hosts resolution in itself is
         defined by the `_output_addn_hosts_file` method.
         """
-        buf = six.StringIO()
         filename = self.get_conf_file_name('host')
 
         LOG.debug(_('Building host file: %s'), filename)
-        for (port, alloc, hostname, name) in self._iter_hosts():
-            set_tag = ''
-            # (dzyu) Check if it is legal ipv6 address, if so, need wrap
-            # it with '[]' to let dnsmasq to distinguish MAC address from
-            # IPv6 address.
-            ip_address = alloc.ip_address
-            if netaddr.valid_ipv6(ip_address):
-                ip_address = '[%s]' % ip_address
-
-            LOG.debug(_('Adding %(mac)s : %(name)s : %(ip)s'),
-                      {"mac": port.mac_address, "name": name,
-                       "ip": ip_address})
-
-            if getattr(port, 'extra_dhcp_opts', False):
-                if self.version >= self.MINIMUM_VERSION:
-                    set_tag = 'set:'
-
-                buf.write('%s,%s,%s,%s%s\n' %
-                          (port.mac_address, name, ip_address,
-                           set_tag, port.id))
-            else:
-                buf.write('%s,%s,%s\n' %
-                          (port.mac_address, name, ip_address))
-
-        utils.replace_file(filename, buf.getvalue())
+        self._replace_conf_file(filename, ''.join(
+            entry.hosts for entry in self._get_host_entries()))
         LOG.debug(_('Done building host file %s'), filename)
         return filename
 
@@ -475,13 +576,18 @@ class Dnsmasq(DhcpLocalProcess):
         return leases
 
     def _release_unused_leases(self):
-        filename = self.get_conf_file_name('host')
-        old_leases = self._read_hosts_file_leases(filename)
+        old_entries = self._host_entries.get(self.network.id)
+        if old_entries is None:
+            filename = self.get_conf_file_name('host')
+            old_leases = self._read_hosts_file_leases(filename)
+        else:
+            old_leases = set()
+            for entry in old_entries.itervalues():
+                old_leases |= entry.leases
 
         new_leases = set()
-        for port in self.network.ports:
-            for alloc in port.fixed_ips:
-                new_leases.add((alloc.ip_address, port.mac_address))
+        for entry in self._get_host_entries():
+            new_leases |= entry.leases
 
         for ip, mac in old_leases - new_leases:
             self._release_lease(mac, ip)
@@ -496,13 +602,9 @@ class Dnsmasq(DhcpLocalProcess):
         Each line in this file is in the same form as a standard /etc/hosts
         file.
         """
-        buf = six.StringIO()
-        for (port, alloc, hostname, fqdn) in self._iter_hosts():
-            # It is compulsory to write the `fqdn` before the `hostname` in
-            # order to obtain it in PTR responses.
-            buf.write('%s\t%s %s\n' % (alloc.ip_address, fqdn, hostname))
         addn_hosts = self.get_conf_file_name('addn_hosts')
-        utils.replace_file(addn_hosts, buf.getvalue())
+        self._replace_conf_file(addn_hosts, ''.join(
+            entry.addn_hosts for entry in self._get_host_entries()))
         return addn_hosts
 
     def _output_opts_file(self):
@@ -580,7 +682,7 @@ class Dnsmasq(DhcpLocalProcess):
                                                    ','.join(ips)))
 
         name = self.get_conf_file_name('opts')
-        utils.replace_file(name, '\n'.join(options))
+        self._replace_conf_file(name, '\n'.join(options))
         return name
 
     def _make_subnet_interface_ip_map(self):
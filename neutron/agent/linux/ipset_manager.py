@@ -0,0 +1,92 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Manages kernel ipsets holding the members of remote security groups."""
+
+from neutron.agent.linux import utils as linux_utils
+from neutron.common import constants
+from neutron.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+# ipset names are limited to 31 characters
+MAX_SET_NAME_LEN = 31
+SET_NAME_PREFIX = 'NET'
+IPSET_FAMILY = {constants.IPv4: 'inet',
+                constants.IPv6: 'inet6'}
+
+
+def get_set_name(set_id, ethertype):
+    """Return the name of the set for the given id and ethertype."""
+    return ('%s%s%s' % (SET_NAME_PREFIX, ethertype[-1],
+                        set_id))[:MAX_SET_NAME_LEN]
+
+
+class IpsetManager(object):
+    """Wrapper for ipset.
+
+    Keeps the members of every set it created in memory, so that refreshing
+    a set only sends the added and removed members to the kernel, in a
+    single 'ipset restore' call.
+    """
+
+    def __init__(self, _execute=None, root_helper=None, namespace=None):
+        if _execute:
+            self.execute = _execute
+        else:
+            self.execute = linux_utils.execute
+        self.root_helper = root_helper
+        self.namespace = namespace
+        # set name -> set of members
+        self.sets = {}
+
+    def _run(self, args, process_input=None):
+        args = ['ipset'] + args
+        if self.namespace:
+            args = ['ip', 'netns', 'exec', self.namespace] + args
+        return self.execute(args, process_input=process_input,
+                            root_helper=self.root_helper)
+
+    def set_exists(self, set_name):
+        return set_name in self.sets
+
+    def refresh_set(self, set_name, members, ethertype):
+        """Create the set if needed and make its members match members."""
+        members = set(members)
+        lines = []
+        if set_name not in self.sets:
+            # The set may be left over from a previous run of the agent
+            lines.append('create %s hash:net family %s' %
+                         (set_name, IPSET_FAMILY[ethertype]))
+            lines.append('flush %s' % set_name)
+            current = set()
+        else:
+            current = self.sets[set_name]
+        lines += ['add %s %s' % (set_name, member)
+                  for member in sorted(members - current)]
+        lines += ['del %s %s' % (set_name, member)
+                  for member in sorted(current - members)]
+        if lines:
+            self._run(['restore', '-exist'],
+                      process_input='\n'.join(lines) + '\n')
+        self.sets[set_name] = members
+
+    def destroy_set(self, set_name):
+        """Destroy the set. It must not be referenced by iptables rules."""
+        if set_name not in self.sets:
+            LOG.warn(_('Attempted to destroy ipset %s which does not '
+                       'exist'), set_name)
+            return
+        self._run(['destroy', set_name])
+        del self.sets[set_name]
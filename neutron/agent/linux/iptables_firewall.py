@@ -19,6 +19,7 @@ import netaddr
 from oslo.config import cfg
 
 from neutron.agent import firewall
+from neutron.agent.linux import ipset_manager
 from neutron.agent.linux import iptables_manager
 from neutron.common import constants
 from neutron.openstack.common import log as logging
@@ -33,6 +34,12 @@ CHAIN_NAME_PREFIX = {INGRESS_DIRECTION: 'i',
                      EGRESS_DIRECTION: 'o',
                      SPOOF_FILTER: 's'}
 LINUX_DEV_LEN = 14
+IPSET_DIRECTION = {INGRESS_DIRECTION: 'src',
+                   EGRESS_DIRECTION: 'dst'}
+DIRECTION_IP_PREFIX = {INGRESS_DIRECTION: 'source_ip_prefix',
+                       EGRESS_DIRECTION: 'dest_ip_prefix'}
+cfg.CONF.import_opt('enable_ipset', 'neutron.agent.securitygroups_rpc',
+                    group='SECURITYGROUP')
 
 
 class IptablesFirewallDriver(firewall.FirewallDriver):
@@ -44,6 +51,11 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
         self.iptables = iptables_manager.IptablesManager(
             root_helper=cfg.CONF.AGENT.root_helper,
             use_ipv6=True)
+        self.enable_ipset = cfg.CONF.SECURITYGROUP.enable_ipset
+        if self.enable_ipset:
+            self.ipset = ipset_manager.IpsetManager(
+                root_helper=cfg.CONF.AGENT.root_helper)
+            self._ipsets_in_use = set()
         # list of port which has security group
         self.filtered_ports = {}
         self._add_fallback_chain_v4v6()
@@ -61,6 +73,7 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
         # each security group has it own chains
         self._setup_chains()
         self.iptables.apply()
+        self._remove_unused_ipsets()
 
     def update_port_filter(self, port):
         LOG.debug(_("Updating device (%s) filter"), port['device'])
@@ -72,6 +85,7 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
         self.filtered_ports[port['device']] = port
         self._setup_chains()
         self.iptables.apply()
+        self._remove_unused_ipsets()
 
     def remove_port_filter(self, port):
         LOG.debug(_("Removing device (%s) filter"), port['device'])
@@ -83,6 +97,7 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
         self.filtered_ports.pop(port['device'], None)
         self._setup_chains()
         self.iptables.apply()
+        self._remove_unused_ipsets()
 
     def _setup_chains(self):
         """Setup ingress and egress chain for a port."""
@@ -90,6 +105,8 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
             self._setup_chains_apply(self.filtered_ports)
 
     def _setup_chains_apply(self, ports):
+        if self.enable_ipset:
+            self._refresh_ipsets(ports)
         self._add_chain_by_name_v4v6(SG_CHAIN)
         for port in ports.values():
             self._setup_chain(port, INGRESS_DIRECTION)
@@ -97,6 +114,37 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
             self.iptables.ipv4['filter'].add_rule(SG_CHAIN, '-j ACCEPT')
             self.iptables.ipv6['filter'].add_rule(SG_CHAIN, '-j ACCEPT')
 
+    def _refresh_ipsets(self, ports):
+        """Make the ipset of every referenced remote group up to date.
+
+        The server expands remote group rules into one rule per member IP,
+        so the members of a set are collected from those rules.
+        """
+        members = {}
+        for port in ports.values():
+            for rule in port.get('security_group_rules', []):
+                remote_group_id = rule.get('remote_group_id')
+                if not remote_group_id:
+                    continue
+                set_name = ipset_manager.get_set_name(remote_group_id,
+                                                      rule['ethertype'])
+                set_members = members.setdefault(
+                    set_name, (rule['ethertype'], set()))[1]
+                ip_prefix = rule.get(DIRECTION_IP_PREFIX[rule['direction']])
+                if ip_prefix:
+                    set_members.add(ip_prefix)
+        for set_name, (ethertype, set_members) in members.iteritems():
+            self.ipset.refresh_set(set_name, set_members, ethertype)
+        self._ipsets_in_use = set(members)
+
+    def _remove_unused_ipsets(self):
+        """Destroy the ipsets no iptables rule refers to any more."""
+        if not self.enable_ipset or self._defer_apply:
+            return
+        for set_name in self.ipset.sets.keys():
+            if set_name not in self._ipsets_in_use:
+                self.ipset.destroy_set(set_name)
+
     def _remove_chains(self):
         """Remove ingress and egress chain for a port."""
         if not self._defer_apply:
@@ -180,6 +228,26 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
                 ipv6_sg_rules.append(rule)
         return ipv4_sg_rules, ipv6_sg_rules
 
+    def _merge_remote_group_rules(self, security_group_rules):
+        """Collapse the per member rules of a remote group into one.
+
+        The member IPs are matched through the ipset of the remote group.
+        """
+        merged_rules = []
+        seen_rules = set()
+        for rule in security_group_rules:
+            if not rule.get('remote_group_id'):
+                merged_rules.append(rule)
+                continue
+            ip_prefix = DIRECTION_IP_PREFIX[rule['direction']]
+            rule = dict((key, value) for key, value in rule.iteritems()
+                        if key != ip_prefix)
+            key = tuple(sorted(rule.items()))
+            if key not in seen_rules:
+                seen_rules.add(key)
+                merged_rules.append(rule)
+        return merged_rules
+
     def _select_sgr_by_direction(self, port, direction):
         return [rule
                 for rule in port.get('security_group_rules', [])
@@ -260,6 +328,9 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
         # for ipv6, iptables6 command is used
         ipv4_sg_rules, ipv6_sg_rules = self._split_sgr_by_ethertype(
             security_group_rules)
+        if self.enable_ipset:
+            ipv4_sg_rules = self._merge_remote_group_rules(ipv4_sg_rules)
+            ipv6_sg_rules = self._merge_remote_group_rules(ipv6_sg_rules)
         ipv4_iptables_rule = []
         ipv6_iptables_rule = []
         if direction == EGRESS_DIRECTION:
@@ -299,6 +370,8 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
                                    rule.get('protocol'),
                                    rule.get('port_range_min'),
                                    rule.get('port_range_max'))
+            if self.enable_ipset and rule.get('remote_group_id'):
+                args += self._ipset_arg(rule)
             args += ['-j RETURN']
             iptables_rules += [' '.join(args)]
 
@@ -353,6 +426,12 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
             return ['-%s' % direction, ip_prefix]
         return []
 
+    def _ipset_arg(self, rule):
+        set_name = ipset_manager.get_set_name(rule['remote_group_id'],
+                                              rule['ethertype'])
+        return ['-m', 'set', '--match-set', set_name,
+                IPSET_DIRECTION[rule['direction']]]
+
     def _port_chain_name(self, port, direction):
         return iptables_manager.get_chain_name(
             '%s%s' % (CHAIN_NAME_PREFIX[direction], port['device'][3:]))
@@ -370,6 +449,7 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
             self._pre_defer_filtered_ports = None
             self._setup_chains_apply(self.filtered_ports)
             self.iptables.defer_apply_off()
+            self._remove_unused_ipsets()
 
 
 class OVSHybridIptablesFirewallDriver(IptablesFirewallDriver):
@@ -24,13 +24,29 @@
 import inspect
 import os
 
+from oslo.config import cfg
+
 from neutron.agent.linux import utils as linux_utils
 from neutron.common import utils
 from neutron.openstack.common import lockutils
 from neutron.openstack.common import log as logging
+from neutron.openstack.common import timeutils
 
 LOG = logging.getLogger(__name__)
 
+OPTS = [
+    cfg.BoolOpt('iptables_incremental_apply', default=False,
+                help=_('Remember the last applied iptables state and only '
+                       'send the changed chains and rules to '
+                       'iptables-restore --noflush, instead of saving and '
+                       'restoring the whole tables on every apply.')),
+    cfg.IntOpt('iptables_full_sync_interval', default=300,
+               help=_('Seconds between full iptables save/restore '
+                      'reconciliations when iptables_incremental_apply '
+                      'is enabled.')),
+]
+cfg.CONF.register_opts(OPTS, 'AGENT')
+
 
 # NOTE(vish): Iptables supports chain names of up to 28 characters,  and we
 #             add up to 12 characters to binary_name which is used as a prefix,
@@ -285,6 +301,13 @@ class IptablesManager(object):
         self.iptables_apply_deferred = False
         self.wrap_name = binary_name[:16]
 
+        self.incremental_apply = cfg.CONF.AGENT.iptables_incremental_apply
+        self.full_sync_interval = cfg.CONF.AGENT.iptables_full_sync_interval
+        # The chains and rules we know are installed, keyed by
+        # (command, table name). Only used for incremental apply.
+        self._applied_state = {}
+        self._last_full_sync = None
+
         self.ipv4 = {'filter': IptablesTable(binary_name=self.wrap_name)}
         self.ipv6 = {'filter': IptablesTable(binary_name=self.wrap_name)}
 
@@ -377,11 +400,34 @@ class IptablesManager(object):
         same component of Nova, and replace them with our current set of
         rules. This happens atomically, thanks to iptables-restore.
 
+        When incremental apply is enabled and the previously applied state
+        is known, only the differences are sent to iptables-restore. A full
+        save/restore is still done periodically to reconcile with the
+        kernel.
+
         """
         s = [('iptables', self.ipv4)]
         if self.use_ipv6:
             s += [('ip6tables', self.ipv6)]
 
+        if self.incremental_apply and not self._full_sync_required():
+            try:
+                return self._apply_incremental(s)
+            except RuntimeError:
+                LOG.exception(_('Incremental iptables apply failed, '
+                                'falling back to a full apply'))
+
+        self._apply_full(s)
+        if self.incremental_apply:
+            self._applied_state = self._get_desired_state(s)
+            self._last_full_sync = timeutils.utcnow()
+
+    def _full_sync_required(self):
+        return (not self._applied_state or
+                timeutils.is_older_than(self._last_full_sync,
+                                        self.full_sync_interval))
+
+    def _apply_full(self, s):
         for cmd, tables in s:
             args = ['%s-save' % (cmd,), '-c']
             if self.namespace:
@@ -400,6 +446,109 @@ class IptablesManager(object):
                          root_helper=self.root_helper)
         LOG.debug(_("IPTablesManager.apply completed with success"))
 
+    def _apply_incremental(self, s):
+        desired_state = self._get_desired_state(s)
+        for cmd, tables in s:
+            lines = []
+            for table_name in tables:
+                key = (cmd, table_name)
+                table_lines = self._diff_table_state(
+                    self._applied_state.get(key, (set(), {})),
+                    desired_state[key])
+                if table_lines:
+                    lines += ['*%s' % table_name] + table_lines + ['COMMIT']
+
+            if lines:
+                args = ['%s-restore' % (cmd,), '-n']
+                if self.namespace:
+                    args = ['ip', 'netns', 'exec', self.namespace] + args
+                self.execute(args, process_input='\n'.join(lines) + '\n',
+                             root_helper=self.root_helper)
+            for table_name in tables:
+                key = (cmd, table_name)
+                self._applied_state[key] = desired_state[key]
+
+        for cmd, tables in s:
+            for table in tables.values():
+                # Removals are already reflected in the desired state
+                table.remove_chains.clear()
+                del table.remove_rules[:]
+        LOG.debug(_("IPTablesManager.apply completed with success"))
+
+    def _get_desired_state(self, s):
+        """Return the chains and per chain rules we want installed.
+
+        The state is keyed by (command, table name) and mirrors the layout
+        _modify_rules() produces: top rules first, then the others, with
+        duplicates removed so that the last occurrence wins.
+        """
+        state = {}
+        for cmd, tables in s:
+            for table_name, table in tables.iteritems():
+                chains = set(table.unwrapped_chains)
+                chains.update('%s-%s' % (self.wrap_name, name)
+                              for name in table.chains)
+                rules = {}
+                seen_rules = set()
+                ordered = ([r for r in table.rules if r.top] +
+                           [r for r in table.rules if not r.top])
+                for rule in reversed(ordered):
+                    chain = str(rule).split(' ', 2)[1]
+                    if (chain, rule.rule) in seen_rules:
+                        continue
+                    seen_rules.add((chain, rule.rule))
+                    rules.setdefault(chain, []).append(rule.rule)
+                for chain_rules in rules.values():
+                    chain_rules.reverse()
+                state[(cmd, table_name)] = (chains, rules)
+        return state
+
+    def _diff_table_state(self, old_state, new_state):
+        old_chains, old_rules = old_state
+        new_chains, new_rules = new_state
+        removed_chains = old_chains - new_chains
+
+        lines = ['-N %s' % chain for chain in sorted(new_chains - old_chains)]
+        for chain in sorted(set(old_rules) | set(new_rules)):
+            if chain in removed_chains:
+                continue
+            lines += self._diff_chain_rules(chain,
+                                            old_rules.get(chain, []),
+                                            new_rules.get(chain, []))
+        # Flush all removed chains first as they may jump to each other
+        lines += ['-F %s' % chain for chain in sorted(removed_chains)]
+        lines += ['-X %s' % chain for chain in sorted(removed_chains)]
+        return lines
+
+    def _diff_chain_rules(self, chain, old, new):
+        """Return the restore lines turning rules old into rules new.
+
+        Our rules always sit at the head of a chain, so rules are inserted
+        by position. Wrapped chains only hold our rules and can simply be
+        appended to.
+        """
+        old_set = set(old)
+        new_set = set(new)
+        kept = [rule for rule in old if rule in new_set]
+        if kept != [rule for rule in new if rule in old_set]:
+            # The order of the kept rules changed, re-add everything
+            kept = []
+        kept_set = set(kept)
+
+        lines = ['-D %s %s' % (chain, rule) for rule in old
+                 if rule not in kept_set]
+        owned = chain.startswith('%s-' % self.wrap_name)
+        length = len(kept)
+        for index, rule in enumerate(new):
+            if rule in kept_set:
+                continue
+            if owned and index == length:
+                lines.append('-A %s %s' % (chain, rule))
+            else:
+                lines.append('-I %s %d %s' % (chain, index + 1, rule))
+            length += 1
+        return lines
+
     def _find_table(self, lines, table_name):
         if len(lines) < 3:
             # length only <2 when fake iptables
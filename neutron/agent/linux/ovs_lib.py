@@ -14,6 +14,8 @@
 #    under the License.
 
 import distutils.version as dist_version
+import itertools
+import operator
 import os
 import re
 
@@ -108,7 +110,8 @@ class OVSBridge(BaseOVS):
         super(OVSBridge, self).__init__(root_helper)
         self.br_name = br_name
         self.defer_apply_flows = False
-        self.deferred_flows = {'add': '', 'mod': '', 'del': ''}
+        # (action, flow) tuples, in the order they were programmed
+        self.deferred_flows = []
 
     def set_controller(self, controller_names):
         vsctl_command = ['--', 'set-controller', self.br_name]
@@ -184,21 +187,21 @@ class OVSBridge(BaseOVS):
     def add_flow(self, **kwargs):
         flow_str = _build_flow_expr_str(kwargs, 'add')
         if self.defer_apply_flows:
-            self.deferred_flows['add'] += flow_str + '\n'
+            self.deferred_flows.append(('add', flow_str))
         else:
             self.run_ofctl("add-flow", [flow_str])
 
     def mod_flow(self, **kwargs):
         flow_str = _build_flow_expr_str(kwargs, 'mod')
         if self.defer_apply_flows:
-            self.deferred_flows['mod'] += flow_str + '\n'
+            self.deferred_flows.append(('mod', flow_str))
         else:
             self.run_ofctl("mod-flows", [flow_str])
 
     def delete_flows(self, **kwargs):
         flow_expr_str = _build_flow_expr_str(kwargs, 'del')
         if self.defer_apply_flows:
-            self.deferred_flows['del'] += flow_expr_str + '\n'
+            self.deferred_flows.append(('del', flow_expr_str))
         else:
             self.run_ofctl("del-flows", [flow_expr_str])
 
@@ -208,16 +211,20 @@ class OVSBridge(BaseOVS):
 
     def defer_apply_off(self):
         LOG.debug(_('defer_apply_off'))
-        for action, flows in self.deferred_flows.items():
-            if flows:
-                LOG.debug(_('Applying following deferred flows '
-                            'to bridge %s'), self.br_name)
-                for line in flows.splitlines():
-                    LOG.debug(_('%(action)s: %(flow)s'),
-                              {'action': action, 'flow': line})
-                self.run_ofctl('%s-flows' % action, ['-'], flows)
+        # The flows are applied in order, consecutive flows with the same
+        # action being applied by a single ovs-ofctl invocation
+        for action, flows in itertools.groupby(self.deferred_flows,
+                                               operator.itemgetter(0)):
+            flows = [flow for _action, flow in flows]
+            LOG.debug(_('Applying following deferred flows '
+                        'to bridge %s'), self.br_name)
+            for flow in flows:
+                LOG.debug(_('%(action)s: %(flow)s'),
+                          {'action': action, 'flow': flow})
+            self.run_ofctl('%s-flows' % action, ['-'],
+                           ''.join(flow + '\n' for flow in flows))
         self.defer_apply_flows = False
-        self.deferred_flows = {'add': '', 'mod': '', 'del': ''}
+        self.deferred_flows = []
 
     def add_tunnel_port(self, port_name, remote_ip, local_ip,
                         tunnel_type=p_const.TYPE_GRE,
@@ -285,66 +292,91 @@ class OVSBridge(BaseOVS):
                             "Exception: %(exception)s"),
                           {'cmd': args, 'exception': e})
 
+    def _get_bridge_ports(self):
+        """Return the ports of the bridge along with their interface.
+
+        The bridge, port and interface tables are listed by a single
+        ovs-vsctl invocation, rather than one invocation per port and
+        column.
+
+        :returns: a list of dicts with the name and tag of the port, and
+                  the external_ids and ofport of its interface
+        """
+        args = ['--format=json',
+                '--', '--columns=ports', 'list', 'Bridge', self.br_name,
+                '--', '--columns=_uuid,name,tag', 'list', 'Port',
+                '--', '--columns=name,external_ids,ofport', 'list',
+                'Interface']
+        result = self.run_vsctl(args, check_error=True)
+        if not result:
+            return []
+        # Each table is output as a json object on its own line
+        bridges, ports, interfaces = [
+            [dict(zip(table['headings'], row)) for row in table['data']]
+            for table in (jsonutils.loads(line)
+                          for line in result.splitlines() if line.strip())]
+        if not bridges:
+            return []
+        bridge_port_uuids = set(uuid for _type, uuid in
+                                _ovsdb_set_elements(bridges[0]['ports']))
+        interfaces = dict((interface['name'], interface)
+                          for interface in interfaces)
+        bridge_ports = []
+        for port in ports:
+            if port['_uuid'][1] not in bridge_port_uuids:
+                continue
+            interface = interfaces.get(port['name'], {})
+            # 'tag' can be [u'set', []] or an integer
+            tag = port['tag']
+            if isinstance(tag, list):
+                tag = tag[1]
+            bridge_ports.append({
+                'name': port['name'],
+                'tag': tag,
+                'external_ids': dict(interface.get('external_ids',
+                                                   ['map', []])[1]),
+                'ofport': interface.get('ofport')})
+        return bridge_ports
+
+    def _get_vif_port_id(self, port):
+        external_ids = port['external_ids']
+        if "iface-id" in external_ids and "attached-mac" in external_ids:
+            return external_ids["iface-id"]
+        elif ("xs-vif-uuid" in external_ids and
+              "attached-mac" in external_ids):
+            # if this is a xenserver and iface-id is not automatically
+            # synced to OVS from XAPI, we grab it from XAPI directly
+            return self.get_xapi_iface_id(external_ids["xs-vif-uuid"])
+
     # returns a VIF object for each VIF port
     def get_vif_ports(self):
         edge_ports = []
-        port_names = self.get_port_name_list()
-        for name in port_names:
-            external_ids = self.db_get_map("Interface", name, "external_ids",
-                                           check_error=True)
-            ofport = self.db_get_val("Interface", name, "ofport",
-                                     check_error=True)
-            if "iface-id" in external_ids and "attached-mac" in external_ids:
-                p = VifPort(name, ofport, external_ids["iface-id"],
-                            external_ids["attached-mac"], self)
-                edge_ports.append(p)
-            elif ("xs-vif-uuid" in external_ids and
-                  "attached-mac" in external_ids):
-                # if this is a xenserver and iface-id is not automatically
-                # synced to OVS from XAPI, we grab it from XAPI directly
-                iface_id = self.get_xapi_iface_id(external_ids["xs-vif-uuid"])
-                p = VifPort(name, ofport, iface_id,
-                            external_ids["attached-mac"], self)
-                edge_ports.append(p)
-
+        for port in self._get_bridge_ports():
+            vif_id = self._get_vif_port_id(port)
+            if vif_id:
+                edge_ports.append(
+                    VifPort(port['name'], port['ofport'], vif_id,
+                            port['external_ids']['attached-mac'], self))
         return edge_ports
 
     def get_vif_port_set(self):
-        port_names = self.get_port_name_list()
         edge_ports = set()
-        args = ['--format=json', '--', '--columns=name,external_ids,ofport',
-                'list', 'Interface']
-        result = self.run_vsctl(args, check_error=True)
-        if not result:
-            return edge_ports
-        for row in jsonutils.loads(result)['data']:
-            name = row[0]
-            if name not in port_names:
-                continue
-            external_ids = dict(row[1][1])
+        for port in self._get_bridge_ports():
             # Do not consider VIFs which aren't yet ready
             # This can happen when ofport values are either [] or ["set", []]
             # We will therefore consider only integer values for ofport
-            ofport = row[2]
+            ofport = port['ofport']
             try:
                 int_ofport = int(ofport)
             except (ValueError, TypeError):
-                LOG.warn(_("Found not yet ready openvswitch port: %s"), row)
+                LOG.warn(_("Found not yet ready openvswitch port: %s"), port)
             else:
                 if int_ofport > 0:
-                    if ("iface-id" in external_ids and
-                        "attached-mac" in external_ids):
-                        edge_ports.add(external_ids['iface-id'])
-                    elif ("xs-vif-uuid" in external_ids and
-                          "attached-mac" in external_ids):
-                        # if this is a xenserver and iface-id is not
-                        # automatically synced to OVS from XAPI, we grab it
-                        # from XAPI directly
-                        iface_id = self.get_xapi_iface_id(
-                            external_ids["xs-vif-uuid"])
-                        edge_ports.add(iface_id)
+                    vif_id = self._get_vif_port_id(port)
+                    if vif_id:
+                        edge_ports.add(vif_id)
                 else:
-                    LOG.warn(_("Found failed openvswitch port: %s"), row)
+                    LOG.warn(_("Found failed openvswitch port: %s"), port)
         return edge_ports
 
     def get_port_tag_dict(self):
@@ -362,20 +394,8 @@ class OVSBridge(BaseOVS):
         in the "Interface" table queried by the get_vif_port_set() method.
 
         """
-        port_names = self.get_port_name_list()
-        args = ['--format=json', '--', '--columns=name,tag', 'list', 'Port']
-        result = self.run_vsctl(args, check_error=True)
-        port_tag_dict = {}
-        if not result:
-            return port_tag_dict
-        for name, tag in jsonutils.loads(result)['data']:
-            if name not in port_names:
-                continue
-            # 'tag' can be [u'set', []] or an integer
-            if isinstance(tag, list):
-                tag = tag[1]
-            port_tag_dict[name] = tag
-        return port_tag_dict
+        return dict((port['name'], port['tag'])
+                    for port in self._get_bridge_ports())
 
     def get_vif_port_by_id(self, port_id):
         args = ['--format=json', '--', '--columns=external_ids,name,ofport',
@@ -439,6 +459,17 @@ class OVSBridge(BaseOVS):
             raise Exception(msg)
 
 
+def _ovsdb_set_elements(value):
+    """Return the elements of an ovsdb set, as encoded in json.
+
+    Sets of one element are encoded as the element itself, others as
+    ["set", [element, ...]].
+    """
+    if value and value[0] == 'set':
+        return value[1]
+    return [value]
+
+
 def get_bridge_for_iface(root_helper, iface):
     args = ["ovs-vsctl", "--timeout=%d" % cfg.CONF.ovs_vsctl_timeout,
             "iface-to-br", iface]
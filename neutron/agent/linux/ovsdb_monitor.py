@@ -17,11 +17,17 @@
 import eventlet
 
 from neutron.agent.linux import async_process
+from neutron.openstack.common import jsonutils
 from neutron.openstack.common import log as logging
 
 
 LOG = logging.getLogger(__name__)
 
+OVSDB_ACTION_INITIAL = 'initial'
+OVSDB_ACTION_INSERT = 'insert'
+OVSDB_ACTION_DELETE = 'delete'
+OVSDB_ACTION_NEW = 'new'
+
 
 class OvsdbMonitor(async_process.AsyncProcess):
     """Manages an invocation of 'ovsdb-client monitor'."""
@@ -59,18 +65,22 @@ class SimpleInterfaceMonitor(OvsdbMonitor):
 
     The has_updates() method indicates whether changes to the ovsdb
     Interface table have been detected since the monitor started or
-    since the previous access.
+    since the previous access, and the get_events() method returns the
+    interfaces added and removed meanwhile.
     """
 
     def __init__(self, root_helper=None, respawn_interval=None):
         super(SimpleInterfaceMonitor, self).__init__(
             'Interface',
-            columns=['name', 'ofport'],
+            columns=['name', 'ofport', 'external_ids'],
             format='json',
             root_helper=root_helper,
             respawn_interval=respawn_interval,
         )
         self.data_received = False
+        self.new_events = {'added': [], 'removed': []}
+        # Set while changes may have been missed, until get_events is called
+        self.events_missed = True
 
     @property
     def is_active(self):
@@ -87,7 +97,66 @@ class SimpleInterfaceMonitor(OvsdbMonitor):
         the absence of updates at the expense of potential false
         positives.
         """
-        return bool(list(self.iter_stdout())) or not self.is_active
+        return self.process_events() or not self.is_active
+
+    def process_events(self):
+        """Parse the monitor output received since the previous call.
+
+        The interfaces inserted, or modified, are queued as added, and the
+        deleted ones as removed, each as a dict with the name, ofport and
+        external_ids keys.
+
+        :returns: whether any output was received
+        """
+        received = False
+        for line in self.iter_stdout():
+            received = True
+            try:
+                output = jsonutils.loads(line)
+                headings = output['headings']
+                rows = [dict(zip(headings, row)) for row in output['data']]
+            except (ValueError, KeyError, TypeError):
+                LOG.warning(_('Unable to parse ovsdb monitor output: %s'),
+                            line)
+                self.events_missed = True
+                continue
+            for row in rows:
+                action = row.get('action')
+                if action == OVSDB_ACTION_INITIAL:
+                    # The monitor (re)started, changes may have been missed
+                    self.events_missed = True
+                    self.new_events['added'].append(self._interface(row))
+                elif action in (OVSDB_ACTION_INSERT, OVSDB_ACTION_NEW):
+                    self.new_events['added'].append(self._interface(row))
+                elif action == OVSDB_ACTION_DELETE:
+                    self.new_events['removed'].append(self._interface(row))
+        return received
+
+    def _interface(self, row):
+        external_ids = row.get('external_ids')
+        if isinstance(external_ids, list) and len(external_ids) == 2:
+            # Maps are encoded as ["map", [[key, value], ...]]
+            external_ids = dict(external_ids[1])
+        else:
+            external_ids = {}
+        return {'name': row.get('name'),
+                'ofport': row.get('ofport'),
+                'external_ids': external_ids}
+
+    def get_events(self):
+        """Return the interfaces added and removed since the previous call.
+
+        :returns: dict with the lists of interfaces added and removed, or
+                  None when changes may have been missed because the
+                  monitor is not active or was (re)started
+        """
+        self.process_events()
+        events = self.new_events
+        self.new_events = {'added': [], 'removed': []}
+        if self.events_missed or not self.is_active:
+            self.events_missed = not self.is_active
+            return
+        return events
 
     def start(self, block=False, timeout=5):
         super(SimpleInterfaceMonitor, self).start()
@@ -98,6 +167,7 @@ class SimpleInterfaceMonitor(OvsdbMonitor):
 
     def _kill(self, *args, **kwargs):
         self.data_received = False
+        self.events_missed = True
         super(SimpleInterfaceMonitor, self)._kill(*args, **kwargs)
 
     def _read_stdout(self):
@@ -56,6 +56,13 @@ class BasePollingManager(object):
     def _is_polling_required(self):
         raise NotImplemented
 
+    def get_events(self):
+        """Return the interfaces added and removed since the previous call.
+
+        :returns: None when the changes are not tracked, the caller then
+                  has to look at all the interfaces
+        """
+
     @property
     def is_polling_required(self):
         # Always consume the updates to minimize polling.
@@ -107,6 +114,9 @@ class InterfacePollingMinimizer(BasePollingManager):
     def stop(self):
         self._monitor.stop()
 
+    def get_events(self):
+        return self._monitor.get_events()
+
     def _is_polling_required(self):
         # Maximize the chances of update detection having a chance to
         # collect output.
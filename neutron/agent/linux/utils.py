@@ -26,6 +26,7 @@ import tempfile
 
 from eventlet.green import subprocess
 from eventlet import greenthread
+from oslo.config import cfg
 
 from neutron.common import utils
 from neutron.openstack.common import excutils
@@ -34,6 +35,19 @@ from neutron.openstack.common import log as logging
 
 LOG = logging.getLogger(__name__)
 
+OPTS = [
+    cfg.StrOpt('root_helper_daemon',
+               help=_('Command starting a long lived root helper daemon, '
+                      'e.g. "sudo neutron-rootwrap-daemon '
+                      '/etc/neutron/rootwrap.conf". When set, the commands '
+                      'run with a root helper are sent to the daemon instead '
+                      'of starting the root helper for each of them.')),
+]
+cfg.CONF.register_opts(OPTS, 'AGENT')
+
+# Rootwrap daemon clients, by daemon command
+_rootwrap_clients = {}
+
 
 def create_process(cmd, root_helper=None, addl_env=None):
     """Create a process object for the given command.
@@ -59,20 +73,59 @@ def create_process(cmd, root_helper=None, addl_env=None):
     return obj, cmd
 
 
+def _get_rootwrap_client(daemon_cmd):
+    client = _rootwrap_clients.get(daemon_cmd)
+    if client is None:
+        # NOTE: the client is imported here as it has to be loaded after
+        # eventlet monkey patching, which the agents do in their main()
+        from oslo.rootwrap import client as rootwrap_client
+        client = rootwrap_client.Client(shlex.split(daemon_cmd))
+        _rootwrap_clients[daemon_cmd] = client
+    return client
+
+
+def _execute_rootwrap_daemon(cmd, process_input=None, addl_env=None):
+    """Run the command through the rootwrap daemon.
+
+    The return value will be a tuple of the exit code, stdout and stderr
+    of the command.
+    """
+    cmd = map(str, cmd)
+    LOG.debug(_("Running command (rootwrap daemon): %s"), cmd)
+    client = _get_rootwrap_client(cfg.CONF.AGENT.root_helper_daemon)
+    # NOTE: the daemon runs the command with the given environment only, so
+    # the PATH which sudo would give to the root helper is passed along
+    env = {'PATH': os.environ.get('PATH', os.defpath)}
+    if addl_env:
+        env.update(addl_env)
+    try:
+        return client.execute(cmd, env, process_input)
+    except Exception as e:
+        # The daemon raises when the command matches no filter, when
+        # neutron-rootwrap would exit with an error code
+        raise RuntimeError(_("\nCommand: %(cmd)s\nRootwrap daemon error: "
+                             "%(error)s") % {'cmd': cmd, 'error': e})
+
+
 def execute(cmd, root_helper=None, process_input=None, addl_env=None,
             check_exit_code=True, return_stderr=False):
     try:
-        obj, cmd = create_process(cmd, root_helper=root_helper,
-                                  addl_env=addl_env)
-        _stdout, _stderr = (process_input and
-                            obj.communicate(process_input) or
-                            obj.communicate())
-        obj.stdin.close()
+        if root_helper and cfg.CONF.AGENT.root_helper_daemon:
+            returncode, _stdout, _stderr = _execute_rootwrap_daemon(
+                cmd, process_input=process_input, addl_env=addl_env)
+        else:
+            obj, cmd = create_process(cmd, root_helper=root_helper,
+                                      addl_env=addl_env)
+            _stdout, _stderr = (process_input and
+                                obj.communicate(process_input) or
+                                obj.communicate())
+            obj.stdin.close()
+            returncode = obj.returncode
         m = _("\nCommand: %(cmd)s\nExit code: %(code)s\nStdout: %(stdout)r\n"
-              "Stderr: %(stderr)r") % {'cmd': cmd, 'code': obj.returncode,
+              "Stderr: %(stderr)r") % {'cmd': cmd, 'code': returncode,
                                        'stdout': _stdout, 'stderr': _stderr}
         LOG.debug(m)
-        if obj.returncode and check_exit_code:
+        if returncode and check_exit_code:
             raise RuntimeError(m)
     finally:
         # NOTE(termie): this appears to be necessary to let the subprocess
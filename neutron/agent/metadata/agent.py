@@ -16,10 +16,12 @@
 #
 # @author: Mark McClain, DreamHost
 
+import collections
 import hashlib
 import hmac
 import os
 import socket
+import time
 
 import eventlet
 import httplib2
@@ -44,6 +46,41 @@ from neutron import wsgi
 LOG = logging.getLogger(__name__)
 
 
+class LookupCache(object):
+    """LRU cache of values expiring after a time to live."""
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self._entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the value cached for a key, or None."""
+        entry = self._entries.pop(key, None)
+        if entry and entry[0] > time.time():
+            # The most recently used entries are the last ones
+            self._entries[key] = entry
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+
+    def put(self, key, value):
+        """Cache the value of a key, evicting the least recently used."""
+        if self.size < 1 or self.ttl <= 0:
+            return
+        self._entries.pop(key, None)
+        if len(self._entries) >= self.size:
+            self._entries.popitem(last=False)
+        self._entries[key] = (time.time() + self.ttl, value)
+
+    def get_state(self):
+        return {'cache_entries': len(self._entries),
+                'cache_hits': self.hits,
+                'cache_misses': self.misses}
+
+
 class MetadataProxyHandler(object):
     OPTS = [
         cfg.StrOpt('admin_user',
@@ -92,12 +129,25 @@ class MetadataProxyHandler(object):
                    help=_("Client certificate for nova metadata api server.")),
         cfg.StrOpt('nova_client_priv_key',
                    default='',
-                   help=_("Private key of client certificate."))
+                   help=_("Private key of client certificate.")),
+        cfg.IntOpt('metadata_cache_size',
+                   default=1000,
+                   help=_("Number of instances looked up by network or "
+                          "router and IP address to cache, 0 to disable "
+                          "the cache.")),
+        cfg.IntOpt('metadata_cache_ttl',
+                   default=5,
+                   help=_("Number of seconds an instance looked up by "
+                          "network or router and IP address is cached. "
+                          "The IP address of a deleted instance can be "
+                          "given to another one in the meantime."))
     ]
 
     def __init__(self, conf):
         self.conf = conf
         self.auth_info = {}
+        self.cache = LookupCache(self.conf.metadata_cache_size,
+                                 self.conf.metadata_cache_ttl)
 
     def _get_neutron_client(self):
         qclient = client.Client(
@@ -133,12 +183,26 @@ class MetadataProxyHandler(object):
             return webob.exc.HTTPInternalServerError(explanation=unicode(msg))
 
     def _get_instance_and_tenant_id(self, req):
-        qclient = self._get_neutron_client()
-
         remote_address = req.headers.get('X-Forwarded-For')
         network_id = req.headers.get('X-Neutron-Network-ID')
         router_id = req.headers.get('X-Neutron-Router-ID')
 
+        cache_key = (network_id, router_id, remote_address)
+        ids = self.cache.get(cache_key)
+        if ids:
+            return ids
+        ids = self._lookup_instance_and_tenant_id(remote_address, network_id,
+                                                  router_id)
+        # The instances not found are not cached, as their port may be
+        # about to be created
+        if ids[0]:
+            self.cache.put(cache_key, ids)
+        return ids
+
+    def _lookup_instance_and_tenant_id(self, remote_address, network_id,
+                                       router_id):
+        qclient = self._get_neutron_client()
+
         if network_id:
             networks = [network_id]
         else:
@@ -280,6 +344,7 @@ class UnixDomainMetadataProxy(object):
 
     def __init__(self, conf):
         self.conf = conf
+        self.handler = None
 
         dirname = os.path.dirname(cfg.CONF.metadata_proxy_socket)
         if os.path.isdir(dirname):
@@ -315,6 +380,10 @@ class UnixDomainMetadataProxy(object):
             self.heartbeat.start(interval=report_interval)
 
     def _report_state(self):
+        # The lookups of the worker processes are not known here
+        if self.handler and self.conf.metadata_workers < 1:
+            self.agent_state['configurations'].update(
+                self.handler.cache.get_state())
         try:
             self.state_rpc.report_state(
                 self.context,
@@ -333,7 +402,8 @@ class UnixDomainMetadataProxy(object):
 
     def run(self):
         server = UnixDomainWSGIServer('neutron-metadata-agent')
-        server.start(MetadataProxyHandler(self.conf),
+        self.handler = MetadataProxyHandler(self.conf)
+        server.start(self.handler,
                      self.conf.metadata_proxy_socket,
                      workers=self.conf.metadata_workers,
                      backlog=self.conf.metadata_backlog)
@@ -21,6 +21,7 @@ from neutron.common import topics
 
 from neutron.openstack.common import log as logging
 from neutron.openstack.common import rpc
+from neutron.openstack.common.rpc import common as rpc_common
 from neutron.openstack.common.rpc import proxy
 from neutron.openstack.common import timeutils
 
@@ -79,14 +80,24 @@ class PluginApi(proxy.RpcProxy):
 
     API version history:
         1.0 - Initial version.
+        1.3 - get_devices_details_list
+        1.4 - update_device_list
 
     '''
 
     BASE_RPC_API_VERSION = '1.1'
+    DEVICES_DETAILS_LIST_VERSION = '1.3'
+    UPDATE_DEVICE_LIST_VERSION = '1.4'
 
     def __init__(self, topic):
         super(PluginApi, self).__init__(
             topic=topic, default_version=self.BASE_RPC_API_VERSION)
+        # Cleared when the server turns out not to support
+        # get_devices_details_list
+        self.devices_details_list_supported = True
+        # Cleared when the server turns out not to support
+        # update_device_list
+        self.update_device_list_supported = True
 
     def get_device_details(self, context, device, agent_id):
         return self.call(context,
@@ -94,6 +105,31 @@ class PluginApi(proxy.RpcProxy):
                                        agent_id=agent_id),
                          topic=self.topic)
 
+    def get_devices_details_list(self, context, devices, agent_id):
+        """Return the details of each device, in the order of devices.
+
+        Falls back to one get_device_details call per device on servers
+        that do not support the bulk call.
+        """
+        if self.devices_details_list_supported:
+            try:
+                return self.call(context,
+                                 self.make_msg('get_devices_details_list',
+                                               devices=devices,
+                                               agent_id=agent_id),
+                                 topic=self.topic,
+                                 version=self.DEVICES_DETAILS_LIST_VERSION)
+            except rpc_common.RemoteError as e:
+                if e.exc_type not in ('UnsupportedRpcVersion',
+                                      'AttributeError'):
+                    raise
+                LOG.info(_("Server does not support "
+                           "get_devices_details_list, falling back to "
+                           "get_device_details"))
+                self.devices_details_list_supported = False
+        return [self.get_device_details(context, device, agent_id)
+                for device in devices]
+
     def update_device_down(self, context, device, agent_id, host=None):
         return self.call(context,
                          self.make_msg('update_device_down', device=device,
@@ -106,6 +142,42 @@ class PluginApi(proxy.RpcProxy):
                                        agent_id=agent_id, host=host),
                          topic=self.topic)
 
+    def update_device_list(self, context, devices_up, devices_down,
+                           agent_id, host=None):
+        """Report several devices up and several devices removed at once.
+
+        Falls back to one update_device_up or update_device_down call per
+        device on servers that do not support the bulk call.
+
+        :returns: dict with the keys devices_up, the devices reported up,
+                  and devices_down, the update_device_down result of each
+                  device reported removed
+        """
+        if self.update_device_list_supported:
+            try:
+                return self.call(context,
+                                 self.make_msg('update_device_list',
+                                               devices_up=devices_up,
+                                               devices_down=devices_down,
+                                               agent_id=agent_id,
+                                               host=host),
+                                 topic=self.topic,
+                                 version=self.UPDATE_DEVICE_LIST_VERSION)
+            except rpc_common.RemoteError as e:
+                if e.exc_type not in ('UnsupportedRpcVersion',
+                                      'AttributeError'):
+                    raise
+                LOG.info(_("Server does not support update_device_list, "
+                           "falling back to update_device_up and "
+                           "update_device_down"))
+                self.update_device_list_supported = False
+        for device in devices_up:
+            self.update_device_up(context, device, agent_id, host)
+        return {'devices_up': devices_up,
+                'devices_down': [self.update_device_down(context, device,
+                                                         agent_id, host)
+                                 for device in devices_down]}
+
     def tunnel_sync(self, context, tunnel_ip, tunnel_type=None):
         return self.call(context,
                          self.make_msg('tunnel_sync', tunnel_ip=tunnel_ip,
@@ -16,14 +16,21 @@
 #    under the License.
 #
 
+import netaddr
 from oslo.config import cfg
 
 from neutron.common import topics
 from neutron.openstack.common import importutils
 from neutron.openstack.common import log as logging
+from neutron.openstack.common.rpc import common as rpc_common
 
 LOG = logging.getLogger(__name__)
 SG_RPC_VERSION = "1.1"
+# Version of the server side RPC API providing security_group_info_for_devices
+SG_INFO_RPC_VERSION = "1.2"
+
+DIRECTION_IP_PREFIX = {'ingress': 'source_ip_prefix',
+                       'egress': 'dest_ip_prefix'}
 
 security_group_opts = [
     cfg.StrOpt(
@@ -36,7 +43,13 @@ security_group_opts = [
         help=_(
             'Controls whether the neutron security group API is enabled '
             'in the server. It should be false when using no security '
-            'groups or using the nova security group API.'))
+            'groups or using the nova security group API.')),
+    cfg.BoolOpt(
+        'enable_ipset',
+        default=False,
+        help=_('Use ipsets to hold the members of remote security groups '
+               'in the iptables based firewall drivers, instead of one '
+               'iptables rule per member.'))
 ]
 cfg.CONF.register_opts(security_group_opts, 'SECURITYGROUP')
 
@@ -85,6 +98,15 @@ class SecurityGroupServerRpcApiMixin(object):
                          version=SG_RPC_VERSION,
                          topic=self.topic)
 
+    def security_group_info_for_devices(self, context, devices):
+        LOG.debug(_("Get security group information "
+                    "for devices via rpc %r"), devices)
+        return self.call(context,
+                         self.make_msg('security_group_info_for_devices',
+                                       devices=devices),
+                         version=SG_INFO_RPC_VERSION,
+                         topic=self.topic)
+
 
 class SecurityGroupAgentRpcCallbackMixin(object):
     """A mix-in that enable SecurityGroup agent
@@ -135,7 +157,8 @@ class SecurityGroupAgentRpcMixin(object):
     support in agent implementations.
     """
 
-    def init_firewall(self, defer_refresh_firewall=False):
+    def init_firewall(self, defer_refresh_firewall=False,
+                      use_enhanced_rpc=False):
         firewall_driver = cfg.CONF.SECURITYGROUP.firewall_driver
         LOG.debug(_("Init firewall settings (driver=%s)"), firewall_driver)
         if not _is_valid_driver_combination():
@@ -152,13 +175,66 @@ class SecurityGroupAgentRpcMixin(object):
         self.devices_to_refilter = set()
         # Flag raised when a global refresh is needed
         self.global_refresh_firewall = False
+        # Fetch security group rules and members once per security group
+        # through security_group_info_for_devices, if the server supports it
+        self.use_enhanced_rpc = use_enhanced_rpc
+
+    def _security_group_rules_for_devices(self, device_ids):
+        if self.use_enhanced_rpc:
+            try:
+                sg_info = self.plugin_rpc.security_group_info_for_devices(
+                    self.context, device_ids)
+                return self._expand_security_group_info(sg_info)
+            except rpc_common.RemoteError as e:
+                if e.exc_type not in ('UnsupportedRpcVersion',
+                                      'AttributeError'):
+                    raise
+                LOG.info(_("Server does not support "
+                           "security_group_info_for_devices, falling back "
+                           "to security_group_rules_for_devices"))
+                self.use_enhanced_rpc = False
+        return self.plugin_rpc.security_group_rules_for_devices(
+            self.context, device_ids)
+
+    def _expand_security_group_info(self, sg_info):
+        """Build the per device rules from the per security group info.
+
+        The result has the same format as the one returned by
+        security_group_rules_for_devices: rules referring to a remote group
+        are converted to one rule per member IP of the group.
+        """
+        devices = sg_info['devices']
+        security_groups = sg_info['security_groups']
+        sg_member_ips = sg_info['sg_member_ips']
+        for device in devices.values():
+            rules = []
+            for sg_id in device.get('security_groups', []):
+                for rule in security_groups.get(sg_id, []):
+                    remote_group_id = rule.get('remote_group_id')
+                    if not remote_group_id:
+                        rules.append(rule.copy())
+                        continue
+                    direction_ip_prefix = DIRECTION_IP_PREFIX[
+                        rule['direction']]
+                    for ip in sg_member_ips.get(remote_group_id, []):
+                        if ip in device.get('fixed_ips', []):
+                            continue
+                        ip_net = netaddr.IPNetwork(ip)
+                        if rule['ethertype'] != 'IPv%s' % ip_net.version:
+                            continue
+                        ip_rule = rule.copy()
+                        ip_rule[direction_ip_prefix] = str(ip_net.cidr)
+                        rules.append(ip_rule)
+            # The provider rules sent by the server come last
+            device['security_group_rules'] = (
+                rules + device.get('security_group_rules', []))
+        return devices
 
     def prepare_devices_filter(self, device_ids):
         if not device_ids:
             return
         LOG.info(_("Preparing filters for devices %s"), device_ids)
-        devices = self.plugin_rpc.security_group_rules_for_devices(
-            self.context, list(device_ids))
+        devices = self._security_group_rules_for_devices(list(device_ids))
         with self.firewall.defer_apply():
             for device in devices.values():
                 self.firewall.prepare_port_filter(device)
@@ -220,8 +296,7 @@ class SecurityGroupAgentRpcMixin(object):
             if not device_ids:
                 LOG.info(_("No ports here to refresh firewall"))
                 return
-        devices = self.plugin_rpc.security_group_rules_for_devices(
-            self.context, device_ids)
+        devices = self._security_group_rules_for_devices(device_ids)
         with self.firewall.defer_apply():
             for device in devices.values():
                 LOG.debug(_("Update port filter for %s"), device['device'])
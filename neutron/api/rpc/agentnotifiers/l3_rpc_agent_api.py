@@ -112,6 +112,50 @@ class L3AgentNotifyAPI(proxy.RpcProxy):
             self._notification(context, 'routers_updated', router_ids,
                                operation, data)
 
+    def floatingips_updated(self, context, router_id, revision, floatingips,
+                            removed):
+        """Notify the floating IPs changed by a revision of a router.
+
+        Only the agents reporting floatingip_deltas in their configurations
+        get the changes, the other ones get the whole router as before. So
+        do the agents that do not host the router yet, once it is scheduled,
+        and all the agents of plugins without agent scheduler, which may not
+        tell the versions of their agents.
+        """
+        plugin = manager.NeutronManager.get_service_plugins().get(
+            service_constants.L3_ROUTER_NAT)
+        if not plugin:
+            LOG.error(_('No plugin for L3 routing registered. Cannot notify '
+                        'agents with the message floatingips_updated'))
+            return
+        if not utils.is_extension_supported(
+                plugin, constants.L3_AGENT_SCHEDULER_EXT_ALIAS):
+            self.routers_updated(context, [router_id])
+            return
+        adminContext = context.is_admin and context or context.elevated()
+        l3_agents = plugin.get_l3_agents_hosting_routers(
+            adminContext, [router_id], admin_state_up=True, active=True)
+        if not l3_agents:
+            self.routers_updated(context, [router_id])
+        for l3_agent in l3_agents:
+            topic = '%s.%s' % (l3_agent.topic, l3_agent.host)
+            if not plugin.get_configuration_dict(l3_agent).get(
+                    'floatingip_deltas'):
+                # The agent was not upgraded yet
+                self.cast(context, self.make_msg('routers_updated',
+                                                 routers=[router_id]),
+                          topic=topic, version='1.1')
+                continue
+            LOG.debug(_('Notify agent at %(topic)s.%(host)s the message '
+                        'floatingips_updated'),
+                      {'topic': l3_agent.topic, 'host': l3_agent.host})
+            self.cast(context,
+                      self.make_msg('floatingips_updated',
+                                    router_id=router_id, revision=revision,
+                                    floatingips=floatingips,
+                                    removed=removed),
+                      topic=topic, version='1.2')
+
     def router_removed_from_agent(self, context, router_id, host):
         self._notification_host(context, 'router_removed_from_agent',
                                 {'router_id': router_id}, host)
@@ -16,6 +16,7 @@
 #    under the License.
 
 import copy
+import itertools
 import netaddr
 import webob.exc
 
@@ -28,6 +29,7 @@ from neutron.api.v2 import resource as wsgi_resource
 from neutron.common import constants as const
 from neutron.common import exceptions
 from neutron.notifiers import nova
+from neutron.openstack.common import excutils
 from neutron.openstack.common import log as logging
 from neutron.openstack.common.notifier import api as notifier_api
 from neutron import policy
@@ -48,6 +50,7 @@ FAULT_MAP = {exceptions.NotFound: webob.exc.HTTPNotFound,
 
 class Controller(object):
     LIST = 'list'
+    ITER = 'iter'
     SHOW = 'show'
     CREATE = 'create'
     UPDATE = 'update'
@@ -99,12 +102,33 @@ class Controller(object):
             parent_part = ''
         self._plugin_handlers = {
             self.LIST: 'get%s_%s' % (parent_part, self._collection),
+            self.ITER: 'iter%s_%s' % (parent_part, self._collection),
             self.SHOW: 'get%s_%s' % (parent_part, self._resource)
         }
         for action in [self.CREATE, self.UPDATE, self.DELETE]:
             self._plugin_handlers[action] = '%s%s_%s' % (action, parent_part,
                                                          self._resource)
 
+    def _get_iter_handler(self):
+        """Return the plugin method iterating over the collection, if any.
+
+        The iterating method is only used when the listing method was not
+        overridden by a subclass of the plugin class defining it, nor
+        delegated to another object by the plugin.
+        """
+        list_method = getattr(self._plugin, self._plugin_handlers[self.LIST],
+                              None)
+        iter_method = getattr(self._plugin, self._plugin_handlers[self.ITER],
+                              None)
+        list_owner = getattr(list_method, '__self__', None)
+        if getattr(iter_method, '__self__', list_owner) is not list_owner:
+            return
+        for cls in self._plugin.__class__.__mro__:
+            if self._plugin_handlers[self.ITER] in vars(cls):
+                return getattr(self._plugin, self._plugin_handlers[self.ITER])
+            if self._plugin_handlers[self.LIST] in vars(cls):
+                return
+
     def _get_primary_key(self, default_primary_key='id'):
         for key, value in self._attr_info.iteritems():
             if value.get('primary_key', False):
@@ -126,7 +150,7 @@ class Controller(object):
                                     % self._plugin.__class__.__name__)
         return getattr(self._plugin, native_sorting_attr_name, False)
 
-    def _is_visible(self, context, attr_name, data):
+    def _is_visible(self, context, attr_name, data, checker=None):
         action = "%s:%s" % (self._plugin_handlers[self.SHOW], attr_name)
         # Optimistically init authz_check to True
         authz_check = True
@@ -134,8 +158,11 @@ class Controller(object):
             attr = (attributes.RESOURCE_ATTRIBUTE_MAP
                     [self._collection].get(attr_name))
             if attr and attr.get('enforce_policy'):
-                authz_check = policy.check_if_exists(
-                    context, action, data)
+                if checker:
+                    authz_check = checker.check_if_exists(action, data)
+                else:
+                    authz_check = policy.check_if_exists(
+                        context, action, data)
         except KeyError:
             # The extension was not configured for adding its resources
             # to the global resource attribute map. Policy check should
@@ -153,13 +180,15 @@ class Controller(object):
         attr_val = self._attr_info.get(attr_name)
         return attr_val and attr_val['is_visible'] and authz_check
 
-    def _view(self, context, data, fields_to_strip=None):
+    def _view(self, context, data, fields_to_strip=None, checker=None):
         # make sure fields_to_strip is iterable
         if not fields_to_strip:
             fields_to_strip = []
+        if not checker:
+            checker = policy.CachedChecker(context)
 
         return dict(item for item in data.iteritems()
-                    if (self._is_visible(context, item[0], data) and
+                    if (self._is_visible(context, item[0], data, checker) and
                         item[0] not in fields_to_strip))
 
     def _do_field_list(self, original_fields):
@@ -231,6 +260,19 @@ class Controller(object):
         pagination_helper.update_fields(original_fields, fields_to_add)
         if parent_id:
             kwargs[self._parent_id_name] = parent_id
+        # The policy decisions are shared by the elements of the list
+        checker = policy.CachedChecker(request.context)
+        obj_iter = self._get_iter_handler()
+        # Without sort keys, the emulated sorting keeps the plugin order
+        if (obj_iter and not getattr(pagination_helper, 'limit', None) and
+                not (isinstance(sorting_helper,
+                                api_common.SortingEmulatedHelper) and
+                     sorting_helper.sort_dict)):
+            for arg in ('limit', 'marker', 'page_reverse'):
+                kwargs.pop(arg, None)
+            return {self._collection: self._stream_items(
+                request.context, obj_iter(request.context, **kwargs),
+                do_authz, fields_to_add, checker)}
         obj_getter = getattr(self._plugin, self._plugin_handlers[self.LIST])
         obj_list = obj_getter(request.context, **kwargs)
         obj_list = sorting_helper.sort(obj_list)
@@ -241,19 +283,44 @@ class Controller(object):
             # other resources. Must check authZ on them too.
             # Omit items from list that should not be visible
             obj_list = [obj for obj in obj_list
-                        if policy.check(request.context,
-                                        self._plugin_handlers[self.SHOW],
-                                        obj,
-                                        plugin=self._plugin)]
+                        if checker.check(self._plugin_handlers[self.SHOW],
+                                         obj)]
         collection = {self._collection:
                       [self._view(request.context, obj,
-                                  fields_to_strip=fields_to_add)
+                                  fields_to_strip=fields_to_add,
+                                  checker=checker)
                        for obj in obj_list]}
         pagination_links = pagination_helper.get_links(obj_list)
         if pagination_links:
             collection[self._collection + "_links"] = pagination_links
         return collection
 
+    def _stream_items(self, context, obj_iter, do_authz, fields_to_strip,
+                      checker):
+        """Return an iterator over the views of the elements of a list.
+
+        The elements are fetched, checked and formatted one by one while the
+        response is sent, except the first one: the errors of the plugin are
+        mostly raised by the first batch, before the response starts. The
+        later ones close the connection, see resource._stream.
+        """
+        def views(objs):
+            for obj in objs:
+                if (do_authz and
+                        not checker.check(self._plugin_handlers[self.SHOW],
+                                          obj)):
+                    continue
+                yield self._view(context, obj,
+                                 fields_to_strip=fields_to_strip,
+                                 checker=checker)
+
+        obj_iter = iter(obj_iter)
+        try:
+            first_obj = next(obj_iter)
+        except StopIteration:
+            return iter([])
+        return views(itertools.chain([first_obj], obj_iter))
+
     def _item(self, request, id, do_authz=False, field_list=None,
               parent_id=None):
         """Retrieves and formats a single element of the requested entity."""
@@ -360,11 +427,9 @@ class Controller(object):
         if self._collection in body:
             # Have to account for bulk create
             items = body[self._collection]
-            deltas = {}
-            bulk = True
         else:
             items = [body]
-            bulk = False
+        deltas = {}
         # Ensure policy engine is initialized
         policy.init()
         for item in items:
@@ -373,24 +438,24 @@ class Controller(object):
             policy.enforce(request.context,
                            action,
                            item[self._resource])
-            try:
-                tenant_id = item[self._resource]['tenant_id']
-                count = quota.QUOTAS.count(request.context, self._resource,
-                                           self._plugin, self._collection,
-                                           tenant_id)
-                if bulk:
-                    delta = deltas.get(tenant_id, 0) + 1
-                    deltas[tenant_id] = delta
-                else:
-                    delta = 1
-                kwargs = {self._resource: count + delta}
-            except exceptions.QuotaResourceUnknown as e:
-                # We don't want to quota this resource
-                LOG.debug(e)
-            else:
-                quota.QUOTAS.limit_check(request.context,
-                                         item[self._resource]['tenant_id'],
-                                         **kwargs)
+            tenant_id = item[self._resource]['tenant_id']
+            deltas[tenant_id] = deltas.get(tenant_id, 0) + 1
+        reservations = []
+        try:
+            for tenant_id, delta in deltas.iteritems():
+                reservation = quota.QUOTAS.make_reservation(
+                    request.context, tenant_id, self._resource, delta,
+                    self._plugin, self._collection, tenant_id)
+                if reservation:
+                    reservations.append(reservation)
+        except exceptions.QuotaResourceUnknown as e:
+            # We don't want to quota this resource
+            LOG.debug(e)
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                for reservation in reservations:
+                    quota.QUOTAS.cancel_reservation(request.context,
+                                                    reservation)
 
         def notify(create_result):
             notifier_method = self._resource + '.create.end'
@@ -405,27 +470,34 @@ class Controller(object):
             return create_result
 
         kwargs = {self._parent_id_name: parent_id} if parent_id else {}
-        if self._collection in body and self._native_bulk:
-            # plugin does atomic bulk create operations
-            obj_creator = getattr(self._plugin, "%s_bulk" % action)
-            objs = obj_creator(request.context, body, **kwargs)
-            return notify({self._collection: [self._view(request.context, obj)
-                                              for obj in objs]})
-        else:
-            obj_creator = getattr(self._plugin, action)
-            if self._collection in body:
+        try:
+            if self._collection in body and self._native_bulk:
+                # plugin does atomic bulk create operations
+                obj_creator = getattr(self._plugin, "%s_bulk" % action)
+                objs = [self._view(request.context, obj) for obj in
+                        obj_creator(request.context, body, **kwargs)]
+            elif self._collection in body:
                 # Emulate atomic bulk behavior
+                obj_creator = getattr(self._plugin, action)
                 objs = self._emulate_bulk_create(obj_creator, request,
                                                  body, parent_id)
-                return notify({self._collection: objs})
             else:
+                obj_creator = getattr(self._plugin, action)
                 kwargs.update({self._resource: body})
                 obj = obj_creator(request.context, **kwargs)
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                for reservation in reservations:
+                    quota.QUOTAS.cancel_reservation(request.context,
+                                                    reservation)
+        for reservation in reservations:
+            quota.QUOTAS.commit_reservation(request.context, reservation)
 
-                self._nova_notifier.send_network_change(
-                    action, {}, {self._resource: obj})
-                return notify({self._resource: self._view(request.context,
-                                                          obj)})
+        if self._collection in body:
+            return notify({self._collection: objs})
+        self._nova_notifier.send_network_change(
+            action, {}, {self._resource: obj})
+        return notify({self._resource: self._view(request.context, obj)})
 
     def delete(self, request, id, **kwargs):
         """Deletes the specified entity."""
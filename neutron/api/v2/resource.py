@@ -17,6 +17,7 @@
 Utility methods for working with WSGI servers redux
 """
 
+import collections
 import sys
 
 import netaddr
@@ -85,6 +86,13 @@ def Resource(controller, faults=None, deserializers=None, serializers=None):
             method = getattr(controller, action)
 
             result = method(request=request, **args)
+            if (_is_streamed(result) and
+                    not hasattr(serializer, 'serialize_iter')):
+                # The serializer needs the whole lists
+                result = dict((key, list(value) if
+                               isinstance(value, collections.Iterator)
+                               else value)
+                              for key, value in result.iteritems())
         except (exceptions.NeutronException,
                 netaddr.AddrFormatError) as e:
             for fault in faults:
@@ -136,6 +144,11 @@ def Resource(controller, faults=None, deserializers=None, serializers=None):
             raise webob.exc.HTTPInternalServerError(**kwargs)
 
         status = action_status.get(action, 200)
+        if _is_streamed(result):
+            app_iter = _stream(action, serializer.serialize_iter(result))
+            return webob.Response(request=request, status=status,
+                                  content_type=content_type,
+                                  app_iter=app_iter)
         body = serializer.serialize(result)
         # NOTE(jkoelker) Comply with RFC2616 section 9.7
         if status == 204:
@@ -148,6 +161,29 @@ def Resource(controller, faults=None, deserializers=None, serializers=None):
     return resource
 
 
+def _is_streamed(result):
+    """Tell whether the result of an action has lists to stream."""
+    return isinstance(result, dict) and any(
+        isinstance(value, collections.Iterator)
+        for value in result.itervalues())
+
+
+def _stream(action, app_iter):
+    """Yield the chunks of a streamed body, logging its errors.
+
+    The status and the first chunks are already sent when the plugin fails
+    while the body is streamed. The error is raised again for the WSGI
+    server to close the connection without ending the body, so the clients
+    do not take the chunks sent for a whole list.
+    """
+    try:
+        for chunk in app_iter:
+            yield chunk
+    except Exception:
+        LOG.exception(_('%s failed while streaming the response'), action)
+        raise
+
+
 def translate(translatable, locale):
     """Translates the object to the given locale.
 
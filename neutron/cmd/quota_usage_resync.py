@@ -0,0 +1,56 @@
+# Copyright 2014 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Recompute the quota usages of the tenants from the resource tables.
+
+The usages tracked with track_quota_usage drift when resources are deleted
+without the ORM, or when tracking was turned off for a while.
+"""
+
+from oslo.config import cfg
+
+from neutron.common import config
+from neutron import context
+from neutron.db import quota_db
+from neutron import manager
+from neutron.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+cli_opts = [
+    cfg.StrOpt('tenant-id',
+               help=_('The tenant whose usages to recompute, all the '
+                      'tenants by default.')),
+]
+
+
+def main():
+    cfg.CONF.register_cli_opts(cli_opts)
+    cfg.CONF(project='neutron')
+    config.setup_logging(cfg.CONF)
+
+    # The plugin configures the database and loads the models it counts
+    manager.NeutronManager.get_plugin()
+    changes = quota_db.DbQuotaDriver().resync_usages(
+        context.get_admin_context(), tenant_id=cfg.CONF.tenant_id)
+    for (tenant_id, resource, old_in_use, in_use,
+         old_reserved, reserved) in changes:
+        LOG.info(_("Usage of %(resource)s of tenant %(tenant_id)s changed "
+                   "from %(old_in_use)s in use and %(old_reserved)s "
+                   "reserved to %(in_use)s in use and %(reserved)s "
+                   "reserved"),
+                 {'resource': resource, 'tenant_id': tenant_id,
+                  'old_in_use': old_in_use, 'in_use': in_use,
+                  'old_reserved': old_reserved, 'reserved': reserved})
+    LOG.info(_("%d quota usages changed"), len(changes))
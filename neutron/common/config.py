@@ -53,6 +53,22 @@ core_opts = [
                help=_("The base MAC address Neutron will use for VIFs")),
     cfg.IntOpt('mac_generation_retries', default=16,
                help=_("How many times Neutron will retry MAC generation")),
+    cfg.IntOpt('mac_block_size', default=0,
+               help=_("How many MAC addresses each API worker leases at "
+                      "once from the base MAC space, to generate them "
+                      "without checking each of them in the database. It "
+                      "must be the same on all the servers. 0 disables the "
+                      "leases")),
+    cfg.IntOpt('mac_block_lease_time', default=86400,
+               help=_("Seconds after which the MAC address blocks leased by "
+                      "a worker which stopped renewing them are leased "
+                      "again by the other workers")),
+    cfg.StrOpt('ipam_driver',
+               help=_("The driver allocating the fixed IPs of the ports. "
+                      "When unset, the first address of the availability "
+                      "ranges of the subnet is allocated, the ranges being "
+                      "locked. neutron.db.ipam.RandomIpamDriver allocates "
+                      "random addresses without locking")),
     cfg.BoolOpt('allow_bulk', default=True,
                 help=_("Allow the usage of the bulk API")),
     cfg.BoolOpt('allow_pagination', default=False,
@@ -63,6 +79,10 @@ core_opts = [
                help=_("The maximum number of items returned in a single "
                       "response, value was 'infinite' or negative integer "
                       "means no limit")),
+    cfg.IntOpt('list_batch_size', default=1000,
+               help=_("The number of networks, subnets or ports fetched at "
+                      "once from the database when a list of them is "
+                      "streamed in a response")),
     cfg.IntOpt('max_dns_nameservers', default=5,
                help=_("Maximum number of DNS nameservers")),
     cfg.IntOpt('max_subnet_host_routes', default=20,
@@ -13,10 +13,13 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import functools
+
 from oslo.config import cfg
 import sqlalchemy as sql
 
 from neutron.db import model_base
+from neutron.openstack.common.db import exception as db_exc
 from neutron.openstack.common.db.sqlalchemy import session
 from neutron.openstack.common import log as logging
 
@@ -87,3 +90,31 @@ def unregister_models(base=BASE):
         base.metadata.drop_all(engine)
     except Exception:
         LOG.exception(_("Database exception"))
+
+
+def retry_on_duplicate_entry(max_retries=10):
+    """Retry a plugin method whose transaction failed on a duplicate entry.
+
+    Lock-free allocations let concurrent transactions pick the same value,
+    the second one failing on the unique constraint of the table. The
+    method, taking the context as first argument, is only retried when it
+    is not called inside a transaction, which the failure rolled back.
+    """
+    def decorator(f):
+        @functools.wraps(f)
+        def wrapper(self, context, *args, **kwargs):
+            if context.session.is_active:
+                return f(self, context, *args, **kwargs)
+            for i in range(max_retries - 1):
+                try:
+                    return f(self, context, *args, **kwargs)
+                except db_exc.DBDuplicateEntry as e:
+                    LOG.debug(_("%(method)s failed due to a concurrent "
+                                "transaction (%(retries)s attempts left): "
+                                "%(error)s"),
+                              {'method': f.__name__,
+                               'retries': max_retries - (i + 1),
+                               'error': e})
+            return f(self, context, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -13,6 +13,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import functools
 import random
 import weakref
 
@@ -28,6 +29,8 @@ from neutron.common import constants
 from neutron.common import exceptions as n_exc
 from neutron import context as ctx
 from neutron.db import api as db
+from neutron.db import ipam
+from neutron.db import mac_blocks_db
 from neutron.db import models_v2
 from neutron.db import sqlalchemyutils
 from neutron.extensions import l3
@@ -35,6 +38,7 @@ from neutron import manager
 from neutron import neutron_plugin_base_v2
 from neutron.notifiers import nova
 from neutron.openstack.common import excutils
+from neutron.openstack.common import importutils
 from neutron.openstack.common import log as logging
 from neutron.openstack.common import uuidutils
 from neutron.plugins.common import constants as service_constants
@@ -51,6 +55,9 @@ LOG = logging.getLogger(__name__)
 # IP allocations being cleaned up by cascade.
 AUTO_DELETE_PORT_OWNERS = [constants.DEVICE_OWNER_DHCP]
 
+# IPAM drivers, by class name
+_IPAM_DRIVERS = {}
+
 
 class CommonDbMixin(object):
     """Common methods used in core and service plugins."""
@@ -66,6 +73,11 @@ class CommonDbMixin(object):
     # TODO(salvatore-orlando): Avoid using class-level variables
     _dict_extend_functions = {}
 
+    # The fields of a model which are copied from its columns, by model.
+    # A list selecting only such fields reads the columns without loading
+    # the objects and their relationships
+    _column_fields = {}
+
     @classmethod
     def register_model_query_hook(cls, model, name, query_hook, filter_hook,
                                   result_filters=None):
@@ -204,11 +216,44 @@ class CommonDbMixin(object):
                                            limit=limit,
                                            marker_obj=marker_obj,
                                            page_reverse=page_reverse)
+        query, dict_func = self._project_collection(query, model, dict_func,
+                                                    fields, sorts)
         items = [dict_func(c, fields) for c in query]
         if limit and page_reverse:
             items.reverse()
         return items
 
+    def _iter_collection(self, get_query, model, dict_func, fields=None,
+                         sorts=None):
+        """Yield the dicts of a collection, fetching it in batches.
+
+        Only one batch of objects is loaded at once, whatever the size of
+        the collection. Each batch follows the last object of the previous
+        one on the sort keys and the id, so the objects created or deleted
+        meanwhile do not shift the following batches. A batch may be short
+        when the query joins the objects to their children, so only an
+        empty one ends the collection.
+
+        :param get_query: returns the query of the collection, unsorted
+        """
+        sorts = list(sorts or [])
+        if 'id' not in dict(sorts):
+            sorts.append(('id', True))
+        limit = cfg.CONF.list_batch_size
+        marker_obj = None
+        while True:
+            query = sqlalchemyutils.batch_query(get_query(), model, limit,
+                                                sorts, marker_obj=marker_obj)
+            query, make_dict = self._project_collection(query, model,
+                                                        dict_func, fields,
+                                                        sorts)
+            batch = query.all()
+            if not batch:
+                return
+            for obj in batch:
+                yield make_dict(obj, fields)
+            marker_obj = batch[-1]
+
     def _get_collection_count(self, context, model, filters=None):
         return self._get_collection_query(context, model, filters).count()
 
@@ -217,6 +262,42 @@ class CommonDbMixin(object):
             return getattr(self, '_get_%s' % resource)(context, marker)
         return None
 
+    def _get_keyset_marker(self, context, resource, model, limit, marker):
+        """Return the marker of a page, selected by the page query.
+
+        Only the existence of the marker is checked beforehand, a marker
+        which is not found, or not visible in the context, raises the not
+        found error of the resource like _get_marker_obj.
+        """
+        if limit and marker:
+            query = self._model_query(context, model).filter(
+                model.id == marker)
+            if not context.session.query(query.exists()).scalar():
+                return self._get_marker_obj(context, resource, limit, marker)
+            return sqlalchemyutils.QueryMarker(query, model)
+        return None
+
+    def _project_collection(self, query, model, dict_func, fields, sorts):
+        """Return the query of a list and the function making its dicts.
+
+        When all the fields are copied from the columns of the model, the
+        query selects the rows of these columns, the id and the sort keys,
+        and the dicts are made from them.
+        """
+        column_fields = self._column_fields.get(model)
+        if not fields or not column_fields or not column_fields.issuperset(
+                fields):
+            return query, dict_func
+        keys = set(fields) | set(key for key, direction in sorts or [])
+        keys.add('id')
+        # The rows of a query joining the children of the objects repeat
+        query = query.with_entities(
+            *[getattr(model, key) for key in sorted(keys)]).distinct()
+        return query, self._make_projected_dict
+
+    def _make_projected_dict(self, row, fields):
+        return self._fields(row._asdict(), fields)
+
 
 class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
                         CommonDbMixin):
@@ -235,6 +316,17 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
     __native_pagination_support = True
     __native_sorting_support = True
 
+    _column_fields = {
+        models_v2.Network: frozenset(['id', 'name', 'tenant_id',
+                                      'admin_state_up', 'status', 'shared']),
+        models_v2.Subnet: frozenset(['id', 'name', 'tenant_id', 'network_id',
+                                     'ip_version', 'cidr', 'gateway_ip',
+                                     'enable_dhcp', 'ipv6_ra_mode',
+                                     'ipv6_address_mode', 'shared']),
+        models_v2.Port: frozenset(['id', 'name', 'network_id', 'tenant_id',
+                                   'mac_address', 'admin_state_up', 'status',
+                                   'device_id', 'device_owner'])}
+
     def __init__(self):
         db.configure_db()
         if cfg.CONF.notify_nova_on_port_status_changes:
@@ -304,6 +396,21 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
     def _generate_mac(context, network_id):
         base_mac = cfg.CONF.base_mac.split(':')
         max_retries = cfg.CONF.mac_generation_retries
+        # The users and the random generation may take the addresses of a
+        # leased block, they are still checked in the network
+        for i in range(max_retries if cfg.CONF.mac_block_size else 0):
+            mac_address = mac_blocks_db.generate_mac()
+            if not mac_address:
+                break
+            if NeutronDbPluginV2._check_unique_mac(context, network_id,
+                                                   mac_address):
+                LOG.debug(_("Generated mac for network %(network_id)s "
+                            "is %(mac_address)s from a leased block"),
+                          {'network_id': network_id,
+                           'mac_address': mac_address})
+                return mac_address
+            LOG.debug(_("Leased mac %s exists, taking the next one"),
+                      mac_address)
         for i in range(max_retries):
             mac = [int(base_mac[0], 16), int(base_mac[1], 16),
                    int(base_mac[2], 16), random.randint(0x00, 0xff),
@@ -351,8 +458,41 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
             ip_address=ip_address,
             subnet_id=subnet_id).delete()
 
+    @staticmethod
+    def _get_ipam_driver():
+        """Return the configured IPAM driver, None for availability ranges."""
+        driver = cfg.CONF.ipam_driver
+        if driver and driver not in _IPAM_DRIVERS:
+            _IPAM_DRIVERS[driver] = importutils.import_object(driver)
+        return _IPAM_DRIVERS.get(driver)
+
+    @staticmethod
+    def _store_ip_allocation(context, ip_address, network_id, subnet_id,
+                             port_id):
+        """Store the allocation of the IP address to the port.
+
+        An IPAM driver may have reserved the address by storing its
+        allocation without port, which is then given to the port.
+        """
+        if NeutronDbPluginV2._get_ipam_driver():
+            reserved = context.session.query(models_v2.IPAllocation).filter_by(
+                ip_address=ip_address, subnet_id=subnet_id,
+                network_id=network_id, port_id=None).update(
+                    {'port_id': port_id})
+            if reserved:
+                return
+        allocated = models_v2.IPAllocation(network_id=network_id,
+                                           port_id=port_id,
+                                           ip_address=ip_address,
+                                           subnet_id=subnet_id)
+        context.session.add(allocated)
+
     @staticmethod
     def _generate_ip(context, subnets):
+        ipam_driver = NeutronDbPluginV2._get_ipam_driver()
+        if ipam_driver:
+            return ipam_driver.allocate_ip(context, subnets)
+
         try:
             return NeutronDbPluginV2._try_generate_ip(context, subnets)
         except n_exc.IpAddressGenerationFailure:
@@ -407,41 +547,38 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
             LOG.debug(_("Rebuilding availability ranges for subnet %s")
                       % subnet)
 
-            # Create a set of all currently allocated addresses
+            # Sort the currently allocated addresses, as integers
             ip_qry_results = ip_qry.filter_by(subnet_id=subnet['id'])
-            allocations = netaddr.IPSet([netaddr.IPAddress(i['ip_address'])
-                                        for i in ip_qry_results])
+            allocations = sorted(int(netaddr.IPAddress(i['ip_address']))
+                                 for i in ip_qry_results)
 
             for pool in pool_qry.filter_by(subnet_id=subnet['id']):
-                # Create a set of all addresses in the pool
-                poolset = netaddr.IPSet(netaddr.iter_iprange(pool['first_ip'],
-                                                             pool['last_ip']))
-
-                # Use set difference to find free addresses in the pool
-                available = poolset - allocations
-
-                # Generator compacts an ip set into contiguous ranges
-                def ipset_to_ranges(ipset):
-                    first, last = None, None
-                    for cidr in ipset.iter_cidrs():
-                        if last and last + 1 != cidr.first:
-                            yield netaddr.IPRange(first, last)
-                            first = None
-                        first, last = first if first else cidr.first, cidr.last
-                    if first:
-                        yield netaddr.IPRange(first, last)
+                first_ip = netaddr.IPAddress(pool['first_ip'])
+                last_ip = netaddr.IPAddress(pool['last_ip'])
+
+                # Remove the allocated addresses from the pool range, walking
+                # the sorted allocations instead of enumerating the pool
+                available = ipam.free_ranges([(int(first_ip), int(last_ip))],
+                                             allocations)
 
                 # Write the ranges to the db
-                for range in ipset_to_ranges(available):
+                for first, last in available:
                     available_range = models_v2.IPAvailabilityRange(
                         allocation_pool_id=pool['id'],
-                        first_ip=str(netaddr.IPAddress(range.first)),
-                        last_ip=str(netaddr.IPAddress(range.last)))
+                        first_ip=str(netaddr.IPAddress(first,
+                                                       first_ip.version)),
+                        last_ip=str(netaddr.IPAddress(last,
+                                                      first_ip.version)))
                     context.session.add(available_range)
 
     @staticmethod
     def _allocate_specific_ip(context, subnet_id, ip_address):
         """Allocate a specific IP address on the subnet."""
+        ipam_driver = NeutronDbPluginV2._get_ipam_driver()
+        if ipam_driver:
+            return ipam_driver.allocate_specific_ip(context, subnet_id,
+                                                    ip_address)
+
         ip = int(netaddr.IPAddress(ip_address))
         range_qry = context.session.query(
             models_v2.IPAvailabilityRange).join(
@@ -1021,9 +1158,11 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
             for port in ports:
                 self._delete_port(context, port['id'])
 
-            # clean up subnets
+            # clean up subnets, through the session for their deletion to
+            # be seen by the mapper events
             subnets_qry = context.session.query(models_v2.Subnet)
-            subnets_qry.filter_by(network_id=id).delete()
+            for subnet in subnets_qry.filter_by(network_id=id):
+                context.session.delete(subnet)
             context.session.delete(network)
 
     def get_network(self, context, id, fields=None):
@@ -1033,7 +1172,9 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
     def get_networks(self, context, filters=None, fields=None,
                      sorts=None, limit=None, marker=None,
                      page_reverse=False):
-        marker_obj = self._get_marker_obj(context, 'network', limit, marker)
+        marker_obj = self._get_keyset_marker(context, 'network',
+                                             models_v2.Network, limit,
+                                             marker)
         return self._get_collection(context, models_v2.Network,
                                     self._make_network_dict,
                                     filters=filters, fields=fields,
@@ -1042,6 +1183,13 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
                                     marker_obj=marker_obj,
                                     page_reverse=page_reverse)
 
+    def iter_networks(self, context, filters=None, fields=None, sorts=None):
+        return self._iter_collection(
+            functools.partial(self._get_collection_query, context,
+                              models_v2.Network, filters=filters),
+            models_v2.Network, self._make_network_dict, fields=fields,
+            sorts=sorts)
+
     def get_networks_count(self, context, filters=None):
         return self._get_collection_count(context, models_v2.Network,
                                           filters=filters)
@@ -1325,7 +1473,9 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
     def get_subnets(self, context, filters=None, fields=None,
                     sorts=None, limit=None, marker=None,
                     page_reverse=False):
-        marker_obj = self._get_marker_obj(context, 'subnet', limit, marker)
+        marker_obj = self._get_keyset_marker(context, 'subnet',
+                                             models_v2.Subnet, limit,
+                                             marker)
         return self._get_collection(context, models_v2.Subnet,
                                     self._make_subnet_dict,
                                     filters=filters, fields=fields,
@@ -1334,6 +1484,13 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
                                     marker_obj=marker_obj,
                                     page_reverse=page_reverse)
 
+    def iter_subnets(self, context, filters=None, fields=None, sorts=None):
+        return self._iter_collection(
+            functools.partial(self._get_collection_query, context,
+                              models_v2.Subnet, filters=filters),
+            models_v2.Subnet, self._make_subnet_dict, fields=fields,
+            sorts=sorts)
+
     def get_subnets_count(self, context, filters=None):
         return self._get_collection_count(context, models_v2.Subnet,
                                           filters=filters)
@@ -1341,6 +1498,7 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
     def create_port_bulk(self, context, ports):
         return self._create_bulk('port', context, ports)
 
+    @db.retry_on_duplicate_entry()
     def create_port(self, context, port):
         p = port['port']
         port_id = p.get('id') or uuidutils.generate_uuid()
@@ -1399,13 +1557,8 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
                                'network_id': network_id,
                                'subnet_id': subnet_id,
                                'port_id': port_id})
-                    allocated = models_v2.IPAllocation(
-                        network_id=network_id,
-                        port_id=port_id,
-                        ip_address=ip_address,
-                        subnet_id=subnet_id,
-                    )
-                    context.session.add(allocated)
+                    NeutronDbPluginV2._store_ip_allocation(
+                        context, ip_address, network_id, subnet_id, port_id)
 
         return self._make_port_dict(port, process_extensions=False)
 
@@ -1442,10 +1595,9 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
 
                 # Update ips if necessary
                 for ip in added_ips:
-                    allocated = models_v2.IPAllocation(
-                        network_id=port['network_id'], port_id=port.id,
-                        ip_address=ip['ip_address'], subnet_id=ip['subnet_id'])
-                    context.session.add(allocated)
+                    NeutronDbPluginV2._store_ip_allocation(
+                        context, ip['ip_address'], port['network_id'],
+                        ip['subnet_id'], port.id)
             # Remove all attributes in p which are not in the port DB model
             # and then update the port
             port.update(self._filter_non_model_columns(p, models_v2.Port))
@@ -1481,7 +1633,11 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
                  enable_eagerloads(False).filter_by(id=id))
         if not context.is_admin:
             query = query.filter_by(tenant_id=context.tenant_id)
-        query.delete()
+        # The port is deleted through the session for its deletion to be
+        # seen by the mapper events, the database deletes its IPs
+        port = query.first()
+        if port:
+            context.session.delete(port)
 
     def get_port(self, context, id, fields=None):
         port = self._get_port(context, id)
@@ -1517,16 +1673,30 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
     def get_ports(self, context, filters=None, fields=None,
                   sorts=None, limit=None, marker=None,
                   page_reverse=False):
-        marker_obj = self._get_marker_obj(context, 'port', limit, marker)
+        marker_obj = self._get_keyset_marker(context, 'port',
+                                             models_v2.Port, limit,
+                                             marker)
         query = self._get_ports_query(context, filters=filters,
                                       sorts=sorts, limit=limit,
                                       marker_obj=marker_obj,
                                       page_reverse=page_reverse)
-        items = [self._make_port_dict(c, fields) for c in query]
+        query, make_dict = self._project_collection(
+            query, models_v2.Port, self._make_port_dict, fields, sorts)
+        items = [make_dict(c, fields) for c in query]
         if limit and page_reverse:
             items.reverse()
         return items
 
+    def iter_ports(self, context, filters=None, fields=None, sorts=None):
+        def get_query(**kwargs):
+            # The fixed_ips filter is consumed by the query
+            return self._get_ports_query(context, filters=dict(filters or {}),
+                                         **kwargs)
+
+        return self._iter_collection(get_query, models_v2.Port,
+                                     self._make_port_dict, fields=fields,
+                                     sorts=sorts)
+
     def get_ports_count(self, context, filters=None):
         return self._get_ports_query(context, filters).count()
 
@@ -13,16 +13,24 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
+import hashlib
+import operator
+
 from oslo.config import cfg
 
 from neutron.api.v2 import attributes
 from neutron.common import constants
 from neutron.common import exceptions as n_exc
 from neutron.common import utils
+from neutron.db import extradhcpopt_db
+from neutron.db import models_v2
+from neutron.extensions import extra_dhcp_opt as edo_ext
 from neutron.extensions import portbindings
 from neutron import manager
 from neutron.openstack.common.db import exception as db_exc
 from neutron.openstack.common import excutils
+from neutron.openstack.common import jsonutils
 from neutron.openstack.common import log as logging
 
 
@@ -85,11 +93,47 @@ class DhcpRpcCallbackMixin(object):
         nets = self._get_active_networks(context, **kwargs)
         return [net['id'] for net in nets]
 
+    @staticmethod
+    def _get_network_fingerprint(network, subnets, ports):
+        """Return a digest of a network with its subnets and ports.
+
+        Only the port attributes configured by the DHCP agent are digested,
+        as returned by _get_fingerprint_port, so that the fingerprints can
+        be computed without building the port dicts.
+        """
+        by_id = operator.itemgetter('id')
+        network = dict(network, subnets=sorted(subnets, key=by_id),
+                       ports=sorted(ports, key=by_id))
+        network.pop('fingerprint', None)
+        return hashlib.sha1(jsonutils.dumps(network,
+                                            sort_keys=True)).hexdigest()
+
+    @staticmethod
+    def _get_fingerprint_port(port_id, mac_address, device_id, device_owner,
+                              fixed_ips, extra_dhcp_opts):
+        return {'id': port_id,
+                'mac_address': mac_address,
+                'device_id': device_id,
+                'device_owner': device_owner,
+                'fixed_ips': sorted(fixed_ips),
+                'extra_dhcp_opts': sorted(extra_dhcp_opts)}
+
     def get_active_networks_info(self, context, **kwargs):
-        """Returns all the networks/subnets/ports in system."""
+        """Returns all the networks/subnets/ports in system.
+
+        The networks are the ones of the given network_ids, if any. Each
+        network has the fingerprint of its subnets and ports.
+        """
         host = kwargs.get('host')
+        network_ids = kwargs.get('network_ids')
         LOG.debug(_('get_active_networks_info from %s'), host)
         networks = self._get_active_networks(context, **kwargs)
+        if network_ids is not None:
+            network_ids = set(network_ids)
+            networks = [network for network in networks
+                        if network['id'] in network_ids]
+            if not networks:
+                return []
         plugin = manager.NeutronManager.get_plugin()
         filters = {'network_id': [network['id'] for network in networks]}
         ports = plugin.get_ports(context, filters=filters)
@@ -101,9 +145,80 @@ class DhcpRpcCallbackMixin(object):
                                   if subnet['network_id'] == network['id']]
             network['ports'] = [port for port in ports
                                 if port['network_id'] == network['id']]
+            fingerprint_ports = [self._get_fingerprint_port(
+                port['id'], port['mac_address'], port['device_id'],
+                port['device_owner'],
+                [(ip['subnet_id'], ip['ip_address'])
+                 for ip in port['fixed_ips']],
+                [(opt['opt_name'], opt['opt_value'])
+                 for opt in port.get(edo_ext.EXTRADHCPOPTS, [])])
+                for port in network['ports']]
+            network['fingerprint'] = self._get_network_fingerprint(
+                network, network['subnets'], fingerprint_ports)
 
         return networks
 
+    def _get_fingerprint_ports(self, context, plugin, network_ids):
+        """Return the ports to fingerprint of the networks by network id.
+
+        The ports are read from their columns, without building the port
+        dicts of the plugin.
+        """
+        fixed_ips = collections.defaultdict(list)
+        query = context.session.query(models_v2.IPAllocation.port_id,
+                                      models_v2.IPAllocation.subnet_id,
+                                      models_v2.IPAllocation.ip_address)
+        for port_id, subnet_id, ip_address in query.filter(
+                models_v2.IPAllocation.network_id.in_(network_ids)):
+            fixed_ips[port_id].append((subnet_id, ip_address))
+
+        extra_dhcp_opts = collections.defaultdict(list)
+        if isinstance(plugin, extradhcpopt_db.ExtraDhcpOptMixin):
+            query = context.session.query(
+                extradhcpopt_db.ExtraDhcpOpt.port_id,
+                extradhcpopt_db.ExtraDhcpOpt.opt_name,
+                extradhcpopt_db.ExtraDhcpOpt.opt_value).join(models_v2.Port)
+            for port_id, opt_name, opt_value in query.filter(
+                    models_v2.Port.network_id.in_(network_ids)):
+                extra_dhcp_opts[port_id].append((opt_name, opt_value))
+
+        ports = collections.defaultdict(list)
+        query = context.session.query(models_v2.Port.id,
+                                      models_v2.Port.network_id,
+                                      models_v2.Port.mac_address,
+                                      models_v2.Port.device_id,
+                                      models_v2.Port.device_owner)
+        for port_id, network_id, mac_address, device_id, device_owner in (
+                query.filter(models_v2.Port.network_id.in_(network_ids))):
+            ports[network_id].append(self._get_fingerprint_port(
+                port_id, mac_address, device_id, device_owner,
+                fixed_ips[port_id], extra_dhcp_opts[port_id]))
+        return ports
+
+    def get_active_networks_fingerprints(self, context, **kwargs):
+        """Return the fingerprints of the active networks by network id.
+
+        The agent only fetches the information of the networks whose
+        fingerprint changed since it configured them.
+        """
+        host = kwargs.get('host')
+        LOG.debug(_('get_active_networks_fingerprints from %s'), host)
+        networks = self._get_active_networks(context, **kwargs)
+        if not networks:
+            return {}
+        plugin = manager.NeutronManager.get_plugin()
+        network_ids = [network['id'] for network in networks]
+        subnets = plugin.get_subnets(context,
+                                     filters={'network_id': network_ids,
+                                              'enable_dhcp': [True]})
+        ports = self._get_fingerprint_ports(context, plugin, network_ids)
+        return dict((network['id'], self._get_network_fingerprint(
+            network,
+            [subnet for subnet in subnets
+             if subnet['network_id'] == network['id']],
+            ports[network['id']]))
+            for network in networks)
+
     def get_network_info(self, context, **kwargs):
         """Retrieve and return a extended information about a network."""
         network_id = kwargs.get('network_id')
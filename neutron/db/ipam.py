@@ -0,0 +1,156 @@
+# Copyright (c) 2014 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import abc
+import bisect
+import random
+
+import netaddr
+from oslo.config import cfg
+import six
+
+from neutron.common import exceptions as n_exc
+from neutron.db import models_v2
+from neutron.openstack.common import log as logging
+
+
+LOG = logging.getLogger(__name__)
+
+ipam_opts = [
+    cfg.IntOpt('ip_generation_retries', default=16,
+               help=_("How many random addresses the random IPAM driver "
+                      "tries on a subnet before only picking addresses "
+                      "known to be free")),
+]
+cfg.CONF.register_opts(ipam_opts)
+
+
+def free_ranges(pools, allocated):
+    """Return the ranges of the pools which are not allocated.
+
+    :param pools: sorted and disjoint (first, last) integer ranges
+    :param allocated: iterable of the integer allocated addresses
+    :returns: the sorted (first, last) integer ranges left free
+    """
+    ranges = []
+    allocated = sorted(allocated)
+    for first, last in pools:
+        index = bisect.bisect_left(allocated, first)
+        while first <= last:
+            if index == len(allocated) or allocated[index] > last:
+                ranges.append((first, last))
+                break
+            if allocated[index] > first:
+                ranges.append((first, allocated[index] - 1))
+            first = allocated[index] + 1
+            index += 1
+    return ranges
+
+
+def nth_address(ranges, index):
+    """Return the index-th address of the (first, last) integer ranges."""
+    for first, last in ranges:
+        if index <= last - first:
+            return first + index
+        index -= last - first + 1
+    raise IndexError(index)
+
+
+@six.add_metaclass(abc.ABCMeta)
+class IpamDriver(object):
+    """Allocate the fixed IP addresses of the ports.
+
+    The plugin stores the IPAllocation of the ports once the driver picked
+    their addresses. A driver may reserve an address beforehand by storing
+    an IPAllocation without port, which the plugin then assigns to the port.
+    """
+
+    @abc.abstractmethod
+    def allocate_ip(self, context, subnets):
+        """Allocate an IP address from one of the subnets.
+
+        :returns: a dict with the ip_address and subnet_id allocated
+        :raises: IpAddressGenerationFailure when the subnets are exhausted
+        """
+
+    @abc.abstractmethod
+    def allocate_specific_ip(self, context, subnet_id, ip_address):
+        """Allocate a specific IP address, already checked to be free."""
+
+
+class RandomIpamDriver(IpamDriver):
+    """Allocate random addresses from the pools, without locking.
+
+    Random addresses are tried until one is not allocated, and reserved by
+    storing its allocation without port. Unlike the availability ranges, no
+    row is shared by the concurrent allocations on a subnet: when a
+    concurrent transaction takes the same address, the primary key of the
+    allocations makes the transaction fail and the port creation is retried.
+    """
+
+    def allocate_ip(self, context, subnets):
+        for subnet in subnets:
+            ip_address = self._allocate_subnet_ip(context, subnet)
+            if ip_address:
+                return {'ip_address': ip_address, 'subnet_id': subnet['id']}
+            LOG.debug(_("All IPs from subnet %(subnet_id)s (%(cidr)s) "
+                        "allocated"),
+                      {'subnet_id': subnet['id'], 'cidr': subnet['cidr']})
+        raise n_exc.IpAddressGenerationFailure(net_id=subnets[0]['network_id'])
+
+    def allocate_specific_ip(self, context, subnet_id, ip_address):
+        # The address is only reserved by the IPAllocation of the port
+        pass
+
+    def _allocate_subnet_ip(self, context, subnet):
+        pool_qry = context.session.query(models_v2.IPAllocationPool)
+        pools = sorted(
+            (int(netaddr.IPAddress(pool['first_ip'])),
+             int(netaddr.IPAddress(pool['last_ip'])))
+            for pool in pool_qry.filter_by(subnet_id=subnet['id']))
+        size = sum(last - first + 1 for first, last in pools)
+        if not size:
+            return
+        ip_qry = context.session.query(
+            models_v2.IPAllocation.ip_address).filter_by(
+                subnet_id=subnet['id'])
+        for i in range(cfg.CONF.ip_generation_retries):
+            ip_address = self._ip(subnet, nth_address(
+                pools, random.randrange(size)))
+            if not ip_qry.filter_by(ip_address=ip_address).first():
+                return self._reserve_ip(context, subnet, ip_address)
+
+        # The subnet is crowded, pick the address among the free ones
+        ranges = free_ranges(pools, [int(netaddr.IPAddress(allocated[0]))
+                                     for allocated in ip_qry])
+        size = sum(last - first + 1 for first, last in ranges)
+        if size:
+            ip_address = self._ip(subnet, nth_address(
+                ranges, random.randrange(size)))
+            return self._reserve_ip(context, subnet, ip_address)
+
+    @staticmethod
+    def _ip(subnet, value):
+        return str(netaddr.IPAddress(value, subnet['ip_version']))
+
+    @staticmethod
+    def _reserve_ip(context, subnet, ip_address):
+        context.session.add(models_v2.IPAllocation(
+            network_id=subnet['network_id'],
+            subnet_id=subnet['id'],
+            ip_address=ip_address))
+        # Make the reservation visible to the next allocations
+        context.session.flush()
+        return ip_address
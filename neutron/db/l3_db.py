@@ -54,6 +54,9 @@ class Router(model_base.BASEV2, models_v2.HasId, models_v2.HasTenant):
     admin_state_up = sa.Column(sa.Boolean)
     gw_port_id = sa.Column(sa.String(36), sa.ForeignKey('ports.id'))
     gw_port = orm.relationship(models_v2.Port, lazy='joined')
+    # Incremented by every change of the floating IPs of the router
+    revision = sa.Column(sa.Integer, default=0, server_default='0',
+                         nullable=False)
 
 
 class FloatingIP(model_base.BASEV2, models_v2.HasId, models_v2.HasTenant):
@@ -101,7 +104,8 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
                'admin_state_up': router['admin_state_up'],
                'status': router['status'],
                EXTERNAL_GW_INFO: None,
-               'gw_port_id': router['gw_port_id']}
+               'gw_port_id': router['gw_port_id'],
+               'revision': router['revision']}
         if router['gw_port_id']:
             nw_id = router.gw_port['network_id']
             res[EXTERNAL_GW_INFO] = {'network_id': nw_id}
@@ -727,13 +731,14 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
             self._update_fip_assoc(context, fip,
                                    floatingip_db, external_port)
             context.session.add(floatingip_db)
+            revisions = self._bump_router_revisions(
+                context, [floatingip_db['router_id']])
 
-        router_id = floatingip_db['router_id']
-        if router_id:
-            self.l3_rpc_notifier.routers_updated(
-                context, [router_id],
-                'create_floatingip')
-        return self._make_floatingip_dict(floatingip_db)
+        floatingip_dict = self._make_floatingip_dict(floatingip_db)
+        for router_id, revision in revisions.iteritems():
+            self.l3_rpc_notifier.floatingips_updated(
+                context, router_id, revision, [floatingip_dict], [])
+        return floatingip_dict
 
     def update_floatingip(self, context, id, floatingip):
         fip = floatingip['floatingip']
@@ -746,16 +751,18 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
             self._update_fip_assoc(context, fip, floatingip_db,
                                    self._core_plugin.get_port(
                                        context.elevated(), fip_port_id))
-        router_ids = []
-        if before_router_id:
-            router_ids.append(before_router_id)
-        router_id = floatingip_db['router_id']
-        if router_id and router_id != before_router_id:
-            router_ids.append(router_id)
-        if router_ids:
-            self.l3_rpc_notifier.routers_updated(
-                context, router_ids, 'update_floatingip')
-        return self._make_floatingip_dict(floatingip_db)
+            router_id = floatingip_db['router_id']
+            revisions = self._bump_router_revisions(
+                context, [before_router_id, router_id])
+        floatingip_dict = self._make_floatingip_dict(floatingip_db)
+        for changed_router_id, revision in revisions.iteritems():
+            if changed_router_id == router_id:
+                self.l3_rpc_notifier.floatingips_updated(
+                    context, router_id, revision, [floatingip_dict], [])
+            else:
+                self.l3_rpc_notifier.floatingips_updated(
+                    context, changed_router_id, revision, [], [id])
+        return floatingip_dict
 
     def update_floatingip_status(self, context, floatingip_id, status):
         """Update operational status for floating IP in neutron DB."""
@@ -771,10 +778,27 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
             self._core_plugin.delete_port(context.elevated(),
                                           floatingip['floating_port_id'],
                                           l3_port_check=False)
-        if router_id:
-            self.l3_rpc_notifier.routers_updated(
-                context, [router_id],
-                'delete_floatingip')
+            revisions = self._bump_router_revisions(context, [router_id])
+        for router_id, revision in revisions.iteritems():
+            self.l3_rpc_notifier.floatingips_updated(
+                context, router_id, revision, [], [id])
+
+    def _bump_router_revisions(self, context, router_ids):
+        """Increment the revision of routers whose floating IPs change.
+
+        The routers stay locked until the end of the transaction, so that
+        their revisions follow the order of the commits. Return the new
+        revision of every router.
+        """
+        router_ids = set(router_ids) - set([None])
+        if not router_ids:
+            return {}
+        context.session.query(Router).filter(
+            Router.id.in_(router_ids)).update(
+                {'revision': Router.revision + 1},
+                synchronize_session=False)
+        return dict(context.session.query(Router.id, Router.revision).filter(
+            Router.id.in_(router_ids)))
 
     def get_floatingip(self, context, id, fields=None):
         floatingip = self._get_floatingip(context, id)
@@ -835,22 +859,42 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
                           {'port_id': port_db['id'],
                            'port_owner': port_db['device_owner']})
 
-    def disassociate_floatingips(self, context, port_id):
-        router_ids = set()
+    def disassociate_floatingips(self, context, port_id, do_notify=True):
+        """Disassociate the floating IPs of a port from their routers.
+
+        The plugins calling this in the transaction deleting the port pass
+        do_notify False, and give the returned value to
+        notify_floatingips_disassociated once the transaction committed,
+        so that the agents never apply the revision of a rolled back change.
+        """
+        removed = {}
 
         with context.session.begin(subtransactions=True):
             fip_qry = context.session.query(FloatingIP)
             floating_ips = fip_qry.filter_by(fixed_port_id=port_id)
             for floating_ip in floating_ips:
-                router_ids.add(floating_ip['router_id'])
+                removed.setdefault(floating_ip['router_id'], []).append(
+                    floating_ip['id'])
                 floating_ip.update({'fixed_port_id': None,
                                     'fixed_ip_address': None,
                                     'router_id': None})
+            revisions = self._bump_router_revisions(context, removed)
+
+        disassociated = dict((router_id, (revision, removed[router_id]))
+                             for router_id, revision in revisions.iteritems())
+        if do_notify:
+            self.notify_floatingips_disassociated(context, disassociated)
+        return disassociated
+
+    def notify_floatingips_disassociated(self, context, disassociated):
+        """Notify the floating IPs disassociated by disassociate_floatingips.
 
-        if router_ids:
-            self.l3_rpc_notifier.routers_updated(
-                context, list(router_ids),
-                'disassociate_floatingips')
+        :param disassociated: dict mapping router ids to their revision and
+                              the ids of their disassociated floating IPs
+        """
+        for router_id, (revision, removed) in disassociated.iteritems():
+            self.l3_rpc_notifier.floatingips_updated(
+                context, router_id, revision, [], removed)
 
     def _build_routers_list(self, routers, gw_ports):
         gw_port_id_gw_port_dict = dict((gw_port['id'], gw_port)
@@ -862,33 +906,22 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
         return routers
 
     def _get_sync_routers(self, context, router_ids=None, active=None):
-        """Query routers and their gw ports for l3 agent.
+        """Query routers for l3 agent.
 
-        Query routers with the router_ids. The gateway ports, if any,
-        will be queried too.
+        Query routers with the router_ids. Their gateway ports are queried
+        by get_sync_data along with their interfaces.
         l3 agent has an option to deal with only one router id. In addition,
         when we need to notify the agent the data about only one router
         (when modification of router, its interfaces, gw_port and floatingips),
         we will have router_ids.
         @param router_ids: the list of router ids which we want to query.
                            if it is None, all of routers will be queried.
-        @return: a list of dicted routers with dicted gw_port populated if any
+        @return: a list of dicted routers
         """
         filters = {'id': router_ids} if router_ids else {}
         if active is not None:
             filters['admin_state_up'] = [active]
-        router_dicts = self.get_routers(context, filters=filters)
-        gw_port_ids = []
-        if not router_dicts:
-            return []
-        for router_dict in router_dicts:
-            gw_port_id = router_dict['gw_port_id']
-            if gw_port_id:
-                gw_port_ids.append(gw_port_id)
-        gw_ports = []
-        if gw_port_ids:
-            gw_ports = self.get_sync_gw_ports(context, gw_port_ids)
-        return self._build_routers_list(router_dicts, gw_ports)
+        return self.get_routers(context, filters=filters)
 
     def _get_sync_floating_ips(self, context, router_ids):
         """Query floating_ips that relate to list of router_ids."""
@@ -917,10 +950,22 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
             self._populate_subnet_for_ports(context, interfaces)
         return interfaces
 
+    def _get_sync_ports(self, context, router_ids):
+        """Query the gateway and interface ports of routers at once."""
+        if not router_ids:
+            return []
+        filters = {'device_id': router_ids,
+                   'device_owner': [DEVICE_OWNER_ROUTER_GW,
+                                    DEVICE_OWNER_ROUTER_INTF]}
+        ports = self._core_plugin.get_ports(context, filters)
+        self._populate_subnet_for_ports(context, ports)
+        return ports
+
     def _populate_subnet_for_ports(self, context, ports):
         """Populate ports with subnet.
 
-        These ports already have fixed_ips populated.
+        These ports already have fixed_ips populated. The subnets of all
+        the ports are queried at once.
         """
         if not ports:
             return
@@ -943,17 +988,17 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
             subnet_id_ports_dict[fixed_ip['subnet_id']] = my_ports
         if not subnet_id_ports_dict:
             return
-        filters = {'id': subnet_id_ports_dict.keys()}
-        fields = ['id', 'cidr', 'gateway_ip']
-        subnet_dicts = self._core_plugin.get_subnets(context, filters, fields)
-        for subnet_dict in subnet_dicts:
-            ports = subnet_id_ports_dict.get(subnet_dict['id'], [])
-            for port in ports:
+        subnets = context.session.query(
+            models_v2.Subnet.id, models_v2.Subnet.cidr,
+            models_v2.Subnet.gateway_ip).filter(
+                models_v2.Subnet.id.in_(subnet_id_ports_dict.keys()))
+        for subnet_id, cidr, gateway_ip in subnets:
+            for port in subnet_id_ports_dict[subnet_id]:
                 # TODO(gongysh) stash the subnet into fixed_ips
                 # to make the payload smaller.
-                port['subnet'] = {'id': subnet_dict['id'],
-                                  'cidr': subnet_dict['cidr'],
-                                  'gateway_ip': subnet_dict['gateway_ip']}
+                port['subnet'] = {'id': subnet_id,
+                                  'cidr': cidr,
+                                  'gateway_ip': gateway_ip}
 
     def _process_sync_data(self, routers, interfaces, floating_ips):
         routers_dict = {}
@@ -975,12 +1020,23 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
         return routers_dict.values()
 
     def get_sync_data(self, context, router_ids=None, active=None):
-        """Query routers and their related floating_ips, interfaces."""
+        """Query routers and their related floating_ips, interfaces.
+
+        The gateway and interface ports of the routers are queried at once,
+        then the subnets of all of them.
+        """
         with context.session.begin(subtransactions=True):
             routers = self._get_sync_routers(context,
                                              router_ids=router_ids,
                                              active=active)
             router_ids = [router['id'] for router in routers]
+            gw_ports = []
+            interfaces = []
+            for port in self._get_sync_ports(context, router_ids):
+                if port['device_owner'] == DEVICE_OWNER_ROUTER_GW:
+                    gw_ports.append(port)
+                else:
+                    interfaces.append(port)
+            routers = self._build_routers_list(routers, gw_ports)
             floating_ips = self._get_sync_floating_ips(context, router_ids)
-            interfaces = self.get_sync_interfaces(context, router_ids)
         return self._process_sync_data(routers, interfaces, floating_ips)
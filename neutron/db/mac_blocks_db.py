@@ -0,0 +1,212 @@
+# Copyright (c) 2014 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import atexit
+import datetime
+import os
+import random
+import threading
+
+from oslo.config import cfg
+import sqlalchemy as sa
+
+from neutron.db import api as db
+from neutron.db import ipam
+from neutron.db import model_base
+from neutron.db import models_v2
+from neutron.openstack.common.db import exception as db_exc
+from neutron.openstack.common import log as logging
+from neutron.openstack.common import timeutils
+
+
+LOG = logging.getLogger(__name__)
+
+
+class MacAddressBlock(model_base.BASEV2):
+    """Represents a block of MAC addresses leased by an API worker."""
+
+    first_mac = sa.Column(sa.String(32), primary_key=True)
+    last_mac = sa.Column(sa.String(32), nullable=False)
+    owner = sa.Column(sa.String(255), nullable=False)
+    leased_at = sa.Column(sa.DateTime)
+
+
+def _mac_space():
+    """Return the first integer MAC address of the base MAC and its size."""
+    base_mac = cfg.CONF.base_mac.split(':')
+    # The bytes of the base MAC which are not generated
+    fixed = 4 if base_mac[3] != '00' else 3
+    random_bits = 8 * (6 - fixed)
+    return int(''.join(base_mac[:fixed]), 16) << random_bits, 1 << random_bits
+
+
+def _mac(value):
+    return ':'.join('%02x' % (value >> shift & 0xff)
+                    for shift in range(40, -8, -8))
+
+
+def _mac_value(mac_address):
+    return int(mac_address.replace(':', ''), 16)
+
+
+class MacBlockAllocator(object):
+    """Hand out the MAC addresses of the blocks leased by a process.
+
+    The blocks of mac_block_size addresses are leased by storing them in
+    the database, whose primary key fails the concurrent leases of the same
+    block. The addresses of the ports existing at the time of the lease are
+    skipped, the other ones are handed out without leasing them one by one.
+    The leases are renewed while addresses are handed out, the blocks not
+    renewed for mac_block_lease_time seconds, such as the ones of a killed
+    worker, are taken over by the next leases.
+    """
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.owner = '%s:%d' % (cfg.CONF.host, self.pid)
+        # The (first, last) integer ranges left free in the leased blocks
+        self._free = []
+        self._leased = False
+        self._renewed_at = None
+        self._lock = threading.Lock()
+
+    def generate_mac(self):
+        with self._lock:
+            if not self._free and not self._lease_block():
+                return
+            if timeutils.is_older_than(self._renewed_at,
+                                       cfg.CONF.mac_block_lease_time / 2):
+                self._renew()
+            first, last = self._free[0]
+            if first == last:
+                self._free.pop(0)
+            else:
+                self._free[0] = (first + 1, last)
+            return _mac(first)
+
+    def _lease_block(self):
+        size = cfg.CONF.mac_block_size
+        base, space = _mac_space()
+        block_count = (space + size - 1) // size
+        # The lease is committed on its own, whatever happens to the port
+        session = db.get_session()
+        for i in range(cfg.CONF.mac_generation_retries):
+            first = base + random.randrange(block_count) * size
+            last = min(first + size, base + space) - 1
+            now = timeutils.utcnow()
+            try:
+                with session.begin():
+                    session.add(MacAddressBlock(first_mac=_mac(first),
+                                                last_mac=_mac(last),
+                                                owner=self.owner,
+                                                leased_at=now))
+            except db_exc.DBDuplicateEntry:
+                if not self._take_over_block(session, first, now):
+                    LOG.debug(_("MAC address block %s already leased"),
+                              _mac(first))
+                    continue
+            self._leased = True
+            self._renewed_at = now
+            # The MAC addresses given by the users may be in upper case
+            used_qry = session.query(models_v2.Port.mac_address).filter(
+                sa.func.lower(models_v2.Port.mac_address).between(
+                    _mac(first), _mac(last)))
+            self._free = ipam.free_ranges(
+                [(first, last)],
+                [_mac_value(mac_address) for mac_address, in used_qry])
+            LOG.debug(_("Leased MAC address block %(first)s-%(last)s"),
+                      {'first': _mac(first), 'last': _mac(last)})
+            if self._free:
+                return True
+        LOG.warning(_("Unable to lease a MAC address block after %s "
+                      "attempts"), cfg.CONF.mac_generation_retries)
+        return False
+
+    def _take_over_block(self, session, first, now):
+        """Lease a block whose lease expired, return whether it was."""
+        expired_at = now - datetime.timedelta(
+            seconds=cfg.CONF.mac_block_lease_time)
+        with session.begin():
+            count = session.query(MacAddressBlock).filter(
+                MacAddressBlock.first_mac == _mac(first),
+                sa.or_(MacAddressBlock.leased_at == sa.null(),
+                       MacAddressBlock.leased_at < expired_at)).update(
+                {'owner': self.owner, 'leased_at': now},
+                synchronize_session=False)
+        if count:
+            LOG.info(_("Took over the expired MAC address block %s"),
+                     _mac(first))
+        return count
+
+    def _renew(self):
+        now = timeutils.utcnow()
+        try:
+            session = db.get_session()
+            with session.begin():
+                session.query(MacAddressBlock).filter_by(
+                    owner=self.owner).update({'leased_at': now},
+                                             synchronize_session=False)
+            self._renewed_at = now
+        except Exception:
+            # The addresses are still checked in their network, a block
+            # taken over meanwhile does not lead to duplicates
+            LOG.exception(_("Unable to renew the MAC address blocks of %s"),
+                          self.owner)
+
+    def release(self):
+        """Return the blocks leased by the process."""
+        with self._lock:
+            self._free = []
+            if not self._leased:
+                return
+            try:
+                session = db.get_session()
+                with session.begin():
+                    session.query(MacAddressBlock).filter_by(
+                        owner=self.owner).delete()
+                self._leased = False
+            except Exception:
+                LOG.exception(_("Unable to release the MAC address blocks "
+                                "of %s"), self.owner)
+
+
+_allocator = None
+
+
+def _get_allocator():
+    global _allocator
+    if not _allocator or _allocator.pid != os.getpid():
+        # A forked worker leases its own blocks
+        _allocator = MacBlockAllocator()
+    return _allocator
+
+
+def generate_mac():
+    """Return a MAC address from the blocks leased by the process.
+
+    :returns: the MAC address, or None when no block could be leased
+    """
+    return _get_allocator().generate_mac()
+
+
+def release_mac_blocks():
+    """Return the MAC address blocks leased by the process."""
+    if _allocator and _allocator.pid == os.getpid():
+        _allocator.release()
+
+
+# The forked API workers exit without running the exit functions, they
+# release their blocks when their service is stopped
+atexit.register(release_mac_blocks)
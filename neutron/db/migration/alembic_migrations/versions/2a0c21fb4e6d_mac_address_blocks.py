@@ -0,0 +1,54 @@
+# Copyright 2014 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""MAC address blocks
+
+Revision ID: 2a0c21fb4e6d
+Revises: 1b837a7125a9
+Create Date: 2014-06-02 10:12:44.518703
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '2a0c21fb4e6d'
+down_revision = '1b837a7125a9'
+
+# Change to ['*'] if this migration applies to all plugins
+
+migration_for_plugins = ['*']
+
+from alembic import op
+import sqlalchemy as sa
+
+from neutron.db import migration
+
+
+def upgrade(active_plugins=None, options=None):
+    if not migration.should_run(active_plugins, migration_for_plugins):
+        return
+
+    op.create_table(
+        'macaddressblocks',
+        sa.Column('first_mac', sa.String(length=32), nullable=False),
+        sa.Column('last_mac', sa.String(length=32), nullable=False),
+        sa.Column('owner', sa.String(length=255), nullable=False),
+        sa.PrimaryKeyConstraint('first_mac'))
+
+
+def downgrade(active_plugins=None, options=None):
+    if not migration.should_run(active_plugins, migration_for_plugins):
+        return
+
+    op.drop_table('macaddressblocks')
@@ -0,0 +1,54 @@
+# Copyright 2014 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""Index the core resources on their tenant and id
+
+Revision ID: 3c1d7a9e5b20
+Revises: 2a0c21fb4e6d
+Create Date: 2014-06-05 14:21:37.802945
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '3c1d7a9e5b20'
+down_revision = '2a0c21fb4e6d'
+
+# Change to ['*'] if this migration applies to all plugins
+
+migration_for_plugins = ['*']
+
+from alembic import op
+
+from neutron.db import migration
+
+
+TABLES = ['networks', 'subnets', 'ports']
+
+
+def upgrade(active_plugins=None, options=None):
+    if not migration.should_run(active_plugins, migration_for_plugins):
+        return
+
+    for table in TABLES:
+        op.create_index('ix_%s_tenant_id_id' % table, table,
+                        ['tenant_id', 'id'])
+
+
+def downgrade(active_plugins=None, options=None):
+    if not migration.should_run(active_plugins, migration_for_plugins):
+        return
+
+    for table in TABLES:
+        op.drop_index('ix_%s_tenant_id_id' % table, table)
@@ -0,0 +1,52 @@
+# Copyright 2014 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""Lease time of the MAC address blocks
+
+Revision ID: 6b3e0f7a2c15
+Revises: 5a7c2e91d4b3
+Create Date: 2014-06-18 14:05:12.301846
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '6b3e0f7a2c15'
+down_revision = '5a7c2e91d4b3'
+
+# Change to ['*'] if this migration applies to all plugins
+
+migration_for_plugins = ['*']
+
+from alembic import op
+import sqlalchemy as sa
+
+from neutron.db import migration
+
+
+def upgrade(active_plugins=None, options=None):
+    if not migration.should_run(active_plugins, migration_for_plugins):
+        return
+
+    # The blocks leased before the upgrade have no lease time, they are
+    # taken over as expired ones
+    op.add_column('macaddressblocks',
+                  sa.Column('leased_at', sa.DateTime(), nullable=True))
+
+
+def downgrade(active_plugins=None, options=None):
+    if not migration.should_run(active_plugins, migration_for_plugins):
+        return
+
+    op.drop_column('macaddressblocks', 'leased_at')
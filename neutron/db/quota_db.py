@@ -13,11 +13,26 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import datetime
+
+from oslo.config import cfg
 import sqlalchemy as sa
+from sqlalchemy import event
+from sqlalchemy import orm
 
 from neutron.common import exceptions
 from neutron.db import model_base
 from neutron.db import models_v2
+from neutron.openstack.common.db import exception as db_exc
+from neutron.openstack.common import timeutils
+from neutron.openstack.common import uuidutils
+
+# The models whose rows are counted in the usages, by resource
+_tracked_models = {}
+# The expiry timestamp and the limits overridden for a tenant, by tenant_id
+_limit_cache = {}
+# The key of the ids of the reservations made in a session, in its info
+_SESSION_RESERVATIONS = 'quota_reservations'
 
 
 class Quota(model_base.BASEV2, models_v2.HasId):
@@ -31,6 +46,110 @@ class Quota(model_base.BASEV2, models_v2.HasId):
     limit = sa.Column(sa.Integer)
 
 
+class QuotaUsage(model_base.BASEV2):
+    """Represent the resources of a tenant in use and reserved."""
+
+    tenant_id = sa.Column(sa.String(255), primary_key=True)
+    resource = sa.Column(sa.String(255), primary_key=True)
+    in_use = sa.Column(sa.Integer, nullable=False, default=0)
+    reserved = sa.Column(sa.Integer, nullable=False, default=0)
+
+
+class Reservation(model_base.BASEV2, models_v2.HasId):
+    """Represent resources of a tenant reserved until they are created."""
+
+    tenant_id = sa.Column(sa.String(255), nullable=False, index=True)
+    resource = sa.Column(sa.String(255), nullable=False)
+    delta = sa.Column(sa.Integer, nullable=False)
+    expiration = sa.Column(sa.DateTime, nullable=False)
+
+
+def _consume_reservation(connection, session, tenant_id, resource):
+    """Take a created resource out of a reservation of its tenant.
+
+    The reservations made in the session of the resource are consumed
+    first. Otherwise, as when the plugin creates the resource in another
+    session, any reservation of the tenant is, the reserved resources still
+    adding up to the ones being created. Return whether a reservation was
+    consumed.
+    """
+    reservations = Reservation.__table__
+    criteria = [reservations.c.tenant_id == tenant_id,
+                reservations.c.resource == resource,
+                reservations.c.delta > 0]
+    reservation_id = None
+    session_ids = getattr(session, 'info', {}).get(_SESSION_RESERVATIONS)
+    if session_ids:
+        reservation_id = connection.execute(
+            sa.select([reservations.c.id]).where(sa.and_(
+                reservations.c.id.in_(session_ids), *criteria)).limit(
+                    1)).scalar()
+    if not reservation_id:
+        reservation_id = connection.execute(
+            sa.select([reservations.c.id]).where(
+                sa.and_(*criteria)).limit(1)).scalar()
+    if not reservation_id:
+        return False
+    # A reservation consumed concurrently is left to its release
+    return connection.execute(reservations.update().where(
+        sa.and_(reservations.c.id == reservation_id,
+                reservations.c.delta > 0)).values(
+                    delta=reservations.c.delta - 1)).rowcount > 0
+
+
+def _usage_updater(resource, delta):
+    def update_usage(mapper, connection, target):
+        if not cfg.CONF.QUOTAS.track_quota_usage:
+            return
+        # The usage is updated in the transaction of the row, a missing
+        # one is counted when it is first needed. A created resource moves
+        # from reserved to in use at once, so it is never counted twice.
+        usages = QuotaUsage.__table__
+        values = {'in_use': usages.c.in_use + delta}
+        if delta > 0 and _consume_reservation(
+                connection, orm.object_session(target), target.tenant_id,
+                resource):
+            values['reserved'] = usages.c.reserved - 1
+        connection.execute(usages.update().where(
+            sa.and_(usages.c.tenant_id == target.tenant_id,
+                    usages.c.resource == resource)).values(**values))
+    return update_usage
+
+
+def track_usage(resource, model):
+    """Count the rows of a model in the usages of a resource.
+
+    The rows must be deleted through the session, the bulk deletions of a
+    query are not counted.
+    """
+    _tracked_models[resource] = model
+    event.listen(model, 'after_insert', _usage_updater(resource, 1))
+    event.listen(model, 'after_delete', _usage_updater(resource, -1))
+
+
+track_usage('network', models_v2.Network)
+track_usage('subnet', models_v2.Subnet)
+track_usage('port', models_v2.Port)
+
+
+def _get_tenant_limits(context, tenant_id):
+    """Return the limits overridden for a tenant, by resource.
+
+    The limits are kept for quota_limit_cache_ttl seconds, the changes
+    made by the driver of this process being seen at once.
+    """
+    now = timeutils.utcnow_ts()
+    cached = _limit_cache.get(tenant_id)
+    if cached and cached[0] > now:
+        return cached[1]
+    limits = dict(context.session.query(Quota.resource, Quota.limit).filter(
+        Quota.tenant_id == tenant_id))
+    ttl = cfg.CONF.QUOTAS.quota_limit_cache_ttl
+    if ttl > 0:
+        _limit_cache[tenant_id] = (now + ttl, limits)
+    return limits
+
+
 class DbQuotaDriver(object):
     """Driver to perform necessary checks to enforce quotas and obtain quota
     information.
@@ -54,8 +173,7 @@ class DbQuotaDriver(object):
                             for key, resource in resources.items())
 
         # update with tenant specific limits
-        q_qry = context.session.query(Quota).filter_by(tenant_id=tenant_id)
-        tenant_quota.update((q['resource'], q['limit']) for q in q_qry)
+        tenant_quota.update(_get_tenant_limits(context, tenant_id))
 
         return tenant_quota
 
@@ -69,6 +187,7 @@ class DbQuotaDriver(object):
             tenant_quotas = context.session.query(Quota)
             tenant_quotas = tenant_quotas.filter_by(tenant_id=tenant_id)
             tenant_quotas.delete()
+        _limit_cache.pop(tenant_id, None)
 
     @staticmethod
     def get_all_quotas(context, resources):
@@ -82,21 +201,24 @@ class DbQuotaDriver(object):
         tenant_default = dict((key, resource.default)
                               for key, resource in resources.items())
 
-        all_tenant_quotas = {}
-
-        for quota in context.session.query(Quota):
-            tenant_id = quota['tenant_id']
-
-            # avoid setdefault() because only want to copy when actually req'd
-            tenant_quota = all_tenant_quotas.get(tenant_id)
-            if tenant_quota is None:
-                tenant_quota = tenant_default.copy()
-                tenant_quota['tenant_id'] = tenant_id
-                all_tenant_quotas[tenant_id] = tenant_quota
-
-            tenant_quota[quota['resource']] = quota['limit']
-
-        return all_tenant_quotas.values()
+        # One row per tenant, with the limit of every resource or NULL
+        # where the default applies
+        keys = tenant_default.keys()
+        query = context.session.query(
+            Quota.tenant_id,
+            *[sa.func.max(sa.case([(Quota.resource == key, Quota.limit)]))
+              for key in keys]).group_by(Quota.tenant_id)
+
+        all_tenant_quotas = []
+        for row in query:
+            tenant_quota = tenant_default.copy()
+            tenant_quota['tenant_id'] = row[0]
+            tenant_quota.update((key, limit)
+                                for key, limit in zip(keys, row[1:])
+                                if limit is not None)
+            all_tenant_quotas.append(tenant_quota)
+
+        return all_tenant_quotas
 
     @staticmethod
     def update_quota_limit(context, tenant_id, resource, limit):
@@ -111,6 +233,7 @@ class DbQuotaDriver(object):
                                      resource=resource,
                                      limit=limit)
                 context.session.add(tenant_quota)
+        _limit_cache.pop(tenant_id, None)
 
     def _get_quotas(self, context, tenant_id, resources, keys):
         """Retrieves the quotas for specific resources.
@@ -177,3 +300,168 @@ class DbQuotaDriver(object):
                  if quotas[key] >= 0 and quotas[key] < val]
         if overs:
             raise exceptions.OverQuota(overs=sorted(overs))
+
+    @staticmethod
+    def tracks_usage(resource):
+        return (cfg.CONF.QUOTAS.track_quota_usage and
+                resource in _tracked_models)
+
+    @staticmethod
+    def _count(context, model, tenant_id):
+        return context.session.query(sa.func.count(model.id)).filter(
+            model.tenant_id == tenant_id).scalar()
+
+    def _get_usage(self, context, tenant_id, resource):
+        """Return the locked usage of a resource, counting a missing one."""
+        usage = context.session.query(QuotaUsage).filter_by(
+            tenant_id=tenant_id, resource=resource).with_lockmode(
+                'update').first()
+        if not usage:
+            in_use = self._count(context, _tracked_models[resource],
+                                 tenant_id)
+            usage = QuotaUsage(tenant_id=tenant_id, resource=resource,
+                               in_use=in_use, reserved=0)
+            context.session.add(usage)
+        return usage
+
+    @staticmethod
+    def _expire_reservations(context, usage, now):
+        expired = context.session.query(Reservation).filter(
+            Reservation.tenant_id == usage.tenant_id,
+            Reservation.resource == usage.resource,
+            Reservation.expiration < now)
+        for reservation in expired:
+            usage.reserved -= reservation.delta
+            context.session.delete(reservation)
+
+    def make_reservation(self, context, tenant_id, resources, resource,
+                         delta):
+        """Reserve resources of a tenant, if allowed by its quota.
+
+        The usage of the resource is checked without counting the
+        resources, the ones being created being reserved. The reservations
+        are ignored after reservation_expiration seconds.
+
+        :param context: The request context, for access checks.
+        :param tenant_id: The tenant_id to check the quota.
+        :param resources: A dictionary of the registered resources.
+        :param resource: The name of the resource to reserve.
+        :param delta: The number of resources to reserve.
+        :returns: the id of the reservation
+        """
+
+        quota = self._get_quotas(context, tenant_id, resources,
+                                 [resource])[resource]
+        now = timeutils.utcnow()
+        reservation = Reservation(
+            id=uuidutils.generate_uuid(), tenant_id=tenant_id,
+            resource=resource, delta=delta,
+            expiration=now + datetime.timedelta(
+                seconds=cfg.CONF.QUOTAS.reservation_expiration))
+        try:
+            with context.session.begin(subtransactions=True):
+                usage = self._get_usage(context, tenant_id, resource)
+                self._expire_reservations(context, usage, now)
+                if (quota >= 0 and
+                        usage.in_use + usage.reserved + delta > quota):
+                    raise exceptions.OverQuota(overs=[resource])
+                usage.reserved += delta
+                context.session.add(reservation)
+        except db_exc.DBDuplicateEntry:
+            # The missing usage was counted concurrently
+            return self.make_reservation(context, tenant_id, resources,
+                                         resource, delta)
+        # The resources created in the session consume this reservation
+        getattr(context.session, 'info', {}).setdefault(
+            _SESSION_RESERVATIONS, set()).add(reservation.id)
+        return reservation.id
+
+    def _release_reservation(self, context, reservation_id):
+        getattr(context.session, 'info', {}).get(
+            _SESSION_RESERVATIONS, set()).discard(reservation_id)
+        with context.session.begin(subtransactions=True):
+            reservation = context.session.query(Reservation).filter_by(
+                id=reservation_id).first()
+            if not reservation:
+                # The reservation expired
+                return
+            usage = context.session.query(QuotaUsage).filter_by(
+                tenant_id=reservation.tenant_id,
+                resource=reservation.resource).with_lockmode(
+                    'update').first()
+            if usage:
+                usage.reserved = max(usage.reserved - reservation.delta, 0)
+            context.session.delete(reservation)
+
+    def commit_reservation(self, context, reservation_id):
+        """Release what is left of a reservation once its resources exist.
+
+        The created resources already moved from reserved to in use, the
+        rest is the resources which were not created.
+        """
+        self._release_reservation(context, reservation_id)
+
+    def cancel_reservation(self, context, reservation_id):
+        """Release a reservation whose resources were not created."""
+        self._release_reservation(context, reservation_id)
+
+    def resync_usages(self, context, tenant_id=None):
+        """Recompute the usages of the tracked resources.
+
+        The resources in use are counted in their tables, and the resources
+        reserved in the reservations which did not expire.
+
+        :param context: The request context, for access checks.
+        :param tenant_id: The tenant_id whose usages to recompute, all the
+                          tenants when None.
+        :returns: the list of the changed usages, as tuples of tenant_id,
+                  resource, and the previous and new in_use and reserved
+        """
+
+        changes = []
+        now = timeutils.utcnow()
+        with context.session.begin(subtransactions=True):
+            for resource, model in sorted(_tracked_models.items()):
+                counts = context.session.query(
+                    model.tenant_id, sa.func.count(model.id)).group_by(
+                        model.tenant_id)
+                reserved_qry = context.session.query(
+                    Reservation.tenant_id,
+                    sa.func.sum(Reservation.delta)).filter(
+                        Reservation.resource == resource,
+                        Reservation.expiration >= now).group_by(
+                            Reservation.tenant_id)
+                usages = context.session.query(QuotaUsage).filter_by(
+                    resource=resource).with_lockmode('update')
+                if tenant_id:
+                    counts = counts.filter(model.tenant_id == tenant_id)
+                    reserved_qry = reserved_qry.filter(
+                        Reservation.tenant_id == tenant_id)
+                    usages = usages.filter_by(tenant_id=tenant_id)
+                counts = dict(counts)
+                # The resources without tenant are not in any quota
+                counts.pop(None, None)
+                reserved = dict(reserved_qry)
+                for usage in usages:
+                    in_use = counts.pop(usage.tenant_id, 0)
+                    now_reserved = reserved.get(usage.tenant_id) or 0
+                    if (usage.in_use, usage.reserved) != (in_use,
+                                                          now_reserved):
+                        changes.append((usage.tenant_id, resource,
+                                        usage.in_use, in_use,
+                                        usage.reserved, now_reserved))
+                        usage.in_use = in_use
+                        usage.reserved = now_reserved
+                for usage_tenant_id, in_use in counts.iteritems():
+                    now_reserved = reserved.get(usage_tenant_id) or 0
+                    changes.append((usage_tenant_id, resource, None, in_use,
+                                    None, now_reserved))
+                    context.session.add(QuotaUsage(
+                        tenant_id=usage_tenant_id, resource=resource,
+                        in_use=in_use, reserved=now_reserved))
+            expired = context.session.query(Reservation).filter(
+                Reservation.expiration < now)
+            if tenant_id:
+                expired = expired.filter_by(tenant_id=tenant_id)
+            expired.delete()
+        return changes
@@ -14,7 +14,6 @@
 #    under the License.
 
 import netaddr
-from sqlalchemy.orm import exc
 
 from neutron.common import constants as q_const
 from neutron.common import ipv6_utils as ipv6
@@ -138,16 +137,47 @@ class SecurityGroupServerRpcCallbackMixin(object):
         :returns: port correspond to the devices with security group rules
         """
         devices = kwargs.get('devices')
+        ports = self._get_ports_from_devices(devices)
+        return self._security_group_rules_for_ports(context, ports)
 
-        ports = {}
+    def security_group_info_for_devices(self, context, **kwargs):
+        """Return security group information for the devices.
+
+        Unlike security_group_rules_for_devices, the rules of a security
+        group and the member IPs of a remote group are returned only once,
+        no matter how many devices use them. The agent expands them.
+
+        :params devices: list of devices
+        :returns: dict with the keys
+                  devices: the ports corresponding to the devices, with the
+                           provider rules in security_group_rules,
+                  security_groups: the rules of each security group,
+                  sg_member_ips: the member IPs of each remote group
+        """
+        devices = kwargs.get('devices')
+        ports = self._get_ports_from_devices(devices)
+        return self._security_group_info_for_ports(context, ports)
+
+    def get_ports_from_devices(self, devices):
+        """Return the ports of the given devices.
+
+        Devices without a port are skipped. Plugins should override this
+        to fetch all the ports with a single query.
+        """
+        ports = []
         for device in devices:
             port = self.get_port_from_device(device)
-            if not port:
-                continue
+            if port:
+                ports.append(port)
+        return ports
+
+    def _get_ports_from_devices(self, devices):
+        ports = {}
+        for port in self.get_ports_from_devices(devices):
             if port['device_owner'].startswith('network:'):
                 continue
             ports[port['id']] = port
-        return self._security_group_rules_for_ports(context, ports)
+        return ports
 
     def _select_rules_for_ports(self, context, ports):
         if not ports:
@@ -157,13 +187,21 @@ class SecurityGroupServerRpcCallbackMixin(object):
 
         sgr_sgid = sg_db.SecurityGroupRule.security_group_id
 
-        query = context.session.query(sg_db.SecurityGroupPortBinding,
+        query = context.session.query(sg_binding_port,
                                       sg_db.SecurityGroupRule)
         query = query.join(sg_db.SecurityGroupRule,
                            sgr_sgid == sg_binding_sgid)
         query = query.filter(sg_binding_port.in_(ports.keys()))
         return query.all()
 
+    def _select_rules_for_security_groups(self, context, security_group_ids):
+        if not security_group_ids:
+            return []
+        sgr_sgid = sg_db.SecurityGroupRule.security_group_id
+        query = context.session.query(sg_db.SecurityGroupRule)
+        query = query.filter(sgr_sgid.in_(security_group_ids))
+        return query.all()
+
     def _select_ips_for_remote_group(self, context, remote_group_ids):
         ips_by_group = {}
         if not remote_group_ids:
@@ -175,21 +213,28 @@ class SecurityGroupServerRpcCallbackMixin(object):
         sg_binding_port = sg_db.SecurityGroupPortBinding.port_id
         sg_binding_sgid = sg_db.SecurityGroupPortBinding.security_group_id
 
+        # Only select the addresses, loading the ports would also eagerly
+        # load all of their relationships
         query = context.session.query(sg_binding_sgid,
-                                      models_v2.Port,
                                       models_v2.IPAllocation.ip_address)
         query = query.join(models_v2.IPAllocation,
                            ip_port == sg_binding_port)
-        query = query.join(models_v2.Port,
-                           ip_port == models_v2.Port.id)
         query = query.filter(sg_binding_sgid.in_(remote_group_ids))
-        for security_group_id, port, ip_address in query:
+        for security_group_id, ip_address in query:
             ips_by_group[security_group_id].append(ip_address)
-            # if there are allowed_address_pairs add them
-            if getattr(port, 'allowed_address_pairs', None):
-                for address_pair in port.allowed_address_pairs:
-                    ips_by_group[security_group_id].append(
-                        address_pair['ip_address'])
+
+        # The allowed address pairs model is only loaded by the plugins
+        # supporting the extension
+        if hasattr(models_v2.Port, 'allowed_address_pairs'):
+            pair_model = models_v2.Port.allowed_address_pairs.property.mapper
+            pair_model = pair_model.class_
+            query = context.session.query(sg_binding_sgid,
+                                          pair_model.ip_address)
+            query = query.join(pair_model,
+                               pair_model.port_id == sg_binding_port)
+            query = query.filter(sg_binding_sgid.in_(remote_group_ids))
+            for security_group_id, ip_address in query:
+                ips_by_group[security_group_id].append(ip_address)
         return ips_by_group
 
     def _select_remote_group_ids(self, ports):
@@ -207,7 +252,7 @@ class SecurityGroupServerRpcCallbackMixin(object):
     def _select_dhcp_ips_for_network_ids(self, context, network_ids):
         if not network_ids:
             return {}
-        query = context.session.query(models_v2.Port,
+        query = context.session.query(models_v2.Port.network_id,
                                       models_v2.IPAllocation.ip_address)
         query = query.join(models_v2.IPAllocation)
         query = query.filter(models_v2.Port.network_id.in_(network_ids))
@@ -218,8 +263,8 @@ class SecurityGroupServerRpcCallbackMixin(object):
         for network_id in network_ids:
             ips[network_id] = []
 
-        for port, ip in query:
-            ips[port['network_id']].append(ip)
+        for network_id, ip in query:
+            ips[network_id].append(ip)
         return ips
 
     def _select_ra_ips_for_network_ids(self, context, network_ids):
@@ -240,54 +285,78 @@ class SecurityGroupServerRpcCallbackMixin(object):
         ips = {}
         for network_id in network_ids:
             ips[network_id] = set([])
-        query = context.session.query(models_v2.Subnet)
-        subnets = query.filter(models_v2.Subnet.network_id.in_(network_ids))
-        for subnet in subnets:
-            gateway_ip = subnet['gateway_ip']
-            if subnet['ip_version'] != 6 or not gateway_ip:
-                continue
+        query = context.session.query(models_v2.Subnet.id,
+                                      models_v2.Subnet.network_id,
+                                      models_v2.Subnet.gateway_ip,
+                                      models_v2.Subnet.ipv6_ra_mode)
+        query = query.filter(models_v2.Subnet.network_id.in_(network_ids))
+        query = query.filter(models_v2.Subnet.ip_version == 6)
+        query = query.filter(models_v2.Subnet.gateway_ip.isnot(None))
+        ra_subnets = []
+        for subnet in query:
+            gateway_ip = subnet.gateway_ip
             # TODO(xuhanp): Figure out how to call the following code
             # each time router is created or updated.
-            if not netaddr.IPAddress(gateway_ip).is_link_local():
-                if subnet['ipv6_ra_mode']:
-                    gateway_ip = self._get_lla_gateway_ip_for_subnet(context,
-                                                                     subnet)
-                else:
-                    # TODO(xuhanp):Figure out how to allow gateway IP from
-                    # existing device to be global address and figure out the
-                    # link local address by other method.
-                    continue
-            if gateway_ip:
-                ips[subnet['network_id']].add(gateway_ip)
+            if netaddr.IPAddress(gateway_ip).is_link_local():
+                ips[subnet.network_id].add(gateway_ip)
+            elif subnet.ipv6_ra_mode:
+                ra_subnets.append(subnet)
+            # TODO(xuhanp):Figure out how to allow gateway IP from
+            # existing device to be global address and figure out the
+            # link local address by other method.
+
+        lla_ips = self._get_lla_gateway_ips_for_subnets(context, ra_subnets)
+        for subnet in ra_subnets:
+            if subnet.id in lla_ips:
+                ips[subnet.network_id].add(lla_ips[subnet.id])
 
         return ips
 
-    def _get_lla_gateway_ip_for_subnet(self, context, subnet):
-        query = context.session.query(models_v2.Port)
-        query = query.join(models_v2.IPAllocation)
-        query = query.filter(
-            models_v2.IPAllocation.subnet_id == subnet['id'])
+    def _get_lla_gateway_ips_for_subnets(self, context, subnets):
+        """Return the link local address of the gateway of each subnet."""
+        if not subnets:
+            return {}
+        gateway_ips = dict((subnet.id, subnet.gateway_ip)
+                           for subnet in subnets)
+        query = context.session.query(models_v2.IPAllocation.subnet_id,
+                                      models_v2.IPAllocation.ip_address,
+                                      models_v2.Port.mac_address)
+        query = query.join(models_v2.Port,
+                           models_v2.IPAllocation.port_id == models_v2.Port.id)
         query = query.filter(
-            models_v2.IPAllocation.ip_address == subnet['gateway_ip'])
+            models_v2.IPAllocation.subnet_id.in_(gateway_ips.keys()))
         query = query.filter(models_v2.Port.device_owner ==
                              q_const.DEVICE_OWNER_ROUTER_INTF)
-        try:
-            gateway_port = query.one()
-        except (exc.NoResultFound, exc.MultipleResultsFound):
-            LOG.warn(_('No valid gateway port on subnet %s is '
-                       'found for IPv6 RA'), subnet['id'])
-            return
-        mac_address = gateway_port['mac_address']
-        lla_ip = str(ipv6.get_ipv6_addr_by_EUI64(
-            q_const.IPV6_LLA_PREFIX,
-            mac_address))
-        return lla_ip
+        gateway_macs = {}
+        for subnet_id, ip_address, mac_address in query:
+            if ip_address == gateway_ips[subnet_id]:
+                gateway_macs.setdefault(subnet_id, []).append(mac_address)
+
+        lla_ips = {}
+        for subnet_id in gateway_ips:
+            macs = gateway_macs.get(subnet_id, [])
+            if len(macs) != 1:
+                LOG.warn(_('No valid gateway port on subnet %s is '
+                           'found for IPv6 RA'), subnet_id)
+                continue
+            lla_ips[subnet_id] = str(ipv6.get_ipv6_addr_by_EUI64(
+                q_const.IPV6_LLA_PREFIX, macs[0]))
+        return lla_ips
 
     def _convert_remote_group_id_to_ip_prefix(self, context, ports):
         remote_group_ids = self._select_remote_group_ids(ports)
         ips = self._select_ips_for_remote_group(context, remote_group_ids)
+        # Parse each member address once, not once per port and rule
+        cidrs = {}
+        for remote_group_id, group_ips in ips.iteritems():
+            cidrs[remote_group_id] = []
+            for ip in group_ips:
+                net = netaddr.IPNetwork(ip)
+                cidrs[remote_group_id].append(
+                    (ip, 'IPv%s' % net.version, str(net.cidr)))
         for port in ports.values():
             updated_rule = []
+            fixed_ips = set(port.get('fixed_ips', []))
             for rule in port.get('security_group_rules'):
                 remote_group_id = rule.get('remote_group_id')
                 direction = rule.get('direction')
@@ -298,16 +367,13 @@ class SecurityGroupServerRpcCallbackMixin(object):
 
                 port['security_group_source_groups'].append(remote_group_id)
                 base_rule = rule
-                for ip in ips[remote_group_id]:
-                    if ip in port.get('fixed_ips', []):
+                for ip, ethertype, cidr in cidrs[remote_group_id]:
+                    if ip in fixed_ips:
                         continue
-                    ip_rule = base_rule.copy()
-                    version = netaddr.IPNetwork(ip).version
-                    ethertype = 'IPv%s' % version
                     if base_rule['ethertype'] != ethertype:
                         continue
-                    ip_rule[direction_ip_prefix] = str(
-                        netaddr.IPNetwork(ip).cidr)
+                    ip_rule = base_rule.copy()
+                    ip_rule[direction_ip_prefix] = cidr
                     updated_rule.append(ip_rule)
             port['security_group_rules'] = updated_rule
         return ports
@@ -350,25 +416,62 @@ class SecurityGroupServerRpcCallbackMixin(object):
             self._add_ingress_ra_rule(port, ips_ra)
             self._add_ingress_dhcp_rule(port, ips_dhcp)
 
+    def _make_rule_dict_for_agent(self, rule_in_db):
+        direction = rule_in_db['direction']
+        rule_dict = {
+            'security_group_id': rule_in_db['security_group_id'],
+            'direction': direction,
+            'ethertype': rule_in_db['ethertype'],
+        }
+        for key in ('protocol', 'port_range_min', 'port_range_max',
+                    'remote_ip_prefix', 'remote_group_id'):
+            if rule_in_db.get(key):
+                if key == 'remote_ip_prefix':
+                    direction_ip_prefix = DIRECTION_IP_PREFIX[direction]
+                    rule_dict[direction_ip_prefix] = rule_in_db[key]
+                    continue
+                rule_dict[key] = rule_in_db[key]
+        return rule_dict
+
     def _security_group_rules_for_ports(self, context, ports):
         rules_in_db = self._select_rules_for_ports(context, ports)
-        for (binding, rule_in_db) in rules_in_db:
-            port_id = binding['port_id']
+        for (port_id, rule_in_db) in rules_in_db:
             port = ports[port_id]
-            direction = rule_in_db['direction']
-            rule_dict = {
-                'security_group_id': rule_in_db['security_group_id'],
-                'direction': direction,
-                'ethertype': rule_in_db['ethertype'],
-            }
-            for key in ('protocol', 'port_range_min', 'port_range_max',
-                        'remote_ip_prefix', 'remote_group_id'):
-                if rule_in_db.get(key):
-                    if key == 'remote_ip_prefix':
-                        direction_ip_prefix = DIRECTION_IP_PREFIX[direction]
-                        rule_dict[direction_ip_prefix] = rule_in_db[key]
-                        continue
-                    rule_dict[key] = rule_in_db[key]
-            port['security_group_rules'].append(rule_dict)
+            port['security_group_rules'].append(
+                self._make_rule_dict_for_agent(rule_in_db))
         self._apply_provider_rule(context, ports)
         return self._convert_remote_group_id_to_ip_prefix(context, ports)
+
+    def _security_group_info_for_ports(self, context, ports):
+        security_group_ids = set()
+        for port in ports.values():
+            security_group_ids.update(port.get(ext_sg.SECURITYGROUPS, []))
+
+        security_groups = dict((sg_id, []) for sg_id in security_group_ids)
+        remote_group_ids = {}
+        rules_in_db = self._select_rules_for_security_groups(
+            context, list(security_group_ids))
+        for rule_in_db in rules_in_db:
+            rule_dict = self._make_rule_dict_for_agent(rule_in_db)
+            security_groups[rule_dict['security_group_id']].append(rule_dict)
+            remote_group_id = rule_dict.get('remote_group_id')
+            if remote_group_id:
+                remote_group_ids.setdefault(
+                    rule_dict['security_group_id'], set()).add(
+                        remote_group_id)
+
+        all_remote_group_ids = set()
+        for port in ports.values():
+            for sg_id in port.get(ext_sg.SECURITYGROUPS, []):
+                for remote_group_id in remote_group_ids.get(sg_id, []):
+                    if (remote_group_id not in
+                            port['security_group_source_groups']):
+                        port['security_group_source_groups'].append(
+                            remote_group_id)
+                    all_remote_group_ids.add(remote_group_id)
+
+        self._apply_provider_rule(context, ports)
+        return {'devices': ports,
+                'security_groups': security_groups,
+                'sg_member_ips': self._select_ips_for_remote_group(
+                    context, list(all_remote_group_ids))}
@@ -24,6 +24,43 @@ from neutron.openstack.common import log as logging
 LOG = logging.getLogger(__name__)
 
 
+class QueryMarker(object):
+    """Marker of a page selected by a query rather than loaded beforehand.
+
+    The values of the sort keys of the marker row are scalar subqueries of
+    the page query, so the page is found with a single statement, whatever
+    the relationships of the model.
+    """
+
+    def __init__(self, query, model):
+        self._query = query
+        self._model = model
+
+    def __getattr__(self, key):
+        if key.startswith('_'):
+            raise AttributeError(key)
+        # The subquery reads the marker row, not the row it is compared to
+        return self._query.with_entities(
+            getattr(self._model, key)).statement.correlate(None).as_scalar()
+
+
+def _get_sort_key_attr(model, sort_key):
+    try:
+        sort_key_attr = getattr(model, sort_key)
+    except AttributeError:
+        # Extension attribute doesn't support for sorting. Because it
+        # existed in attr_info, it will be catched at here
+        msg = _("%s is invalid attribute for sort_key") % sort_key
+        raise n_exc.BadRequest(resource=model.__tablename__, msg=msg)
+    if isinstance(sort_key_attr.property, RelationshipProperty):
+        msg = _("The attribute '%(attr)s' is reference to other "
+                "resource, can't used by sort "
+                "'%(resource)s'") % {'attr': sort_key,
+                                     'resource': model.__tablename__}
+        raise n_exc.BadRequest(resource=model.__tablename__, msg=msg)
+    return sort_key_attr
+
+
 def paginate_query(query, model, limit, sorts, marker_obj=None):
     """Returns a query with sorting / pagination criteria added.
 
@@ -42,7 +79,8 @@ def paginate_query(query, model, limit, sorts, marker_obj=None):
 
     Typically, the id of the last row is used as the client-facing pagination
     marker, then the actual marker object must be fetched from the db and
-    passed in to us as marker.
+    passed in to us as marker, unless a QueryMarker selects it in the page
+    query.
 
     :param query: the query object to which we should add paging/sorting
     :param model: the ORM model class
@@ -65,19 +103,7 @@ def paginate_query(query, model, limit, sorts, marker_obj=None):
     # Add sorting
     for sort_key, sort_direction in sorts:
         sort_dir_func = sqlalchemy.asc if sort_direction else sqlalchemy.desc
-        try:
-            sort_key_attr = getattr(model, sort_key)
-        except AttributeError:
-            # Extension attribute doesn't support for sorting. Because it
-            # existed in attr_info, it will be catched at here
-            msg = _("%s is invalid attribute for sort_key") % sort_key
-            raise n_exc.BadRequest(resource=model.__tablename__, msg=msg)
-        if isinstance(sort_key_attr.property, RelationshipProperty):
-            msg = _("The attribute '%(attr)s' is reference to other "
-                    "resource, can't used by sort "
-                    "'%(resource)s'") % {'attr': sort_key,
-                                         'resource': model.__tablename__}
-            raise n_exc.BadRequest(resource=model.__tablename__, msg=msg)
+        sort_key_attr = _get_sort_key_attr(model, sort_key)
         query = query.order_by(sort_dir_func(sort_key_attr))
 
     # Add pagination
@@ -105,3 +131,53 @@ def paginate_query(query, model, limit, sorts, marker_obj=None):
         query = query.limit(limit)
 
     return query
+
+
+def batch_query(query, model, limit, sorts, marker_obj=None):
+    """Returns a query of the batch of rows following marker_obj.
+
+    Like paginate_query, the rows following the marker are selected on the
+    values of its sort keys, which must end with a unique one, rather than
+    at an offset. Unlike it, the null values of the nullable sort keys are
+    sorted first in ascending order, last in descending order, whatever the
+    database, and a marker whose sort keys are null is followed by the
+    right rows. The rows of a collection sorted on any of its columns are
+    thus fetched in batches, each one starting where the previous one
+    ended.
+
+    :param marker_obj: the last row of the previous batch, or None for the
+                       first batch
+    """
+    criteria_list = []
+    equal_attrs = []
+    for sort_key, sort_direction in sorts:
+        sort_dir_func = sqlalchemy.asc if sort_direction else sqlalchemy.desc
+        sort_key_attr = _get_sort_key_attr(model, sort_key)
+        nullable = sort_key_attr.property.columns[0].nullable
+        if nullable:
+            query = query.order_by(sort_dir_func(
+                sqlalchemy.case([(sort_key_attr == sqlalchemy.null(), 0)],
+                                else_=1)))
+        query = query.order_by(sort_dir_func(sort_key_attr))
+        if marker_obj is None:
+            continue
+        value = getattr(marker_obj, sort_key)
+        if value is None:
+            following = (sort_key_attr != sqlalchemy.null() if sort_direction
+                         else sqlalchemy.sql.false())
+            equal = sort_key_attr == sqlalchemy.null()
+        else:
+            # A bound literal, booleans may not be compared otherwise
+            value = sqlalchemy.literal(value, type_=sort_key_attr.type)
+            following = (sort_key_attr > value if sort_direction
+                         else sort_key_attr < value)
+            if nullable and not sort_direction:
+                following = sqlalchemy.sql.or_(
+                    following, sort_key_attr == sqlalchemy.null())
+            equal = sort_key_attr == value
+        criteria_list.append(sqlalchemy.sql.and_(*(equal_attrs +
+                                                   [following])))
+        equal_attrs.append(equal)
+    if criteria_list:
+        query = query.filter(sqlalchemy.sql.or_(*criteria_list))
+    return query.limit(limit)
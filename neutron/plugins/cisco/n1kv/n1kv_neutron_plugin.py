@@ -1243,8 +1243,10 @@ class N1kvNeutronPluginV2(db_base_plugin_v2.NeutronDbPluginV2,
                 n1kv_db_v2.delete_vm_network(context.session,
                                              port[n1kv.PROFILE_ID],
                                              port['network_id'])
-            self.disassociate_floatingips(context, id)
+            disassociated = self.disassociate_floatingips(
+                context, id, do_notify=False)
             super(N1kvNeutronPluginV2, self).delete_port(context, id)
+        self.notify_floatingips_disassociated(context, disassociated)
         self._send_delete_port_request(context, port, vm_network)
 
     def get_port(self, context, id, fields=None):
@@ -30,6 +30,12 @@ ml2_opts = [
                 help=_("An ordered list of networking mechanism driver "
                        "entrypoints to be loaded from the "
                        "neutron.ml2.mechanism_drivers namespace.")),
+    cfg.IntOpt('device_details_cache_ttl',
+               default=0,
+               help=_("Number of seconds the port details returned to the "
+                      "agents by get_device_details are cached. Updates "
+                      "made by other server processes may be seen late by "
+                      "this long. 0 disables the cache.")),
 ]
 
 
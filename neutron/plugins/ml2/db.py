@@ -13,6 +13,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import sqlalchemy as sa
 from sqlalchemy.orm import exc
 
 from neutron.db import api as db_api
@@ -27,6 +28,10 @@ from neutron.plugins.ml2 import models
 
 LOG = log.getLogger(__name__)
 
+# Limit the number of port id prefixes matched by a single query, some
+# backends limit the depth of the expressions they accept
+MAX_PORTS_PER_QUERY = 500
+
 
 def add_network_segment(session, network_id, segment):
     with session.begin(subtransactions=True):
@@ -122,6 +127,57 @@ def get_port_and_sgs(port_id):
         return port_dict
 
 
+def get_ports_and_sgs(port_ids):
+    """Get ports from database with security group info.
+
+    Returns a dict mapping each port id prefix of port_ids to its port.
+    Prefixes without a port are left out.
+    """
+
+    LOG.debug(_("get_ports_and_sgs() called for port_ids %s"), port_ids)
+    port_ids = list(set(port_ids))
+    if not port_ids:
+        return {}
+    prefix_lengths = set(len(port_id) for port_id in port_ids)
+    session = db_api.get_session()
+    sg_binding_port = sg_db.SecurityGroupPortBinding.port_id
+    sg_binding_sgid = sg_db.SecurityGroupPortBinding.security_group_id
+    plugin = manager.NeutronManager.get_plugin()
+    ports = {}
+    sg_ids = {}
+
+    with session.begin(subtransactions=True):
+        for i in range(0, len(port_ids), MAX_PORTS_PER_QUERY):
+            chunk = port_ids[i:i + MAX_PORTS_PER_QUERY]
+            requested = set(chunk)
+            query = session.query(models_v2.Port, sg_binding_sgid)
+            query = query.outerjoin(sg_db.SecurityGroupPortBinding,
+                                    models_v2.Port.id == sg_binding_port)
+            query = query.filter(sa.or_(*[models_v2.Port.id.startswith(
+                port_id) for port_id in chunk]))
+            for port, sg_id in query:
+                for length in prefix_lengths:
+                    port_id = port.id[:length]
+                    if port_id not in requested:
+                        continue
+                    if port_id not in ports:
+                        ports[port_id] = port
+                        sg_ids[port_id] = []
+                    if ports[port_id].id == port.id and sg_id:
+                        sg_ids[port_id].append(sg_id)
+
+        port_dicts = {}
+        for port_id, port in ports.iteritems():
+            port_dict = plugin._make_port_dict(port)
+            port_dict['security_groups'] = sg_ids[port_id]
+            port_dict['security_group_rules'] = []
+            port_dict['security_group_source_groups'] = []
+            port_dict['fixed_ips'] = [ip['ip_address']
+                                      for ip in port['fixed_ips']]
+            port_dicts[port_id] = port_dict
+        return port_dicts
+
+
 def get_port_binding_host(port_id):
     session = db_api.get_session()
     with session.begin(subtransactions=True):
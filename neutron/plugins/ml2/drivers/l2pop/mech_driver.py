@@ -39,6 +39,7 @@ class L2populationMechanismDriver(api.MechanismDriver,
         self.rpc_ctx = n_context.get_admin_context_without_session()
         self.migrated_ports = {}
         self.deleted_ports = {}
+        self.active_port_counts = {}
 
     def _get_port_fdb_entries(self, port):
         return [[port['mac_address'],
@@ -95,9 +96,26 @@ class L2populationMechanismDriver(api.MechanismDriver,
 
         return True
 
+    def update_port_precommit(self, context):
+        port = context.current
+        orig = context.original
+
+        if (port['status'] != orig['status'] and
+            port['status'] in (const.PORT_STATUS_ACTIVE,
+                               const.PORT_STATUS_DOWN) and
+                port['binding:host_id']):
+            # Count the active ports of the agent now, the transaction may
+            # also update the status of other ports of the agent before
+            # update_port_postcommit is called
+            session = context._plugin_context.session
+            self.active_port_counts[port['id']] = (
+                self.get_agent_network_active_port_count(
+                    session, port['binding:host_id'], port['network_id']))
+
     def update_port_postcommit(self, context):
         port = context.current
         orig = context.original
+        agent_active_ports = self.active_port_counts.pop(port['id'], None)
 
         diff_ips = self._get_diff_ips(orig, port)
         if diff_ips:
@@ -111,9 +129,10 @@ class L2populationMechanismDriver(api.MechanismDriver,
             self.migrated_ports[orig['id']] = orig
         elif port['status'] != orig['status']:
             if port['status'] == const.PORT_STATUS_ACTIVE:
-                self._update_port_up(context)
+                self._update_port_up(context, agent_active_ports)
             elif port['status'] == const.PORT_STATUS_DOWN:
-                fdb_entries = self._update_port_down(context, port)
+                fdb_entries = self._update_port_down(
+                    context, port, agent_active_ports=agent_active_ports)
                 l2pop_rpc.L2populationAgentNotify.remove_fdb_entries(
                     self.rpc_ctx, fdb_entries)
             elif port['status'] == const.PORT_STATUS_BUILD:
@@ -155,7 +174,7 @@ class L2populationMechanismDriver(api.MechanismDriver,
 
         return agent, agent_ip, segment, fdb_entries
 
-    def _update_port_up(self, context):
+    def _update_port_up(self, context, agent_active_ports=None):
         port_context = context.current
         port_infos = self._get_port_infos(context, port_context)
         if not port_infos:
@@ -166,8 +185,9 @@ class L2populationMechanismDriver(api.MechanismDriver,
         network_id = port_context['network_id']
 
         session = db_api.get_session()
-        agent_active_ports = self.get_agent_network_active_port_count(
-            session, agent_host, network_id)
+        if agent_active_ports is None:
+            agent_active_ports = self.get_agent_network_active_port_count(
+                session, agent_host, network_id)
 
         other_fdb_entries = {network_id:
                              {'segment_id': segment['segmentation_id'],
@@ -216,7 +236,8 @@ class L2populationMechanismDriver(api.MechanismDriver,
                                                           other_fdb_entries)
 
     def _update_port_down(self, context, port_context,
-                          agent_active_ports_count_for_flooding=0):
+                          agent_active_ports_count_for_flooding=0,
+                          agent_active_ports=None):
         port_infos = self._get_port_infos(context, port_context)
         if not port_infos:
             return
@@ -225,9 +246,10 @@ class L2populationMechanismDriver(api.MechanismDriver,
         agent_host = port_context['binding:host_id']
         network_id = port_context['network_id']
 
-        session = db_api.get_session()
-        agent_active_ports = self.get_agent_network_active_port_count(
-            session, agent_host, network_id)
+        if agent_active_ports is None:
+            session = db_api.get_session()
+            agent_active_ports = self.get_agent_network_active_port_count(
+                session, agent_host, network_id)
 
         other_fdb_entries = {network_id:
                              {'segment_id': segment['segmentation_id'],
@@ -17,6 +17,10 @@
 # @author: Francois Eleouet, Orange
 # @author: Mathieu Rohon, Orange
 
+import contextlib
+import copy
+import threading
+
 from neutron.common import topics
 from neutron.openstack.common import log as logging
 from neutron.openstack.common.rpc import proxy
@@ -35,6 +39,63 @@ class L2populationAgentNotifyAPI(proxy.RpcProxy):
         self.topic_l2pop_update = topics.get_topic_name(topic,
                                                         topics.L2POPULATION,
                                                         topics.UPDATE)
+        # Notifications queued by batch_notifications, per green thread
+        self._local = threading.local()
+
+    @contextlib.contextmanager
+    def batch_notifications(self):
+        """Queue the notifications sent in the block, send them at exit.
+
+        Consecutive add_fdb_entries or remove_fdb_entries notifications to
+        the same destination are merged, so that updating many ports only
+        sends one message per destination instead of one per port.
+        """
+        if getattr(self._local, 'batch', None) is not None:
+            # Nested batch, the outermost one sends the notifications
+            yield
+            return
+        self._local.batch = []
+        try:
+            yield
+        finally:
+            batch = self._local.batch
+            self._local.batch = None
+            for context, method, fdb_entries, host in batch:
+                self._notify(context, method, fdb_entries, host)
+
+    def _queue(self, context, method, fdb_entries, host):
+        batch = self._local.batch
+        if method != 'update_fdb_entries':
+            # Notifications of the same kind can be sent in any order,
+            # merge with a queued one to the same host since the last
+            # notification of another kind
+            for queued in reversed(batch):
+                if queued[1] != method:
+                    break
+                if queued[3] == host:
+                    self._merge_fdb_entries(queued[2], fdb_entries)
+                    return
+        batch.append((context, method, copy.deepcopy(fdb_entries), host))
+
+    def _merge_fdb_entries(self, fdb_entries, other_fdb_entries):
+        for network_id, other in other_fdb_entries.iteritems():
+            if network_id not in fdb_entries:
+                fdb_entries[network_id] = copy.deepcopy(other)
+                continue
+            ports = fdb_entries[network_id]['ports']
+            for agent_ip, entries in other['ports'].iteritems():
+                agent_entries = ports.setdefault(agent_ip, [])
+                for entry in entries:
+                    if entry not in agent_entries:
+                        agent_entries.append(entry)
+
+    def _notify(self, context, method, fdb_entries, host):
+        if getattr(self._local, 'batch', None) is not None:
+            self._queue(context, method, fdb_entries, host)
+        elif host:
+            self._notification_host(context, method, fdb_entries, host)
+        else:
+            self._notification_fanout(context, method, fdb_entries)
 
     def _notification_fanout(self, context, method, fdb_entries):
         LOG.debug(_('Fanout notify l2population agents at %(topic)s '
@@ -60,29 +121,14 @@ class L2populationAgentNotifyAPI(proxy.RpcProxy):
 
     def add_fdb_entries(self, context, fdb_entries, host=None):
         if fdb_entries:
-            if host:
-                self._notification_host(context, 'add_fdb_entries',
-                                        fdb_entries, host)
-            else:
-                self._notification_fanout(context, 'add_fdb_entries',
-                                          fdb_entries)
+            self._notify(context, 'add_fdb_entries', fdb_entries, host)
 
     def remove_fdb_entries(self, context, fdb_entries, host=None):
         if fdb_entries:
-            if host:
-                self._notification_host(context, 'remove_fdb_entries',
-                                        fdb_entries, host)
-            else:
-                self._notification_fanout(context, 'remove_fdb_entries',
-                                          fdb_entries)
+            self._notify(context, 'remove_fdb_entries', fdb_entries, host)
 
     def update_fdb_entries(self, context, fdb_entries, host=None):
         if fdb_entries:
-            if host:
-                self._notification_host(context, 'update_fdb_entries',
-                                        fdb_entries, host)
-            else:
-                self._notification_fanout(context, 'update_fdb_entries',
-                                          fdb_entries)
+            self._notify(context, 'update_fdb_entries', fdb_entries, host)
 
 L2populationAgentNotify = L2populationAgentNotifyAPI()
@@ -25,6 +25,7 @@ from neutron.common import constants as const
 from neutron.common import exceptions as exc
 from neutron.common import topics
 from neutron.db import agentschedulers_db
+from neutron.db import api as db_api
 from neutron.db import allowedaddresspairs_db as addr_pair_db
 from neutron.db import db_base_plugin_v2
 from neutron.db import external_net_db
@@ -121,6 +122,8 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
 
     def _setup_rpc(self):
         self.notifier = rpc.AgentNotifierApi(topics.AGENT)
+        self.device_details_cache = rpc.DeviceDetailsCache(
+            cfg.CONF.ml2.device_details_cache_ttl)
         self.agent_notifiers[const.AGENT_TYPE_DHCP] = (
             dhcp_rpc_agent_api.DhcpAgentNotifyAPI()
         )
@@ -419,6 +422,7 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
         # now the error is propogated to the caller, which is expected to
         # either undo/retry the operation or delete the resource.
         self.mechanism_manager.update_network_postcommit(mech_context)
+        self.device_details_cache.invalidate_network(id)
         return updated_network
 
     def get_network(self, context, id, fields=None):
@@ -530,6 +534,7 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
             # delete the network.  Ideally we'd notify the caller of
             # the fact that an error occurred.
             LOG.error(_("mechanism_manager.delete_network_postcommit failed"))
+        self.device_details_cache.invalidate_network(id)
         self.notifier.network_delete(context, id)
 
     def create_subnet(self, context, subnet):
@@ -631,6 +636,7 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
             # the fact that an error occurred.
             LOG.error(_("mechanism_manager.delete_subnet_postcommit failed"))
 
+    @db_api.retry_on_duplicate_entry()
     def create_port(self, context, port):
         attrs = port['port']
         attrs['status'] = const.PORT_STATUS_DOWN
@@ -705,6 +711,7 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
         # now the error is propogated to the caller, which is expected to
         # either undo/retry the operation or delete the resource.
         self.mechanism_manager.update_port_postcommit(mech_context)
+        self.device_details_cache.invalidate_port(id)
 
         need_port_update_notify |= self.is_security_group_member_updated(
             context, original_port, updated_port)
@@ -725,6 +732,7 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
             l3plugin.prevent_l3_port_deletion(context, id)
 
         session = context.session
+        disassociated = {}
         # REVISIT: Serialize this operation with a semaphore to prevent
         # undesired eventlet yields leading to 'lock wait timeout' errors
         with contextlib.nested(lockutils.lock('db-access'),
@@ -747,10 +755,14 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
             self._delete_port_security_group_bindings(context, id)
             LOG.debug(_("Calling base delete_port"))
             if l3plugin:
-                l3plugin.disassociate_floatingips(context, id)
+                disassociated = l3plugin.disassociate_floatingips(
+                    context, id, do_notify=False)
 
             super(Ml2Plugin, self).delete_port(context, id)
 
+        if disassociated:
+            l3plugin.notify_floatingips_disassociated(context, disassociated)
+
         try:
             self.mechanism_manager.delete_port_postcommit(mech_context)
         except ml2_exc.MechanismDriverError:
@@ -758,36 +770,55 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
             # delete the port.  Ideally we'd notify the caller of the
             # fact that an error occurred.
             LOG.error(_("mechanism_manager.delete_port_postcommit failed"))
+        self.device_details_cache.invalidate_port(id)
         self.notify_security_groups_member_updated(context, port)
 
     def update_port_status(self, context, port_id, status):
-        updated = False
+        return bool(self.update_port_statuses(context, {port_id: status}))
+
+    def update_port_statuses(self, context, statuses):
+        """Update the status of several ports in a single transaction.
+
+        :param statuses: dict mapping port ids, or port id prefixes, to
+                         their new status
+        :returns: the port ids, as given in statuses, of the ports found
+        """
+        found = []
+        mech_contexts = []
+        networks = {}
         session = context.session
         # REVISIT: Serialize this operation with a semaphore to prevent
         # undesired eventlet yields leading to 'lock wait timeout' errors
         with contextlib.nested(lockutils.lock('db-access'),
                                session.begin(subtransactions=True)):
-            port = db.get_port(session, port_id)
-            if not port:
-                LOG.warning(_("Port %(port)s updated up by agent not found"),
-                            {'port': port_id})
-                return False
-            if port.status != status:
+            for port_id, status in statuses.iteritems():
+                port = db.get_port(session, port_id)
+                if not port:
+                    LOG.warning(_("Port %(port)s updated up by agent not "
+                                  "found"), {'port': port_id})
+                    continue
+                found.append(port_id)
+                if port.status == status:
+                    continue
                 original_port = self._make_port_dict(port)
                 port.status = status
                 updated_port = self._make_port_dict(port)
-                network = self.get_network(context,
-                                           original_port['network_id'])
+                network_id = original_port['network_id']
+                if network_id not in networks:
+                    networks[network_id] = self.get_network(context,
+                                                            network_id)
                 mech_context = driver_context.PortContext(
-                    self, context, updated_port, network,
+                    self, context, updated_port, networks[network_id],
                     original_port=original_port)
                 self.mechanism_manager.update_port_precommit(mech_context)
-                updated = True
+                mech_contexts.append(mech_context)
 
-        if updated:
+        for mech_context in mech_contexts:
             self.mechanism_manager.update_port_postcommit(mech_context)
+            port = mech_context.current
+            self.device_details_cache.set_status(port['id'], port['status'])
 
-        return True
+        return found
 
     def port_bound_to_host(self, port_id, host):
         port_host = db.get_port_binding_host(port_id)
@@ -13,6 +13,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+
 from neutron.agent import securitygroups_rpc as sg_rpc
 from neutron.common import constants as q_const
 from neutron.common import rpc as q_rpc
@@ -24,9 +26,11 @@ from neutron.db import securitygroups_rpc_base as sg_db_rpc
 from neutron import manager
 from neutron.openstack.common import log
 from neutron.openstack.common.rpc import proxy
+from neutron.openstack.common import timeutils
 from neutron.openstack.common import uuidutils
 from neutron.plugins.ml2 import db
 from neutron.plugins.ml2 import driver_api as api
+from neutron.plugins.ml2.drivers.l2pop import rpc as l2pop_rpc
 from neutron.plugins.ml2.drivers import type_tunnel
 # REVISIT(kmestery): Allow the type and mechanism drivers to supply the
 # mixins and eventually remove the direct dependencies on type_tunnel.
@@ -37,14 +41,86 @@ TAP_DEVICE_PREFIX = 'tap'
 TAP_DEVICE_PREFIX_LENGTH = 3
 
 
+class DeviceDetailsCache(object):
+    """Cache of the port details returned by get_device_details.
+
+    Entries are keyed by the port id, or port id prefix, derived from the
+    device name. They expire after ttl seconds, and are dropped as soon
+    as the port or its network is updated or deleted by this process.
+    A ttl of 0 disables the cache.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        # port id or prefix -> (expiry, details, status)
+        self._entries = {}
+        # port id -> port ids or prefixes its details are cached under
+        self._keys_by_port = {}
+        self._next_purge = 0
+
+    def get(self, port_id):
+        """Return the cached (details, status) of the port, or None."""
+        entry = self._entries.get(port_id)
+        if not entry:
+            return
+        expiry, details, status = entry
+        if expiry <= timeutils.utcnow_ts():
+            self._remove(port_id)
+            return
+        return dict(details), status
+
+    def add(self, port_id, details, status):
+        if self.ttl <= 0:
+            return
+        now = timeutils.utcnow_ts()
+        if now >= self._next_purge:
+            self._purge(now)
+        self._entries[port_id] = (now + self.ttl, dict(details), status)
+        self._keys_by_port.setdefault(details['port_id'], set()).add(port_id)
+
+    def set_status(self, port_id, status):
+        for key in self._keys_by_port.get(port_id, ()):
+            expiry, details, _status = self._entries[key]
+            self._entries[key] = (expiry, details, status)
+
+    def invalidate_port(self, port_id):
+        for key in self._keys_by_port.pop(port_id, ()):
+            del self._entries[key]
+
+    def invalidate_network(self, network_id):
+        port_ids = [details['port_id']
+                    for expiry, details, status in self._entries.values()
+                    if details['network_id'] == network_id]
+        for port_id in port_ids:
+            self.invalidate_port(port_id)
+
+    def _remove(self, key):
+        expiry, details, status = self._entries.pop(key)
+        keys = self._keys_by_port[details['port_id']]
+        keys.discard(key)
+        if not keys:
+            del self._keys_by_port[details['port_id']]
+
+    def _purge(self, now):
+        for key, (expiry, details, status) in self._entries.items():
+            if expiry <= now:
+                self._remove(key)
+        self._next_purge = now + self.ttl
+
+
 class RpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
                    sg_db_rpc.SecurityGroupServerRpcCallbackMixin,
                    type_tunnel.TunnelRpcCallbackMixin):
 
-    RPC_API_VERSION = '1.1'
+    RPC_API_VERSION = '1.5'
     # history
     #   1.0 Initial version (from openvswitch/linuxbridge)
     #   1.1 Support Security Group RPC
+    #   1.2 Support security_group_info_for_devices
+    #   1.3 Support get_devices_details_list
+    #   1.4 Support update_device_list
+    #   1.5 Support get_active_networks_fingerprints and the network_ids
+    #       of get_active_networks_info
 
     def __init__(self, notifier, type_manager):
         # REVISIT(kmestery): This depends on the first three super classes
@@ -86,6 +162,19 @@ class RpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
             port['device'] = device
         return port
 
+    @classmethod
+    def get_ports_from_devices(cls, devices):
+        port_ids = dict((device, cls._device_to_port_id(device))
+                        for device in devices)
+        ports = db.get_ports_and_sgs(port_ids.values())
+        result = []
+        for device, port_id in port_ids.iteritems():
+            if port_id in ports:
+                port = dict(ports[port_id])
+                port['device'] = device
+                result.append(port)
+        return result
+
     def get_device_details(self, rpc_context, **kwargs):
         """Agent requests device details."""
         agent_id = kwargs.get('agent_id')
@@ -94,6 +183,21 @@ class RpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
                     "%(agent_id)s"),
                   {'device': device, 'agent_id': agent_id})
         port_id = self._device_to_port_id(device)
+        plugin = manager.NeutronManager.get_plugin()
+
+        cached = plugin.device_details_cache.get(port_id)
+        if cached:
+            entry, status = cached
+            new_status = (q_const.PORT_STATUS_BUILD if entry['admin_state_up']
+                          else q_const.PORT_STATUS_DOWN)
+            if (status == new_status or
+                    plugin.update_port_status(rpc_context, entry['port_id'],
+                                              new_status)):
+                entry['device'] = device
+                LOG.debug(_("Returning cached: %s"), entry)
+                return entry
+            # The port was deleted by another server process
+            plugin.device_details_cache.invalidate_port(entry['port_id'])
 
         session = db_api.get_session()
         with session.begin(subtransactions=True):
@@ -139,7 +243,6 @@ class RpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
             new_status = (q_const.PORT_STATUS_BUILD if port.admin_state_up
                           else q_const.PORT_STATUS_DOWN)
             if port.status != new_status:
-                plugin = manager.NeutronManager.get_plugin()
                 plugin.update_port_status(rpc_context,
                                           port_id,
                                           new_status)
@@ -151,9 +254,20 @@ class RpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
                      'network_type': segment[api.NETWORK_TYPE],
                      'segmentation_id': segment[api.SEGMENTATION_ID],
                      'physical_network': segment[api.PHYSICAL_NETWORK]}
+            plugin.device_details_cache.add(port_id, entry, new_status)
             LOG.debug(_("Returning: %s"), entry)
             return entry
 
+    def get_devices_details_list(self, rpc_context, **kwargs):
+        """Agent requests the details of several devices at once."""
+        return [
+            self.get_device_details(
+                rpc_context,
+                device=device,
+                agent_id=kwargs.get('agent_id'))
+            for device in kwargs.pop('devices', [])
+        ]
+
     def _find_segment(self, segments, segment_id):
         for segment in segments:
             if segment[api.ID] == segment_id:
@@ -202,6 +316,54 @@ class RpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
         plugin.update_port_status(rpc_context, port_id,
                                   q_const.PORT_STATUS_ACTIVE)
 
+    def update_device_list(self, rpc_context, **kwargs):
+        """Devices are up, or no longer exist, on agent.
+
+        The status of all the ports is updated in a single transaction,
+        and the l2 population notifications of all the ports are merged.
+
+        :returns: dict with the keys
+                  devices_up: the devices given in devices_up,
+                  devices_down: the update_device_down result of each
+                                device given in devices_down
+        """
+        agent_id = kwargs.get('agent_id')
+        host = kwargs.get('host')
+        devices_up = kwargs.get('devices_up') or []
+        devices_down = kwargs.get('devices_down') or []
+        LOG.debug(_("Devices %(devices_up)s up and %(devices_down)s no "
+                    "longer existing at agent %(agent_id)s"),
+                  {'devices_up': devices_up, 'devices_down': devices_down,
+                   'agent_id': agent_id})
+        plugin = manager.NeutronManager.get_plugin()
+
+        # Update the ports going up first, as update_device_up and
+        # update_device_down calls would
+        statuses = collections.OrderedDict()
+        port_ids = {}
+        for devices, status in ((devices_up, q_const.PORT_STATUS_ACTIVE),
+                                (devices_down, q_const.PORT_STATUS_DOWN)):
+            for device in devices:
+                port_id = self._device_to_port_id(device)
+                if host and not plugin.port_bound_to_host(port_id, host):
+                    LOG.debug(_("Device %(device)s not bound to the"
+                                " agent host %(host)s"),
+                              {'device': device, 'host': host})
+                    continue
+                port_ids[device] = port_id
+                statuses[port_id] = status
+
+        with l2pop_rpc.L2populationAgentNotify.batch_notifications():
+            found = set(plugin.update_port_statuses(rpc_context, statuses))
+
+        # Devices not bound to the host are reported as existing
+        return {'devices_up': devices_up,
+                'devices_down': [
+                    {'device': device,
+                     'exists': (device not in port_ids or
+                                port_ids[device] in found)}
+                    for device in devices_down]}
+
 
 class AgentNotifierApi(proxy.RpcProxy,
                        sg_rpc.SecurityGroupAgentRpcApiMixin,
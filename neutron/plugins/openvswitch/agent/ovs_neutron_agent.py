@@ -110,7 +110,8 @@ class OVSSecurityGroupAgent(sg_rpc.SecurityGroupAgentRpcMixin):
         self.context = context
         self.plugin_rpc = plugin_rpc
         self.root_helper = root_helper
-        self.init_firewall(defer_refresh_firewall=True)
+        self.init_firewall(defer_refresh_firewall=True,
+                           use_enhanced_rpc=True)
 
 
 class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
@@ -152,7 +153,8 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
                  veth_mtu=None, l2_population=False,
                  minimize_polling=False,
                  ovsdb_monitor_respawn_interval=(
-                     constants.DEFAULT_OVSDBMON_RESPAWN)):
+                     constants.DEFAULT_OVSDBMON_RESPAWN),
+                 full_scan_interval=constants.DEFAULT_FULL_SCAN_INTERVAL):
         '''Constructor.
 
         :param integ_br: name of the integration bridge.
@@ -170,6 +172,9 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
         :param ovsdb_monitor_respawn_interval: Optional, when using polling
                minimization, the number of seconds to wait before respawning
                the ovsdb monitor.
+        :param full_scan_interval: Optional, when using polling
+               minimization, the number of seconds between full scans of
+               the integration bridge ports, 0 to only scan on resync.
         '''
         self.veth_mtu = veth_mtu
         self.root_helper = root_helper
@@ -204,6 +209,7 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
         self.polling_interval = polling_interval
         self.minimize_polling = minimize_polling
         self.ovsdb_monitor_respawn_interval = ovsdb_monitor_respawn_interval
+        self.full_scan_interval = full_scan_interval
 
         if tunnel_types:
             self.enable_tunneling = True
@@ -446,6 +452,7 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
 
         if network_type in constants.TUNNEL_NETWORK_TYPES:
             if self.enable_tunneling:
+                self.tun_br.defer_apply_on()
                 # outbound broadcast/multicast
                 ofports = ','.join(self.tun_br_ofports[network_type].values())
                 if ofports:
@@ -461,6 +468,7 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
                                      tun_id=segmentation_id,
                                      actions="mod_vlan_vid:%s,resubmit(,%s)" %
                                      (lvid, constants.LEARN_FROM_TUN))
+                self.tun_br.defer_apply_off()
             else:
                 LOG.error(_("Cannot provision %(network_type)s network for "
                           "net-id=%(net_uuid)s - tunneling disabled"),
@@ -533,10 +541,12 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
 
         if lvm.network_type in constants.TUNNEL_NETWORK_TYPES:
             if self.enable_tunneling:
+                self.tun_br.defer_apply_on()
                 self.tun_br.delete_flows(
                     table=constants.TUN_TABLE[lvm.network_type],
                     tun_id=lvm.segmentation_id)
                 self.tun_br.delete_flows(dl_vlan=lvm.vlan)
+                self.tun_br.defer_apply_off()
                 if self.l2_pop:
                     # Try to remove tunnel ports if not used by other networks
                     for ofport in lvm.tun_ofports:
@@ -695,6 +705,8 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
             exit(1)
         self.tun_br.remove_all_flows()
 
+        # The default flows are applied at once
+        self.tun_br.defer_apply_on()
         # Table 0 (default) will sort incoming traffic depending on in_port
         self.tun_br.add_flow(priority=1,
                              in_port=self.patch_int_ofport,
@@ -747,6 +759,7 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
         self.tun_br.add_flow(table=constants.FLOOD_TO_TUN,
                              priority=0,
                              actions="drop")
+        self.tun_br.defer_apply_off()
 
     def setup_physical_bridges(self, bridge_mappings):
         '''Setup the physical network bridges.
@@ -838,6 +851,75 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
         port_info['removed'] = registered_ports - cur_ports
         return port_info
 
+    def _get_interface_port_id(self, interface):
+        external_ids = interface['external_ids']
+        if 'attached-mac' not in external_ids:
+            return
+        if 'iface-id' in external_ids:
+            return external_ids['iface-id']
+        if 'xs-vif-uuid' in external_ids:
+            return self.int_br.get_xapi_iface_id(external_ids['xs-vif-uuid'])
+
+    def _is_interface_ready(self, interface):
+        # ofport is ["set", []] until openvswitch assigns it, and -1 when
+        # the interface could not be created
+        try:
+            return int(interface['ofport']) > 0
+        except (ValueError, TypeError):
+            return False
+
+    def process_port_events(self, events, registered_ports,
+                            updated_ports=None):
+        """Build the port info from the interface changes seen by ovsdb.
+
+        Unlike scan_ports, only the interfaces added or removed since the
+        previous iteration are looked at.
+        """
+        removed = set()
+        for interface in events['removed']:
+            port_id = self._get_interface_port_id(interface)
+            if port_id:
+                removed.add(port_id)
+
+        added = set()
+        candidates = [interface for interface in events['added']
+                      if self._is_interface_ready(interface)]
+        if candidates:
+            int_br_ports = set(self.int_br.get_port_name_list())
+            for interface in candidates:
+                if interface['name'] not in int_br_ports:
+                    continue
+                port_id = self._get_interface_port_id(interface)
+                if port_id:
+                    added.add(port_id)
+
+        for port_id in removed & added:
+            # Removed and added again meanwhile, the interface is there if
+            # it was plugged again
+            if self.int_br.get_vif_port_by_id(port_id):
+                removed.discard(port_id)
+            else:
+                added.discard(port_id)
+        removed &= registered_ports
+
+        if updated_ports is None:
+            updated_ports = set()
+        # Known ports whose interface was plugged again or modified need to
+        # be wired again
+        updated_ports |= added & registered_ports
+        added -= registered_ports
+
+        cur_ports = (registered_ports - removed) | added
+        self.int_br_device_count = len(cur_ports)
+        port_info = {'current': cur_ports}
+        updated_ports &= cur_ports
+        if updated_ports:
+            port_info['updated'] = updated_ports
+        if added or removed:
+            port_info['added'] = added
+            port_info['removed'] = removed
+        return port_info
+
     def check_changed_vlans(self, registered_ports):
         """Return ports which have lost their vlan tag.
 
@@ -946,7 +1028,7 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
                     self.tun_br_ofports[tunnel_type].pop(remote_ip, None)
 
     def treat_devices_added_or_updated(self, devices):
-        resync = False
+        ports = {}
         for device in devices:
             LOG.debug(_("Processing port %s"), device)
             port = self.int_br.get_vif_port_by_id(device)
@@ -957,18 +1039,23 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
                 LOG.info(_("Port %s was not found on the integration bridge "
                            "and will therefore not be processed"), device)
                 continue
-            try:
-                # TODO(salv-orlando): Provide bulk API for retrieving
-                # details for all devices in one call
-                details = self.plugin_rpc.get_device_details(self.context,
-                                                             device,
-                                                             self.agent_id)
-            except Exception as e:
-                LOG.debug(_("Unable to get port details for "
-                            "%(device)s: %(e)s"),
-                          {'device': device, 'e': e})
-                resync = True
-                continue
+            ports[device] = port
+        if not ports:
+            return False
+        try:
+            devices_details_list = self.plugin_rpc.get_devices_details_list(
+                self.context, list(ports), self.agent_id)
+        except Exception as e:
+            LOG.debug(_("Unable to get port details for "
+                        "%(devices)s: %(e)s"),
+                      {'devices': list(ports), 'e': e})
+            # All the devices will be processed again on resync
+            return True
+        devices_up = []
+        devices_down = []
+        for details in devices_details_list:
+            device = details['device']
+            port = ports[device]
             if 'port_id' in details:
                 LOG.info(_("Port %(device)s updated. Details: %(details)s"),
                          {'device': device, 'details': details})
@@ -978,81 +1065,92 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
                                     details['physical_network'],
                                     details['segmentation_id'],
                                     details['admin_state_up'])
-                # update plugin about port status
                 if details.get('admin_state_up'):
                     LOG.debug(_("Setting status for %s to UP"), device)
-                    self.plugin_rpc.update_device_up(
-                        self.context, device, self.agent_id, cfg.CONF.host)
+                    devices_up.append(device)
                 else:
                     LOG.debug(_("Setting status for %s to DOWN"), device)
-                    self.plugin_rpc.update_device_down(
-                        self.context, device, self.agent_id, cfg.CONF.host)
+                    devices_down.append(device)
                 LOG.info(_("Configuration for device %s completed."), device)
             else:
                 LOG.warn(_("Device %s not defined on plugin"), device)
                 if (port and port.ofport != -1):
                     self.port_dead(port)
-        return resync
+        if not devices_up and not devices_down:
+            return False
+        # update plugin about port status
+        try:
+            self.plugin_rpc.update_device_list(self.context, devices_up,
+                                               devices_down, self.agent_id,
+                                               cfg.CONF.host)
+        except Exception as e:
+            LOG.debug(_("Unable to update the status of %(devices)s: "
+                        "%(e)s"),
+                      {'devices': devices_up + devices_down, 'e': e})
+            return True
+        return False
 
     def treat_ancillary_devices_added(self, devices):
-        resync = False
         for device in devices:
             LOG.info(_("Ancillary Port %s added"), device)
-            try:
-                self.plugin_rpc.get_device_details(self.context, device,
-                                                   self.agent_id)
-            except Exception as e:
-                LOG.debug(_("Unable to get port details for "
-                            "%(device)s: %(e)s"),
-                          {'device': device, 'e': e})
-                resync = True
-                continue
+        try:
+            self.plugin_rpc.get_devices_details_list(self.context,
+                                                     list(devices),
+                                                     self.agent_id)
+        except Exception as e:
+            LOG.debug(_("Unable to get port details for "
+                        "%(devices)s: %(e)s"),
+                      {'devices': devices, 'e': e})
+            return True
 
-            # update plugin about port status
-            self.plugin_rpc.update_device_up(self.context,
-                                             device,
-                                             self.agent_id,
-                                             cfg.CONF.host)
-        return resync
+        # update plugin about port status
+        try:
+            self.plugin_rpc.update_device_list(self.context, list(devices),
+                                               [], self.agent_id,
+                                               cfg.CONF.host)
+        except Exception as e:
+            LOG.debug(_("Unable to update the status of %(devices)s: "
+                        "%(e)s"),
+                      {'devices': devices, 'e': e})
+            return True
+        return False
 
     def treat_devices_removed(self, devices):
-        resync = False
         self.sg_agent.remove_devices_filter(devices)
         for device in devices:
             LOG.info(_("Attachment %s removed"), device)
-            try:
-                self.plugin_rpc.update_device_down(self.context,
-                                                   device,
-                                                   self.agent_id,
-                                                   cfg.CONF.host)
-            except Exception as e:
-                LOG.debug(_("port_removed failed for %(device)s: %(e)s"),
-                          {'device': device, 'e': e})
-                resync = True
-                continue
+        try:
+            self.plugin_rpc.update_device_list(self.context, [],
+                                               list(devices), self.agent_id,
+                                               cfg.CONF.host)
+        except Exception as e:
+            LOG.debug(_("port_removed failed for %(devices)s: %(e)s"),
+                      {'devices': devices, 'e': e})
+            return True
+        for device in devices:
             self.port_unbound(device)
-        return resync
+        return False
 
     def treat_ancillary_devices_removed(self, devices):
-        resync = False
         for device in devices:
             LOG.info(_("Attachment %s removed"), device)
-            try:
-                details = self.plugin_rpc.update_device_down(self.context,
-                                                             device,
-                                                             self.agent_id,
-                                                             cfg.CONF.host)
-            except Exception as e:
-                LOG.debug(_("port_removed failed for %(device)s: %(e)s"),
-                          {'device': device, 'e': e})
-                resync = True
-                continue
+        try:
+            result = self.plugin_rpc.update_device_list(self.context, [],
+                                                        list(devices),
+                                                        self.agent_id,
+                                                        cfg.CONF.host)
+        except Exception as e:
+            LOG.debug(_("port_removed failed for %(devices)s: %(e)s"),
+                      {'devices': devices, 'e': e})
+            return True
+        for details in result['devices_down']:
             if details['exists']:
-                LOG.info(_("Port %s updated."), device)
+                LOG.info(_("Port %s updated."), details['device'])
                 # Nothing to do regarding local networking
             else:
-                LOG.debug(_("Device %s not defined on plugin"), device)
-        return resync
+                LOG.debug(_("Device %s not defined on plugin"),
+                          details['device'])
+        return False
 
     def process_network_ports(self, port_info):
         resync_a = False
@@ -1127,6 +1225,8 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
 
     def tunnel_sync(self):
         resync = False
+        # The flows of all the tunnels are applied at once
+        self.tun_br.defer_apply_on()
         try:
             for tunnel_type in self.tunnel_types:
                 details = self.plugin_rpc.tunnel_sync(self.context,
@@ -1153,6 +1253,8 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
             LOG.debug(_("Unable to sync tunnel IP %(local_ip)s: %(e)s"),
                       {'local_ip': self.local_ip, 'e': e})
             resync = True
+        finally:
+            self.tun_br.defer_apply_off()
         return resync
 
     def _agent_has_updates(self, polling_manager):
@@ -1174,6 +1276,7 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
         updated_ports_copy = set()
         ancillary_ports = set()
         tunnel_sync = True
+        last_full_scan = None
         while True:
             start = time.time()
             port_stats = {'regular': {'added': 0,
@@ -1188,6 +1291,12 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
                 ports.clear()
                 ancillary_ports.clear()
                 sync = False
+                last_full_scan = None
+                polling_manager.force_polling()
+            elif (self.full_scan_interval and last_full_scan is not None and
+                  start - last_full_scan > self.full_scan_interval):
+                # Periodically reconcile with the interfaces on br-int
+                last_full_scan = None
                 polling_manager.force_polling()
             # Notify the plugin of tunnel IP
             if self.enable_tunneling and tunnel_sync:
@@ -1209,7 +1318,13 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
                     # between these two statements, this will be thread-safe
                     updated_ports_copy = self.updated_ports
                     self.updated_ports = set()
-                    port_info = self.scan_ports(ports, updated_ports_copy)
+                    events = polling_manager.get_events()
+                    if events is None or last_full_scan is None:
+                        port_info = self.scan_ports(ports, updated_ports_copy)
+                        last_full_scan = start
+                    else:
+                        port_info = self.process_port_events(
+                            events, ports, updated_ports_copy)
                     ports = port_info['current']
                     LOG.debug(_("Agent rpc_loop - iteration:%(iter_num)d - "
                                 "port information retrieved. "
@@ -1265,6 +1380,7 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
                     # Put the ports back in self.updated_port
                     self.updated_ports |= updated_ports_copy
                     sync = True
+                    last_full_scan = None
 
             # sleep till end of polling interval
             elapsed = (time.time() - start)
@@ -1315,6 +1431,7 @@ def create_agent_config_map(config):
         root_helper=config.AGENT.root_helper,
         polling_interval=config.AGENT.polling_interval,
         minimize_polling=config.AGENT.minimize_polling,
+        full_scan_interval=config.AGENT.full_scan_interval,
         tunnel_types=config.AGENT.tunnel_types,
         veth_mtu=config.AGENT.veth_mtu,
         l2_population=config.AGENT.l2_population,
@@ -70,6 +70,13 @@ agent_opts = [
                default=constants.DEFAULT_OVSDBMON_RESPAWN,
                help=_("The number of seconds to wait before respawning the "
                       "ovsdb monitor after losing communication with it")),
+    cfg.IntOpt('full_scan_interval',
+               default=constants.DEFAULT_FULL_SCAN_INTERVAL,
+               help=_("When minimizing polling, the number of seconds "
+                      "between full scans of the integration bridge ports. "
+                      "In between, only the interface changes reported by "
+                      "the ovsdb monitor are processed. 0 disables the "
+                      "periodic full scans.")),
     cfg.ListOpt('tunnel_types', default=DEFAULT_TUNNEL_TYPES,
                 help=_("Network types supported by the agent "
                        "(gre and/or vxlan)")),
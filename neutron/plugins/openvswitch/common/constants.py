@@ -52,3 +52,6 @@ TUN_TABLE = {p_const.TYPE_GRE: GRE_TUN_TO_LV,
 
 # The default respawn interval for the ovsdb monitor
 DEFAULT_OVSDBMON_RESPAWN = 30
+
+# The default interval between full scans of the integration bridge ports
+DEFAULT_FULL_SCAN_INTERVAL = 300
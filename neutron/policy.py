@@ -380,6 +380,112 @@ def enforce(context, action, target, plugin=None):
     return result
 
 
+def _target_fields(rule, visited=None):
+    """Return the target fields read by a check, or None if they're unknown.
+
+    Only the checks reading nothing but some fields of the target and the
+    credentials are analyzed, the other ones may read anything.
+    """
+    if visited is None:
+        visited = set()
+    if isinstance(rule, (policy.TrueCheck, policy.FalseCheck,
+                         policy.RoleCheck)):
+        return set()
+    if isinstance(rule, policy.RuleCheck):
+        if rule.match in visited:
+            return set()
+        visited.add(rule.match)
+        try:
+            return _target_fields(policy._rules[rule.match], visited)
+        except (KeyError, TypeError):
+            # The check fails closed whatever the target
+            return set()
+    if isinstance(rule, (policy.AndCheck, policy.OrCheck)):
+        fields = set()
+        for sub_rule in rule.rules:
+            sub_fields = _target_fields(sub_rule, visited)
+            if sub_fields is None:
+                return
+            fields |= sub_fields
+        return fields
+    if isinstance(rule, policy.NotCheck):
+        return _target_fields(rule.rule, visited)
+    if isinstance(rule, FieldCheck):
+        return set([rule.field])
+    if isinstance(rule, OwnerCheck):
+        # The owner of a parent resource is loaded from its foreign key
+        fields = set([rule.target_field])
+        for separator in (':', '_'):
+            if separator in rule.target_field:
+                parent_res = rule.target_field.split(separator, 1)[0]
+                foreign_key = attributes.RESOURCE_FOREIGN_KEYS.get(
+                    "%ss" % parent_res)
+                if foreign_key:
+                    fields.add(foreign_key)
+                break
+        return fields
+    if type(rule) is policy.GenericCheck:
+        return set(re.findall('%\\(([^)]*)\\)', rule.match))
+
+
+class CachedChecker(object):
+    """Check the policies of a context, memoizing the decisions.
+
+    The rule of a read action is compiled once into the target fields it
+    reads, and its decisions are memoized against the values of these fields.
+    The credentials are read once from the context, so a checker is meant to
+    serve a single request, e.g. the visibility checks of the attributes of
+    all the resources of a list.
+    """
+
+    def __init__(self, context):
+        self._context = context
+        self._credentials = None
+        self._fields = {}
+        self._decisions = {}
+
+    def _get_fields(self, action):
+        try:
+            return self._fields[action]
+        except KeyError:
+            fields = None
+            # The rules of write actions depend on the attributes set
+            if not get_resource_and_action(action)[1]:
+                fields = _target_fields(policy.RuleCheck('rule', action))
+            if fields is not None:
+                fields = tuple(sorted(fields))
+            self._fields[action] = fields
+            return fields
+
+    def check(self, action, target):
+        """Memoized version of check."""
+        if self._credentials is None:
+            self._credentials = self._context.to_dict()
+        if target is None:
+            target = {}
+        fields = self._get_fields(action)
+        if fields is None:
+            return policy.check(_build_match_rule(action, target), target,
+                                self._credentials)
+        key = (action,) + tuple(target.get(field) for field in fields)
+        try:
+            return self._decisions[key]
+        except KeyError:
+            result = self._decisions[key] = policy.check(
+                _build_match_rule(action, target), target, self._credentials)
+            return result
+        except TypeError:
+            # A field is not hashable, e.g. a list
+            return policy.check(_build_match_rule(action, target), target,
+                                self._credentials)
+
+    def check_if_exists(self, action, target):
+        """Memoized version of check_if_exists."""
+        if not policy._rules or action not in policy._rules:
+            raise exceptions.PolicyRuleNotFound(rule=action)
+        return self.check(action, target)
+
+
 def check_is_admin(context):
     """Verify context has admin rights according to policy settings."""
     init()
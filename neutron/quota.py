@@ -54,6 +54,23 @@ quota_opts = [
     cfg.StrOpt('quota_driver',
                default=QUOTA_DB_DRIVER,
                help=_('Default driver to use for quota checks')),
+    cfg.BoolOpt('track_quota_usage',
+                default=False,
+                help=_('Keep the usages of the networks, subnets and ports '
+                       'of the tenants in the database, and reserve the '
+                       'resources being created, rather than counting '
+                       'them on every creation. Requires the database '
+                       'quota driver.')),
+    cfg.IntOpt('reservation_expiration',
+               default=120,
+               help=_('Number of seconds after which the reservation of '
+                      'resources which were neither created nor failed '
+                      'is ignored.')),
+    cfg.IntOpt('quota_limit_cache_ttl',
+               default=30,
+               help=_('Number of seconds during which the quota limits of '
+                      'a tenant are kept in memory by the database quota '
+                      'driver. 0 disables the cache.')),
 ]
 # Register the configuration options
 cfg.CONF.register_opts(quota_opts, 'QUOTAS')
@@ -299,6 +316,40 @@ class QuotaEngine(object):
         return self.get_driver().limit_check(context, tenant_id,
                                              self._resources, values)
 
+    def make_reservation(self, context, tenant_id, resource, delta,
+                         *args, **kwargs):
+        """Check that a tenant is allowed delta more resources.
+
+        When the driver tracks the usage of the resource, the resources
+        are reserved until the reservation is committed or cancelled.
+        Otherwise the resources are counted, the arguments following delta
+        being passed to the count function of the resource.
+
+        This method will raise a QuotaResourceUnknown exception if the
+        resource is unknown, and an OverQuota exception if the resources
+        would be over the quota.
+
+        :param context: The request context, for access checks.
+        :returns: the id of the reservation, or None
+        """
+
+        driver = self.get_driver()
+        if (resource in self._resources and
+                getattr(driver, 'tracks_usage', None) and
+                driver.tracks_usage(resource)):
+            return driver.make_reservation(context, tenant_id,
+                                           self._resources, resource, delta)
+        count = self.count(context, resource, *args, **kwargs)
+        self.limit_check(context, tenant_id, **{resource: count + delta})
+
+    def commit_reservation(self, context, reservation_id):
+        """Release a reservation once its resources are created."""
+        self.get_driver().commit_reservation(context, reservation_id)
+
+    def cancel_reservation(self, context, reservation_id):
+        """Release a reservation whose resources failed to be created."""
+        self.get_driver().cancel_reservation(context, reservation_id)
+
     @property
     def resources(self):
         return self._resources
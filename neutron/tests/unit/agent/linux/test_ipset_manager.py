@@ -0,0 +1,69 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from neutron.agent.linux import ipset_manager
+from neutron.tests import base
+
+
+class TestIpsetManager(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestIpsetManager, self).setUp()
+        self.execute = mock.Mock()
+        self.ipset = ipset_manager.IpsetManager(_execute=self.execute,
+                                                root_helper='sudo')
+
+    def test_get_set_name(self):
+        name = ipset_manager.get_set_name('a' * 36, 'IPv6')
+        self.assertEqual('NET6' + 'a' * 27, name)
+
+    def test_refresh_new_set(self):
+        self.ipset.refresh_set('NET4sg', ['10.0.0.2/32'], 'IPv4')
+        self.execute.assert_called_once_with(
+            ['ipset', 'restore', '-exist'],
+            process_input=('create NET4sg hash:net family inet\n'
+                           'flush NET4sg\n'
+                           'add NET4sg 10.0.0.2/32\n'),
+            root_helper='sudo')
+        self.assertTrue(self.ipset.set_exists('NET4sg'))
+
+    def test_refresh_unchanged_set(self):
+        self.ipset.refresh_set('NET4sg', ['10.0.0.2/32'], 'IPv4')
+        self.execute.reset_mock()
+        self.ipset.refresh_set('NET4sg', ['10.0.0.2/32'], 'IPv4')
+        self.assertFalse(self.execute.called)
+
+    def test_refresh_in_namespace(self):
+        self.ipset.namespace = 'ns'
+        self.ipset.refresh_set('NET6sg', [], 'IPv6')
+        self.execute.assert_called_once_with(
+            ['ip', 'netns', 'exec', 'ns', 'ipset', 'restore', '-exist'],
+            process_input=('create NET6sg hash:net family inet6\n'
+                           'flush NET6sg\n'),
+            root_helper='sudo')
+
+    def test_destroy_set(self):
+        self.ipset.refresh_set('NET4sg', [], 'IPv4')
+        self.execute.reset_mock()
+        self.ipset.destroy_set('NET4sg')
+        self.execute.assert_called_once_with(
+            ['ipset', 'destroy', 'NET4sg'], process_input=None,
+            root_helper='sudo')
+        self.assertFalse(self.ipset.set_exists('NET4sg'))
+
+    def test_destroy_nonexistent_set(self):
+        self.ipset.destroy_set('NET4sg')
+        self.assertFalse(self.execute.called)
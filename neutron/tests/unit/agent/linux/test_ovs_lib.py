@@ -407,6 +407,26 @@ class OVS_Lib_Test(base.BaseTestCase):
             mock.call('del-flows', ['-'], 'deleted_flow_1\n')
         ])
 
+    def test_defer_apply_flows_keeps_order(self):
+        flow_expr = mock.patch.object(ovs_lib, '_build_flow_expr_str').start()
+        flow_expr.side_effect = ['added_flow_1', 'deleted_flow_1',
+                                 'deleted_flow_2', 'added_flow_2']
+        run_ofctl = mock.patch.object(self.br, 'run_ofctl').start()
+
+        self.br.defer_apply_on()
+        self.br.add_flow(flow='add_flow_1')
+        self.br.delete_flows(flow='delete_flow_1')
+        self.br.delete_flows(flow='delete_flow_2')
+        self.br.add_flow(flow='add_flow_2')
+        self.br.defer_apply_off()
+
+        self.assertEqual([
+            mock.call('add-flows', ['-'], 'added_flow_1\n'),
+            mock.call('del-flows', ['-'], 'deleted_flow_1\ndeleted_flow_2\n'),
+            mock.call('add-flows', ['-'], 'added_flow_2\n')
+        ], run_ofctl.mock_calls)
+        self.assertEqual([], self.br.deferred_flows)
+
     def test_add_tunnel_port(self):
         pname = "tap99"
         local_ip = "1.1.1.1"
@@ -457,32 +477,48 @@ class OVS_Lib_Test(base.BaseTestCase):
         self.assertEqual(self.br.add_patch_port(pname, peer), ofport)
         tools.verify_mock_calls(self.execute, expected_calls_and_values)
 
+    def _bridge_ports_call(self):
+        return mock.call(["ovs-vsctl", self.TO, "--format=json",
+                          "--", "--columns=ports", "list", "Bridge",
+                          self.BR_NAME,
+                          "--", "--columns=_uuid,name,tag", "list", "Port",
+                          "--", "--columns=name,external_ids,ofport",
+                          "list", "Interface"],
+                         root_helper=self.root_helper)
+
+    def _encode_bridge_ports(self, bridge_ports, other_ports=()):
+        # bridge_ports and other_ports are (name, tag, external_ids, ofport)
+        # tuples of the ports on this bridge and on other bridges
+        port_rows = []
+        interface_rows = []
+        for name, tag, external_ids, ofport in (list(bridge_ports) +
+                                                list(other_ports)):
+            port_rows.append([['uuid', name + '-uuid'], name, tag])
+            interface_rows.append([name, external_ids, ofport])
+        bridge_port_uuids = ['set', [['uuid', name + '-uuid']
+                                     for name, _t, _e, _o in bridge_ports]]
+        return '\n'.join([
+            self._encode_ovs_json(['ports'], [[bridge_port_uuids]]),
+            self._encode_ovs_json(['_uuid', 'name', 'tag'], port_rows),
+            self._encode_ovs_json(['name', 'external_ids', 'ofport'],
+                                  interface_rows)]) + '\n'
+
     def _test_get_vif_ports(self, is_xen=False):
         pname = "tap99"
-        ofport = "6"
+        ofport = 6
         vif_id = uuidutils.generate_uuid()
         mac = "ca:fe:de:ad:be:ef"
 
         if is_xen:
-            external_ids = ('{xs-vif-uuid="%s", attached-mac="%s"}'
-                            % (vif_id, mac))
+            external_ids = {"xs-vif-uuid": vif_id, "attached-mac": mac}
         else:
-            external_ids = ('{iface-id="%s", attached-mac="%s"}'
-                            % (vif_id, mac))
+            external_ids = {"iface-id": vif_id, "attached-mac": mac}
 
         # Each element is a tuple of (expected mock call, return_value)
         expected_calls_and_values = [
-            (mock.call(["ovs-vsctl", self.TO, "list-ports", self.BR_NAME],
-                       root_helper=self.root_helper),
-             "%s\n" % pname),
-            (mock.call(["ovs-vsctl", self.TO, "get",
-                        "Interface", pname, "external_ids"],
-                       root_helper=self.root_helper),
-             external_ids),
-            (mock.call(["ovs-vsctl", self.TO, "get",
-                        "Interface", pname, "ofport"],
-                       root_helper=self.root_helper),
-             ofport),
+            (self._bridge_ports_call(),
+             self._encode_bridge_ports([(pname, 1, external_ids, ofport),
+                                        ('patch-tun', set(), {}, 1)])),
         ]
         if is_xen:
             expected_calls_and_values.append(
@@ -527,32 +563,27 @@ class OVS_Lib_Test(base.BaseTestCase):
         else:
             id_key = 'iface-id'
 
-        headings = ['name', 'external_ids']
-        data = [
+        bridge_ports = [
             # A vif port on this bridge:
-            ['tap99', {id_key: 'tap99id', 'attached-mac': 'tap99mac'}, 1],
+            ('tap99', 1, {id_key: 'tap99id', 'attached-mac': 'tap99mac'}, 1),
             # A vif port on this bridge not yet configured
-            ['tap98', {id_key: 'tap98id', 'attached-mac': 'tap98mac'}, []],
+            ('tap98', 1, {id_key: 'tap98id', 'attached-mac': 'tap98mac'},
+             []),
             # Another vif port on this bridge not yet configured
-            ['tap97', {id_key: 'tap97id', 'attached-mac': 'tap97mac'},
-             ['set', []]],
-
-            # A vif port on another bridge:
-            ['tap88', {id_key: 'tap88id', 'attached-mac': 'tap88id'}, 1],
+            ('tap97', 1, {id_key: 'tap97id', 'attached-mac': 'tap97mac'},
+             ['set', []]),
             # Non-vif port on this bridge:
-            ['tun22', {}, 2],
+            ('tun22', set(), {}, 2),
+        ]
+        other_ports = [
+            # A vif port on another bridge:
+            ('tap88', 1, {id_key: 'tap88id', 'attached-mac': 'tap88id'}, 1),
         ]
 
         # Each element is a tuple of (expected mock call, return_value)
         expected_calls_and_values = [
-            (mock.call(["ovs-vsctl", self.TO, "list-ports", self.BR_NAME],
-                       root_helper=self.root_helper),
-             'tap99\ntun22'),
-            (mock.call(["ovs-vsctl", self.TO, "--format=json",
-                        "--", "--columns=name,external_ids,ofport",
-                        "list", "Interface"],
-                       root_helper=self.root_helper),
-             self._encode_ovs_json(headings, data)),
+            (self._bridge_ports_call(),
+             self._encode_bridge_ports(bridge_ports, other_ports)),
         ]
         tools.setup_mock_calls(self.execute, expected_calls_and_values)
 
@@ -579,61 +610,46 @@ class OVS_Lib_Test(base.BaseTestCase):
     def test_get_vif_port_set_xen(self):
         self._test_get_vif_port_set(True)
 
-    def test_get_vif_ports_list_ports_error(self):
-        expected_calls_and_values = [
-            (mock.call(["ovs-vsctl", self.TO, "list-ports", self.BR_NAME],
-                       root_helper=self.root_helper),
-             RuntimeError()),
-        ]
+    def test_get_vif_port_set_single_port(self):
+        # A set of one element is encoded as the element itself
+        output = self._encode_bridge_ports(
+            [('tap99', 1, {'iface-id': 'tap99id', 'attached-mac': 'mac'}, 1)])
+        output = output.replace('["set", [["uuid", "tap99-uuid"]]]',
+                                '["uuid", "tap99-uuid"]')
+        expected_calls_and_values = [(self._bridge_ports_call(), output)]
         tools.setup_mock_calls(self.execute, expected_calls_and_values)
-        self.assertRaises(RuntimeError, self.br.get_vif_ports)
-        tools.verify_mock_calls(self.execute, expected_calls_and_values)
+        self.assertEqual(set(['tap99id']), self.br.get_vif_port_set())
 
-    def test_get_vif_port_set_list_ports_error(self):
+    def test_get_vif_ports_list_ports_error(self):
         expected_calls_and_values = [
-            (mock.call(["ovs-vsctl", self.TO, "list-ports", self.BR_NAME],
-                       root_helper=self.root_helper),
-             RuntimeError()),
+            (self._bridge_ports_call(), RuntimeError()),
         ]
         tools.setup_mock_calls(self.execute, expected_calls_and_values)
-        self.assertRaises(RuntimeError, self.br.get_vif_port_set)
+        self.assertRaises(RuntimeError, self.br.get_vif_ports)
         tools.verify_mock_calls(self.execute, expected_calls_and_values)
 
     def test_get_vif_port_set_list_interface_error(self):
         expected_calls_and_values = [
-            (mock.call(["ovs-vsctl", self.TO, "list-ports", self.BR_NAME],
-                       root_helper=self.root_helper),
-             'tap99\n'),
-            (mock.call(["ovs-vsctl", self.TO, "--format=json",
-                        "--", "--columns=name,external_ids,ofport",
-                        "list", "Interface"],
-                       root_helper=self.root_helper),
-             RuntimeError()),
+            (self._bridge_ports_call(), RuntimeError()),
         ]
         tools.setup_mock_calls(self.execute, expected_calls_and_values)
         self.assertRaises(RuntimeError, self.br.get_vif_port_set)
         tools.verify_mock_calls(self.execute, expected_calls_and_values)
 
     def test_get_port_tag_dict(self):
-        headings = ['name', 'tag']
-        data = [
-            ['int-br-eth2', set()],
-            ['patch-tun', set()],
-            ['qr-76d9e6b6-21', 1],
-            ['tapce5318ff-78', 1],
-            ['tape1400310-e6', 1],
+        bridge_ports = [
+            ('int-br-eth2', set(), {}, 1),
+            ('patch-tun', set(), {}, 2),
+            ('qr-76d9e6b6-21', 1, {}, 3),
+            ('tapce5318ff-78', 1, {}, 4),
+            ('tape1400310-e6', 1, {}, 5),
         ]
 
         # Each element is a tuple of (expected mock call, return_value)
         expected_calls_and_values = [
-            (mock.call(["ovs-vsctl", self.TO, "list-ports", self.BR_NAME],
-                       root_helper=self.root_helper),
-             '\n'.join((iface for iface, tag in data))),
-            (mock.call(["ovs-vsctl", self.TO, "--format=json",
-                        "--", "--columns=name,tag",
-                        "list", "Port"],
-                       root_helper=self.root_helper),
-             self._encode_ovs_json(headings, data)),
+            (self._bridge_ports_call(),
+             self._encode_bridge_ports(bridge_ports,
+                                       [('tap88', 2, {}, 6)])),
         ]
         tools.setup_mock_calls(self.execute, expected_calls_and_values)
 
@@ -646,6 +662,7 @@ class OVS_Lib_Test(base.BaseTestCase):
              u'tapce5318ff-78': 1,
              u'tape1400310-e6': 1}
         )
+        tools.verify_mock_calls(self.execute, expected_calls_and_values)
 
     def test_clear_db_attribute(self):
         pname = "tap77"
@@ -708,9 +725,7 @@ class OVS_Lib_Test(base.BaseTestCase):
 
     def test_delete_neutron_ports_list_error(self):
         expected_calls_and_values = [
-            (mock.call(["ovs-vsctl", self.TO, "list-ports", self.BR_NAME],
-                       root_helper=self.root_helper),
-             RuntimeError()),
+            (self._bridge_ports_call(), RuntimeError()),
         ]
         tools.setup_mock_calls(self.execute, expected_calls_and_values)
         self.assertRaises(RuntimeError, self.br.delete_ports, all_ports=False)
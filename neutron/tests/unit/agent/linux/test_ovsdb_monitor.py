@@ -14,10 +14,13 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
+
 import eventlet.event
 import mock
 
 from neutron.agent.linux import ovsdb_monitor
+from neutron.openstack.common import jsonutils
 from neutron.tests import base
 
 
@@ -80,6 +83,55 @@ class TestSimpleInterfaceMonitor(base.BaseTestCase):
                         new_callable=mock.PropertyMock(return_value=True)):
             self.assertFalse(self.monitor.has_updates)
 
+    def _mock_output(self, *rows):
+        output = [jsonutils.dumps({
+            'headings': ['row', 'action', 'name', 'ofport', 'external_ids'],
+            'data': [row]}) for row in rows]
+        return mock.patch.object(self.monitor, 'iter_stdout',
+                                 return_value=output)
+
+    def mock_is_active(self, is_active=True):
+        target = ('neutron.agent.linux.ovsdb_monitor.SimpleInterfaceMonitor'
+                  '.is_active')
+        return mock.patch(
+            target, new_callable=mock.PropertyMock(return_value=is_active))
+
+    def test_get_events_returns_interface_changes(self):
+        self.monitor.events_missed = False
+        with contextlib.nested(
+            self._mock_output(
+                ['uuid1', 'insert', 'tap1', ['set', []],
+                 ['map', [['iface-id', 'port1']]]],
+                ['uuid1', 'old', '', ['set', []], ''],
+                ['uuid1', 'new', 'tap1', 1, ['map', [['iface-id', 'port1']]]],
+                ['uuid2', 'delete', 'tap2', 2, ['map', []]]),
+            self.mock_is_active()
+        ):
+            events = self.monitor.get_events()
+        self.assertEqual(
+            {'added': [{'name': 'tap1', 'ofport': ['set', []],
+                        'external_ids': {'iface-id': 'port1'}},
+                       {'name': 'tap1', 'ofport': 1,
+                        'external_ids': {'iface-id': 'port1'}}],
+             'removed': [{'name': 'tap2', 'ofport': 2, 'external_ids': {}}]},
+            events)
+
+    def test_get_events_returns_none_after_initial_rows(self):
+        self.monitor.events_missed = False
+        with contextlib.nested(
+            self._mock_output(['uuid1', 'initial', 'tap1', 1, ['map', []]]),
+            self.mock_is_active()
+        ):
+            self.assertIsNone(self.monitor.get_events())
+        with self.mock_is_active():
+            self.assertEqual({'added': [], 'removed': []},
+                             self.monitor.get_events())
+
+    def test_get_events_returns_none_if_not_active(self):
+        self.monitor.events_missed = False
+        self.assertIsNone(self.monitor.get_events())
+        self.assertTrue(self.monitor.events_missed)
+
     def test__kill_sets_data_received_to_false(self):
         self.monitor.data_received = True
         with mock.patch(
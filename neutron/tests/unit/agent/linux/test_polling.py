@@ -79,6 +79,9 @@ class TestBasePollingManager(base.BaseTestCase):
         with self.mock_is_polling_required(False):
             self.assertFalse(self.pm.is_polling_required)
 
+    def test_get_events_returns_none(self):
+        self.assertIsNone(self.pm.get_events())
+
 
 class TestAlwaysPoll(base.BaseTestCase):
 
@@ -103,6 +106,11 @@ class TestInterfacePollingMinimizer(base.BaseTestCase):
             self.pm.stop()
         mock_stop.assert_called_with()
 
+    def test_get_events_returns_monitor_events(self):
+        with mock.patch.object(self.pm._monitor, 'get_events',
+                               return_value='events'):
+            self.assertEqual('events', self.pm.get_events())
+
     def mock_has_updates(self, return_value):
         target = ('neutron.agent.linux.ovsdb_monitor.SimpleInterfaceMonitor'
                   '.has_updates')
@@ -0,0 +1,119 @@
+# Copyright (c) 2014 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+from oslo.config import cfg
+import webob.exc
+
+from neutron.db import db_base_plugin_v2
+from neutron.db import ipam
+from neutron.openstack.common.db import exception as db_exc
+from neutron.tests import base
+from neutron.tests.unit import test_db_plugin
+
+
+class TestFreeRanges(base.BaseTestCase):
+
+    def test_free_ranges(self):
+        self.assertEqual([(11, 12), (15, 19), (30, 30), (32, 40)],
+                         ipam.free_ranges([(10, 20), (30, 40)],
+                                          [31, 14, 10, 13, 20, 50]))
+
+    def test_free_ranges_nothing_allocated(self):
+        self.assertEqual([(10, 20)], ipam.free_ranges([(10, 20)], []))
+
+    def test_free_ranges_exhausted(self):
+        self.assertEqual([], ipam.free_ranges([(10, 12)], [12, 10, 11, 11]))
+
+    def test_nth_address(self):
+        ranges = [(11, 12), (15, 19)]
+        self.assertEqual(11, ipam.nth_address(ranges, 0))
+        self.assertEqual(15, ipam.nth_address(ranges, 2))
+        self.assertEqual(19, ipam.nth_address(ranges, 6))
+        self.assertRaises(IndexError, ipam.nth_address, ranges, 7)
+
+
+class TestRandomIpamDriver(test_db_plugin.NeutronDbPluginV2TestCase):
+
+    def setUp(self):
+        super(TestRandomIpamDriver, self).setUp()
+        cfg.CONF.set_override('ipam_driver',
+                              'neutron.db.ipam.RandomIpamDriver')
+
+    def _create_port_ips(self, subnet, count):
+        kwargs = {'fixed_ips': [{'subnet_id': subnet['subnet']['id']}] * count}
+        res = self._create_port(self.fmt, subnet['subnet']['network_id'],
+                                **kwargs)
+        return res
+
+    def test_allocate_until_exhausted(self):
+        with self.subnet(cidr='10.0.0.0/29') as subnet:
+            res = self._create_port_ips(subnet, 5)
+            port = self.deserialize(self.fmt, res)
+            self.assertEqual(
+                ['10.0.0.2', '10.0.0.3', '10.0.0.4', '10.0.0.5', '10.0.0.6'],
+                sorted(ip['ip_address'] for ip in port['port']['fixed_ips']))
+
+            res = self._create_port_ips(subnet, 1)
+            self.assertEqual(webob.exc.HTTPConflict.code, res.status_int)
+            self._delete('ports', port['port']['id'])
+
+    def test_allocate_retries_allocated_ip(self):
+        cfg.CONF.set_override('ip_generation_retries', 1)
+        with self.subnet(cidr='10.0.0.0/29') as subnet:
+            fixed_ips = [{'subnet_id': subnet['subnet']['id'],
+                          'ip_address': '10.0.0.2'}]
+            with self.port(subnet=subnet, fixed_ips=fixed_ips):
+                # The first candidate is 10.0.0.2, which is already allocated
+                with mock.patch('random.randrange', return_value=0):
+                    with self.port(subnet=subnet) as port:
+                        ips = port['port']['fixed_ips']
+                        self.assertEqual('10.0.0.3', ips[0]['ip_address'])
+
+    def test_update_port_add_ip(self):
+        with self.subnet(cidr='10.0.0.0/29') as subnet:
+            with self.port(subnet=subnet) as port:
+                ips = port['port']['fixed_ips']
+                data = {'port': {'fixed_ips': [
+                    ips[0], {'subnet_id': subnet['subnet']['id']}]}}
+                req = self.new_update_request('ports', data,
+                                              port['port']['id'])
+                res = self.deserialize(self.fmt, req.get_response(self.api))
+                new_ips = res['port']['fixed_ips']
+                self.assertEqual(2, len(new_ips))
+                self.assertNotEqual(new_ips[0]['ip_address'],
+                                    new_ips[1]['ip_address'])
+
+    def test_create_port_retried_on_duplicate(self):
+        store_ip_allocation = (
+            db_base_plugin_v2.NeutronDbPluginV2._store_ip_allocation)
+        calls = []
+
+        def _store_ip_allocation(*args):
+            calls.append(args)
+            if len(calls) == 1:
+                # A concurrent transaction allocated the same address
+                raise db_exc.DBDuplicateEntry(['ip_address'])
+            store_ip_allocation(*args)
+
+        with self.subnet(cidr='10.0.0.0/29') as subnet:
+            with mock.patch.object(db_base_plugin_v2.NeutronDbPluginV2,
+                                   '_store_ip_allocation',
+                                   side_effect=_store_ip_allocation):
+                res = self._create_port_ips(subnet, 1)
+            self.assertEqual(webob.exc.HTTPCreated.code, res.status_int)
+            self.assertEqual(2, len(calls))
+            port = self.deserialize(self.fmt, res)
+            self._delete('ports', port['port']['id'])
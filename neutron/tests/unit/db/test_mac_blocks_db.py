@@ -0,0 +1,160 @@
+# Copyright (c) 2014 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import datetime
+
+import mock
+from oslo.config import cfg
+
+from neutron import context
+from neutron.db import mac_blocks_db
+from neutron.openstack.common import timeutils
+from neutron.tests.unit import test_db_plugin
+
+
+class TestMacBlocks(test_db_plugin.NeutronDbPluginV2TestCase):
+
+    def setUp(self):
+        super(TestMacBlocks, self).setUp()
+        cfg.CONF.set_override('base_mac', 'fa:16:3e:00:00:00')
+        cfg.CONF.set_override('mac_block_size', 4)
+        mock.patch.object(mac_blocks_db, '_allocator', None).start()
+        self.randrange = mock.patch('random.randrange', return_value=0).start()
+        self.ctx = context.get_admin_context()
+
+    def _lease(self, first_mac, last_mac, owner='other-host:1',
+               leased_at=None):
+        with self.ctx.session.begin():
+            self.ctx.session.add(mac_blocks_db.MacAddressBlock(
+                first_mac=first_mac, last_mac=last_mac, owner=owner,
+                leased_at=leased_at or timeutils.utcnow()))
+
+    def _leased_blocks(self):
+        return sorted(
+            (block.first_mac, block.owner) for block in
+            self.ctx.session.query(mac_blocks_db.MacAddressBlock))
+
+    def _create_port_mac(self, network, **kwargs):
+        res = self._create_port(self.fmt, network['network']['id'], **kwargs)
+        return self.deserialize(self.fmt, res)['port']['mac_address']
+
+    def test_generate_macs_from_leased_block(self):
+        with self.network(do_delete=False) as network:
+            self.assertEqual('fa:16:3e:00:00:00',
+                             self._create_port_mac(network))
+            self.assertEqual('fa:16:3e:00:00:01',
+                             self._create_port_mac(network))
+        owner = mac_blocks_db._allocator.owner
+        self.assertEqual([('fa:16:3e:00:00:00', owner)],
+                         self._leased_blocks())
+        self.assertEqual(1, self.randrange.call_count)
+
+    def test_lease_skips_used_macs(self):
+        self.randrange.side_effect = [0, 1]
+        with self.network(do_delete=False) as network:
+            self._create_port_mac(network, mac_address='fa:16:3e:00:00:00')
+            self._create_port_mac(network, mac_address='fa:16:3e:00:00:02')
+            self.assertEqual('fa:16:3e:00:00:01',
+                             self._create_port_mac(network))
+            self.assertEqual('fa:16:3e:00:00:03',
+                             self._create_port_mac(network))
+            self.assertEqual('fa:16:3e:00:00:04',
+                             self._create_port_mac(network))
+
+    def test_lease_skips_used_macs_in_upper_case(self):
+        with self.network(do_delete=False) as network:
+            self._create_port_mac(network, mac_address='FA:16:3E:00:00:00')
+            self.assertEqual('fa:16:3e:00:00:01',
+                             self._create_port_mac(network))
+
+    def test_generate_skips_macs_used_after_lease(self):
+        with self.network(do_delete=False) as network:
+            self.assertEqual('fa:16:3e:00:00:00',
+                             self._create_port_mac(network))
+            self._create_port_mac(network, mac_address='fa:16:3e:00:00:01')
+            self.assertEqual('fa:16:3e:00:00:02',
+                             self._create_port_mac(network))
+
+    def test_lease_expired_block(self):
+        leased_at = timeutils.utcnow() - datetime.timedelta(days=2)
+        self._lease('fa:16:3e:00:00:00', 'fa:16:3e:00:00:03',
+                    leased_at=leased_at)
+        self.assertEqual('fa:16:3e:00:00:00', mac_blocks_db.generate_mac())
+        self.assertEqual([('fa:16:3e:00:00:00',
+                           mac_blocks_db._allocator.owner)],
+                         self._leased_blocks())
+
+    def test_renew_leased_blocks(self):
+        self.assertEqual('fa:16:3e:00:00:00', mac_blocks_db.generate_mac())
+        leased_at = timeutils.utcnow() + datetime.timedelta(days=1)
+        with mock.patch.object(timeutils, 'utcnow', return_value=leased_at):
+            self.assertEqual('fa:16:3e:00:00:01',
+                             mac_blocks_db.generate_mac())
+        block = self.ctx.session.query(mac_blocks_db.MacAddressBlock).one()
+        self.assertEqual(leased_at, block.leased_at)
+
+    def test_lease_another_block_when_leased(self):
+        self._lease('fa:16:3e:00:00:00', 'fa:16:3e:00:00:03')
+        self.randrange.side_effect = [0, 1]
+        with self.network(do_delete=False) as network:
+            self.assertEqual('fa:16:3e:00:00:04',
+                             self._create_port_mac(network))
+
+    def test_base_mac_fourth_byte(self):
+        cfg.CONF.set_override('base_mac', 'fa:16:3e:4f:00:00')
+        self.randrange.return_value = 2
+        with self.network(do_delete=False) as network:
+            self.assertEqual('fa:16:3e:4f:00:08',
+                             self._create_port_mac(network))
+        self.randrange.assert_called_once_with(1 << 14)
+
+    def test_generate_random_mac_when_no_block_left(self):
+        cfg.CONF.set_override('mac_block_size', 1 << 24)
+        self._lease('fa:16:3e:00:00:00', 'fa:16:3e:ff:ff:ff')
+        with mock.patch('random.randint', return_value=0x42):
+            with self.network(do_delete=False) as network:
+                self.assertEqual('fa:16:3e:42:42:42',
+                                 self._create_port_mac(network))
+
+    def test_release_mac_blocks(self):
+        self._lease('fa:16:3e:00:00:04', 'fa:16:3e:00:00:07')
+        self.assertEqual('fa:16:3e:00:00:00', mac_blocks_db.generate_mac())
+        mac_blocks_db.release_mac_blocks()
+        self.assertEqual([('fa:16:3e:00:00:04', 'other-host:1')],
+                         self._leased_blocks())
+        # The block is leased again, with its addresses left unused
+        self.assertEqual('fa:16:3e:00:00:00', mac_blocks_db.generate_mac())
+
+    def test_release_without_lease(self):
+        with mock.patch.object(mac_blocks_db.db, 'get_session') as session:
+            mac_blocks_db.release_mac_blocks()
+            mac_blocks_db._get_allocator().release()
+        self.assertFalse(session.called)
+
+    def test_forked_worker_leases_own_blocks(self):
+        self.randrange.side_effect = [0, 0, 1]
+        self.assertEqual('fa:16:3e:00:00:00', mac_blocks_db.generate_mac())
+        parent_owner = mac_blocks_db._allocator.owner
+        with mock.patch('os.getpid', return_value=-1):
+            self.assertEqual('fa:16:3e:00:00:04',
+                             mac_blocks_db.generate_mac())
+            child_owner = mac_blocks_db._allocator.owner
+            self.assertNotEqual(parent_owner, child_owner)
+            self.assertEqual([('fa:16:3e:00:00:00', parent_owner),
+                              ('fa:16:3e:00:00:04', child_owner)],
+                             self._leased_blocks())
+            mac_blocks_db.release_mac_blocks()
+        self.assertEqual([('fa:16:3e:00:00:00', parent_owner)],
+                         self._leased_blocks())
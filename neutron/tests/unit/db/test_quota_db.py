@@ -0,0 +1,175 @@
+# Copyright (c) 2014 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import datetime
+
+import mock
+from oslo.config import cfg
+import webob.exc
+
+from neutron import context
+from neutron.db import quota_db
+from neutron.openstack.common import timeutils
+from neutron import quota
+from neutron.tests.unit import test_db_plugin
+
+
+class TestQuotaUsages(test_db_plugin.NeutronDbPluginV2TestCase):
+
+    def setUp(self):
+        super(TestQuotaUsages, self).setUp()
+        cfg.CONF.set_override('quota_driver', quota.QUOTA_DB_DRIVER,
+                              group='QUOTAS')
+        cfg.CONF.set_override('track_quota_usage', True, group='QUOTAS')
+        mock.patch.object(quota.QUOTAS, '_driver', None).start()
+        self.ctx = context.get_admin_context()
+        self.driver = quota_db.DbQuotaDriver()
+
+    def _usage(self, resource, tenant_id=None):
+        usage = self.ctx.session.query(
+            quota_db.QuotaUsage.in_use,
+            quota_db.QuotaUsage.reserved).filter_by(
+                tenant_id=tenant_id or self._tenant_id,
+                resource=resource).first()
+        return usage and tuple(usage)
+
+    def _reservations(self):
+        return self.ctx.session.query(quota_db.Reservation).all()
+
+    def test_usages_follow_creations_and_deletions(self):
+        with self.network() as network:
+            self.assertEqual((1, 0), self._usage('network'))
+            with self.subnet(network) as subnet:
+                self.assertEqual((1, 0), self._usage('subnet'))
+                with self.port(subnet):
+                    self.assertEqual((1, 0), self._usage('port'))
+                    with self.port(subnet):
+                        self.assertEqual((2, 0), self._usage('port'))
+                    self.assertEqual((1, 0), self._usage('port'))
+                self.assertEqual((0, 0), self._usage('port'))
+        self.assertEqual((0, 0), self._usage('network'))
+        self.assertEqual((0, 0), self._usage('subnet'))
+        self.assertEqual([], self._reservations())
+
+    def test_network_deletion_counts_its_subnets(self):
+        with self.network(do_delete=False) as network:
+            with self.subnet(network, do_delete=False):
+                self.assertEqual((1, 0), self._usage('subnet'))
+            self._delete('networks', network['network']['id'])
+        self.assertEqual((0, 0), self._usage('subnet'))
+
+    def test_create_does_not_count(self):
+        with self.network():
+            plugin = test_db_plugin.manager.NeutronManager.get_plugin()
+            with mock.patch.object(plugin, 'get_networks_count') as count:
+                with self.network():
+                    self.assertEqual((2, 0), self._usage('network'))
+            self.assertFalse(count.called)
+
+    def test_create_moves_reservation_in_use(self):
+        quota_driver = quota.QUOTAS.get_driver()
+        usages = []
+
+        def commit_reservation(context, reservation_id):
+            usages.append(self._usage('network'))
+            quota_driver.commit_reservation(context, reservation_id)
+
+        with mock.patch.object(quota.QUOTAS, 'commit_reservation',
+                               side_effect=commit_reservation):
+            with self.network():
+                # The created network is not counted as reserved too
+                self.assertEqual([(1, 0)], usages)
+                self.assertEqual((1, 0), self._usage('network'))
+        self.assertEqual([], self._reservations())
+
+    def test_create_consumes_reservation_of_its_session(self):
+        other_id = self.driver.make_reservation(
+            context.get_admin_context(), self._tenant_id,
+            quota.QUOTAS.resources, 'network', 1)
+        with self.network():
+            # The reservation of the other request is still counted
+            self.assertEqual((1, 1), self._usage('network'))
+            self.assertEqual([(other_id, 1)],
+                             [(r.id, r.delta) for r in self._reservations()])
+
+    def test_create_in_other_session_consumes_any_reservation(self):
+        reservation_id = self.driver.make_reservation(
+            self.ctx, self._tenant_id, quota.QUOTAS.resources, 'network', 1)
+        plugin = test_db_plugin.manager.NeutronManager.get_plugin()
+        plugin.create_network(context.get_admin_context(), {
+            'network': {'name': 'net', 'admin_state_up': True,
+                        'tenant_id': self._tenant_id, 'shared': False}})
+        self.assertEqual((1, 0), self._usage('network'))
+        self.driver.commit_reservation(self.ctx, reservation_id)
+        self.assertEqual((1, 0), self._usage('network'))
+        self.assertEqual([], self._reservations())
+
+    def test_create_over_quota(self):
+        cfg.CONF.set_override('quota_network', 1, group='QUOTAS')
+        with self.network():
+            res = self._create_network(self.fmt, 'net', True)
+            self.assertEqual(webob.exc.HTTPConflict.code, res.status_int)
+            self.assertEqual((1, 0), self._usage('network'))
+        self.assertEqual([], self._reservations())
+
+    def test_failed_create_cancels_reservation(self):
+        plugin = test_db_plugin.manager.NeutronManager.get_plugin()
+        with mock.patch.object(plugin, 'create_network',
+                               side_effect=ValueError):
+            res = self._create_network(self.fmt, 'net', True)
+        self.assertEqual(webob.exc.HTTPInternalServerError.code,
+                         res.status_int)
+        self.assertEqual((0, 0), self._usage('network'))
+        self.assertEqual([], self._reservations())
+
+    def test_reservations_are_counted(self):
+        cfg.CONF.set_override('quota_network', 2, group='QUOTAS')
+        self.driver.make_reservation(self.ctx, self._tenant_id,
+                                     quota.QUOTAS.resources, 'network', 2)
+        self.assertEqual((0, 2), self._usage('network'))
+        res = self._create_network(self.fmt, 'net', True)
+        self.assertEqual(webob.exc.HTTPConflict.code, res.status_int)
+
+    def test_expired_reservations_are_ignored(self):
+        cfg.CONF.set_override('quota_network', 2, group='QUOTAS')
+        self.driver.make_reservation(self.ctx, self._tenant_id,
+                                     quota.QUOTAS.resources, 'network', 2)
+        later = timeutils.utcnow() + datetime.timedelta(seconds=121)
+        with mock.patch.object(timeutils, 'utcnow', return_value=later):
+            with self.network():
+                self.assertEqual((1, 0), self._usage('network'))
+        self.assertEqual([], self._reservations())
+
+    def test_untracked_resource_is_counted(self):
+        cfg.CONF.set_override('track_quota_usage', False, group='QUOTAS')
+        with self.network():
+            self.assertIsNone(self._usage('network'))
+
+    def test_resync_usages(self):
+        with self.network():
+            with self.network(tenant_id='other'):
+                usage = self.ctx.session.query(quota_db.QuotaUsage).filter_by(
+                    tenant_id=self._tenant_id, resource='network').one()
+                usage.update({'in_use': 5, 'reserved': 3})
+                self.ctx.session.query(quota_db.QuotaUsage).filter_by(
+                    tenant_id='other').delete()
+                changes = self.driver.resync_usages(self.ctx)
+                self.assertEqual(
+                    [('other', 'network', None, 1, None, 0),
+                     (self._tenant_id, 'network', 5, 1, 3, 0)],
+                    sorted(changes))
+                self.assertEqual((1, 0), self._usage('network'))
+                self.assertEqual((1, 0), self._usage('network', 'other'))
+                self.assertEqual([], self.driver.resync_usages(self.ctx))
@@ -118,11 +118,12 @@ class TestLinuxBridgeAgent(base.BaseTestCase):
                                                                      None)
         devices = [DEVICE_1]
         with contextlib.nested(
-            mock.patch.object(agent.plugin_rpc, "update_device_down"),
+            mock.patch.object(agent.plugin_rpc, "update_device_list"),
             mock.patch.object(agent, "remove_devices_filter")
         ) as (fn_udd, fn_rdf):
-            fn_udd.return_value = {'device': DEVICE_1,
-                                   'exists': True}
+            fn_udd.return_value = {'devices_up': [],
+                                   'devices_down': [{'device': DEVICE_1,
+                                                     'exists': True}]}
             with mock.patch.object(linuxbridge_neutron_agent.LOG,
                                    'info') as log:
                 resync = agent.treat_devices_removed(devices)
@@ -137,11 +138,12 @@ class TestLinuxBridgeAgent(base.BaseTestCase):
                                                                      None)
         devices = [DEVICE_1]
         with contextlib.nested(
-            mock.patch.object(agent.plugin_rpc, "update_device_down"),
+            mock.patch.object(agent.plugin_rpc, "update_device_list"),
             mock.patch.object(agent, "remove_devices_filter")
         ) as (fn_udd, fn_rdf):
-            fn_udd.return_value = {'device': DEVICE_1,
-                                   'exists': False}
+            fn_udd.return_value = {'devices_up': [],
+                                   'devices_down': [{'device': DEVICE_1,
+                                                     'exists': False}]}
             with mock.patch.object(linuxbridge_neutron_agent.LOG,
                                    'debug') as log:
                 resync = agent.treat_devices_removed(devices)
@@ -156,18 +158,59 @@ class TestLinuxBridgeAgent(base.BaseTestCase):
                                                                      None)
         devices = [DEVICE_1]
         with contextlib.nested(
-            mock.patch.object(agent.plugin_rpc, "update_device_down"),
+            mock.patch.object(agent.plugin_rpc, "update_device_list"),
             mock.patch.object(agent, "remove_devices_filter")
         ) as (fn_udd, fn_rdf):
             fn_udd.side_effect = Exception()
             with mock.patch.object(linuxbridge_neutron_agent.LOG,
                                    'debug') as log:
                 resync = agent.treat_devices_removed(devices)
-                self.assertEqual(2, log.call_count)
+                self.assertEqual(1, log.call_count)
                 self.assertTrue(resync)
                 self.assertTrue(fn_udd.called)
                 self.assertTrue(fn_rdf.called)
 
+    def test_treat_devices_added_updates_device_list(self):
+        agent = linuxbridge_neutron_agent.LinuxBridgeNeutronAgentRPC({},
+                                                                     0,
+                                                                     None)
+        details = [{'device': device, 'port_id': device,
+                    'network_id': 'net_id', 'admin_state_up': True,
+                    'network_type': 'flat', 'segmentation_id': None,
+                    'physical_network': 'physnet1'}
+                   for device in (DEVICE_1, 'tap02')]
+        with contextlib.nested(
+            mock.patch.object(agent.plugin_rpc, "get_devices_details_list",
+                              return_value=details),
+            mock.patch.object(agent.plugin_rpc, "update_device_list"),
+            mock.patch.object(agent.br_mgr, "add_interface",
+                              side_effect=[True, False]),
+            mock.patch.object(agent, "prepare_devices_filter")
+        ) as (fn_gddl, fn_udl, fn_ai, fn_pdf):
+            self.assertFalse(agent.treat_devices_added([DEVICE_1, 'tap02']))
+            fn_udl.assert_called_once_with(agent.context, [DEVICE_1],
+                                           ['tap02'], agent.agent_id,
+                                           cfg.CONF.host)
+
+    def test_treat_devices_added_update_device_list_failed(self):
+        agent = linuxbridge_neutron_agent.LinuxBridgeNeutronAgentRPC({},
+                                                                     0,
+                                                                     None)
+        details = [{'device': DEVICE_1, 'port_id': DEVICE_1,
+                    'network_id': 'net_id', 'admin_state_up': True,
+                    'network_type': 'flat', 'segmentation_id': None,
+                    'physical_network': 'physnet1'}]
+        with contextlib.nested(
+            mock.patch.object(agent.plugin_rpc, "get_devices_details_list",
+                              return_value=details),
+            mock.patch.object(agent.plugin_rpc, "update_device_list",
+                              side_effect=Exception()),
+            mock.patch.object(agent.br_mgr, "add_interface",
+                              return_value=True),
+            mock.patch.object(agent, "prepare_devices_filter")
+        ):
+            self.assertTrue(agent.treat_devices_added([DEVICE_1]))
+
     def test_update_devices_failed(self):
         agent = linuxbridge_neutron_agent.LinuxBridgeNeutronAgentRPC({},
                                                                      0,
@@ -187,6 +187,47 @@ class TestL2PopulationRpcTestCase(test_plugin.NeutronDbPluginV2TestCase):
                     self.mock_fanout.assert_called_with(
                         mock.ANY, expected, topic=self.fanout_topic)
 
+    def test_fdb_add_merged_for_update_device_list(self):
+        self._register_ml2_agents()
+
+        with self.subnet(network=self._network) as subnet:
+            host_arg = {portbindings.HOST_ID: HOST}
+            with self.port(subnet=subnet,
+                           arg_list=(portbindings.HOST_ID,),
+                           **host_arg) as port1:
+                with self.port(subnet=subnet,
+                               arg_list=(portbindings.HOST_ID,),
+                               **host_arg) as port2:
+                    p1 = port1['port']
+                    p2 = port2['port']
+
+                    devices = ['tap' + p1['id'], 'tap' + p2['id']]
+
+                    self.mock_fanout.reset_mock()
+                    result = self.callbacks.update_device_list(
+                        self.adminContext, agent_id=HOST, host=HOST,
+                        devices_up=devices, devices_down=[])
+                    self.assertEqual(devices, result['devices_up'])
+
+                    p1_ips = [p['ip_address'] for p in p1['fixed_ips']]
+                    p2_ips = [p['ip_address'] for p in p2['fixed_ips']]
+                    expected = {'args':
+                                {'fdb_entries':
+                                 {p1['network_id']:
+                                  {'ports':
+                                   {'20.0.0.1': [constants.FLOODING_ENTRY,
+                                                 [p1['mac_address'],
+                                                  p1_ips[0]],
+                                                 [p2['mac_address'],
+                                                  p2_ips[0]]]},
+                                   'network_type': 'vxlan',
+                                   'segment_id': 1}}},
+                                'namespace': None,
+                                'method': 'add_fdb_entries'}
+
+                    self.mock_fanout.assert_called_once_with(
+                        mock.ANY, expected, topic=self.fanout_topic)
+
     def test_fdb_add_not_called_type_local(self):
         self._register_ml2_agents()
 
@@ -428,6 +469,49 @@ class TestL2PopulationRpcTestCase(test_plugin.NeutronDbPluginV2TestCase):
                     self.mock_fanout.assert_called_with(
                         mock.ANY, expected, topic=self.fanout_topic)
 
+    def test_fdb_remove_merged_for_update_device_list(self):
+        self._register_ml2_agents()
+
+        with self.subnet(network=self._network) as subnet:
+            host_arg = {portbindings.HOST_ID: HOST}
+            with self.port(subnet=subnet,
+                           arg_list=(portbindings.HOST_ID,),
+                           **host_arg) as port1:
+                with self.port(subnet=subnet,
+                               arg_list=(portbindings.HOST_ID,),
+                               **host_arg) as port2:
+                    p1 = port1['port']
+                    p2 = port2['port']
+
+                    devices = ['tap' + p1['id'], 'tap' + p2['id']]
+                    self.callbacks.update_device_list(
+                        self.adminContext, agent_id=HOST, host=HOST,
+                        devices_up=devices, devices_down=[])
+
+                    self.mock_fanout.reset_mock()
+                    self.callbacks.update_device_list(
+                        self.adminContext, agent_id=HOST, host=HOST,
+                        devices_up=[], devices_down=devices)
+
+                    p1_ips = [p['ip_address'] for p in p1['fixed_ips']]
+                    p2_ips = [p['ip_address'] for p in p2['fixed_ips']]
+                    expected = {'args':
+                                {'fdb_entries':
+                                 {p1['network_id']:
+                                  {'ports':
+                                   {'20.0.0.1': [[p1['mac_address'],
+                                                  p1_ips[0]],
+                                                 constants.FLOODING_ENTRY,
+                                                 [p2['mac_address'],
+                                                  p2_ips[0]]]},
+                                   'network_type': 'vxlan',
+                                   'segment_id': 1}}},
+                                'namespace': None,
+                                'method': 'remove_fdb_entries'}
+
+                    self.mock_fanout.assert_called_once_with(
+                        mock.ANY, expected, topic=self.fanout_topic)
+
     def test_delete_port(self):
         self._register_ml2_agents()
 
@@ -13,12 +13,15 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
+
 import mock
 
 from neutron import context
 from neutron.extensions import portbindings
 from neutron import manager
 from neutron.plugins.ml2 import config as config
+from neutron.plugins.ml2 import db as ml2_db
 from neutron.tests.unit import test_db_plugin as test_plugin
 
 
@@ -94,6 +97,46 @@ class PortBindingTestCase(test_plugin.NeutronDbPluginV2TestCase):
                                 portbindings.VIF_TYPE_OVS,
                                 True, True, 'ACTIVE')
 
+    def test_update_device_list(self):
+        host_arg = {portbindings.HOST_ID: 'host-ovs-no_filter'}
+        with self.subnet() as subnet:
+            with contextlib.nested(
+                self.port(subnet=subnet, arg_list=(portbindings.HOST_ID,),
+                          **host_arg),
+                self.port(subnet=subnet, arg_list=(portbindings.HOST_ID,),
+                          **host_arg),
+                self.port(subnet=subnet)
+            ) as (port1, port2, port3):
+                port_ids = [p['port']['id'] for p in (port1, port2, port3)]
+                neutron_context = context.get_admin_context()
+                for port_id in port_ids[1:]:
+                    self.plugin.update_port_status(neutron_context, port_id,
+                                                   'ACTIVE')
+                result = self.plugin.callbacks.update_device_list(
+                    neutron_context, agent_id="theAgentId",
+                    host='host-ovs-no_filter', devices_up=[port_ids[0]],
+                    devices_down=[port_ids[1], port_ids[2], 'bad_device_id'])
+                self.assertEqual([port_ids[0]], result['devices_up'])
+                self.assertEqual(
+                    [{'device': port_ids[1], 'exists': True},
+                     {'device': port_ids[2], 'exists': True},
+                     {'device': 'bad_device_id', 'exists': True}],
+                    result['devices_down'])
+                statuses = [self._show('ports', port_id)['port']['status']
+                            for port_id in port_ids]
+                # Devices not bound to the host are left untouched
+                self.assertEqual(['ACTIVE', 'DOWN', 'ACTIVE'], statuses)
+
+    def test_update_device_list_dispatched(self):
+        dispatcher = self.plugin.callbacks.create_rpc_dispatcher()
+        result = dispatcher.dispatch(
+            context.get_admin_context(), '1.4', 'update_device_list', None,
+            devices_up=[], devices_down=['bad_device_id'],
+            agent_id="theAgentId", host='host-ovs-no_filter')
+        self.assertEqual({'devices_up': [],
+                          'devices_down': [{'device': 'bad_device_id',
+                                            'exists': True}]}, result)
+
     def _test_update_port_binding(self, host, new_host=None):
         with mock.patch.object(self.plugin,
                                '_notify_port_updated') as notify_mock:
@@ -134,3 +177,78 @@ class PortBindingTestCase(test_plugin.NeutronDbPluginV2TestCase):
 
     def test_update_from_host_to_empty_binding_notifies_agent(self):
         self._test_update_port_binding('host-ovs-no_filter', '')
+
+
+class PortBindingDeviceDetailsTestCase(PortBindingTestCase):
+
+    def setUp(self):
+        config.cfg.CONF.set_override('device_details_cache_ttl', 60, 'ml2')
+        super(PortBindingDeviceDetailsTestCase, self).setUp()
+
+    def _get_device_details(self, device):
+        return self.plugin.callbacks.get_device_details(
+            context.get_admin_context(), agent_id="theAgentId",
+            device=device)
+
+    def test_get_device_details_cached(self):
+        host_arg = {portbindings.HOST_ID: 'host-ovs-no_filter'}
+        with self.port(arg_list=(portbindings.HOST_ID,),
+                       **host_arg) as port:
+            port_id = port['port']['id']
+            details = self._get_device_details(port_id)
+            with mock.patch.object(ml2_db, 'get_port') as get_port:
+                self.assertEqual(details, self._get_device_details(port_id))
+                self.assertFalse(get_port.called)
+
+    def test_get_device_details_cache_invalidated_on_port_update(self):
+        host_arg = {portbindings.HOST_ID: 'host-ovs-no_filter'}
+        with self.port(arg_list=(portbindings.HOST_ID,),
+                       **host_arg) as port:
+            port_id = port['port']['id']
+            self.assertTrue(
+                self._get_device_details(port_id)['admin_state_up'])
+            self._update('ports', port_id,
+                         {'port': {'admin_state_up': False}})
+            self.assertFalse(
+                self._get_device_details(port_id)['admin_state_up'])
+
+    def test_get_device_details_cache_invalidated_on_port_delete(self):
+        host_arg = {portbindings.HOST_ID: 'host-ovs-no_filter'}
+        with self.port(arg_list=(portbindings.HOST_ID,),
+                       **host_arg) as port:
+            port_id = port['port']['id']
+            self._get_device_details(port_id)
+        self.assertEqual({'device': port_id},
+                         self._get_device_details(port_id))
+
+    def test_get_device_details_cached_status_update(self):
+        host_arg = {portbindings.HOST_ID: 'host-ovs-no_filter'}
+        with self.port(arg_list=(portbindings.HOST_ID,),
+                       **host_arg) as port:
+            port_id = port['port']['id']
+            neutron_context = context.get_admin_context()
+            self._get_device_details(port_id)
+            self.plugin.callbacks.update_device_up(
+                neutron_context, agent_id="theAgentId", device=port_id)
+            self._get_device_details(port_id)
+            port = self._show('ports', port_id)
+            self.assertEqual('BUILD', port['port']['status'])
+
+    def test_get_devices_details_list(self):
+        host_arg = {portbindings.HOST_ID: 'host-ovs-no_filter'}
+        with self.subnet() as subnet:
+            with contextlib.nested(
+                self.port(subnet=subnet, arg_list=(portbindings.HOST_ID,),
+                          **host_arg),
+                self.port(subnet=subnet, arg_list=(portbindings.HOST_ID,),
+                          **host_arg)
+            ) as (port1, port2):
+                port_ids = [port1['port']['id'], port2['port']['id']]
+                devices = port_ids + ['bad_device_id']
+                details = self.plugin.callbacks.get_devices_details_list(
+                    context.get_admin_context(), agent_id="theAgentId",
+                    devices=devices)
+                self.assertEqual(devices, [d['device'] for d in details])
+                self.assertEqual(port_ids,
+                                 [d['port_id'] for d in details[:2]])
+                self.assertNotIn('port_id', details[2])
@@ -23,6 +23,7 @@ from neutron.agent import rpc as agent_rpc
 from neutron.common import topics
 from neutron.openstack.common import context
 from neutron.openstack.common import rpc
+from neutron.openstack.common import timeutils
 from neutron.plugins.ml2.drivers import type_tunnel
 from neutron.plugins.ml2 import rpc as plugin_rpc
 from neutron.tests import base
@@ -110,3 +111,61 @@ class RpcApiTestCase(base.BaseTestCase):
                            device='fake_device',
                            agent_id='fake_agent_id',
                            host='fake_host')
+
+
+class DeviceDetailsCacheTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(DeviceDetailsCacheTestCase, self).setUp()
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+        self.cache = plugin_rpc.DeviceDetailsCache(10)
+        self.details = {'device': 'tap12345678-90',
+                        'port_id': '12345678-90ab',
+                        'network_id': 'net1'}
+
+    def test_get_missing(self):
+        self.assertIsNone(self.cache.get('12345678-90ab'))
+
+    def test_add_and_get(self):
+        self.cache.add('12345678-90', self.details, 'BUILD')
+        self.assertEqual((self.details, 'BUILD'),
+                         self.cache.get('12345678-90'))
+
+    def test_disabled(self):
+        cache = plugin_rpc.DeviceDetailsCache(0)
+        cache.add('12345678-90', self.details, 'BUILD')
+        self.assertIsNone(cache.get('12345678-90'))
+
+    def test_expiry(self):
+        self.cache.add('12345678-90', self.details, 'BUILD')
+        timeutils.advance_time_seconds(10)
+        self.assertIsNone(self.cache.get('12345678-90'))
+        self.assertEqual({}, self.cache._keys_by_port)
+
+    def test_set_status(self):
+        self.cache.add('12345678-90', self.details, 'BUILD')
+        self.cache.set_status('12345678-90ab', 'ACTIVE')
+        self.assertEqual((self.details, 'ACTIVE'),
+                         self.cache.get('12345678-90'))
+
+    def test_invalidate_port(self):
+        self.cache.add('12345678-90', self.details, 'BUILD')
+        self.cache.add('12345678-90ab', self.details, 'BUILD')
+        self.cache.invalidate_port('12345678-90ab')
+        self.assertIsNone(self.cache.get('12345678-90'))
+        self.assertIsNone(self.cache.get('12345678-90ab'))
+
+    def test_invalidate_network(self):
+        other = dict(self.details, port_id='abc', network_id='net2')
+        self.cache.add('12345678-90', self.details, 'BUILD')
+        self.cache.add('abc', other, 'BUILD')
+        self.cache.invalidate_network('net1')
+        self.assertIsNone(self.cache.get('12345678-90'))
+        self.assertEqual((other, 'BUILD'), self.cache.get('abc'))
+
+    def test_purge_expired(self):
+        self.cache.add('12345678-90', self.details, 'BUILD')
+        timeutils.advance_time_seconds(10)
+        self.cache.add('abc', dict(self.details, port_id='abc'), 'BUILD')
+        self.assertEqual(['abc'], self.cache._entries.keys())
@@ -83,6 +83,32 @@ class TestMl2SecurityGroups(Ml2SecurityGroupsTestCase,
                                      port_dict['fixed_ips'])
                     self._delete('ports', port_id)
 
+    def test_security_group_get_ports_from_devices(self):
+        with self.network() as n:
+            with self.subnet(n):
+                with self.security_group() as sg:
+                    sg_id = sg['security_group']['id']
+                    res1 = self._create_port(self.fmt, n['network']['id'],
+                                             security_groups=[sg_id])
+                    port_id1 = self.deserialize(self.fmt, res1)['port']['id']
+                    res2 = self._create_port(self.fmt, n['network']['id'])
+                    port_id2 = self.deserialize(self.fmt, res2)['port']['id']
+                    tap_device = 'tap' + port_id2[:11]
+                    devices = [port_id1, tap_device, 'bad_device_id']
+                    plugin = manager.NeutronManager.get_plugin()
+                    ports = plugin.callbacks.get_ports_from_devices(devices)
+                    ports = dict((port['device'], port) for port in ports)
+                    self.assertEqual(set([port_id1, tap_device]),
+                                     set(ports))
+                    self.assertEqual(port_id1, ports[port_id1]['id'])
+                    self.assertEqual([sg_id],
+                                     ports[port_id1][ext_sg.SECURITYGROUPS])
+                    self.assertEqual(port_id2, ports[tap_device]['id'])
+                    self.assertEqual(
+                        [], ports[tap_device]['security_group_rules'])
+                    self._delete('ports', port_id1)
+                    self._delete('ports', port_id2)
+
     def test_security_group_get_port_from_device_with_no_port(self):
         plugin = manager.NeutronManager.get_plugin()
         port_dict = plugin.callbacks.get_port_from_device('bad_device_id')
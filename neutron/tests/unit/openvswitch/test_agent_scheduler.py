@@ -32,6 +32,7 @@ from neutron.extensions import agent
 from neutron.extensions import dhcpagentscheduler
 from neutron.extensions import l3agentscheduler
 from neutron import manager
+from neutron.openstack.common import jsonutils
 from neutron.openstack.common import timeutils
 from neutron.openstack.common import uuidutils
 from neutron.plugins.common import constants as service_constants
@@ -1203,6 +1204,44 @@ class OvsL3AgentNotifierTestCase(test_l3_plugin.L3NatTestCaseMixin,
                     payload={'router_id': router1['router']['id']}),
                 topic='l3_agent.hosta')
 
+    def test_floatingips_updated_l3_agent_notification(self):
+        plugin = manager.NeutronManager.get_plugin()
+        l3_notifier = plugin.agent_notifiers[constants.AGENT_TYPE_L3]
+        with self.router() as router1:
+            router_id = router1['router']['id']
+            self._register_agent_states()
+            with mock.patch.object(l3_notifier,
+                                   'routers_updated') as routers_updated:
+                l3_notifier.floatingips_updated(
+                    self.adminContext, router_id, 1, [], ['fip'])
+            routers_updated.assert_called_once_with(
+                self.adminContext, [router_id])
+            hosta_id = self._get_agent_id(constants.AGENT_TYPE_L3,
+                                          L3_HOSTA)
+            self._add_router_to_l3_agent(hosta_id, router_id)
+            # The agent does not support the deltas yet
+            with mock.patch.object(l3_notifier, 'cast') as mock_l3:
+                l3_notifier.floatingips_updated(
+                    self.adminContext, router_id, 2, [], ['fip'])
+            mock_l3.assert_called_once_with(
+                mock.ANY, l3_notifier.make_msg(
+                    'routers_updated', routers=[router_id]),
+                topic='l3_agent.hosta', version='1.1')
+            hosta = self.adminContext.session.query(agents_db.Agent).get(
+                hosta_id)
+            configurations = jsonutils.loads(hosta.configurations)
+            configurations['floatingip_deltas'] = True
+            with self.adminContext.session.begin():
+                hosta.configurations = jsonutils.dumps(configurations)
+            with mock.patch.object(l3_notifier, 'cast') as mock_l3:
+                l3_notifier.floatingips_updated(
+                    self.adminContext, router_id, 3, [], ['fip'])
+            mock_l3.assert_called_once_with(
+                mock.ANY, l3_notifier.make_msg(
+                    'floatingips_updated', router_id=router_id, revision=3,
+                    floatingips=[], removed=['fip']),
+                topic='l3_agent.hosta', version='1.2')
+
     def test_agent_updated_l3_agent_notification(self):
         plugin = manager.NeutronManager.get_plugin()
         l3_notifier = plugin.agent_notifiers[constants.AGENT_TYPE_L3]
@@ -250,6 +250,61 @@ class TestOvsNeutronAgent(base.BaseTestCase):
                                       updated_ports)
         self.assertEqual(expected, actual)
 
+    def _interface(self, name, port_id, ofport=1):
+        return {'name': name, 'ofport': ofport,
+                'external_ids': {'iface-id': port_id,
+                                 'attached-mac': 'fa:16:3e:00:00:01'}}
+
+    def mock_process_port_events(self, events, registered_ports,
+                                 updated_ports=None, port_names=None,
+                                 existing_ports=()):
+        with contextlib.nested(
+            mock.patch.object(self.agent.int_br, 'get_port_name_list',
+                              return_value=port_names or []),
+            mock.patch.object(self.agent.int_br, 'get_vif_port_by_id',
+                              side_effect=lambda p: p in existing_ports),
+            mock.patch.object(self.agent.int_br, 'get_vif_port_set'),
+        ) as (get_port_name_list, get_vif_port_by_id, get_vif_port_set):
+            port_info = self.agent.process_port_events(
+                events, registered_ports, updated_ports)
+        self.assertFalse(get_vif_port_set.called)
+        return port_info
+
+    def test_process_port_events_returns_port_changes(self):
+        events = {'added': [self._interface('tap3', 3),
+                            self._interface('qr-4', 4),
+                            self._interface('tap5', 5, ofport=['set', []])],
+                  'removed': [self._interface('tap2', 2)]}
+        expected = dict(current=set([1, 3]), added=set([3]),
+                        removed=set([2]))
+        actual = self.mock_process_port_events(
+            events, set([1, 2]), port_names=['tap1', 'tap3', 'tap5'])
+        self.assertEqual(expected, actual)
+
+    def test_process_port_events_returns_updated_ports_only(self):
+        events = {'added': [], 'removed': []}
+        expected = dict(current=set([1, 2]), updated=set([2]))
+        actual = self.mock_process_port_events(events, set([1, 2]),
+                                               set([2, 3]))
+        self.assertEqual(expected, actual)
+
+    def test_process_port_events_replugged_port_is_updated(self):
+        events = {'added': [self._interface('tap2', 2)],
+                  'removed': [self._interface('tap2', 2)]}
+        expected = dict(current=set([1, 2]), updated=set([2]))
+        actual = self.mock_process_port_events(
+            events, set([1, 2]), port_names=['tap1', 'tap2'],
+            existing_ports=[2])
+        self.assertEqual(expected, actual)
+
+    def test_process_port_events_added_then_removed_port_is_ignored(self):
+        events = {'added': [self._interface('tap2', 2)],
+                  'removed': [self._interface('tap2', 2)]}
+        expected = dict(current=set([1]))
+        actual = self.mock_process_port_events(
+            events, set([1]), port_names=['tap1', 'tap2'])
+        self.assertEqual(expected, actual)
+
     def test_update_ports_returns_changed_vlan(self):
         br = ovs_lib.OVSBridge('br-int', 'sudo')
         mac = "ca:fe:de:ad:be:ef"
@@ -271,11 +326,13 @@ class TestOvsNeutronAgent(base.BaseTestCase):
 
     def test_treat_devices_added_returns_true_for_missing_device(self):
         with contextlib.nested(
-            mock.patch.object(self.agent.plugin_rpc, 'get_device_details',
+            mock.patch.object(self.agent.plugin_rpc,
+                              'get_devices_details_list',
                               side_effect=Exception()),
             mock.patch.object(self.agent.int_br, 'get_vif_port_by_id',
                               return_value=mock.Mock())):
-            self.assertTrue(self.agent.treat_devices_added_or_updated([{}]))
+            self.assertTrue(self.agent.treat_devices_added_or_updated(
+                ['fake_device']))
 
     def _mock_treat_devices_added_updated(self, details, port, func_name):
         """Mock treat devices added or updated.
@@ -286,40 +343,46 @@ class TestOvsNeutronAgent(base.BaseTestCase):
         :returns: whether the named function was called
         """
         with contextlib.nested(
-            mock.patch.object(self.agent.plugin_rpc, 'get_device_details',
-                              return_value=details),
+            mock.patch.object(self.agent.plugin_rpc,
+                              'get_devices_details_list',
+                              return_value=[details]),
             mock.patch.object(self.agent.int_br, 'get_vif_port_by_id',
                               return_value=port),
-            mock.patch.object(self.agent.plugin_rpc, 'update_device_up'),
-            mock.patch.object(self.agent.plugin_rpc, 'update_device_down'),
+            mock.patch.object(self.agent.plugin_rpc, 'update_device_list'),
             mock.patch.object(self.agent, func_name)
-        ) as (get_dev_fn, get_vif_func, upd_dev_up, upd_dev_down, func):
-            self.assertFalse(self.agent.treat_devices_added_or_updated([{}]))
+        ) as (get_dev_fn, get_vif_func, upd_dev_list, func):
+            self.assertFalse(self.agent.treat_devices_added_or_updated(
+                ['fake_device']))
         return func.called
 
     def test_treat_devices_added_updated_ignores_invalid_ofport(self):
         port = mock.Mock()
         port.ofport = -1
         self.assertFalse(self._mock_treat_devices_added_updated(
-            mock.MagicMock(), port, 'port_dead'))
+            {'device': 'fake_device'}, port, 'port_dead'))
 
     def test_treat_devices_added_updated_marks_unknown_port_as_dead(self):
         port = mock.Mock()
         port.ofport = 1
         self.assertTrue(self._mock_treat_devices_added_updated(
-            mock.MagicMock(), port, 'port_dead'))
+            {'device': 'fake_device'}, port, 'port_dead'))
 
     def test_treat_devices_added_does_not_process_missing_port(self):
         with contextlib.nested(
-            mock.patch.object(self.agent.plugin_rpc, 'get_device_details'),
+            mock.patch.object(self.agent.plugin_rpc,
+                              'get_devices_details_list'),
             mock.patch.object(self.agent.int_br, 'get_vif_port_by_id',
                               return_value=None)
         ) as (get_dev_fn, get_vif_func):
+            self.assertFalse(self.agent.treat_devices_added_or_updated(
+                ['fake_device']))
             self.assertFalse(get_dev_fn.called)
 
     def test_treat_devices_added__updated_updates_known_port(self):
         details = mock.MagicMock()
         details.__contains__.side_effect = lambda x: True
+        details.__getitem__.side_effect = (
+            lambda x: 'fake_device' if x == 'device' else mock.Mock())
         self.assertTrue(self._mock_treat_devices_added_updated(
             details, mock.Mock(), 'treat_vif_port'))
 
@@ -332,31 +395,60 @@ class TestOvsNeutronAgent(base.BaseTestCase):
                              'segmentation_id': 'bar',
                              'network_type': 'baz'}
         with contextlib.nested(
-            mock.patch.object(self.agent.plugin_rpc, 'get_device_details',
-                              return_value=fake_details_dict),
+            mock.patch.object(self.agent.plugin_rpc,
+                              'get_devices_details_list',
+                              return_value=[fake_details_dict]),
             mock.patch.object(self.agent.int_br, 'get_vif_port_by_id',
                               return_value=mock.MagicMock()),
-            mock.patch.object(self.agent.plugin_rpc, 'update_device_up'),
-            mock.patch.object(self.agent.plugin_rpc, 'update_device_down'),
+            mock.patch.object(self.agent.plugin_rpc, 'update_device_list'),
             mock.patch.object(self.agent, 'treat_vif_port')
-        ) as (get_dev_fn, get_vif_func, upd_dev_up,
-              upd_dev_down, treat_vif_port):
-            self.assertFalse(self.agent.treat_devices_added_or_updated([{}]))
+        ) as (get_dev_fn, get_vif_func, upd_dev_list, treat_vif_port):
+            self.assertFalse(
+                self.agent.treat_devices_added_or_updated(['xxx']))
             self.assertTrue(treat_vif_port.called)
-            self.assertTrue(upd_dev_down.called)
+            upd_dev_list.assert_called_once_with(
+                self.agent.context, [], ['xxx'], self.agent.agent_id,
+                cfg.CONF.host)
+
+    def test_treat_devices_added_updated_returns_true_for_failed_update(self):
+        fake_details_dict = {'admin_state_up': True,
+                             'port_id': 'xxx',
+                             'device': 'xxx',
+                             'network_id': 'yyy',
+                             'physical_network': 'foo',
+                             'segmentation_id': 'bar',
+                             'network_type': 'baz'}
+        with contextlib.nested(
+            mock.patch.object(self.agent.plugin_rpc,
+                              'get_devices_details_list',
+                              return_value=[fake_details_dict]),
+            mock.patch.object(self.agent.int_br, 'get_vif_port_by_id',
+                              return_value=mock.MagicMock()),
+            mock.patch.object(self.agent.plugin_rpc, 'update_device_list',
+                              side_effect=Exception()),
+            mock.patch.object(self.agent, 'treat_vif_port')
+        ):
+            self.assertTrue(
+                self.agent.treat_devices_added_or_updated(['xxx']))
 
     def test_treat_devices_removed_returns_true_for_missing_device(self):
-        with mock.patch.object(self.agent.plugin_rpc, 'update_device_down',
+        with mock.patch.object(self.agent.plugin_rpc, 'update_device_list',
                                side_effect=Exception()):
-            self.assertTrue(self.agent.treat_devices_removed([{}]))
+            self.assertTrue(self.agent.treat_devices_removed(['fake_dev']))
 
     def _mock_treat_devices_removed(self, port_exists):
-        details = dict(exists=port_exists)
-        with mock.patch.object(self.agent.plugin_rpc, 'update_device_down',
-                               return_value=details):
+        result = {'devices_up': [],
+                  'devices_down': [dict(device='fake_dev',
+                                        exists=port_exists)]}
+        with mock.patch.object(self.agent.plugin_rpc, 'update_device_list',
+                               return_value=result) as upd_dev_list:
             with mock.patch.object(self.agent, 'port_unbound') as port_unbound:
-                self.assertFalse(self.agent.treat_devices_removed([{}]))
-        self.assertTrue(port_unbound.called)
+                self.assertFalse(self.agent.treat_devices_removed(
+                    ['fake_dev']))
+        port_unbound.assert_called_once_with('fake_dev')
+        upd_dev_list.assert_called_once_with(
+            self.agent.context, [], ['fake_dev'], self.agent.agent_id,
+            cfg.CONF.host)
 
     def test_treat_devices_removed_unbinds_port(self):
         self._mock_treat_devices_removed(True)
@@ -638,6 +730,45 @@ class TestOvsNeutronAgent(base.BaseTestCase):
             self.agent.reclaim_local_vlan('net2')
             del_port_fn.assert_called_once_with('gre-02020202')
 
+    def _test_rpc_loop(self, events, full_scan_interval=0, next_scan=0):
+        polling_manager = mock.Mock()
+        polling_manager.get_events.return_value = events
+        self.agent.full_scan_interval = full_scan_interval
+        clock = [0]
+
+        def sleep(seconds):
+            if clock[0]:
+                raise RuntimeError()
+            clock[0] = next_scan
+
+        with contextlib.nested(
+            mock.patch.object(self.agent, 'scan_ports',
+                              return_value={'current': set()}),
+            mock.patch.object(self.agent, 'process_port_events',
+                              return_value={'current': set()}),
+            mock.patch.object(self.agent, '_agent_has_updates',
+                              return_value=True),
+            mock.patch.object(ovs_neutron_agent.time, 'time',
+                              side_effect=lambda: clock[0]),
+            mock.patch.object(ovs_neutron_agent.time, 'sleep',
+                              side_effect=sleep)
+        ) as (scan_ports, process_port_events, has_updates, time, sleep):
+            self.assertRaises(RuntimeError, self.agent.rpc_loop,
+                              polling_manager=polling_manager)
+        return scan_ports.call_count, process_port_events.call_count
+
+    def test_rpc_loop_processes_events_after_full_scan(self):
+        self.assertEqual((1, 1), self._test_rpc_loop(
+            {'added': [], 'removed': []}, next_scan=1))
+
+    def test_rpc_loop_full_scan_without_events(self):
+        self.assertEqual((2, 0), self._test_rpc_loop(None, next_scan=1))
+
+    def test_rpc_loop_periodic_full_scan(self):
+        self.assertEqual((2, 0), self._test_rpc_loop(
+            {'added': [], 'removed': []}, full_scan_interval=60,
+            next_scan=61))
+
     def test_daemon_loop_uses_polling_manager(self):
         with mock.patch(
             'neutron.agent.linux.polling.get_polling_manager') as mock_get_pm:
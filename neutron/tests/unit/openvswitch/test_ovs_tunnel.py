@@ -144,6 +144,7 @@ class TunnelTest(base.BaseTestCase):
 
         self.mock_tun_bridge_expected += [
             mock.call.remove_all_flows(),
+            mock.call.defer_apply_on(),
             mock.call.add_flow(priority=1,
                                in_port=self.INT_OFPORT,
                                actions="resubmit(,%s)" %
@@ -184,7 +185,8 @@ class TunnelTest(base.BaseTestCase):
                                constants.FLOOD_TO_TUN),
             mock.call.add_flow(table=constants.FLOOD_TO_TUN,
                                priority=0,
-                               actions="drop")
+                               actions="drop"),
+            mock.call.defer_apply_off()
         ]
 
         self.device_exists = mock.patch.object(ip_lib, 'device_exists').start()
@@ -271,6 +273,7 @@ class TunnelTest(base.BaseTestCase):
     def test_provision_local_vlan(self):
         ofports = ','.join(TUN_OFPORTS[p_const.TYPE_GRE].values())
         self.mock_tun_bridge_expected += [
+            mock.call.defer_apply_on(),
             mock.call.mod_flow(table=constants.FLOOD_TO_TUN,
                                dl_vlan=LV_ID,
                                actions="strip_vlan,"
@@ -281,6 +284,7 @@ class TunnelTest(base.BaseTestCase):
                                tun_id=LS_ID,
                                actions="mod_vlan_vid:%s,resubmit(,%s)" %
                                (LV_ID, constants.LEARN_FROM_TUN)),
+            mock.call.defer_apply_off()
         ]
 
         a = ovs_neutron_agent.OVSNeutronAgent(self.INT_BRIDGE,
@@ -359,9 +363,11 @@ class TunnelTest(base.BaseTestCase):
 
     def test_reclaim_local_vlan(self):
         self.mock_tun_bridge_expected += [
+            mock.call.defer_apply_on(),
             mock.call.delete_flows(
                 table=constants.TUN_TABLE['gre'], tun_id=LS_ID),
-            mock.call.delete_flows(dl_vlan=LVM.vlan)
+            mock.call.delete_flows(dl_vlan=LVM.vlan),
+            mock.call.defer_apply_off()
         ]
 
         a = ovs_neutron_agent.OVSNeutronAgent(self.INT_BRIDGE,
@@ -554,6 +560,11 @@ class TunnelTest(base.BaseTestCase):
                        'removed': set(['tap0']),
                        'added': set([])})
         ])
+        # tunnel_sync runs in both iterations as the plugin is never synced
+        self.mock_tun_bridge_expected += [
+            mock.call.defer_apply_on(),
+            mock.call.defer_apply_off()
+        ] * 2
         self._verify_mock_calls()
 
 
@@ -14,6 +14,7 @@
 
 import fixtures
 import mock
+from oslo.config import cfg
 import testtools
 
 from neutron.agent.linux import utils
@@ -76,6 +77,72 @@ class AgentUtilsExecuteTest(base.BaseTestCase):
         self.assertEqual(result, expected)
 
 
+class AgentUtilsExecuteRootwrapDaemonTest(base.BaseTestCase):
+    def setUp(self):
+        super(AgentUtilsExecuteRootwrapDaemonTest, self).setUp()
+        self.daemon_cmd = 'sudo neutron-rootwrap-daemon /etc/rootwrap.conf'
+        cfg.CONF.set_override('root_helper_daemon', self.daemon_cmd, 'AGENT')
+        self.addCleanup(cfg.CONF.reset)
+        self.client = mock.Mock()
+        self.client.execute.return_value = (0, 'out', 'err')
+        self.client_cls = mock.patch('oslo.rootwrap.client.Client',
+                                     return_value=self.client).start()
+        self.addCleanup(utils._rootwrap_clients.clear)
+        self.create_process = mock.patch.object(utils,
+                                                'create_process').start()
+
+    def test_with_helper(self):
+        self.assertEqual('out', utils.execute(
+            ['ip', 'link'], 'sudo', process_input='in',
+            addl_env={'foo': 'bar'}))
+        self.client.execute.assert_called_once_with(
+            ['ip', 'link'], {'PATH': mock.ANY, 'foo': 'bar'}, 'in')
+        self.client_cls.assert_called_once_with(
+            ['sudo', 'neutron-rootwrap-daemon', '/etc/rootwrap.conf'])
+        self.assertFalse(self.create_process.called)
+
+    def test_env_has_path(self):
+        with mock.patch.dict('os.environ', {'PATH': '/sbin:/bin'}):
+            utils.execute(['ip', 'netns', 'exec', 'ns', 'sysctl'], 'sudo')
+        self.client.execute.assert_called_once_with(
+            ['ip', 'netns', 'exec', 'ns', 'sysctl'], {'PATH': '/sbin:/bin'},
+            None)
+
+    def test_addl_env_overrides_path(self):
+        with mock.patch.dict('os.environ', {'PATH': '/sbin:/bin'}):
+            utils.execute(['ip', 'link'], 'sudo',
+                          addl_env={'PATH': '/usr/sbin', 'foo': 'bar'})
+        self.client.execute.assert_called_once_with(
+            ['ip', 'link'], {'PATH': '/usr/sbin', 'foo': 'bar'}, None)
+
+    def test_client_is_reused(self):
+        utils.execute(['ip', 'link'], 'sudo')
+        utils.execute(['ip', 'addr'], 'sudo')
+        self.assertEqual(1, self.client_cls.call_count)
+        self.assertEqual(2, self.client.execute.call_count)
+
+    def test_stderr_true(self):
+        self.assertEqual(('out', 'err'), utils.execute(
+            ['ip', 'link'], 'sudo', return_stderr=True))
+
+    def test_check_exit_code(self):
+        self.client.execute.return_value = (1, '', 'err')
+        self.assertRaises(RuntimeError, utils.execute, ['ip', 'link'], 'sudo')
+        self.assertEqual('', utils.execute(['ip', 'link'], 'sudo',
+                                           check_exit_code=False))
+
+    def test_daemon_error(self):
+        self.client.execute.side_effect = Exception('No filter matched')
+        self.assertRaises(RuntimeError, utils.execute, ['ip', 'link'], 'sudo')
+
+    def test_without_helper(self):
+        process = mock.Mock(returncode=0)
+        process.communicate.return_value = ('out', '')
+        self.create_process.return_value = (process, ['ls'])
+        self.assertEqual('out', utils.execute(['ls']))
+        self.assertFalse(self.client_cls.called)
+
+
 class AgentUtilsGetInterfaceMAC(base.BaseTestCase):
     def test_get_interface_mac(self):
         expect_val = '01:02:03:04:05:06'
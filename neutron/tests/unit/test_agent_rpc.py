@@ -15,10 +15,13 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
+
 import mock
 
 from neutron.agent import rpc
 from neutron.openstack.common import context
+from neutron.openstack.common.rpc import common as rpc_common
 from neutron.tests import base
 
 
@@ -39,6 +42,94 @@ class AgentRPCPluginApi(base.BaseTestCase):
     def test_get_device_details(self):
         self._test_rpc_call('get_device_details')
 
+    def test_get_devices_details_list(self):
+        agent = rpc.PluginApi('fake_topic')
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        with mock.patch.object(agent, 'call',
+                               return_value=['foo']) as rpc_call:
+            self.assertEqual(['foo'], agent.get_devices_details_list(
+                ctxt, ['fake_device'], 'fake_agent_id'))
+        rpc_call.assert_called_once_with(
+            ctxt, agent.make_msg('get_devices_details_list',
+                                 devices=['fake_device'],
+                                 agent_id='fake_agent_id'),
+            topic='fake_topic', version='1.3')
+
+    def test_get_devices_details_list_fallback(self):
+        agent = rpc.PluginApi('fake_topic')
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        error = rpc_common.RemoteError(exc_type='UnsupportedRpcVersion')
+        with contextlib.nested(
+            mock.patch.object(agent, 'call', side_effect=error),
+            mock.patch.object(agent, 'get_device_details',
+                              side_effect=lambda c, d, a: {'device': d})
+        ) as (rpc_call, get_device_details):
+            for i in range(2):
+                self.assertEqual(
+                    [{'device': 'dev1'}, {'device': 'dev2'}],
+                    agent.get_devices_details_list(
+                        ctxt, ['dev1', 'dev2'], 'fake_agent_id'))
+        self.assertEqual(1, rpc_call.call_count)
+        self.assertFalse(agent.devices_details_list_supported)
+
+    def test_get_devices_details_list_remote_error(self):
+        agent = rpc.PluginApi('fake_topic')
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        error = rpc_common.RemoteError(exc_type='PortNotFound')
+        with mock.patch.object(agent, 'call', side_effect=error):
+            self.assertRaises(rpc_common.RemoteError,
+                              agent.get_devices_details_list,
+                              ctxt, ['dev1'], 'fake_agent_id')
+        self.assertTrue(agent.devices_details_list_supported)
+
+    def test_update_device_list(self):
+        agent = rpc.PluginApi('fake_topic')
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        expected = {'devices_up': ['dev1'],
+                    'devices_down': [{'device': 'dev2', 'exists': True}]}
+        with mock.patch.object(agent, 'call',
+                               return_value=expected) as rpc_call:
+            self.assertEqual(expected, agent.update_device_list(
+                ctxt, ['dev1'], ['dev2'], 'fake_agent_id', 'fake_host'))
+        rpc_call.assert_called_once_with(
+            ctxt, agent.make_msg('update_device_list',
+                                 devices_up=['dev1'], devices_down=['dev2'],
+                                 agent_id='fake_agent_id', host='fake_host'),
+            topic='fake_topic', version='1.4')
+
+    def test_update_device_list_fallback(self):
+        agent = rpc.PluginApi('fake_topic')
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        error = rpc_common.RemoteError(exc_type='UnsupportedRpcVersion')
+        with contextlib.nested(
+            mock.patch.object(agent, 'call', side_effect=error),
+            mock.patch.object(agent, 'update_device_up'),
+            mock.patch.object(agent, 'update_device_down',
+                              side_effect=lambda c, d, a, h: {'device': d,
+                                                              'exists': True})
+        ) as (rpc_call, update_device_up, update_device_down):
+            for i in range(2):
+                self.assertEqual(
+                    {'devices_up': ['dev1'],
+                     'devices_down': [{'device': 'dev2', 'exists': True}]},
+                    agent.update_device_list(
+                        ctxt, ['dev1'], ['dev2'], 'fake_agent_id'))
+        self.assertEqual(1, rpc_call.call_count)
+        self.assertEqual(2, update_device_up.call_count)
+        update_device_up.assert_called_with(ctxt, 'dev1', 'fake_agent_id',
+                                            None)
+        self.assertFalse(agent.update_device_list_supported)
+
+    def test_update_device_list_remote_error(self):
+        agent = rpc.PluginApi('fake_topic')
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        error = rpc_common.RemoteError(exc_type='PortNotFound')
+        with mock.patch.object(agent, 'call', side_effect=error):
+            self.assertRaises(rpc_common.RemoteError,
+                              agent.update_device_list,
+                              ctxt, ['dev1'], [], 'fake_agent_id')
+        self.assertTrue(agent.update_device_list_supported)
+
     def test_update_device_down(self):
         self._test_rpc_call('update_device_down')
 
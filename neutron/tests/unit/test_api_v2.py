@@ -1241,6 +1241,53 @@ class V2Views(base.BaseTestCase):
         self._view(keys, 'subnets', 'subnet')
 
 
+class _IterPlugin(object):
+    def get_networks(self, context, **kwargs):
+        pass
+
+    def iter_networks(self, context, **kwargs):
+        pass
+
+
+class _ListOverridingPlugin(_IterPlugin):
+    def get_networks(self, context, **kwargs):
+        pass
+
+
+class _IterOverridingPlugin(_ListOverridingPlugin):
+    def iter_networks(self, context, **kwargs):
+        pass
+
+
+class IterHandlerTestCase(base.BaseTestCase):
+    def _get_iter_handler(self, plugin):
+        attr_info = attributes.RESOURCE_ATTRIBUTE_MAP['networks']
+        controller = v2_base.Controller(plugin, 'networks', 'network',
+                                        attr_info)
+        return controller._get_iter_handler()
+
+    def test_iter_handler(self):
+        plugin = _IterPlugin()
+        self.assertEqual(plugin.iter_networks,
+                         self._get_iter_handler(plugin))
+
+    def test_no_iter_handler(self):
+        self.assertIsNone(self._get_iter_handler(mock.Mock()))
+
+    def test_iter_handler_list_overridden(self):
+        self.assertIsNone(self._get_iter_handler(_ListOverridingPlugin()))
+
+    def test_iter_handler_list_delegated(self):
+        plugin = _IterPlugin()
+        plugin.get_networks = _ListOverridingPlugin().get_networks
+        self.assertIsNone(self._get_iter_handler(plugin))
+
+    def test_iter_handler_both_overridden(self):
+        plugin = _IterOverridingPlugin()
+        self.assertEqual(plugin.iter_networks,
+                         self._get_iter_handler(plugin))
+
+
 class NotificationTest(APIv2TestBase):
     def _resource_op_notifier(self, opname, resource, expected_errors=False,
                               notification_level='INFO'):
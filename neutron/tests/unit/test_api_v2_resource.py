@@ -314,6 +314,35 @@ class ResourceTestCase(base.BaseTestCase):
         res = resource.get('', extra_environ=environ)
         self.assertEqual(res.status_int, 200)
 
+    def test_streamed_list(self):
+        controller = mock.MagicMock()
+        controller.test = lambda request: {'foo': iter(['bar', 'baz'])}
+
+        resource = webtest.TestApp(wsgi_resource.Resource(controller))
+
+        environ = {'wsgiorg.routing_args': (None, {'action': 'test'})}
+        res = resource.get('', extra_environ=environ)
+        self.assertEqual(res.status_int, 200)
+        self.assertEqual({'foo': ['bar', 'baz']},
+                         wsgi.JSONDeserializer().deserialize(res.body)['body'])
+
+    def test_streamed_list_error_logged_and_raised(self):
+        def items():
+            yield 'bar'
+            raise Exception()
+
+        controller = mock.MagicMock()
+        controller.test = lambda request: {'foo': items()}
+
+        environ = {'wsgiorg.routing_args': (None, {'action': 'test'})}
+        request = wsgi.Request.blank('', environ=environ)
+        with mock.patch.object(wsgi_resource, 'LOG') as log:
+            res = request.get_response(wsgi_resource.Resource(controller))
+            self.assertEqual(res.status_int, 200)
+            # The WSGI server closes the connection without ending the body
+            self.assertRaises(Exception, list, res.app_iter)
+        self.assertTrue(log.exception.called)
+
     def test_status_204(self):
         controller = mock.MagicMock()
         controller.test = lambda request: {'foo': 'bar'}
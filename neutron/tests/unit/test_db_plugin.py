@@ -947,6 +947,34 @@ fixed_ips=ip_address%%3D%s&fixed_ips=ip_address%%3D%s&fixed_ips=subnet_id%%3D%s
             self._test_list_resources('port', [port1],
                                       query_params=query_params)
 
+    def _skip_unless_listed_by_db_plugin(self):
+        plugin = manager.NeutronManager.get_plugin()
+        if (plugin.get_ports.__func__ is not
+                db_base_plugin_v2.NeutronDbPluginV2.get_ports.__func__ or
+                plugin.get_ports.__self__ is not plugin.iter_ports.__self__):
+            self.skipTest("The plugin lists the ports itself")
+
+    def test_list_ports_in_batches(self):
+        self._skip_unless_listed_by_db_plugin()
+        cfg.CONF.set_override('list_batch_size', 2)
+        with contextlib.nested(self.subnet(),
+                               self.subnet(cidr='10.0.1.0/24')) as (subnet,
+                                                                    other):
+            with contextlib.nested(self.port(subnet=subnet),
+                                   self.port(subnet=subnet),
+                                   self.port(subnet=subnet),
+                                   self.port(subnet=other)) as ports:
+                plugin = manager.NeutronManager.get_plugin()
+                with mock.patch.object(plugin, 'iter_ports',
+                                       wraps=plugin.iter_ports) as iter_ports:
+                    self._test_list_resources('port', ports)
+                    # The filter on the fixed IPs applies to every batch
+                    query_params = 'fixed_ips=subnet_id%%3D%s' % (
+                        subnet['subnet']['id'])
+                    self._test_list_resources('port', ports[:3],
+                                              query_params=query_params)
+                self.assertEqual(2, iter_ports.call_count)
+
     def test_list_ports_public_network(self):
         with self.network(shared=True) as network:
             with self.subnet(network) as subnet:
@@ -979,6 +1007,22 @@ fixed_ips=ip_address%%3D%s&fixed_ips=ip_address%%3D%s&fixed_ips=subnet_id%%3D%s
                                       [('admin_state_up', 'asc'),
                                        ('mac_address', 'desc')])
 
+    def test_list_ports_with_sort_native_in_batches(self):
+        if self._skip_native_sorting:
+            self.skipTest("Skip test for not implemented sorting feature")
+        cfg.CONF.set_override('list_batch_size', 2)
+        cfg.CONF.set_default('allow_overlapping_ips', True)
+        with contextlib.nested(self.port(admin_state_up='True',
+                                         mac_address='00:00:00:00:00:01'),
+                               self.port(admin_state_up='False',
+                                         mac_address='00:00:00:00:00:02'),
+                               self.port(admin_state_up='False',
+                                         mac_address='00:00:00:00:00:03')
+                               ) as (port1, port2, port3):
+            self._test_list_with_sort('port', (port3, port2, port1),
+                                      [('admin_state_up', 'asc'),
+                                       ('mac_address', 'desc')])
+
     def test_list_ports_with_sort_emulated(self):
         helper_patcher = mock.patch(
             'neutron.api.v2.base.Controller._get_sorting_helper',
@@ -1008,6 +1052,62 @@ fixed_ips=ip_address%%3D%s&fixed_ips=ip_address%%3D%s&fixed_ips=subnet_id%%3D%s
                                             (port1, port2, port3),
                                             ('mac_address', 'asc'), 2, 2)
 
+    def test_list_ports_with_pagination_native_by_admin_state_up(self):
+        if self._skip_native_pagination:
+            self.skipTest("Skip test for not implemented pagination feature")
+        cfg.CONF.set_default('allow_overlapping_ips', True)
+        with contextlib.nested(self.port(admin_state_up=False),
+                               self.port(admin_state_up=False),
+                               self.port(admin_state_up=True)) as ports:
+            plugin = manager.NeutronManager.get_plugin()
+            # The marker is selected by the query of the page
+            with mock.patch.object(plugin, '_get_port') as get_port:
+                self._test_list_with_pagination('port', ports,
+                                                ('admin_state_up', 'asc'),
+                                                2, 2)
+            self.assertFalse(get_port.called)
+
+    def test_list_ports_with_pagination_native_foreign_marker(self):
+        if self._skip_native_pagination:
+            self.skipTest("Skip test for not implemented pagination feature")
+        cfg.CONF.set_default('allow_overlapping_ips', True)
+        with contextlib.nested(self.port(tenant_id='tenant_1'),
+                               self.port(tenant_id='tenant_2')) as ports:
+            req = self.new_list_request(
+                'ports', params='limit=1&marker=%s' % ports[0]['port']['id'])
+            req.environ['neutron.context'] = context.Context('', 'tenant_2')
+            res = req.get_response(self.api)
+            self.assertEqual(webob.exc.HTTPNotFound.code, res.status_int)
+
+    def test_list_ports_with_pagination_native_deleted_marker(self):
+        if self._skip_native_pagination:
+            self.skipTest("Skip test for not implemented pagination feature")
+        with self.port() as port:
+            pass
+        req = self.new_list_request(
+            'ports', params='limit=1&marker=%s' % port['port']['id'])
+        res = req.get_response(self.api)
+        self.assertEqual(webob.exc.HTTPNotFound.code, res.status_int)
+
+    def test_list_ports_with_column_fields(self):
+        self._skip_unless_listed_by_db_plugin()
+        with self.subnet() as subnet:
+            subnet_id = subnet['subnet']['id']
+            fixed_ips = [{'subnet_id': subnet_id, 'ip_address': '10.0.0.5'},
+                         {'subnet_id': subnet_id, 'ip_address': '10.0.0.6'}]
+            with self.port(subnet=subnet, fixed_ips=fixed_ips,
+                           name='port') as port:
+                plugin = manager.NeutronManager.get_plugin()
+                req = self.new_list_request(
+                    'ports', params='fields=id&fields=name&'
+                    'fixed_ips=subnet_id%%3D%s' % subnet_id)
+                with mock.patch.object(plugin, '_make_port_dict') as make:
+                    res = self.deserialize(self.fmt,
+                                           req.get_response(self.api))
+                self.assertFalse(make.called)
+                self.assertEqual([{'id': port['port']['id'],
+                                   'name': 'port'}], res['ports'])
+
     def test_list_ports_with_pagination_emulated(self):
         helper_patcher = mock.patch(
             'neutron.api.v2.base.Controller._get_pagination_helper',
@@ -2021,6 +2121,23 @@ class TestNetworksV2(NeutronDbPluginV2TestCase):
                                       [('admin_state_up', 'asc'),
                                        ('name', 'desc')])
 
+    def test_list_networks_in_batches_while_created(self):
+        cfg.CONF.set_override('list_batch_size', 1)
+        with contextlib.nested(self.network(name='net2'),
+                               self.network(name='net3')) as (net2, net3):
+            plugin = manager.NeutronManager.get_plugin()
+            if plugin.get_networks.__func__ is not (
+                    db_base_plugin_v2.NeutronDbPluginV2.get_networks.__func__):
+                self.skipTest("The plugin lists the networks itself")
+            networks = plugin.iter_networks(context.get_admin_context(),
+                                            sorts=[('name', True)])
+            self.assertEqual('net2', next(networks)['name'])
+            with self.network(name='net1'):
+                # The network created before the next batch does not shift
+                # it
+                self.assertEqual(['net3'],
+                                 [network['name'] for network in networks])
+
     def test_list_networks_with_sort_extended_attr_native_returns_400(self):
         if self._skip_native_sorting:
             self.skipTest("Skip test for not implemented sorting feature")
@@ -3400,6 +3517,35 @@ class TestSubnetsV2(NeutronDbPluginV2TestCase):
                                       [('enable_dhcp', 'asc'),
                                        ('cidr', 'desc')])
 
+    def test_list_subnets_with_sort_on_nullable_in_batches(self):
+        if self._skip_native_sorting:
+            self.skipTest("Skip test for not implemented sorting feature")
+        cfg.CONF.set_override('list_batch_size', 1)
+        with contextlib.nested(self.subnet(gateway_ip='10.0.0.1',
+                                           cidr='10.0.0.0/24'),
+                               self.subnet(gateway_ip=None,
+                                           cidr='11.0.0.0/24'),
+                               self.subnet(gateway_ip='12.0.0.1',
+                                           cidr='12.0.0.0/24'),
+                               self.subnet(gateway_ip=None,
+                                           cidr='13.0.0.0/24')
+                               ) as subnets:
+            plugin = manager.NeutronManager.get_plugin()
+            if plugin.get_subnets.__func__ is not (
+                    db_base_plugin_v2.NeutronDbPluginV2.get_subnets.__func__):
+                self.skipTest("The plugin lists the subnets itself")
+            ids = [subnet['subnet']['id'] for subnet in subnets]
+            null_ids = sorted(ids[1::2])
+            ctx = context.get_admin_context()
+            self.assertEqual(
+                null_ids + [ids[0], ids[2]],
+                [subnet['id'] for subnet in plugin.iter_subnets(
+                    ctx, sorts=[('gateway_ip', True)])])
+            self.assertEqual(
+                [ids[2], ids[0]] + null_ids,
+                [subnet['id'] for subnet in plugin.iter_subnets(
+                    ctx, sorts=[('gateway_ip', False)])])
+
     def test_list_subnets_with_sort_emulated(self):
         helper_patcher = mock.patch(
             'neutron.api.v2.base.Controller._get_sorting_helper',
@@ -3847,6 +3993,33 @@ class TestNeutronDbPluginV2(base.BaseTestCase):
                           ['b', '192.168.1.100', '192.168.1.109'],
                           ['b', '192.168.1.112', '192.168.1.120']], actual)
 
+    def test_rebuild_availability_ranges_ipv6(self):
+        pools = [{'id': 'a',
+                  'first_ip': '::2',
+                  'last_ip': '::ff'}]
+        allocations = [{'ip_address': '::2'},
+                       {'ip_address': '::5'}]
+
+        ip_qry = mock.Mock()
+        ip_qry.with_lockmode.return_value = ip_qry
+        ip_qry.filter_by.return_value = allocations
+
+        pool_qry = mock.Mock()
+        pool_qry.options.return_value = pool_qry
+        pool_qry.with_lockmode.return_value = pool_qry
+        pool_qry.filter_by.return_value = pools
+
+        context = mock.Mock()
+        context.session.query.side_effect = lambda model: (
+            ip_qry if model == models_v2.IPAllocation else pool_qry)
+
+        db_base_plugin_v2.NeutronDbPluginV2._rebuild_availability_ranges(
+            context, [mock.MagicMock()])
+
+        actual = [[args[0].first_ip, args[0].last_ip]
+                  for _name, args, _kwargs in context.session.add.mock_calls]
+        self.assertEqual([['::3', '::4'], ['::6', '::ff']], actual)
+
 
 class NeutronDbPluginV2AsMixinTestCase(base.BaseTestCase):
     """Tests for NeutronDbPluginV2 as Mixin.
@@ -17,9 +17,12 @@ import mock
 
 from neutron.common import constants
 from neutron.common import exceptions as n_exc
+from neutron import context
 from neutron.db import dhcp_rpc_base
+from neutron.extensions import extra_dhcp_opt as edo_ext
 from neutron.openstack.common.db import exception as db_exc
 from neutron.tests import base
+from neutron.tests.unit import test_extension_extradhcpopts
 
 
 class TestDhcpRpcCallbackMixin(base.BaseTestCase):
@@ -47,6 +50,62 @@ class TestDhcpRpcCallbackMixin(base.BaseTestCase):
 
         self.assertEqual(len(self.log.mock_calls), 1)
 
+    def _test_get_active_networks_info(self, network_ids=None):
+        self.plugin.get_networks.return_value = [dict(id='a'), dict(id='b')]
+        self.plugin.get_subnets.return_value = [
+            dict(id='s1', network_id='a', enable_dhcp=True)]
+        self.plugin.get_ports.return_value = [
+            dict(id='p1', network_id='a', mac_address='fa:16:3e:00:00:01',
+                 device_id='d1', device_owner='', fixed_ips=[]),
+            dict(id='p2', network_id='b', mac_address='fa:16:3e:00:00:02',
+                 device_id='d2', device_owner='', fixed_ips=[])]
+        return self.callbacks.get_active_networks_info(
+            mock.Mock(), host='host', network_ids=network_ids)
+
+    def test_get_active_networks_info(self):
+        networks = self._test_get_active_networks_info()
+        self.assertEqual(['a', 'b'], [network['id'] for network in networks])
+        self.assertEqual([['s1'], []],
+                         [[subnet['id'] for subnet in network['subnets']]
+                          for network in networks])
+        self.assertEqual([['p1'], ['p2']],
+                         [[port['id'] for port in network['ports']]
+                          for network in networks])
+        self.assertNotEqual(networks[0]['fingerprint'],
+                            networks[1]['fingerprint'])
+
+    def test_get_active_networks_info_network_ids(self):
+        networks = self._test_get_active_networks_info(network_ids=['b'])
+        self.assertEqual(['b'], [network['id'] for network in networks])
+        filters = self.plugin.get_ports.call_args[1]['filters']
+        self.assertEqual(['b'], filters['network_id'])
+
+    def test_get_active_networks_info_no_network_ids(self):
+        self.assertEqual([], self._test_get_active_networks_info([]))
+        self.assertFalse(self.plugin.get_ports.called)
+
+    def test_get_network_fingerprint_ignores_order(self):
+        ports = [self.callbacks._get_fingerprint_port(
+            'p1', 'fa:16:3e:00:00:01', 'd1', '',
+            [('s1', '10.0.0.3'), ('s1', '10.0.0.2')], []),
+            self.callbacks._get_fingerprint_port(
+                'p2', 'fa:16:3e:00:00:02', 'd2', '', [], [])]
+        reordered = [self.callbacks._get_fingerprint_port(
+            'p2', 'fa:16:3e:00:00:02', 'd2', '', [], []),
+            self.callbacks._get_fingerprint_port(
+                'p1', 'fa:16:3e:00:00:01', 'd1', '',
+                [('s1', '10.0.0.2'), ('s1', '10.0.0.3')], [])]
+        network = dict(id='a')
+        subnets = [dict(id='s1'), dict(id='s2')]
+        fingerprint = self.callbacks._get_network_fingerprint(
+            network, subnets, ports)
+        self.assertEqual(fingerprint, self.callbacks._get_network_fingerprint(
+            network, subnets[::-1], reordered))
+        ports[1]['fixed_ips'] = [('s1', '10.0.0.4')]
+        self.assertNotEqual(fingerprint,
+                            self.callbacks._get_network_fingerprint(
+                                network, subnets, ports))
+
     def _test__port_action_with_failures(self, exc=None, action=None):
         port = {
             'network_id': 'foo_network_id',
@@ -231,3 +290,51 @@ class TestDhcpRpcCallbackMixin(base.BaseTestCase):
                                                        device_id=['devid'])),
             mock.call.update_port(mock.ANY, 'port_id',
                                   dict(port=port_update))])
+
+
+class TestDhcpRpcCallbackMixinFingerprints(
+    test_extension_extradhcpopts.ExtraDhcpOptDBTestCase):
+
+    def setUp(self):
+        super(TestDhcpRpcCallbackMixinFingerprints, self).setUp()
+        self.callbacks = dhcp_rpc_base.DhcpRpcCallbackMixin()
+
+    def _get_fingerprints(self):
+        # Like the RPC calls, each call has its own context and session
+        networks = self.callbacks.get_active_networks_info(
+            context.get_admin_context(), host='host')
+        fingerprints = self.callbacks.get_active_networks_fingerprints(
+            context.get_admin_context(), host='host')
+        self.assertEqual(dict((network['id'], network['fingerprint'])
+                              for network in networks), fingerprints)
+        return fingerprints
+
+    def test_get_active_networks_fingerprints(self):
+        opts = [{'opt_name': 'bootfile-name', 'opt_value': 'pxelinux.0'}]
+        with self.subnet() as subnet1, self.subnet(
+                cidr='10.0.1.0/24') as subnet2:
+            network_id = subnet1['subnet']['network_id']
+            with self.port(subnet=subnet1), self.port(subnet=subnet2):
+                params = {edo_ext.EXTRADHCPOPTS: opts}
+                with self.port(subnet=subnet1,
+                               arg_list=(edo_ext.EXTRADHCPOPTS,),
+                               **params) as port:
+                    fingerprints = self._get_fingerprints()
+                    self.assertEqual(2, len(fingerprints))
+
+                    data = {'port': {edo_ext.EXTRADHCPOPTS: [
+                        {'opt_name': 'bootfile-name',
+                         'opt_value': 'pxelinux.1'}]}}
+                    req = self.new_update_request('ports', data,
+                                                  port['port']['id'])
+                    req.get_response(self.api)
+                    changed = self._get_fingerprints()
+                    self.assertNotEqual(fingerprints[network_id],
+                                        changed[network_id])
+                    network_id2 = subnet2['subnet']['network_id']
+                    self.assertEqual(fingerprints[network_id2],
+                                     changed[network_id2])
+
+    def test_get_active_networks_fingerprints_no_networks(self):
+        self.assertEqual({}, self.callbacks.get_active_networks_fingerprints(
+            context.get_admin_context(), host='host'))
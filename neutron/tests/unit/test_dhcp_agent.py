@@ -15,6 +15,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
 import copy
 import sys
 import uuid
@@ -187,11 +188,13 @@ class TestDhcpAgent(base.BaseTestCase):
             dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
             attrs_to_mock = dict(
                 [(a, mock.DEFAULT) for a in
-                 ['sync_state', 'periodic_resync']])
+                 ['sync_state', 'periodic_resync',
+                  'start_event_threads']])
             with mock.patch.multiple(dhcp, **attrs_to_mock) as mocks:
                 dhcp.run()
                 mocks['sync_state'].assert_called_once_with()
                 mocks['periodic_resync'].assert_called_once_with()
+                mocks['start_event_threads'].assert_called_once_with()
 
     def test_call_driver(self):
         network = mock.Mock()
@@ -242,6 +245,7 @@ class TestDhcpAgent(base.BaseTestCase):
     def _test_sync_state_helper(self, known_networks, active_networks):
         with mock.patch(DHCP_PLUGIN) as plug:
             mock_plugin = mock.Mock()
+            mock_plugin.get_active_networks_fingerprints.return_value = None
             mock_plugin.get_active_networks_info.return_value = active_networks
             plug.return_value = mock_plugin
 
@@ -293,7 +297,8 @@ class TestDhcpAgent(base.BaseTestCase):
     def test_sync_state_plugin_error(self):
         with mock.patch(DHCP_PLUGIN) as plug:
             mock_plugin = mock.Mock()
-            mock_plugin.get_active_networks_info.side_effect = Exception
+            mock_plugin.get_active_networks_fingerprints.side_effect = (
+                Exception)
             plug.return_value = mock_plugin
 
             with mock.patch.object(dhcp_agent.LOG, 'exception') as log:
@@ -303,12 +308,90 @@ class TestDhcpAgent(base.BaseTestCase):
                 self.assertTrue(log.called)
                 self.assertTrue(dhcp.needs_resync)
 
+    def _test_sync_state_fingerprints(self, fingerprints, expected_ids):
+        known_networks = [
+            dhcp.NetModel(True, dict(id=network_id, fingerprint=fingerprint,
+                                     subnets=[], ports=[]))
+            for network_id, fingerprint in [('a', 'fp-a'), ('b', 'fp-b'),
+                                            ('c', 'fp-c')]]
+        with mock.patch(DHCP_PLUGIN) as plug:
+            mock_plugin = mock.Mock()
+            mock_plugin.get_active_networks_fingerprints.return_value = (
+                fingerprints)
+            changed_networks = [mock.Mock(id=network_id)
+                                for network_id in expected_ids]
+            mock_plugin.get_active_networks_info.return_value = (
+                changed_networks)
+            plug.return_value = mock_plugin
+
+            agent = dhcp_agent.DhcpAgent(HOSTNAME)
+            for network in known_networks:
+                agent.cache.put(network)
+            attrs_to_mock = dict(
+                [(a, mock.DEFAULT) for a in
+                 ['safe_configure_dhcp_for_network', 'disable_dhcp_helper']])
+            with mock.patch.multiple(agent, **attrs_to_mock) as mocks:
+                agent.sync_state()
+                if expected_ids:
+                    args, kwargs = (
+                        mock_plugin.get_active_networks_info.call_args)
+                    self.assertEqual(sorted(expected_ids),
+                                     sorted(kwargs['network_ids']))
+                else:
+                    self.assertFalse(
+                        mock_plugin.get_active_networks_info.called)
+                self.assertEqual(
+                    [mock.call(network) for network in changed_networks],
+                    mocks['safe_configure_dhcp_for_network'].call_args_list)
+                mocks['disable_dhcp_helper'].assert_called_once_with('c')
+                self.assertFalse(agent.needs_resync)
+
+    def test_sync_state_fingerprints_unchanged(self):
+        self._test_sync_state_fingerprints({'a': 'fp-a', 'b': 'fp-b'}, [])
+
+    def test_sync_state_fingerprints_changed(self):
+        self._test_sync_state_fingerprints(
+            {'a': 'fp-a', 'b': 'fp-b2', 'd': 'fp-d'}, ['b', 'd'])
+
+    def test_sync_state_fingerprint_reset_by_port_update(self):
+        agent = dhcp_agent.DhcpAgent(HOSTNAME)
+        network = dhcp.NetModel(True, dict(id=fake_network.id,
+                                           fingerprint='fp',
+                                           subnets=[], ports=[]))
+        agent.cache.put(network)
+        agent.cache.put_port(fake_port1)
+        self.assertIsNone(network.fingerprint)
+
     def test_periodic_resync(self):
         dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
         with mock.patch.object(dhcp_agent.eventlet, 'spawn') as spawn:
             dhcp.periodic_resync()
             spawn.assert_called_once_with(dhcp._periodic_resync_helper)
 
+    def test_start_event_threads(self):
+        cfg.CONF.set_override('num_event_threads', 2)
+        dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
+        with mock.patch.object(dhcp_agent.eventlet, 'spawn') as spawn:
+            dhcp.start_event_threads()
+            self.assertEqual([mock.call(dhcp._event_thread)] * 2,
+                             spawn.call_args_list)
+
+    def test_process_next_event_failure(self):
+        dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
+        dhcp.queue.put('net-id', dhcp_agent.REFRESH)
+        with contextlib.nested(
+            mock.patch.object(dhcp, 'refresh_dhcp_helper',
+                              side_effect=RuntimeError),
+            mock.patch.object(dhcp_agent.LOG, 'exception')
+        ) as (refresh, log):
+            dhcp._process_next_event()
+            refresh.assert_called_once_with('net-id')
+            self.assertTrue(log.called)
+            self.assertTrue(dhcp.needs_resync)
+        # The network is done with and can be handed out again
+        dhcp.queue.put('net-id', dhcp_agent.RELOAD)
+        self.assertEqual(('net-id', dhcp_agent.RELOAD), dhcp.queue.get())
+
     def test_periodoc_resync_helper(self):
         with mock.patch.object(dhcp_agent.eventlet, 'sleep') as sleep:
             dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
@@ -670,26 +753,30 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
 
         with mock.patch.object(self.dhcp, 'enable_dhcp_helper') as enable:
             self.dhcp.network_create_end(None, payload)
-            enable.assertCalledOnceWith(fake_network.id)
+            self.dhcp._process_next_event()
+            enable.assert_called_once_with(fake_network.id)
 
     def test_network_update_end_admin_state_up(self):
         payload = dict(network=dict(id=fake_network.id, admin_state_up=True))
         with mock.patch.object(self.dhcp, 'enable_dhcp_helper') as enable:
             self.dhcp.network_update_end(None, payload)
-            enable.assertCalledOnceWith(fake_network.id)
+            self.dhcp._process_next_event()
+            enable.assert_called_once_with(fake_network.id)
 
     def test_network_update_end_admin_state_down(self):
         payload = dict(network=dict(id=fake_network.id, admin_state_up=False))
         with mock.patch.object(self.dhcp, 'disable_dhcp_helper') as disable:
             self.dhcp.network_update_end(None, payload)
-            disable.assertCalledOnceWith(fake_network.id)
+            self.dhcp._process_next_event()
+            disable.assert_called_once_with(fake_network.id)
 
     def test_network_delete_end(self):
         payload = dict(network_id=fake_network.id)
 
         with mock.patch.object(self.dhcp, 'disable_dhcp_helper') as disable:
             self.dhcp.network_delete_end(None, payload)
-            disable.assertCalledOnceWith(fake_network.id)
+            self.dhcp._process_next_event()
+            disable.assert_called_once_with(fake_network.id)
 
     def test_refresh_dhcp_helper_no_dhcp_enabled_networks(self):
         network = dhcp.NetModel(True, dict(id='net-id',
@@ -731,6 +818,7 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
         self.plugin.get_network_info.return_value = fake_network
 
         self.dhcp.subnet_update_end(None, payload)
+        self.dhcp._process_next_event()
 
         self.cache.assert_has_calls([mock.call.put(fake_network)])
         self.call_driver.assert_called_once_with('reload_allocations',
@@ -748,6 +836,7 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
         self.plugin.get_network_info.return_value = new_state
 
         self.dhcp.subnet_update_end(None, payload)
+        self.dhcp._process_next_event()
 
         self.cache.assert_has_calls([mock.call.put(new_state)])
         self.call_driver.assert_called_once_with('restart',
@@ -766,6 +855,7 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
         self.plugin.get_network_info.return_value = fake_network
 
         self.dhcp.subnet_delete_end(None, payload)
+        self.dhcp._process_next_event()
 
         self.cache.assert_has_calls([
             mock.call.get_network_by_subnet_id(
@@ -780,6 +870,7 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
         self.cache.get_network_by_id.return_value = fake_network
         self.cache.get_port_by_id.return_value = fake_port2
         self.dhcp.port_update_end(None, payload)
+        self.dhcp._process_next_event()
         self.cache.assert_has_calls(
             [mock.call.get_network_by_id(fake_port2.network_id),
              mock.call.put_port(mock.ANY)])
@@ -793,6 +884,7 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
         updated_fake_port1.fixed_ips[0].ip_address = '172.9.9.99'
         self.cache.get_port_by_id.return_value = updated_fake_port1
         self.dhcp.port_update_end(None, payload)
+        self.dhcp._process_next_event()
         self.cache.assert_has_calls(
             [mock.call.get_network_by_id(fake_port1.network_id),
              mock.call.put_port(mock.ANY)])
@@ -805,6 +897,7 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
         self.cache.get_port_by_id.return_value = fake_port2
 
         self.dhcp.port_delete_end(None, payload)
+        self.dhcp._process_next_event()
         self.cache.assert_has_calls(
             [mock.call.get_port_by_id(fake_port2.id),
              mock.call.get_network_by_id(fake_network.id),
@@ -819,8 +912,34 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
         self.dhcp.port_delete_end(None, payload)
 
         self.cache.assert_has_calls([mock.call.get_port_by_id('unknown')])
+        self.assertEqual(0, len(self.dhcp.queue))
         self.assertEqual(self.call_driver.call_count, 0)
 
+    def test_port_update_end_burst(self):
+        self.cache.get_network_by_id.return_value = fake_network
+        for port in (fake_port1, fake_port2, fake_port1):
+            self.dhcp.port_update_end(None, dict(port=vars(port)))
+        self.assertEqual(1, len(self.dhcp.queue))
+        self.dhcp._process_next_event()
+        self.assertEqual(3, self.cache.put_port.call_count)
+        self.call_driver.assert_called_once_with('reload_allocations',
+                                                 fake_network)
+
+    def test_network_delete_end_before_port_update_end(self):
+        other_network = dhcp.NetModel(True, dict(id='other-net-id',
+                                                 subnets=[], ports=[]))
+        self.cache.get_network_by_id.return_value = other_network
+        self.dhcp.port_update_end(None, dict(port=vars(fake_port2)))
+        self.dhcp.network_delete_end(None,
+                                     dict(network_id=fake_network.id))
+        with mock.patch.object(self.dhcp, 'disable_dhcp_helper') as disable:
+            self.dhcp._process_next_event()
+            disable.assert_called_once_with(fake_network.id)
+        self.assertFalse(self.call_driver.called)
+        self.dhcp._process_next_event()
+        self.call_driver.assert_called_once_with('reload_allocations',
+                                                 other_network)
+
 
 class TestDhcpPluginApiProxy(base.BaseTestCase):
     def setUp(self):
@@ -856,10 +975,49 @@ class TestDhcpPluginApiProxy(base.BaseTestCase):
         self.call.return_value = None
         self.assertIsNone(self.proxy.get_dhcp_port('netid', 'devid'))
 
+    def test_get_active_networks_fingerprints(self):
+        self.call.return_value = {'a': 'fp'}
+        self.assertEqual({'a': 'fp'},
+                         self.proxy.get_active_networks_fingerprints())
+        self.make_msg.assert_called_once_with(
+            'get_active_networks_fingerprints', host='foo')
+        self.assertEqual(self.proxy.FINGERPRINTS_VERSION,
+                         self.call.call_args[1]['version'])
+
+    def _test_get_active_networks_fingerprints_unsupported(self, exc_type):
+        self.call.side_effect = common.RemoteError(exc_type)
+        self.assertIsNone(self.proxy.get_active_networks_fingerprints())
+        self.assertIsNone(self.proxy.get_active_networks_fingerprints())
+        self.assertEqual(1, self.call.call_count)
+
+    def test_get_active_networks_fingerprints_unsupported_version(self):
+        self._test_get_active_networks_fingerprints_unsupported(
+            'UnsupportedRpcVersion')
+
+    def test_get_active_networks_fingerprints_unsupported_method(self):
+        self._test_get_active_networks_fingerprints_unsupported(
+            'AttributeError')
+
+    def test_get_active_networks_fingerprints_remote_error(self):
+        self.call.side_effect = common.RemoteError('Exception')
+        self.assertRaises(common.RemoteError,
+                          self.proxy.get_active_networks_fingerprints)
+        self.assertTrue(self.proxy.fingerprints_supported)
+
     def test_get_active_networks_info(self):
         self.proxy.get_active_networks_info()
         self.make_msg.assert_called_once_with('get_active_networks_info',
                                               host='foo')
+        self.assertEqual(self.proxy.BASE_RPC_API_VERSION,
+                         self.call.call_args[1]['version'])
+
+    def test_get_active_networks_info_network_ids(self):
+        self.proxy.get_active_networks_info(network_ids=['a'])
+        self.make_msg.assert_called_once_with('get_active_networks_info',
+                                              network_ids=['a'],
+                                              host='foo')
+        self.assertEqual(self.proxy.FINGERPRINTS_VERSION,
+                         self.call.call_args[1]['version'])
 
     def test_create_dhcp_port(self):
         port_body = (
@@ -920,6 +1078,88 @@ class TestDhcpPluginApiProxy(base.BaseTestCase):
                                               host='foo')
 
 
+class TestNetworkEventQueue(base.BaseTestCase):
+    def setUp(self):
+        super(TestNetworkEventQueue, self).setUp()
+        self.queue = dhcp_agent.NetworkEventQueue()
+
+    def test_get_in_queued_order(self):
+        self.queue.put('net-1', dhcp_agent.RELOAD)
+        self.queue.put('net-2', dhcp_agent.REFRESH)
+        self.assertEqual(('net-1', dhcp_agent.RELOAD), self.queue.get())
+        self.assertEqual(('net-2', dhcp_agent.REFRESH), self.queue.get())
+        self.assertEqual(0, len(self.queue))
+
+    def test_get_deletes_first(self):
+        self.queue.put('net-1', dhcp_agent.RELOAD)
+        self.queue.put('net-2', dhcp_agent.RELOAD)
+        self.queue.put('net-3', dhcp_agent.DISABLE,
+                       dhcp_agent.DELETE_PRIORITY)
+        self.queue.put('net-2', dhcp_agent.RELOAD,
+                       dhcp_agent.DELETE_PRIORITY)
+        self.assertEqual(['net-2', 'net-3', 'net-1'],
+                         [self.queue.get()[0] for i in range(3)])
+
+    def _test_merge(self, helpers, expected):
+        for helper in helpers:
+            self.queue.put('net-id', helper)
+        self.assertEqual(1, len(self.queue))
+        self.assertEqual(('net-id', expected), self.queue.get())
+        self.assertEqual(len(helpers) - 1, self.queue.merged_events)
+
+    def test_merge_reloads(self):
+        self._test_merge([dhcp_agent.RELOAD] * 3, dhcp_agent.RELOAD)
+
+    def test_merge_reload_into_refresh(self):
+        self._test_merge([dhcp_agent.REFRESH, dhcp_agent.RELOAD],
+                         dhcp_agent.REFRESH)
+
+    def test_merge_refresh_into_reload(self):
+        self._test_merge([dhcp_agent.RELOAD, dhcp_agent.REFRESH],
+                         dhcp_agent.REFRESH)
+
+    def test_merge_refresh_into_disable(self):
+        self._test_merge([dhcp_agent.DISABLE, dhcp_agent.REFRESH],
+                         dhcp_agent.DISABLE)
+
+    def test_merge_enable_after_disable(self):
+        self._test_merge([dhcp_agent.ENABLE, dhcp_agent.DISABLE,
+                          dhcp_agent.RELOAD, dhcp_agent.ENABLE],
+                         dhcp_agent.ENABLE)
+
+    def test_get_skips_handled_network(self):
+        self.queue.put('net-1', dhcp_agent.RELOAD)
+        self.assertEqual(('net-1', dhcp_agent.RELOAD), self.queue.get())
+        self.queue.put('net-1', dhcp_agent.REFRESH,
+                       dhcp_agent.DELETE_PRIORITY)
+        self.queue.put('net-2', dhcp_agent.RELOAD)
+        self.assertEqual(('net-2', dhcp_agent.RELOAD), self.queue.get())
+        self.queue.done('net-1')
+        self.assertEqual(('net-1', dhcp_agent.REFRESH), self.queue.get())
+
+    def test_get_state(self):
+        with mock.patch.object(dhcp_agent.time, 'time') as time:
+            time.return_value = 10.0
+            self.queue.put('net-1', dhcp_agent.RELOAD)
+            self.queue.put('net-1', dhcp_agent.RELOAD)
+            self.queue.put('net-2', dhcp_agent.RELOAD)
+            self.queue.get()
+            time.return_value = 10.5
+            self.queue.done('net-1')
+            self.assertEqual({'queued_networks': 1,
+                              'merged_events': 1,
+                              'handled_events': 1,
+                              'event_latency_avg': 0.5,
+                              'event_latency_max': 0.5},
+                             self.queue.get_state())
+            self.assertEqual({'queued_networks': 1,
+                              'merged_events': 1,
+                              'handled_events': 1,
+                              'event_latency_avg': 0,
+                              'event_latency_max': 0},
+                             self.queue.get_state())
+
+
 class TestNetworkCache(base.BaseTestCase):
     def test_put_network(self):
         nc = dhcp_agent.NetworkCache()
@@ -954,11 +1194,13 @@ class TestNetworkCache(base.BaseTestCase):
         nc.subnet_lookup = {fake_subnet1.id: fake_network.id,
                             fake_subnet2.id: fake_network.id}
         nc.port_lookup = {fake_port1.id: fake_network.id}
+        nc.port_indexes = {fake_network.id: {fake_port1.id: 0}}
         nc.remove(fake_network)
 
         self.assertEqual(len(nc.cache), 0)
         self.assertEqual(len(nc.subnet_lookup), 0)
         self.assertEqual(len(nc.port_lookup), 0)
+        self.assertEqual(len(nc.port_indexes), 0)
 
     def test_get_network_by_id(self):
         nc = dhcp_agent.NetworkCache()
@@ -1029,6 +1271,26 @@ class TestNetworkCache(base.BaseTestCase):
         nc.put(fake_network)
         self.assertEqual(nc.get_port_by_id(fake_port1.id), fake_port1)
 
+    def test_remove_port_moves_last_port(self):
+        ports = [dhcp.PortModel(dict(id=port_id, network_id='net-id'))
+                 for port_id in ('port-1', 'port-2', 'port-3')]
+        fake_net = dhcp.NetModel(True, dict(id='net-id', subnets=[],
+                                            ports=list(ports)))
+        nc = dhcp_agent.NetworkCache()
+        nc.put(fake_net)
+        nc.remove_port(ports[0])
+
+        self.assertEqual([ports[2], ports[1]], fake_net.ports)
+        self.assertEqual({'port-3': 0, 'port-2': 1},
+                         nc.port_indexes['net-id'])
+        updated_port = dhcp.PortModel(dict(id='port-3', network_id='net-id'))
+        nc.put_port(updated_port)
+        self.assertEqual([updated_port, ports[1]], fake_net.ports)
+        self.assertEqual(updated_port, nc.get_port_by_id('port-3'))
+        nc.remove_port(ports[1])
+        self.assertEqual([updated_port], fake_net.ports)
+        self.assertIsNone(nc.get_port_by_id('port-2'))
+
 
 class FakePort1:
     id = 'eeeeeeee-eeee-eeee-eeee-eeeeeeeeeeee'
@@ -1447,7 +1709,44 @@ class TestDictModel(base.BaseTestCase):
         self.assertEqual(m.a[1].c, 3)
 
 
+class TestSlotModel(base.BaseTestCase):
+    def test_port(self):
+        port = dhcp.PortModel(dict(
+            id='port-id', name='port', mac_address='fa:16:3e:00:00:01',
+            fixed_ips=[dict(subnet_id='subnet-id', ip_address='10.0.0.2')],
+            extra_dhcp_opts=[dict(opt_name='tftp-server',
+                                  opt_value='10.0.0.1')]))
+
+        self.assertEqual('port-id', port.id)
+        self.assertEqual('fa:16:3e:00:00:01', port.mac_address)
+        self.assertIsInstance(port.fixed_ips[0], dhcp.FixedIpModel)
+        self.assertEqual('10.0.0.2', port.fixed_ips[0].ip_address)
+        self.assertEqual('tftp-server', port.extra_dhcp_opts[0].opt_name)
+        self.assertFalse(hasattr(port, 'name'))
+        self.assertFalse(hasattr(port, 'device_id'))
+        self.assertFalse(hasattr(port, '__dict__'))
+
+    def test_subnet(self):
+        subnet = dhcp.SubnetModel(dict(
+            id='subnet-id', cidr='10.0.0.0/24', allocation_pools=[],
+            host_routes=[dict(destination='0.0.0.0/0',
+                              nexthop='10.0.0.1')]))
+
+        self.assertEqual('10.0.0.0/24', subnet.cidr)
+        self.assertEqual('10.0.0.1', subnet.host_routes[0].nexthop)
+        self.assertFalse(hasattr(subnet, 'allocation_pools'))
+
+
 class TestNetModel(base.BaseTestCase):
+    def test_compact_subnets_and_ports(self):
+        network = dhcp.NetModel(True, dict(id='foo',
+                                           subnets=[dict(id='subnet-id')],
+                                           ports=[dict(id='port-id'),
+                                                  fake_port1]))
+        self.assertIsInstance(network.subnets[0], dhcp.SubnetModel)
+        self.assertIsInstance(network.ports[0], dhcp.PortModel)
+        self.assertIs(fake_port1, network.ports[1])
+
     def test_ns_name(self):
         network = dhcp.NetModel(True, {'id': 'foo'})
         self.assertEqual(network.namespace, 'qdhcp-foo')
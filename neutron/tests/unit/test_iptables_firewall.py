@@ -1223,3 +1223,80 @@ class IptablesFirewallTestCase(base.BaseTestCase):
                  mock.call.add_rule('ofake_dev', '-j $sg-fallback'),
                  mock.call.add_rule('sg-chain', '-j ACCEPT')]
         self.v4filter_inst.assert_has_calls(calls)
+
+
+class IptablesFirewallIpsetTestCase(base.BaseTestCase):
+    def setUp(self):
+        super(IptablesFirewallIpsetTestCase, self).setUp()
+        cfg.CONF.register_opts(a_cfg.ROOT_HELPER_OPTS, 'AGENT')
+        self.config(enable_ipset=True, group='SECURITYGROUP')
+        self.utils_exec = mock.patch(
+            'neutron.agent.linux.utils.execute').start()
+        iptables_cls = mock.patch(
+            'neutron.agent.linux.iptables_manager.IptablesManager').start()
+        self.v4filter_inst = mock.Mock()
+        iptables_inst = mock.Mock()
+        iptables_inst.ipv4 = {'filter': self.v4filter_inst}
+        iptables_inst.ipv6 = {'filter': mock.Mock()}
+        iptables_cls.return_value = iptables_inst
+
+        self.firewall = iptables_firewall.IptablesFirewallDriver()
+        self.remote_sg_id = _uuid()
+        self.set_name = 'NET4' + self.remote_sg_id[:27]
+
+    def _fake_port_with_members(self, *member_ips):
+        return {'device': 'tapfake_dev',
+                'mac_address': 'ff:ff:ff:ff:ff:ff',
+                'fixed_ips': [FAKE_IP['IPv4'], FAKE_IP['IPv6']],
+                'security_group_rules': [
+                    {'ethertype': 'IPv4',
+                     'direction': 'ingress',
+                     'protocol': 'tcp',
+                     'remote_group_id': self.remote_sg_id,
+                     'source_ip_prefix': '%s/32' % ip}
+                    for ip in member_ips]}
+
+    def test_prepare_port_filter_with_remote_group(self):
+        port = self._fake_port_with_members('10.0.0.2', '10.0.0.3')
+        self.firewall.prepare_port_filter(port)
+
+        rule = ('-p tcp -m tcp -m set --match-set %s src -j RETURN' %
+                self.set_name)
+        rule_calls = [c for c in self.v4filter_inst.add_rule.call_args_list
+                      if c == mock.call('ifake_dev', rule)]
+        self.assertEqual(1, len(rule_calls))
+        self.utils_exec.assert_called_once_with(
+            ['ipset', 'restore', '-exist'],
+            process_input=('create %(name)s hash:net family inet\n'
+                           'flush %(name)s\n'
+                           'add %(name)s 10.0.0.2/32\n'
+                           'add %(name)s 10.0.0.3/32\n' %
+                           {'name': self.set_name}),
+            root_helper=mock.ANY)
+
+    def test_update_port_filter_refreshes_members(self):
+        self.firewall.prepare_port_filter(
+            self._fake_port_with_members('10.0.0.2', '10.0.0.3'))
+        self.utils_exec.reset_mock()
+
+        self.firewall.update_port_filter(
+            self._fake_port_with_members('10.0.0.3', '10.0.0.4'))
+
+        self.utils_exec.assert_called_once_with(
+            ['ipset', 'restore', '-exist'],
+            process_input=('add %(name)s 10.0.0.4/32\n'
+                           'del %(name)s 10.0.0.2/32\n' %
+                           {'name': self.set_name}),
+            root_helper=mock.ANY)
+
+    def test_remove_port_filter_destroys_unused_set(self):
+        port = self._fake_port_with_members('10.0.0.2')
+        self.firewall.prepare_port_filter(port)
+        self.utils_exec.reset_mock()
+
+        self.firewall.remove_port_filter(port)
+
+        self.utils_exec.assert_called_once_with(
+            ['ipset', 'destroy', self.set_name], process_input=None,
+            root_helper=mock.ANY)
+        self.assertEqual({}, self.firewall.ipset.sets)
@@ -616,3 +616,100 @@ class IptablesManagerStateLessTestCase(base.BaseTestCase):
 
     def test_nat_not_found(self):
         self.assertNotIn('nat', self.iptables.ipv4)
+
+
+class IptablesManagerIncrementalTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(IptablesManagerIncrementalTestCase, self).setUp()
+        self.config(iptables_incremental_apply=True, group='AGENT')
+        self.root_helper = 'sudo'
+        self.iptables = (iptables_manager.
+                         IptablesManager(root_helper=self.root_helper))
+        self.execute = mock.patch.object(self.iptables, "execute").start()
+        # The first apply is always a full save/restore
+        self.iptables.apply()
+        self.execute.reset_mock()
+
+    def _restore_input(self):
+        self.assertEqual(1, self.execute.call_count)
+        args, kwargs = self.execute.call_args
+        self.assertEqual((['iptables-restore', '-n'],), args)
+        return kwargs['process_input']
+
+    def test_first_apply_is_full(self):
+        iptables = iptables_manager.IptablesManager(
+            root_helper=self.root_helper)
+        with mock.patch.object(iptables, "execute") as execute:
+            iptables.apply()
+            execute.assert_any_call(['iptables-save', '-c'],
+                                    root_helper=self.root_helper)
+
+    def test_apply_without_changes(self):
+        self.iptables.apply()
+        self.assertFalse(self.execute.called)
+
+    def test_add_chain_and_rules(self):
+        self.iptables.ipv4['filter'].add_chain('filter')
+        self.iptables.ipv4['filter'].add_rule('filter', '-j DROP')
+        self.iptables.ipv4['filter'].add_rule('INPUT', '-s 0/0 -d 192.168.0.2',
+                                              wrap=False)
+        self.iptables.apply()
+
+        self.assertEqual('*filter\n'
+                         '-N %(bn)s-filter\n'
+                         '-I INPUT 2 -s 0/0 -d 192.168.0.2\n'
+                         '-A %(bn)s-filter -j DROP\n'
+                         'COMMIT\n' % IPTABLES_ARG,
+                         self._restore_input())
+
+    def test_remove_chain_and_rules(self):
+        self.iptables.ipv4['filter'].add_chain('filter')
+        self.iptables.ipv4['filter'].add_rule('FORWARD', '-j $filter')
+        self.iptables.apply()
+        self.execute.reset_mock()
+
+        self.iptables.ipv4['filter'].remove_chain('filter')
+        self.iptables.apply()
+
+        self.assertEqual('*filter\n'
+                         '-D %(bn)s-FORWARD -j %(bn)s-filter\n'
+                         '-F %(bn)s-filter\n'
+                         '-X %(bn)s-filter\n'
+                         'COMMIT\n' % IPTABLES_ARG,
+                         self._restore_input())
+
+    def test_insert_top_rule(self):
+        self.iptables.ipv4['filter'].add_rule('INPUT', '-j ACCEPT')
+        self.iptables.ipv4['filter'].add_rule('INPUT', '-j DROP', top=True)
+        self.iptables.apply()
+
+        self.assertEqual('*filter\n'
+                         '-A %(bn)s-INPUT -j DROP\n'
+                         '-A %(bn)s-INPUT -j ACCEPT\n'
+                         'COMMIT\n' % IPTABLES_ARG,
+                         self._restore_input())
+        self.execute.reset_mock()
+
+        self.iptables.ipv4['filter'].add_rule('INPUT', '-j LOG', top=True)
+        self.iptables.apply()
+
+        self.assertEqual('*filter\n'
+                         '-I %(bn)s-INPUT 2 -j LOG\n'
+                         'COMMIT\n' % IPTABLES_ARG,
+                         self._restore_input())
+
+    def test_failed_incremental_apply_falls_back_to_full(self):
+        self.execute.side_effect = [RuntimeError, '', None, '', None]
+        self.iptables.ipv4['filter'].add_chain('filter')
+        self.iptables.apply()
+
+        self.execute.assert_any_call(['iptables-save', '-c'],
+                                     root_helper=self.root_helper)
+
+    def test_periodic_full_sync(self):
+        with mock.patch.object(iptables_manager.timeutils,
+                               'is_older_than', return_value=True):
+            self.iptables.apply()
+        self.execute.assert_any_call(['iptables-save', '-c'],
+                                     root_helper=self.root_helper)
@@ -920,6 +920,62 @@ class TestBasicRouterOperations(base.BaseTestCase):
         # verify that will set fullsync
         self.assertIn(FAKE_ID, agent.updated_routers)
 
+    def test_floatingips_updated(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        agent.floatingips_updated(None, FAKE_ID, 2, [], ['fip'])
+        self.assertEqual({FAKE_ID: [(2, [], ['fip'])]},
+                         agent.updated_floatingips)
+        self.assertNotIn(FAKE_ID, agent.updated_routers)
+
+    def _prepare_router_with_floating_ip(self, agent, revision):
+        router = self._prepare_router_data()
+        router['revision'] = revision
+        router[l3_constants.FLOATINGIP_KEY] = [
+            {'id': 'fip1', 'floating_ip_address': '15.1.2.3',
+             'fixed_ip_address': '35.4.0.10'}]
+        agent._router_added(router['id'], router)
+        ri = agent.router_info[router['id']]
+        ri.ex_gw_port = router['gw_port']
+        return ri
+
+    def _process_floatingip_updates(self, agent, ri, updates):
+        with mock.patch.object(agent,
+                               '_process_router_floating_ips') as process:
+            agent._process_floatingip_updates({ri.router_id: updates})
+        return process
+
+    def test_process_floatingip_updates(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        ri = self._prepare_router_with_floating_ip(agent, 1)
+        fip2 = {'id': 'fip2', 'floating_ip_address': '15.1.2.4',
+                'fixed_ip_address': '35.4.0.11'}
+        # The notifications of consecutive revisions may arrive unordered
+        process = self._process_floatingip_updates(
+            agent, ri, [(3, [], ['fip1']), (2, [fip2], [])])
+        process.assert_called_once_with(ri, ri.ex_gw_port)
+        self.assertEqual(3, ri.revision)
+        self.assertEqual([fip2], ri.router[l3_constants.FLOATINGIP_KEY])
+        self.assertNotIn(ri.router_id, agent.updated_routers)
+
+    def test_process_floatingip_updates_already_fetched(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        ri = self._prepare_router_with_floating_ip(agent, 2)
+        process = self._process_floatingip_updates(
+            agent, ri, [(2, [], ['fip1'])])
+        self.assertFalse(process.called)
+        self.assertEqual(2, ri.revision)
+        self.assertEqual(1, len(ri.router[l3_constants.FLOATINGIP_KEY]))
+
+    def test_process_floatingip_updates_missed_revision(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        ri = self._prepare_router_with_floating_ip(agent, 1)
+        process = self._process_floatingip_updates(
+            agent, ri, [(3, [], ['fip1'])])
+        self.assertFalse(process.called)
+        self.assertEqual(1, ri.revision)
+        self.assertEqual(1, len(ri.router[l3_constants.FLOATINGIP_KEY]))
+        self.assertIn(ri.router_id, agent.updated_routers)
+
     def test_process_router_delete(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
         ex_gw_port = {'id': _uuid(),
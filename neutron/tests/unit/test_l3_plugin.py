@@ -20,11 +20,14 @@ import copy
 import mock
 import netaddr
 from oslo.config import cfg
+import sqlalchemy as sa
 from webob import exc
 
+from neutron.api.rpc.agentnotifiers import l3_rpc_agent_api
 from neutron.api.v2 import attributes
 from neutron.common import constants as l3_constants
 from neutron.common import exceptions as n_exc
+from neutron.common import topics
 from neutron import context
 from neutron.db import api as qdbapi
 from neutron.db import db_base_plugin_v2
@@ -246,11 +249,16 @@ class TestL3NatBasePlugin(db_base_plugin_v2.NeutronDbPluginV2,
     def delete_port(self, context, id, l3_port_check=True):
         plugin = manager.NeutronManager.get_service_plugins().get(
             service_constants.L3_ROUTER_NAT)
-        if plugin:
-            if l3_port_check:
-                plugin.prevent_l3_port_deletion(context, id)
-            plugin.disassociate_floatingips(context, id)
-        return super(TestL3NatBasePlugin, self).delete_port(context, id)
+        if plugin and l3_port_check:
+            plugin.prevent_l3_port_deletion(context, id)
+        disassociated = {}
+        with context.session.begin(subtransactions=True):
+            if plugin:
+                disassociated = plugin.disassociate_floatingips(
+                    context, id, do_notify=False)
+            super(TestL3NatBasePlugin, self).delete_port(context, id)
+        if disassociated:
+            plugin.notify_floatingips_disassociated(context, disassociated)
 
 
 # This plugin class is for tests with plugin that integrates L3.
@@ -1805,6 +1813,48 @@ class L3AgentDbTestCaseBase(L3NatTestCaseMixin):
             self.assertIsNotNone(floatingips[0]['fixed_ip_address'])
             self.assertIsNotNone(floatingips[0]['router_id'])
 
+    def _count_sync_data_queries(self, router_ids):
+        statements = []
+        engine = qdbapi.get_engine()
+
+        def _count(conn, cursor, statement, *args):
+            statements.append(statement)
+        sa.event.listen(engine, 'before_cursor_execute', _count)
+        try:
+            routers = self.plugin.get_sync_data(context.get_admin_context(),
+                                                router_ids)
+        finally:
+            sa.event.remove(engine, 'before_cursor_execute', _count)
+        self.assertEqual(len(router_ids), len(routers))
+        for router in routers:
+            self.assertIn('subnet', router['gw_port'])
+            interfaces = router[l3_constants.INTERFACE_KEY]
+            self.assertEqual(1, len(interfaces))
+            self.assertIn('subnet', interfaces[0])
+        return len(statements)
+
+    def test_l3_agent_routers_query_count(self):
+        with contextlib.nested(self.router(), self.router(),
+                               self.subnet(cidr='10.0.1.0/24'),
+                               self.subnet(cidr='10.0.2.0/24'),
+                               self.subnet(cidr='10.0.3.0/24')) as (
+                                   r1, r2, public_sub, s1, s2):
+            self._set_net_external(public_sub['subnet']['network_id'])
+            router_ids = [r1['router']['id'], r2['router']['id']]
+            for router_id, sub in zip(router_ids, (s1, s2)):
+                self._add_external_gateway_to_router(
+                    router_id, public_sub['subnet']['network_id'])
+                self._router_interface_action('add', router_id,
+                                              sub['subnet']['id'], None)
+            one_router = self._count_sync_data_queries(router_ids[:1])
+            all_routers = self._count_sync_data_queries(router_ids)
+            self.assertEqual(one_router, all_routers)
+            for router_id, sub in zip(router_ids, (s1, s2)):
+                self._router_interface_action('remove', router_id,
+                                              sub['subnet']['id'], None)
+                self._remove_external_gateway_from_router(
+                    router_id, public_sub['subnet']['network_id'])
+
     def _test_notify_op_agent(self, target_func, *args):
         l3_rpc_agent_api_str = (
             'neutron.api.rpc.agentnotifiers.l3_rpc_agent_api.L3AgentNotifyAPI')
@@ -1858,15 +1908,94 @@ class L3AgentDbTestCaseBase(L3NatTestCaseMixin):
                 self._test_interfaces_op_agent, r)
 
     def _test_floatingips_op_agent(self, notifyApi):
-        with self.floatingip_with_assoc():
-            pass
-        # add gateway, add interface, associate, deletion of floatingip,
-        # delete gateway, delete interface
-        self.assertEqual(6, notifyApi.routers_updated.call_count)
+        with self.floatingip_with_assoc() as fip:
+            fip_id = fip['floatingip']['id']
+            router_id = fip['floatingip']['router_id']
+        # add gateway, add interface, delete gateway, delete interface
+        self.assertEqual(4, notifyApi.routers_updated.call_count)
+        # associate, deletion of floatingip
+        self.assertEqual(2, notifyApi.floatingips_updated.call_count)
+        (create_args, _), (delete_args, _) = (
+            notifyApi.floatingips_updated.call_args_list)
+        self.assertEqual((router_id, 1), create_args[1:3])
+        self.assertEqual([fip_id], [f['id'] for f in create_args[3]])
+        self.assertEqual([], create_args[4])
+        self.assertEqual((router_id, 2, [], [fip_id]), delete_args[1:])
 
     def test_floatingips_op_agent(self):
         self._test_notify_op_agent(self._test_floatingips_op_agent)
 
+    def test_floatingips_updated_without_agent_scheduler(self):
+        plugin = manager.NeutronManager.get_service_plugins()[
+            service_constants.L3_ROUTER_NAT]
+        if 'l3_agent_scheduler' in plugin.supported_extension_aliases:
+            self.skipTest("The plugin schedules the routers")
+        notifier = l3_rpc_agent_api.L3AgentNotifyAPI()
+        with mock.patch.object(notifier, 'fanout_cast') as fanout_cast:
+            notifier.floatingips_updated(context.get_admin_context(),
+                                         'router_id', 1, [], ['fip_id'])
+        # The versions of the agents are not known
+        fanout_cast.assert_called_once_with(
+            mock.ANY, notifier.make_msg('routers_updated',
+                                        routers=['router_id']),
+            topic=topics.L3_AGENT)
+
+    def _test_floatingip_disassociate_op_agent(self, notifyApi):
+        with self.floatingip_with_assoc() as fip:
+            fip_id = fip['floatingip']['id']
+            router_id = fip['floatingip']['router_id']
+            self._update('floatingips', fip_id,
+                         {'floatingip': {'port_id': None}})
+        # associate, disassociate, the deletion is not notified
+        self.assertEqual(2, notifyApi.floatingips_updated.call_count)
+        update_args = notifyApi.floatingips_updated.call_args[0]
+        self.assertEqual((router_id, 2, [], [fip_id]), update_args[1:])
+
+    def test_floatingip_disassociate_op_agent(self):
+        self._test_notify_op_agent(self._test_floatingip_disassociate_op_agent)
+
+    def _test_floatingip_port_delete_op_agent(self, notifyApi):
+        with self.port(no_delete=True) as p:
+            port_id = p['port']['id']
+            with self.floatingip_with_assoc(port_id=port_id) as fip:
+                fip_id = fip['floatingip']['id']
+                router_id = fip['floatingip']['router_id']
+                plugin = manager.NeutronManager.get_plugin()
+                plugin.delete_port(context.get_admin_context(), port_id)
+                update_args = notifyApi.floatingips_updated.call_args[0]
+                self.assertEqual((router_id, 2, [], [fip_id]),
+                                 update_args[1:])
+
+    def test_floatingip_port_delete_op_agent(self):
+        self._test_notify_op_agent(self._test_floatingip_port_delete_op_agent)
+
+    def _test_floatingip_port_delete_rollback_op_agent(self, notifyApi):
+        with self.floatingip_with_assoc() as fip:
+            fip_id = fip['floatingip']['id']
+            router_id = fip['floatingip']['router_id']
+            port_id = fip['floatingip']['port_id']
+            notifyApi.reset_mock()
+            plugin = manager.NeutronManager.get_plugin()
+            with mock.patch.object(db_base_plugin_v2.NeutronDbPluginV2,
+                                   'delete_port',
+                                   side_effect=RuntimeError):
+                self.assertRaises(RuntimeError, plugin.delete_port,
+                                  context.get_admin_context(), port_id)
+            # The rolled back disassociation is not notified
+            self.assertFalse(notifyApi.floatingips_updated.called)
+            fip = self._show('floatingips', fip_id)
+            self.assertEqual(port_id, fip['floatingip']['port_id'])
+
+            self._update('floatingips', fip_id,
+                         {'floatingip': {'port_id': None}})
+            # The next change gets the revision following the committed one
+            update_args = notifyApi.floatingips_updated.call_args[0]
+            self.assertEqual((router_id, 2, [], [fip_id]), update_args[1:])
+
+    def test_floatingip_port_delete_rollback_op_agent(self):
+        self._test_notify_op_agent(
+            self._test_floatingip_port_delete_rollback_op_agent)
+
 
 class L3BaseForIntTests(test_db_plugin.NeutronDbPluginV2TestCase):
 
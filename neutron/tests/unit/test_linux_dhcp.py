@@ -406,6 +406,8 @@ class TestBase(base.BaseTestCase):
         self.execute_p = mock.patch('neutron.agent.linux.utils.execute')
         self.safe = self.replace_p.start()
         self.execute = self.execute_p.start()
+        mock.patch.dict(dhcp.Dnsmasq._conf_file_digests, clear=True).start()
+        mock.patch.dict(dhcp.Dnsmasq._host_entries, clear=True).start()
 
 
 class TestDhcpBase(TestBase):
@@ -1069,6 +1071,104 @@ tag:tag1,249,%s,%s""".lstrip() % (fake_v6,
             ])
             mock_open.assert_called_once_with('/proc/5/cmdline', 'r')
 
+    def _reload_allocations(self, dm):
+        with contextlib.nested(
+            mock.patch.object(dhcp.Dnsmasq, 'active'),
+            mock.patch.object(dhcp.Dnsmasq, 'pid'),
+            mock.patch.object(dhcp.Dnsmasq, 'interface_name'),
+            mock.patch.object(dhcp.Dnsmasq, '_make_subnet_interface_ip_map',
+                              return_value={}),
+            mock.patch.object(dm, 'device_manager')
+        ) as (active, pid, interface_name, ip_map, device_manager):
+            active.__get__ = mock.Mock(return_value=True)
+            pid.__get__ = mock.Mock(return_value=5)
+            interface_name.__get__ = mock.Mock(return_value='tap12345678-12')
+            dm.reload_allocations()
+        self.assertTrue(device_manager.update.called)
+
+    def test_reload_allocations_unchanged(self):
+        fake_net = FakeDualNetwork()
+        self._reload_allocations(
+            dhcp.Dnsmasq(self.conf, fake_net, version=float(2.59)))
+        self.safe.reset_mock()
+        self.execute.reset_mock()
+
+        self._reload_allocations(
+            dhcp.Dnsmasq(self.conf, fake_net, version=float(2.59)))
+        self.assertFalse(self.safe.called)
+        self.assertFalse(self.execute.called)
+
+    def test_reload_allocations_port_added(self):
+        fake_net = FakeDualNetwork()
+        self._reload_allocations(
+            dhcp.Dnsmasq(self.conf, fake_net, version=float(2.59)))
+        self.safe.reset_mock()
+        self.execute.reset_mock()
+
+        fake_net.ports = fake_net.ports + [FakePortMultipleAgents1()]
+        self._reload_allocations(
+            dhcp.Dnsmasq(self.conf, fake_net, version=float(2.59)))
+        # The options file is left as it is
+        self.assertEqual(
+            ['/dhcp/%s/%s' % (fake_net.id, kind)
+             for kind in ('host', 'addn_hosts')],
+            [call[0][0] for call in self.safe.call_args_list])
+        self.execute.assert_called_once_with(['kill', '-HUP', 5], 'sudo')
+
+    def test_reload_allocations_after_remove_config_files(self):
+        fake_net = FakeDualNetwork()
+        self._reload_allocations(
+            dhcp.Dnsmasq(self.conf, fake_net, version=float(2.59)))
+        self.safe.reset_mock()
+
+        dm = dhcp.Dnsmasq(self.conf, fake_net, version=float(2.59))
+        with mock.patch('shutil.rmtree'):
+            dm._remove_config_files()
+        self._reload_allocations(dm)
+        self.assertEqual(3, self.safe.call_count)
+
+    def test_get_host_entries_rebuilds_changed_ports(self):
+        fake_net = FakeDualNetwork()
+        dnsmasq = dhcp.Dnsmasq(self.conf, fake_net, version=float(2.59))
+        entries = dnsmasq._get_host_entries()
+
+        port = FakePort1()
+        port.fixed_ips = [FakeIPAllocation('192.168.0.9')]
+        fake_net.ports = [port] + fake_net.ports[1:]
+        with mock.patch.object(dnsmasq, '_make_host_entry',
+                               wraps=dnsmasq._make_host_entry) as make:
+            changed = dnsmasq._get_host_entries()
+        make.assert_called_once_with(port, mock.ANY)
+        self.assertEqual(entries[1:], changed[1:])
+        self.assertIn('192.168.0.9', changed[0].hosts)
+        self.assertEqual(set([('192.168.0.9', port.mac_address)]),
+                         changed[0].leases)
+
+    def test_get_host_entries_of_duplicate_port_ids(self):
+        fake_net = FakeDualNetwork()
+        fake_net.ports = [FakeRouterPort(), FakePortMultipleAgents1()]
+        dnsmasq = dhcp.Dnsmasq(self.conf, fake_net, version=float(2.59))
+        self.assertEqual(['192.168.0.1', '192.168.0.5'],
+                         [list(entry.leases)[0][0]
+                          for entry in dnsmasq._get_host_entries()])
+
+    def test_release_unused_leases_of_written_hosts_file(self):
+        dnsmasq = dhcp.Dnsmasq(self.conf, FakeDualNetwork())
+        dnsmasq._output_hosts_file()
+        dnsmasq._read_hosts_file_leases = mock.Mock()
+        dnsmasq._release_lease = mock.Mock()
+        dnsmasq.network.ports = [FakePort1()]
+
+        dnsmasq._release_unused_leases()
+
+        self.assertFalse(dnsmasq._read_hosts_file_leases.called)
+        dnsmasq._release_lease.assert_has_calls(
+            [mock.call('00:00:f3:aa:bb:cc', 'fdca:3ba5:a17a:4ba3::2'),
+             mock.call('00:00:0f:aa:bb:cc', '192.168.0.3'),
+             mock.call('00:00:0f:aa:bb:cc', 'fdca:3ba5:a17a:4ba3::3'),
+             mock.call('00:00:0f:rr:rr:rr', '192.168.0.1')],
+            any_order=True)
+
     def test_release_unused_leases(self):
         dnsmasq = dhcp.Dnsmasq(self.conf, FakeDualNetwork())
 
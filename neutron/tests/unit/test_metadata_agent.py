@@ -45,6 +45,8 @@ class FakeConf(object):
     nova_metadata_insecure = True
     nova_client_cert = 'nova_cert'
     nova_client_priv_key = 'nova_priv_key'
+    metadata_cache_size = 1000
+    metadata_cache_ttl = 5
 
 
 class TestMetadataProxyHandler(base.BaseTestCase):
@@ -197,6 +199,40 @@ class TestMetadataProxyHandler(base.BaseTestCase):
             (None, None)
         )
 
+    def test_get_instance_id_cached(self):
+        headers = {'X-Neutron-Network-ID': 'the_id'}
+        ports = [[{'device_id': 'device_id', 'tenant_id': 'tenant_id'}]]
+        self._get_instance_and_tenant_id_helper(headers, ports,
+                                                networks=['the_id'])
+        self.qclient.reset_mock()
+
+        req = mock.Mock(headers=headers)
+        self.assertEqual(('device_id', 'tenant_id'),
+                         self.handler._get_instance_and_tenant_id(req))
+        self.assertFalse(self.qclient.called)
+        self.assertEqual(1, self.handler.cache.hits)
+        self.assertEqual(1, self.handler.cache.misses)
+
+    def test_get_instance_id_other_ip_address_not_cached(self):
+        headers = {'X-Neutron-Network-ID': 'the_id'}
+        ports = [[{'device_id': 'device_id', 'tenant_id': 'tenant_id'}]]
+        self._get_instance_and_tenant_id_helper(headers, ports,
+                                                networks=['the_id'])
+
+        headers['X-Forwarded-For'] = '192.168.1.2'
+        self.qclient.return_value.list_ports.side_effect = None
+        self.qclient.return_value.list_ports.return_value = {'ports': []}
+        self.assertEqual((None, None),
+                         self.handler._get_instance_and_tenant_id(
+                             mock.Mock(headers=headers)))
+        self.assertEqual(0, self.handler.cache.hits)
+
+    def test_get_instance_id_no_match_not_cached(self):
+        headers = {'X-Neutron-Network-ID': 'the_id'}
+        self._get_instance_and_tenant_id_helper(headers, [[]],
+                                                networks=['the_id'])
+        self.assertEqual(0, self.handler.cache.get_state()['cache_entries'])
+
     def _proxy_request_test_helper(self, response_code=200, method='GET'):
         hdrs = {'X-Forwarded-For': '8.8.8.8'}
         body = 'body'
@@ -274,6 +310,46 @@ class TestMetadataProxyHandler(base.BaseTestCase):
         )
 
 
+class TestLookupCache(base.BaseTestCase):
+    def setUp(self):
+        super(TestLookupCache, self).setUp()
+        self.time_p = mock.patch.object(agent.time, 'time')
+        self.time = self.time_p.start()
+        self.time.return_value = 100.0
+
+    def test_get(self):
+        cache = agent.LookupCache(2, 5)
+        cache.put('a', 1)
+        self.assertEqual(1, cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual({'cache_entries': 1, 'cache_hits': 1,
+                          'cache_misses': 1}, cache.get_state())
+
+    def test_get_expired(self):
+        cache = agent.LookupCache(2, 5)
+        cache.put('a', 1)
+        self.time.return_value = 105.0
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual({'cache_entries': 0, 'cache_hits': 0,
+                          'cache_misses': 1}, cache.get_state())
+
+    def test_put_evicts_least_recently_used(self):
+        cache = agent.LookupCache(2, 5)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(1, cache.get('a'))
+        self.assertEqual(3, cache.get('c'))
+
+    def test_put_disabled(self):
+        for size, ttl in [(0, 5), (2, 0)]:
+            cache = agent.LookupCache(size, ttl)
+            cache.put('a', 1)
+            self.assertIsNone(cache.get('a'))
+
+
 class TestUnixDomainHttpProtocol(base.BaseTestCase):
     def test_init_empty_client(self):
         u = agent.UnixDomainHttpProtocol(mock.Mock(), '', mock.Mock())
@@ -449,3 +525,14 @@ class TestUnixDomainMetadataProxy(base.BaseTestCase):
                 state_api_inst = state_api.return_value
                 state_api_inst.report_state.assert_called_once_with(
                     proxy.context, proxy.agent_state, use_call=True)
+
+    def test_report_state_cache(self):
+        with mock.patch('neutron.agent.rpc.PluginReportStateAPI'):
+            with mock.patch('os.makedirs'):
+                proxy = agent.UnixDomainMetadataProxy(self.cfg.CONF)
+                proxy.handler = mock.Mock()
+                proxy.handler.cache.get_state.return_value = {
+                    'cache_hits': 2}
+                proxy._report_state()
+                self.assertEqual(
+                    2, proxy.agent_state['configurations']['cache_hits'])
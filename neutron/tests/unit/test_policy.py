@@ -459,6 +459,67 @@ class NeutronPolicyTestCase(base.BaseTestCase):
             result = policy.enforce(self.context, action, target)
             self.assertTrue(result)
 
+    def test_target_fields(self):
+        self.assertEqual(
+            set(['tenant_id', 'shared', 'router:external']),
+            policy._target_fields(common_policy.RuleCheck('rule',
+                                                          'get_network')))
+        self.assertEqual(
+            set(['network:tenant_id', 'network_id']),
+            policy._target_fields(common_policy.RuleCheck(
+                'rule', 'admin_or_network_owner')))
+        self.assertEqual(set(), policy._target_fields(
+            common_policy.RuleCheck('rule', 'missing')))
+        self.assertIsNone(policy._target_fields(
+            common_policy.parse_rule('role:admin or http://example.com')))
+
+    def _test_cached_checker(self, action, targets, expected_results,
+                             expected_checks):
+        checker = policy.CachedChecker(self.context)
+        with mock.patch.object(common_policy, 'check',
+                               wraps=common_policy.check) as check:
+            self.assertEqual(expected_results,
+                             [checker.check(action, target)
+                              for target in targets])
+        self.assertEqual(expected_checks, check.call_count)
+
+    def test_cached_checker_memoizes_decisions(self):
+        targets = [{'tenant_id': 'fake', 'shared': False, 'name': 'a'},
+                   {'tenant_id': 'fake', 'shared': False, 'name': 'b'},
+                   {'tenant_id': 'other', 'shared': False, 'name': 'c'},
+                   {'tenant_id': 'other', 'shared': True, 'name': 'd'},
+                   {'tenant_id': 'other', 'shared': False, 'name': 'e'}]
+        self._test_cached_checker('get_network', targets,
+                                  [True, True, False, True, False], 3)
+
+    def test_cached_checker_unhashable_field(self):
+        targets = [{'tenant_id': 'other', 'shared': [True]}] * 2
+        self._test_cached_checker('get_network', targets, [False, False], 2)
+
+    def test_cached_checker_write_action_not_memoized(self):
+        targets = [{'tenant_id': 'fake', 'name': 'a'}] * 2
+        self._test_cached_checker('create_network', targets, [True, True], 2)
+
+    def test_cached_checker_parent_resource(self):
+        self.rules['get_port'] = common_policy.parse_rule(
+            "rule:admin_or_network_owner")
+        policy.init()
+        plugin = manager.NeutronManager.get_instance().plugin
+        with mock.patch.object(plugin, 'get_network',
+                               return_value={'tenant_id': 'fake'}) as get:
+            targets = [{'network_id': 'net1'}, {'network_id': 'net1'},
+                       {'network_id': 'net2'}]
+            self._test_cached_checker('get_port', targets,
+                                      [True, True, True], 2)
+        self.assertEqual(2, get.call_count)
+
+    def test_cached_checker_check_if_exists(self):
+        checker = policy.CachedChecker(self.context)
+        self.assertTrue(checker.check_if_exists('get_network',
+                                                {'tenant_id': 'fake'}))
+        self.assertRaises(exceptions.PolicyRuleNotFound,
+                          checker.check_if_exists, 'get_network:missing', {})
+
     def test_tenant_id_check_no_target_field_raises(self):
         # Try and add a bad rule
         self.assertRaises(
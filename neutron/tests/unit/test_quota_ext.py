@@ -19,6 +19,7 @@ import sys
 
 import mock
 from oslo.config import cfg
+import sqlalchemy as sa
 import testtools
 import webtest
 
@@ -29,6 +30,7 @@ from neutron.common import exceptions
 from neutron import context
 from neutron.db import api as db
 from neutron.db import quota_db
+from neutron.openstack.common import timeutils
 from neutron import quota
 from neutron.tests import base
 from neutron.tests.unit import test_api_v2
@@ -44,6 +46,8 @@ class QuotaExtensionTestCase(testlib_api.WebTestCase):
 
     def setUp(self):
         super(QuotaExtensionTestCase, self).setUp()
+        # The limits cached by an earlier test were in another database
+        mock.patch.dict(quota_db._limit_cache, clear=True).start()
         # Ensure existing ExtensionManager is not used
         extensions.PluginAwareExtensionManager._instance = None
 
@@ -312,6 +316,73 @@ class QuotaExtensionDbTestCase(QuotaExtensionTestCase):
                            extra_environ=env, expect_errors=True)
         self.assertEqual(400, res.status_int)
 
+    def _get_network_limit(self, ctx, tenant_id):
+        return quota_db.DbQuotaDriver.get_tenant_quotas(
+            ctx, quota.QUOTAS.resources, tenant_id)['network']
+
+    def _change_limits_elsewhere(self, ctx, tenant_id, limit):
+        ctx.session.query(quota_db.Quota).filter_by(
+            tenant_id=tenant_id).update({'limit': limit})
+
+    def test_tenant_quotas_are_cached(self):
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+        tenant_id = 'tenant_id1'
+        ctx = context.get_admin_context()
+        quota_db.DbQuotaDriver.update_quota_limit(ctx, tenant_id,
+                                                  'network', 100)
+        self.assertEqual(100, self._get_network_limit(ctx, tenant_id))
+        self._change_limits_elsewhere(ctx, tenant_id, 5)
+        self.assertEqual(100, self._get_network_limit(ctx, tenant_id))
+        timeutils.advance_time_seconds(30)
+        self.assertEqual(5, self._get_network_limit(ctx, tenant_id))
+
+    def test_tenant_quotas_cache_disabled(self):
+        cfg.CONF.set_override('quota_limit_cache_ttl', 0, group='QUOTAS')
+        tenant_id = 'tenant_id1'
+        ctx = context.get_admin_context()
+        quota_db.DbQuotaDriver.update_quota_limit(ctx, tenant_id,
+                                                  'network', 100)
+        self.assertEqual(100, self._get_network_limit(ctx, tenant_id))
+        self._change_limits_elsewhere(ctx, tenant_id, 5)
+        self.assertEqual(5, self._get_network_limit(ctx, tenant_id))
+
+    def test_update_and_delete_invalidate_cached_quotas(self):
+        tenant_id = 'tenant_id1'
+        ctx = context.get_admin_context()
+        self.assertEqual(10, self._get_network_limit(ctx, tenant_id))
+        quota_db.DbQuotaDriver.update_quota_limit(ctx, tenant_id,
+                                                  'network', 100)
+        self.assertEqual(100, self._get_network_limit(ctx, tenant_id))
+        quota_db.DbQuotaDriver.delete_tenant_quota(ctx, tenant_id)
+        self.assertEqual(10, self._get_network_limit(ctx, tenant_id))
+
+    def test_get_all_quotas_in_one_query(self):
+        ctx = context.get_admin_context()
+        for tenant_id, resource, limit in (('tenant_id1', 'network', 100),
+                                           ('tenant_id1', 'port', -1),
+                                           ('tenant_id2', 'extra1', 7)):
+            quota_db.DbQuotaDriver.update_quota_limit(ctx, tenant_id,
+                                                      resource, limit)
+        statements = []
+        engine = db.get_engine()
+
+        def _count(conn, cursor, statement, *args):
+            statements.append(statement)
+        sa.event.listen(engine, 'before_cursor_execute', _count)
+        try:
+            quotas = quota_db.DbQuotaDriver.get_all_quotas(
+                ctx, quota.QUOTAS.resources)
+        finally:
+            sa.event.remove(engine, 'before_cursor_execute', _count)
+        self.assertEqual(1, len(statements))
+        self.assertEqual(
+            [{'tenant_id': 'tenant_id1', 'network': 100, 'subnet': 10,
+              'port': -1, 'extra1': -1},
+             {'tenant_id': 'tenant_id2', 'network': 10, 'subnet': 10,
+              'port': 50, 'extra1': 7}],
+            sorted(quotas, key=lambda quota: quota['tenant_id']))
+
 
 class QuotaExtensionDbTestCaseXML(QuotaExtensionDbTestCase):
     fmt = 'xml'
@@ -19,6 +19,7 @@ import contextlib
 
 import mock
 from oslo.config import cfg
+import sqlalchemy as sa
 from testtools import matchers
 import webob.exc
 
@@ -30,10 +31,12 @@ from neutron.agent import securitygroups_rpc as sg_rpc
 from neutron.common import constants as const
 from neutron.common import ipv6_utils as ipv6
 from neutron import context
+from neutron.db import api as db_api
 from neutron.db import securitygroups_rpc_base as sg_db_rpc
 from neutron.extensions import allowedaddresspairs as addr_pair
 from neutron.extensions import securitygroup as ext_sg
 from neutron import manager
+from neutron.openstack.common.rpc import common as rpc_common
 from neutron.openstack.common.rpc import proxy
 from neutron.tests import base
 from neutron.tests.unit import test_extension_security_group as test_sg
@@ -296,6 +299,120 @@ class SGServerRpcCallBackMixinTestCase(test_sg.SecurityGroupDBTestCase):
                 self._delete('ports', port_id1)
                 self._delete('ports', port_id2)
 
+    def test_security_group_info_for_devices_ipv4_source_group(self):
+
+        with self.network() as n:
+            with contextlib.nested(self.subnet(n),
+                                   self.security_group(),
+                                   self.security_group()) as (subnet_v4,
+                                                              sg1,
+                                                              sg2):
+                sg1_id = sg1['security_group']['id']
+                sg2_id = sg2['security_group']['id']
+                rule1 = self._build_security_group_rule(
+                    sg1_id,
+                    'ingress', const.PROTO_NAME_TCP, '24',
+                    '25', remote_group_id=sg2['security_group']['id'])
+                rules = {
+                    'security_group_rules': [rule1['security_group_rule']]}
+                res = self._create_security_group_rule(self.fmt, rules)
+                self.deserialize(self.fmt, res)
+                self.assertEqual(res.status_int, webob.exc.HTTPCreated.code)
+
+                res1 = self._create_port(
+                    self.fmt, n['network']['id'],
+                    security_groups=[sg1_id])
+                ports_rest1 = self.deserialize(self.fmt, res1)
+                port_id1 = ports_rest1['port']['id']
+                res2 = self._create_port(
+                    self.fmt, n['network']['id'],
+                    security_groups=[sg1_id])
+                ports_rest2 = self.deserialize(self.fmt, res2)
+                port_id2 = ports_rest2['port']['id']
+                self.rpc.devices = {port_id1: ports_rest1['port'],
+                                    port_id2: ports_rest2['port']}
+                devices = [port_id1, port_id2, 'no_exist_device']
+
+                res3 = self._create_port(
+                    self.fmt, n['network']['id'],
+                    security_groups=[sg2_id])
+                ports_rest3 = self.deserialize(self.fmt, res3)
+                port_id3 = ports_rest3['port']['id']
+                ctx = context.get_admin_context()
+                sg_info = self.rpc.security_group_info_for_devices(
+                    ctx, devices=devices)
+                expected = {
+                    sg1_id: [{'direction': 'egress',
+                              'ethertype': const.IPv4,
+                              'security_group_id': sg1_id},
+                             {'direction': 'egress',
+                              'ethertype': const.IPv6,
+                              'security_group_id': sg1_id},
+                             {'direction': u'ingress',
+                              'protocol': const.PROTO_NAME_TCP,
+                              'ethertype': const.IPv4,
+                              'port_range_max': 25, 'port_range_min': 24,
+                              'remote_group_id': sg2_id,
+                              'security_group_id': sg1_id}]}
+                self.assertEqual(expected, sg_info['security_groups'])
+                self.assertEqual({sg2_id: [u'10.0.0.4']},
+                                 sg_info['sg_member_ips'])
+                self.assertEqual(set([port_id1, port_id2]),
+                                 set(sg_info['devices']))
+                port_rpc = sg_info['devices'][port_id1]
+                self.assertEqual([], port_rpc['security_group_rules'])
+                self.assertEqual([sg2_id],
+                                 port_rpc['security_group_source_groups'])
+                self._delete('ports', port_id1)
+                self._delete('ports', port_id2)
+                self._delete('ports', port_id3)
+
+    def _count_rules_for_devices_queries(self, ports):
+        statements = []
+
+        def _count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        self.rpc.devices = dict((port['id'], dict(port)) for port in ports)
+        engine = db_api.get_engine()
+        sa.event.listen(engine, 'before_cursor_execute', _count)
+        try:
+            self.rpc.security_group_rules_for_devices(
+                context.get_admin_context(), devices=self.rpc.devices.keys())
+        finally:
+            sa.event.remove(engine, 'before_cursor_execute', _count)
+        return len(statements)
+
+    def test_security_group_rules_for_devices_query_count(self):
+        with self.network() as n:
+            with contextlib.nested(self.subnet(n),
+                                   self.subnet(n, cidr='2001:db8::/64',
+                                               ip_version=6,
+                                               ipv6_ra_mode='slaac',
+                                               ipv6_address_mode='slaac'),
+                                   self.security_group(),
+                                   self.security_group()) as (subnet_v4,
+                                                              subnet_v6,
+                                                              sg1, sg2):
+                sg1_id = sg1['security_group']['id']
+                sg2_id = sg2['security_group']['id']
+                rule1 = self._build_security_group_rule(
+                    sg1_id, 'ingress', const.PROTO_NAME_TCP, '22', '22',
+                    remote_group_id=sg2_id)
+                self._create_security_group_rule(self.fmt, rule1)
+                ports = []
+                for i in range(3):
+                    res = self._create_port(
+                        self.fmt, n['network']['id'],
+                        security_groups=[sg1_id, sg2_id])
+                    ports.append(self.deserialize(self.fmt, res)['port'])
+
+                one_port = self._count_rules_for_devices_queries(ports[:1])
+                all_ports = self._count_rules_for_devices_queries(ports)
+                self.assertEqual(one_port, all_ports)
+                for port in ports:
+                    self._delete('ports', port['id'])
+
     def test_security_group_rules_for_devices_ipv6_ingress(self):
         fake_prefix = FAKE_PREFIX[const.IPv6]
         fake_gateway = FAKE_IP[const.IPv6]
@@ -876,6 +993,69 @@ class SecurityGroupAgentRpcTestCase(base.BaseTestCase):
         self.agent.refresh_firewall([])
         self.firewall.assert_has_calls([])
 
+    def _fake_security_group_info(self):
+        rule = {'security_group_id': 'fake_sgid1',
+                'direction': 'ingress',
+                'ethertype': const.IPv4,
+                'remote_group_id': 'fake_sgid2'}
+        provider_rule = {'direction': 'ingress',
+                         'ethertype': const.IPv4,
+                         'source_ip_prefix': '10.0.0.2/32'}
+        device = {'device': 'fake_device',
+                  'fixed_ips': ['10.0.0.3'],
+                  'security_groups': ['fake_sgid1', 'fake_sgid2'],
+                  'security_group_source_groups': ['fake_sgid2'],
+                  'security_group_rules': [provider_rule]}
+        return {'devices': {'fake_device': device},
+                'security_groups': {'fake_sgid1': [rule],
+                                    'fake_sgid2': []},
+                'sg_member_ips': {'fake_sgid2': ['10.0.0.3', '10.0.0.4',
+                                                 'fe80::4']}}
+
+    def test_prepare_devices_filter_with_enhanced_rpc(self):
+        self.agent.use_enhanced_rpc = True
+        self.agent.plugin_rpc.security_group_info_for_devices.return_value = (
+            self._fake_security_group_info())
+        self.agent.prepare_devices_filter(['fake_device'])
+        expected_device = {
+            'device': 'fake_device',
+            'fixed_ips': ['10.0.0.3'],
+            'security_groups': ['fake_sgid1', 'fake_sgid2'],
+            'security_group_source_groups': ['fake_sgid2'],
+            'security_group_rules': [
+                {'security_group_id': 'fake_sgid1',
+                 'direction': 'ingress',
+                 'ethertype': const.IPv4,
+                 'remote_group_id': 'fake_sgid2',
+                 'source_ip_prefix': '10.0.0.4/32'},
+                {'direction': 'ingress',
+                 'ethertype': const.IPv4,
+                 'source_ip_prefix': '10.0.0.2/32'}]}
+        self.firewall.prepare_port_filter.assert_called_once_with(
+            expected_device)
+        self.assertFalse(
+            self.agent.plugin_rpc.security_group_rules_for_devices.called)
+
+    def test_prepare_devices_filter_enhanced_rpc_not_supported(self):
+        self.agent.use_enhanced_rpc = True
+        self.agent.plugin_rpc.security_group_info_for_devices.side_effect = (
+            rpc_common.RemoteError('UnsupportedRpcVersion'))
+        self.agent.prepare_devices_filter(['fake_device'])
+        rpc = self.agent.plugin_rpc
+        rpc.security_group_rules_for_devices.assert_called_once_with(
+            None, ['fake_device'])
+        self.firewall.prepare_port_filter.assert_called_once_with(
+            self.fake_device)
+        self.assertFalse(self.agent.use_enhanced_rpc)
+
+    def test_prepare_devices_filter_enhanced_rpc_remote_error(self):
+        self.agent.use_enhanced_rpc = True
+        self.agent.plugin_rpc.security_group_info_for_devices.side_effect = (
+            rpc_common.RemoteError('ValueError'))
+        self.assertRaises(rpc_common.RemoteError,
+                          self.agent.prepare_devices_filter, ['fake_device'])
+        self.assertTrue(self.agent.use_enhanced_rpc)
+
 
 class SecurityGroupAgentRpcWithDeferredRefreshTestCase(
     SecurityGroupAgentRpcTestCase):
@@ -1101,6 +1281,17 @@ class SecurityGroupServerRpcApiTestCase(base.BaseTestCase):
              version=sg_rpc.SG_RPC_VERSION,
              topic='fake_topic')])
 
+    def test_security_group_info_for_devices(self):
+        self.rpc.security_group_info_for_devices(None, ['fake_device'])
+        self.rpc.call.assert_has_calls(
+            [mock.call(None,
+             {'args':
+                 {'devices': ['fake_device']},
+              'method': 'security_group_info_for_devices',
+              'namespace': None},
+             version=sg_rpc.SG_INFO_RPC_VERSION,
+             topic='fake_topic')])
+
 
 class FakeSGNotifierAPI(proxy.RpcProxy,
                         sg_rpc.SecurityGroupAgentRpcApiMixin):
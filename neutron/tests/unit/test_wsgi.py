@@ -63,6 +63,12 @@ class TestWSGIServer(base.BaseTestCase):
         server.wait()
         launcher.wait.assert_called_once_with()
 
+    @mock.patch('neutron.db.mac_blocks_db.release_mac_blocks')
+    def test_worker_stop_releases_mac_blocks(self, release_mac_blocks):
+        worker = wsgi.WorkerService(mock.Mock(), None)
+        worker.stop()
+        release_mac_blocks.assert_called_once_with()
+
     def test_start_random_port_with_ipv6(self):
         server = wsgi.Server("test_random_port")
         server.start(None, 0, host="::1")
@@ -604,6 +610,27 @@ class JSONDictSerializerTest(base.BaseTestCase):
 
         self.assertEqual(result, expected_json)
 
+    def test_json_iter(self):
+        servers = [dict(id=i, name='server %d' % i) for i in range(3)]
+        serializer = wsgi.JSONDictSerializer()
+        expected = serializer.serialize(dict(servers=servers, count=3))
+        result = serializer.serialize_iter(dict(servers=iter(servers),
+                                                count=3))
+        self.assertEqual(expected, ''.join(result))
+
+    def test_json_iter_chunks(self):
+        servers = [dict(id=i) for i in range(3)]
+        serializer = wsgi.JSONDictSerializer()
+        chunks = list(serializer.serialize_iter(dict(servers=iter(servers)),
+                                                chunk_size=10))
+        self.assertEqual(['{"servers": ', '[{"id": 0}', ', {"id": 1}',
+                          ', {"id": 2}', ']}'], chunks)
+
+    def test_json_iter_empty(self):
+        serializer = wsgi.JSONDictSerializer()
+        result = serializer.serialize_iter(dict(servers=iter([])))
+        self.assertEqual('{"servers": []}', ''.join(result))
+
 
 class TextDeserializerTest(base.BaseTestCase):
 
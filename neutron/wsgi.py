@@ -20,6 +20,7 @@ Utility methods for working with WSGI servers
 """
 from __future__ import print_function
 
+import collections
 import errno
 import os
 import socket
@@ -40,6 +41,7 @@ from neutron.common import constants
 from neutron.common import exceptions as exception
 from neutron import context
 from neutron.db import api
+from neutron.db import mac_blocks_db
 from neutron.openstack.common import excutils
 from neutron.openstack.common import gettextutils
 from neutron.openstack.common import jsonutils
@@ -107,6 +109,7 @@ class WorkerService(object):
         if isinstance(self._server, eventlet.greenthread.GreenThread):
             self._server.kill()
             self._server = None
+        mac_blocks_db.release_mac_blocks()
 
 
 class Server(object):
@@ -398,6 +401,39 @@ class JSONDictSerializer(DictSerializer):
             return unicode(obj)
         return jsonutils.dumps(data, default=sanitizer)
 
+    def serialize_iter(self, data, chunk_size=65536):
+        """Serialize a dict whose values may be iterators, in chunks.
+
+        The elements of the iterators are serialized one by one and joined
+        in chunks of about chunk_size bytes, so that the whole body is never
+        held in memory.
+        """
+        def parts():
+            yield '{'
+            for index, (key, value) in enumerate(data.iteritems()):
+                yield '%s%s: ' % (index and ', ' or '', self.default(key))
+                if isinstance(value, collections.Iterator):
+                    yield '['
+                    for item_index, item in enumerate(value):
+                        yield '%s%s' % (item_index and ', ' or '',
+                                        self.default(item))
+                    yield ']'
+                else:
+                    yield self.default(value)
+            yield '}'
+
+        chunk = []
+        size = 0
+        for part in parts():
+            chunk.append(part)
+            size += len(part)
+            if size >= chunk_size:
+                yield ''.join(chunk)
+                chunk = []
+                size = 0
+        if chunk:
+            yield ''.join(chunk)
+
 
 class XMLDictSerializer(DictSerializer):
 
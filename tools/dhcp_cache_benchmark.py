@@ -0,0 +1,135 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the memory and the update time of the DHCP agent network cache.
+
+Networks of 100 ports, as returned by the server to the agent, are put in
+a network cache. The memory taken by their ports is reported, both as the
+dict models the agent used to keep and as the port models it now keeps.
+The time taken to update and remove a port of the cache is reported too.
+
+Usage: dhcp_cache_benchmark.py [port_count ...]
+"""
+from __future__ import print_function
+
+import sys
+import time
+
+from neutron.agent import dhcp_agent
+from neutron.agent.linux import dhcp
+from neutron.openstack.common import uuidutils
+
+DEFAULT_PORT_COUNTS = [1000, 10000, 100000]
+PORTS_PER_NETWORK = 100
+
+
+def _make_port(network_id, index):
+    return {'id': uuidutils.generate_uuid(),
+            'name': '',
+            'network_id': network_id,
+            'tenant_id': 'bench',
+            'mac_address': 'fa:16:3e:%02x:%02x:%02x' % (
+                index >> 16 & 0xff, index >> 8 & 0xff, index & 0xff),
+            'admin_state_up': True,
+            'status': 'ACTIVE',
+            'device_id': uuidutils.generate_uuid(),
+            'device_owner': 'compute:None',
+            'fixed_ips': [{'subnet_id': network_id,
+                           'ip_address': '10.%d.%d.%d' % (
+                               index >> 16 & 0xff, index >> 8 & 0xff,
+                               index & 0xff)}],
+            'security_groups': [uuidutils.generate_uuid()],
+            'allowed_address_pairs': [],
+            'extra_dhcp_opts': [],
+            'binding:host_id': 'compute-%d' % (index % 100),
+            'binding:vif_type': 'ovs',
+            'binding:capabilities': {'port_filter': True},
+            'binding:profile': {}}
+
+
+def _make_networks(port_count):
+    networks = []
+    for index in range(0, port_count, PORTS_PER_NETWORK):
+        network_id = uuidutils.generate_uuid()
+        networks.append({
+            'id': network_id,
+            'subnets': [],
+            'ports': [_make_port(network_id, port_index) for port_index
+                      in range(index, min(index + PORTS_PER_NETWORK,
+                                          port_count))]})
+    return networks
+
+
+def _size(obj, seen):
+    """Return the size of an object and of the objects it refers to."""
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_size(key, seen) + _size(value, seen)
+                    for key, value in obj.iteritems())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(_size(item, seen) for item in obj)
+    elif hasattr(obj, '__dict__'):
+        size += _size(vars(obj), seen)
+    elif hasattr(obj, '__slots__'):
+        size += sum(_size(getattr(obj, key), seen)
+                    for key in obj.__slots__ if hasattr(obj, key))
+    return size
+
+
+def measure_memory(networks):
+    dict_ports = [dhcp.DictModel(port) for network in networks
+                  for port in network['ports']]
+    cache = dhcp_agent.NetworkCache()
+    for network in networks:
+        cache.put(dhcp.NetModel(False, network))
+    ports = [port for network_id in cache.get_network_ids()
+             for port in cache.get_network_by_id(network_id).ports]
+    return _size(dict_ports, set()), _size(ports, set())
+
+
+def measure_updates(networks):
+    cache = dhcp_agent.NetworkCache()
+    for network in networks:
+        cache.put(dhcp.NetModel(False, network))
+    ports = [dhcp.PortModel(port) for network in networks
+             for port in network['ports']]
+    start = time.time()
+    for port in ports:
+        cache.put_port(port)
+    update_time = time.time() - start
+    start = time.time()
+    for port in ports:
+        cache.remove_port(port)
+    remove_time = time.time() - start
+    return update_time / len(ports), remove_time / len(ports)
+
+
+def main(argv):
+    port_counts = [int(arg) for arg in argv[1:]] or DEFAULT_PORT_COUNTS
+    print('%8s %14s %14s %14s %14s' % ('ports', 'dicts (MB)', 'slots (MB)',
+                                       'update (us)', 'remove (us)'))
+    for port_count in port_counts:
+        networks = _make_networks(port_count)
+        dict_size, slot_size = measure_memory(networks)
+        update_time, remove_time = measure_updates(networks)
+        print('%8d %14.1f %14.1f %14.1f %14.1f' % (
+            port_count, dict_size / 1048576.0, slot_size / 1048576.0,
+            update_time * 1000000, remove_time * 1000000))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
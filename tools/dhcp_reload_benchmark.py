@@ -0,0 +1,124 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the reload of the dnsmasq allocations of a network.
+
+The config files of a network with the given number of ports are written
+in a scratch directory, then the allocations are reloaded as after a port
+update: once rewriting every file, once after a change leaving the files
+as they are (such as a port status update), and once after a port is
+added. The time taken and the bytes written are reported. dnsmasq itself
+is not run, so the time it spends parsing the reloaded files is not
+included.
+
+Usage: dhcp_reload_benchmark.py [port_count ...]
+"""
+from __future__ import print_function
+
+import os
+import sys
+import tempfile
+import time
+
+from oslo.config import cfg
+
+from neutron.agent import dhcp_agent
+from neutron.agent.linux import dhcp
+from neutron.agent.linux import utils
+from neutron.common import config  # noqa
+from neutron.openstack.common import uuidutils
+
+DEFAULT_PORT_COUNTS = [100, 1000, 4000]
+NETWORK_ID = uuidutils.generate_uuid()
+SUBNET_ID = uuidutils.generate_uuid()
+
+
+class DeviceManager(object):
+    """Leave the DHCP port of the network as it is."""
+
+    def update(self, network, device_name):
+        pass
+
+
+def _make_port(index):
+    return {'id': uuidutils.generate_uuid(),
+            'network_id': NETWORK_ID,
+            'device_owner': 'compute:None',
+            'admin_state_up': True,
+            'mac_address': 'fa:16:3e:%02x:%02x:%02x' % (
+                index >> 16 & 0xff, index >> 8 & 0xff, index & 0xff),
+            'fixed_ips': [{'subnet_id': SUBNET_ID,
+                           'ip_address': '10.%d.%d.%d' % (
+                               index >> 16 & 0xff, index >> 8 & 0xff,
+                               index & 0xff)}],
+            'extra_dhcp_opts': []}
+
+
+def _make_network(port_count):
+    return dhcp.NetModel(False, {
+        'id': NETWORK_ID,
+        'tenant_id': 'bench',
+        'admin_state_up': True,
+        'subnets': [{'id': SUBNET_ID, 'network_id': NETWORK_ID,
+                     'ip_version': 4, 'cidr': '10.0.0.0/8',
+                     'gateway_ip': '10.0.0.1', 'enable_dhcp': True,
+                     'dns_nameservers': [], 'host_routes': []}],
+        'ports': [_make_port(index) for index in range(2, port_count + 2)]})
+
+
+def measure(network, written):
+    driver = dhcp.Dnsmasq(cfg.CONF, network,
+                          version=dhcp.Dnsmasq.MINIMUM_VERSION)
+    driver.device_manager = DeviceManager()
+    del written[:]
+    start = time.time()
+    driver.reload_allocations()
+    return time.time() - start, sum(written)
+
+
+def main(argv):
+    port_counts = [int(arg) for arg in argv[1:]] or DEFAULT_PORT_COUNTS
+    dhcp_agent.register_options()
+    cfg.CONF.set_override('dhcp_confs', tempfile.mkdtemp())
+    cfg.CONF.set_override('interface_driver',
+                          'neutron.agent.linux.interface.NullDriver')
+    written = []
+    replace_file = utils.replace_file
+
+    def _replace_file(file_name, data):
+        written.append(len(data))
+        replace_file(file_name, data)
+
+    utils.replace_file = _replace_file
+    os.makedirs(os.path.join(cfg.CONF.dhcp_confs, NETWORK_ID))
+
+    print('%8s %12s %12s %14s %14s %12s %12s' % (
+        'ports', 'full (ms)', 'full (KB)', 'unchanged (ms)', 'unchanged (KB)',
+        'added (ms)', 'added (KB)'))
+    for port_count in port_counts:
+        network = _make_network(port_count)
+        dhcp.Dnsmasq._conf_file_digests.clear()
+        dhcp.Dnsmasq._host_entries.clear()
+        full_time, full_size = measure(network, written)
+        same_time, same_size = measure(network, written)
+        network.ports.append(dhcp.DictModel(_make_port(port_count + 2)))
+        added_time, added_size = measure(network, written)
+        print('%8d %12.1f %12.1f %14.1f %14.1f %12.1f %12.1f' % (
+            port_count, full_time * 1000, full_size / 1024.0,
+            same_time * 1000, same_size / 1024.0,
+            added_time * 1000, added_size / 1024.0))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
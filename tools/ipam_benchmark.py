@@ -0,0 +1,124 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the port creation throughput against the number of workers.
+
+Each worker is a process creating ports on the same /16 subnet, with the
+availability ranges and with the random IPAM driver. The database is
+recreated for every measure, so the connection must point to a scratch
+database. The default sqlite file serializes the writers: use a MySQL or
+PostgreSQL database to see the effect of the locks.
+
+Usage: ipam_benchmark.py [connection [ports_per_worker [worker_count ...]]]
+"""
+from __future__ import print_function
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+from oslo.config import cfg
+
+from neutron.api.v2 import attributes
+from neutron.common import config  # noqa
+from neutron import context
+from neutron.db import api as db_api
+from neutron.db import db_base_plugin_v2
+
+DEFAULT_PORTS_PER_WORKER = 100
+DEFAULT_WORKER_COUNTS = [1, 2, 4, 8]
+DRIVERS = [('ranges', None), ('random', 'neutron.db.ipam.RandomIpamDriver')]
+TENANT_ID = 'bench-tenant'
+
+
+def _create_ports(plugin, network_id, port_count, failures):
+    # The connections of the parent must not be shared with the workers
+    db_api.get_engine().dispose()
+    ctx = context.get_admin_context()
+    for index in range(port_count):
+        try:
+            plugin.create_port(ctx, {'port': {
+                'tenant_id': TENANT_ID,
+                'network_id': network_id,
+                'name': '',
+                'admin_state_up': True,
+                'device_id': '',
+                'device_owner': '',
+                'mac_address': attributes.ATTR_NOT_SPECIFIED,
+                'fixed_ips': attributes.ATTR_NOT_SPECIFIED}})
+        except Exception:
+            with failures.get_lock():
+                failures.value += 1
+
+
+def measure(plugin, worker_count, port_count):
+    db_api.clear_db()
+    db_api.configure_db()
+    ctx = context.get_admin_context()
+    network = plugin.create_network(ctx, {'network': {
+        'tenant_id': TENANT_ID, 'name': 'bench', 'admin_state_up': True,
+        'shared': False}})
+    plugin.create_subnet(ctx, {'subnet': {
+        'tenant_id': TENANT_ID, 'network_id': network['id'], 'name': '',
+        'ip_version': 4, 'cidr': '10.0.0.0/16', 'enable_dhcp': False,
+        'gateway_ip': attributes.ATTR_NOT_SPECIFIED,
+        'allocation_pools': attributes.ATTR_NOT_SPECIFIED,
+        'dns_nameservers': attributes.ATTR_NOT_SPECIFIED,
+        'host_routes': attributes.ATTR_NOT_SPECIFIED,
+        'ipv6_ra_mode': attributes.ATTR_NOT_SPECIFIED,
+        'ipv6_address_mode': attributes.ATTR_NOT_SPECIFIED}})
+    db_api.get_engine().dispose()
+
+    failures = multiprocessing.Value('i', 0)
+    workers = [multiprocessing.Process(target=_create_ports,
+                                       args=(plugin, network['id'],
+                                             port_count, failures))
+               for i in range(worker_count)]
+    start = time.time()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.time() - start
+    created = worker_count * port_count - failures.value
+    return created / elapsed, failures.value
+
+
+def main(argv):
+    connection = (len(argv) > 1 and argv[1] or
+                  'sqlite:///%s' % os.path.join(tempfile.mkdtemp(),
+                                                'ipam.db'))
+    port_count = int(argv[2]) if len(argv) > 2 else DEFAULT_PORTS_PER_WORKER
+    worker_counts = [int(arg) for arg in argv[3:]] or DEFAULT_WORKER_COUNTS
+    cfg.CONF.set_override('connection', connection, 'database')
+    cfg.CONF.set_override('notify_nova_on_port_status_changes', False)
+    cfg.CONF.set_override('notify_nova_on_port_data_changes', False)
+    plugin = db_base_plugin_v2.NeutronDbPluginV2()
+
+    print('%8s %20s %20s' % ('workers', 'ranges (ports/s)',
+                             'random (ports/s)'))
+    for worker_count in worker_counts:
+        results = []
+        for name, driver in DRIVERS:
+            cfg.CONF.set_override('ipam_driver', driver)
+            rate, failures = measure(plugin, worker_count, port_count)
+            results.append('%.1f (%d failed)' % (rate, failures))
+        print('%8d %20s %20s' % tuple([worker_count] + results))
+    db_api.clear_db()
+
+
+if __name__ == '__main__':
+    main(sys.argv)
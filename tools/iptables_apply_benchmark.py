@@ -0,0 +1,99 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure IptablesManager apply latency against the number of rules.
+
+The iptables commands are replaced by an in-memory fake, so the numbers
+only cover the work done by the agent itself (building and parsing the
+restore input), not the time spent by iptables-restore in the kernel.
+
+Usage: iptables_apply_benchmark.py [rule_count ...]
+"""
+from __future__ import print_function
+
+import sys
+import tempfile
+import time
+
+from oslo.config import cfg
+
+from neutron.agent.linux import iptables_manager
+
+DEFAULT_RULE_COUNTS = [100, 1000, 5000]
+RULES_PER_CHAIN = 10
+
+
+class FakeIptables(object):
+    """Keep the last full restore input and hand it back on save."""
+
+    def __init__(self):
+        self.dump = ''
+        self.input_bytes = 0
+
+    def execute(self, args, process_input=None, root_helper=None):
+        if args[0].endswith('-save'):
+            return self.dump
+        self.input_bytes += len(process_input)
+        if '-c' in args:
+            self.dump = process_input
+        return ''
+
+
+def _add_port_chain(manager, index):
+    chain = 'port%d' % index
+    table = manager.ipv4['filter']
+    table.add_chain(chain)
+    table.add_rule('FORWARD', '-m physdev --physdev-out tap%d -j $%s' %
+                   (index, chain))
+    for rule in range(RULES_PER_CHAIN - 1):
+        table.add_rule(chain, '-s 10.%d.%d.0/24 -j RETURN' %
+                       (index % 256, rule))
+
+
+def measure(rule_count, incremental):
+    cfg.CONF.set_override('iptables_incremental_apply', incremental, 'AGENT')
+    fake = FakeIptables()
+    manager = iptables_manager.IptablesManager(_execute=fake.execute)
+    ports = rule_count // RULES_PER_CHAIN
+    for index in range(ports):
+        _add_port_chain(manager, index)
+    manager.apply()
+
+    # One port change: add the chain of a new port and remove an old one
+    fake.input_bytes = 0
+    start = time.time()
+    _add_port_chain(manager, ports)
+    manager.apply()
+    manager.ipv4['filter'].remove_chain('port0')
+    manager.apply()
+    elapsed = (time.time() - start) / 2
+    cfg.CONF.clear_override('iptables_incremental_apply', 'AGENT')
+    return elapsed, fake.input_bytes // 2
+
+
+def main(argv):
+    rule_counts = [int(arg) for arg in argv[1:]] or DEFAULT_RULE_COUNTS
+    cfg.CONF.set_override('lock_path', tempfile.mkdtemp())
+    print('%8s %14s %14s %14s %14s' % ('rules', 'full (ms)', 'full (bytes)',
+                                       'incr (ms)', 'incr (bytes)'))
+    for rule_count in rule_counts:
+        full_time, full_bytes = measure(rule_count, False)
+        incr_time, incr_bytes = measure(rule_count, True)
+        print('%8d %14.2f %14d %14.2f %14d' % (rule_count,
+                                               full_time * 1000, full_bytes,
+                                               incr_time * 1000, incr_bytes))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
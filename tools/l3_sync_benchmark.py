@@ -0,0 +1,183 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the queries and the time taken to sync the routers of an agent.
+
+Routers with a gateway, an interface and a floating IP are inserted in a
+scratch sqlite database, then the data of all of them is fetched as for a
+full sync of the l3 agent, and the data of a single one as when it is
+updated. The statements sent to the database are counted.
+
+Usage: l3_sync_benchmark.py [router_count ...]
+"""
+from __future__ import print_function
+
+import os
+import sys
+import tempfile
+import time
+
+from oslo.config import cfg
+import sqlalchemy as sa
+
+from neutron.common import config  # noqa
+from neutron.common import constants
+from neutron import context
+from neutron.db import api as db_api
+from neutron.db import db_base_plugin_v2
+from neutron.db import external_net_db
+from neutron.db import extraroute_db
+from neutron.db import l3_db
+from neutron.db import l3_gwmode_db
+from neutron.db import models_v2
+from neutron import manager
+from neutron.openstack.common import uuidutils
+
+DEFAULT_ROUTER_COUNTS = [10, 100, 1000]
+
+
+class L3Plugin(db_base_plugin_v2.CommonDbMixin,
+               extraroute_db.ExtraRoute_db_mixin,
+               l3_gwmode_db.L3_NAT_db_mixin):
+    pass
+
+
+def _add_network(session, tenant_id, cidr):
+    network_id = uuidutils.generate_uuid()
+    subnet_id = uuidutils.generate_uuid()
+    session.add(models_v2.Network(id=network_id, tenant_id=tenant_id,
+                                  name='', status='ACTIVE',
+                                  admin_state_up=True, shared=False))
+    session.add(models_v2.Subnet(id=subnet_id, tenant_id=tenant_id,
+                                 network_id=network_id, ip_version=4,
+                                 cidr=cidr, gateway_ip=cidr[:-4] + '1',
+                                 enable_dhcp=False, shared=False))
+    return network_id, subnet_id
+
+
+def _add_port(session, tenant_id, network_id, subnet_id, ip_address,
+              device_id='', device_owner=''):
+    port_id = uuidutils.generate_uuid()
+    session.add(models_v2.Port(
+        id=port_id, tenant_id=tenant_id, name='', network_id=network_id,
+        mac_address='fa:16:3e:%02x:%02x:%02x' % tuple(
+            int(byte) for byte in ip_address.split('.')[1:]),
+        admin_state_up=True, status='ACTIVE', device_id=device_id,
+        device_owner=device_owner))
+    session.add(models_v2.IPAllocation(port_id=port_id,
+                                       ip_address=ip_address,
+                                       subnet_id=subnet_id,
+                                       network_id=network_id))
+    return port_id
+
+
+def populate(router_count):
+    db_api.clear_db()
+    db_api.configure_db()
+    session = db_api.get_session()
+    with session.begin():
+        ext_network_id, ext_subnet_id = _add_network(session, 'admin',
+                                                     '172.16.0.0/16')
+        session.add(external_net_db.ExternalNetwork(
+            network_id=ext_network_id))
+    router_ids = []
+    for index in range(router_count):
+        tenant_id = 'tenant-%d' % index
+        ext_ip = '172.16.%d.%%d' % (index / 100)
+        with session.begin():
+            router_id = uuidutils.generate_uuid()
+            router_ids.append(router_id)
+            gw_port_id = _add_port(
+                session, '', ext_network_id, ext_subnet_id,
+                ext_ip % (index % 100 * 2 + 2), device_id=router_id,
+                device_owner=constants.DEVICE_OWNER_ROUTER_GW)
+            session.add(l3_db.Router(id=router_id, tenant_id=tenant_id,
+                                     name='router-%d' % index,
+                                     status='ACTIVE', admin_state_up=True,
+                                     gw_port_id=gw_port_id,
+                                     enable_snat=True))
+            network_id, subnet_id = _add_network(
+                session, tenant_id, '10.%d.%d.0/24' % (index / 256,
+                                                       index % 256))
+            _add_port(session, tenant_id, network_id, subnet_id,
+                      '10.%d.%d.1' % (index / 256, index % 256),
+                      device_id=router_id,
+                      device_owner=constants.DEVICE_OWNER_ROUTER_INTF)
+            fixed_ip = '10.%d.%d.2' % (index / 256, index % 256)
+            fixed_port_id = _add_port(session, tenant_id, network_id,
+                                      subnet_id, fixed_ip)
+            floating_ip = ext_ip % (index % 100 * 2 + 3)
+            floating_port_id = _add_port(
+                session, '', ext_network_id, ext_subnet_id, floating_ip,
+                device_owner=constants.DEVICE_OWNER_FLOATINGIP)
+            # The floating IP is not related to its ports by the mappers
+            session.flush()
+            session.add(l3_db.FloatingIP(
+                id=uuidutils.generate_uuid(), tenant_id=tenant_id,
+                floating_ip_address=floating_ip,
+                floating_network_id=ext_network_id,
+                floating_port_id=floating_port_id,
+                fixed_port_id=fixed_port_id, fixed_ip_address=fixed_ip,
+                router_id=router_id))
+    return router_ids
+
+
+def measure(plugin, router_ids=None):
+    statements = []
+
+    def _count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    ctx = context.get_admin_context()
+    engine = db_api.get_engine()
+    sa.event.listen(engine, 'before_cursor_execute', _count)
+    try:
+        start = time.time()
+        routers = plugin.get_sync_data(ctx, router_ids, active=True)
+        elapsed = time.time() - start
+    finally:
+        sa.event.remove(engine, 'before_cursor_execute', _count)
+    assert len(routers) == len(router_ids or routers)
+    for router in routers:
+        assert router['gw_port']['subnet']
+        assert router[constants.INTERFACE_KEY][0]['subnet']
+        assert router[constants.FLOATINGIP_KEY]
+    return len(statements), elapsed
+
+
+def main(argv):
+    router_counts = [int(arg) for arg in argv[1:]] or DEFAULT_ROUTER_COUNTS
+    connection = 'sqlite:///%s' % os.path.join(tempfile.mkdtemp(), 'l3.db')
+    cfg.CONF.set_override('connection', connection, 'database')
+    cfg.CONF.set_override('core_plugin',
+                          'neutron.db.db_base_plugin_v2.NeutronDbPluginV2')
+    # The core plugin is loaded before any measure
+    manager.NeutronManager.get_plugin()
+    plugin = L3Plugin()
+
+    print('%8s %14s %14s %14s %14s' % ('routers', 'all (queries)',
+                                       'all (ms)', 'one (queries)',
+                                       'one (ms)'))
+    for router_count in router_counts:
+        router_ids = populate(router_count)
+        all_queries, all_time = measure(plugin)
+        one_queries, one_time = measure(plugin, router_ids[:1])
+        print('%8d %14d %14.1f %14d %14.1f' % (
+            router_count, all_queries, all_time * 1000, one_queries,
+            one_time * 1000))
+    db_api.clear_db()
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,124 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the memory used by the API to list all the ports.
+
+The ports are inserted in a scratch sqlite database, then GET /v2.0/ports
+is served to an admin by the API of the db base plugin, once building the
+whole response and once streaming it. Every measure runs in a new process,
+whose peak resident memory grows by the reported amount while the body is
+read by chunks.
+
+Usage: list_benchmark.py [port_count ...]
+"""
+from __future__ import print_function
+
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from oslo.config import cfg
+import webob
+
+from neutron.api.v2 import base
+from neutron.api.v2 import router
+from neutron.common import config  # noqa
+from neutron import context
+from neutron.db import api as db_api
+from neutron.db import models_v2
+from neutron.openstack.common import uuidutils
+
+DEFAULT_PORT_COUNTS = [10000, 50000]
+INSERT_BATCH_SIZE = 5000
+POLICY_FILE = os.path.join(os.path.dirname(__file__), os.pardir, 'etc',
+                           'policy.json')
+
+
+def populate(port_count):
+    db_api.clear_db()
+    db_api.configure_db()
+    session = db_api.get_session()
+    network_id = uuidutils.generate_uuid()
+    with session.begin():
+        session.add(models_v2.Network(id=network_id, tenant_id='bench',
+                                      name='bench', status='ACTIVE',
+                                      admin_state_up=True, shared=False))
+    for first in range(0, port_count, INSERT_BATCH_SIZE):
+        with session.begin():
+            for index in range(first, min(first + INSERT_BATCH_SIZE,
+                                          port_count)):
+                session.add(models_v2.Port(
+                    id=uuidutils.generate_uuid(), tenant_id='bench',
+                    name='port-%d' % index, network_id=network_id,
+                    mac_address='fa:16:3e:%02x:%02x:%02x' % (
+                        index >> 16 & 0xff, index >> 8 & 0xff, index & 0xff),
+                    admin_state_up=True, status='ACTIVE',
+                    device_id='', device_owner=''))
+    db_api.get_engine().dispose()
+
+
+def _list_ports(streamed, results):
+    api = router.APIRouter()
+    if not streamed:
+        base.Controller._get_iter_handler = lambda self: None
+    request = webob.Request.blank('/ports.json')
+    request.environ['neutron.context'] = context.get_admin_context()
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.time()
+    size = 0
+    for chunk in request.get_response(api).app_iter:
+        size += len(chunk)
+    results.put((time.time() - start, size,
+                 resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss))
+
+
+def measure(streamed):
+    results = multiprocessing.Queue()
+    worker = multiprocessing.Process(target=_list_ports,
+                                     args=(streamed, results))
+    worker.start()
+    result = results.get()
+    worker.join()
+    return result
+
+
+def main(argv):
+    port_counts = [int(arg) for arg in argv[1:]] or DEFAULT_PORT_COUNTS
+    connection = 'sqlite:///%s' % os.path.join(tempfile.mkdtemp(), 'list.db')
+    cfg.CONF.set_override('connection', connection, 'database')
+    cfg.CONF.set_override('core_plugin',
+                          'neutron.db.db_base_plugin_v2.NeutronDbPluginV2')
+    cfg.CONF.set_override('policy_file', os.path.abspath(POLICY_FILE))
+    cfg.CONF.set_override('notify_nova_on_port_status_changes', False)
+    cfg.CONF.set_override('notify_nova_on_port_data_changes', False)
+
+    print('%8s %10s %12s %12s %12s %12s' % (
+        'ports', 'body (MB)', 'list (s)', 'list (MB)', 'stream (s)',
+        'stream (MB)'))
+    for port_count in port_counts:
+        populate(port_count)
+        list_time, size, list_rss = measure(False)
+        stream_time, stream_size, stream_rss = measure(True)
+        assert size == stream_size
+        print('%8d %10.1f %12.2f %12.1f %12.2f %12.1f' % (
+            port_count, size / 1048576.0, list_time, list_rss / 1024.0,
+            stream_time, stream_rss / 1024.0))
+    db_api.clear_db()
+
+
+if __name__ == '__main__':
+    main(sys.argv)
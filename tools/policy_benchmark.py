@@ -0,0 +1,109 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the policy checks of the views of a list of ports.
+
+The ports of a few tenants are checked and viewed as GET /v2.0/ports does
+for a tenant, with the rules of etc/policy.json, once evaluating every
+check and once with the memoized decisions of a CachedChecker. The plugin
+is not involved.
+
+Usage: policy_benchmark.py [port_count ...]
+"""
+from __future__ import print_function
+
+import os
+import sys
+import time
+
+from oslo.config import cfg
+
+from neutron.api.v2 import attributes
+from neutron.api.v2 import base
+from neutron.common import config  # noqa
+from neutron import context
+from neutron.extensions import portbindings
+from neutron.openstack.common import uuidutils
+from neutron import policy
+
+DEFAULT_PORT_COUNTS = [500, 5000]
+TENANT_COUNT = 10
+POLICY_FILE = os.path.join(os.path.dirname(__file__), os.pardir, 'etc',
+                           'policy.json')
+
+
+class FakePlugin(object):
+    def get_port(self, context, id, fields=None):
+        pass
+
+
+def _make_ports(count):
+    return [{'id': uuidutils.generate_uuid(),
+             'tenant_id': 'tenant-%d' % (index % TENANT_COUNT),
+             'network_id': uuidutils.generate_uuid(),
+             'name': '', 'admin_state_up': True, 'status': 'ACTIVE',
+             'mac_address': 'fa:16:3e:00:00:00', 'fixed_ips': [],
+             'device_id': '', 'device_owner': '',
+             portbindings.HOST_ID: 'host', portbindings.VIF_TYPE: 'ovs',
+             portbindings.VIF_DETAILS: {}, portbindings.PROFILE: {}}
+            for index in range(count)]
+
+
+def _view_ports(controller, ctx, ports, checker):
+    views = []
+    for port in ports:
+        if checker:
+            allowed = checker.check('get_port', port)
+        else:
+            allowed = policy.check(ctx, 'get_port', port)
+        if allowed:
+            if checker:
+                views.append(controller._view(ctx, port, checker=checker))
+            else:
+                views.append(dict(
+                    item for item in port.iteritems()
+                    if controller._is_visible(ctx, item[0], port)))
+    return views
+
+
+def measure(controller, ctx, ports, cached):
+    start = time.time()
+    checker = policy.CachedChecker(ctx) if cached else None
+    views = _view_ports(controller, ctx, ports, checker)
+    return time.time() - start, views
+
+
+def main(argv):
+    port_counts = [int(arg) for arg in argv[1:]] or DEFAULT_PORT_COUNTS
+    cfg.CONF.set_override('policy_file', os.path.abspath(POLICY_FILE))
+    policy.init()
+    attr_info = attributes.RESOURCE_ATTRIBUTE_MAP['ports']
+    attr_info.update(portbindings.EXTENDED_ATTRIBUTES_2_0['ports'])
+    controller = base.Controller(FakePlugin(), 'ports', 'port', attr_info)
+    ctx = context.Context('user', 'tenant-0', roles=['member'])
+
+    print('%8s %8s %16s %16s' % ('ports', 'visible', 'uncached (ms)',
+                                 'cached (ms)'))
+    for port_count in port_counts:
+        ports = _make_ports(port_count)
+        uncached_time, expected = measure(controller, ctx, ports, False)
+        cached_time, views = measure(controller, ctx, ports, True)
+        assert views == expected
+        print('%8d %8d %16.2f %16.2f' % (port_count, len(views),
+                                         uncached_time * 1000,
+                                         cached_time * 1000))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
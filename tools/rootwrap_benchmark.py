@@ -0,0 +1,68 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the latency of agent commands run with a root helper.
+
+The same command is run through utils.execute, once starting the root
+helper for every call and once through the rootwrap daemon. The daemon
+is started by the first call, which is not part of the measure.
+
+Usage: rootwrap_benchmark.py root_helper root_helper_daemon [count [cmd...]]
+
+e.g. rootwrap_benchmark.py \\
+         "sudo neutron-rootwrap /etc/neutron/rootwrap.conf" \\
+         "sudo neutron-rootwrap-daemon /etc/neutron/rootwrap.conf" \\
+         100 ip link show lo
+"""
+from __future__ import print_function
+
+import sys
+import time
+
+import eventlet
+eventlet.monkey_patch()
+
+from oslo.config import cfg
+
+from neutron.agent.linux import utils
+
+DEFAULT_COUNT = 100
+DEFAULT_CMD = ['ip', 'link', 'show', 'lo']
+
+
+def measure(cmd, root_helper, count):
+    start = time.time()
+    for i in range(count):
+        utils.execute(cmd, root_helper=root_helper)
+    return (time.time() - start) / count
+
+
+def main(argv):
+    if len(argv) < 3:
+        print(__doc__)
+        return 1
+    root_helper, root_helper_daemon = argv[1:3]
+    count = int(argv[3]) if len(argv) > 3 else DEFAULT_COUNT
+    cmd = argv[4:] or DEFAULT_CMD
+
+    fork_time = measure(cmd, root_helper, count)
+    cfg.CONF.set_override('root_helper_daemon', root_helper_daemon, 'AGENT')
+    utils.execute(cmd, root_helper=root_helper)
+    daemon_time = measure(cmd, root_helper, count)
+    print('%8s %14s %14s' % ('commands', 'fork (ms)', 'daemon (ms)'))
+    print('%8d %14.2f %14.2f' % (count, fork_time * 1000, daemon_time * 1000))
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
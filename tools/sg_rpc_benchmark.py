@@ -0,0 +1,159 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the security group rules RPC against the number of devices.
+
+The database is an in-memory sqlite one, populated with a network holding
+the requested number of ports. Every port is in a security group whose
+rules reference a remote group, which is the worst case for the server.
+For each device count, the number of SQL statements and the latency of
+security_group_rules_for_devices and security_group_info_for_devices are
+printed.
+
+Usage: sg_rpc_benchmark.py [device_count ...]
+"""
+from __future__ import print_function
+
+import sys
+import time
+
+import netaddr
+from oslo.config import cfg
+import sqlalchemy as sa
+
+from neutron.common import constants
+from neutron import context
+from neutron.db import api as db_api
+from neutron.db import models_v2
+from neutron.db import securitygroups_db as sg_db
+from neutron.db import securitygroups_rpc_base as sg_db_rpc
+from neutron.openstack.common import uuidutils
+
+DEFAULT_DEVICE_COUNTS = [1, 100, 1000]
+TENANT_ID = 'bench-tenant'
+
+
+class BenchmarkCallback(sg_db_rpc.SecurityGroupServerRpcCallbackMixin):
+    """Look the ports up with a single query, as the ML2 plugin does."""
+
+    def get_ports_from_devices(self, devices):
+        session = db_api.get_session()
+        sg_binding_port = sg_db.SecurityGroupPortBinding.port_id
+        query = session.query(models_v2.Port,
+                              sg_db.SecurityGroupPortBinding.security_group_id)
+        query = query.outerjoin(sg_db.SecurityGroupPortBinding,
+                                models_v2.Port.id == sg_binding_port)
+        query = query.filter(models_v2.Port.id.in_(devices))
+        ports = {}
+        for port, sg_id in query:
+            if port.id not in ports:
+                ports[port.id] = {
+                    'id': port.id,
+                    'device': port.id,
+                    'network_id': port.network_id,
+                    'device_owner': port.device_owner,
+                    'fixed_ips': [ip.ip_address for ip in port.fixed_ips],
+                    'security_groups': [],
+                    'security_group_rules': [],
+                    'security_group_source_groups': []}
+            if sg_id:
+                ports[port.id]['security_groups'].append(sg_id)
+        return ports.values()
+
+
+def populate(session, device_count):
+    network_id = uuidutils.generate_uuid()
+    subnet_id = uuidutils.generate_uuid()
+    sg_id = uuidutils.generate_uuid()
+    remote_sg_id = uuidutils.generate_uuid()
+    with session.begin():
+        session.add(models_v2.Network(id=network_id, tenant_id=TENANT_ID,
+                                      name='bench', status='ACTIVE',
+                                      admin_state_up=True, shared=False))
+        session.add(models_v2.Subnet(id=subnet_id, tenant_id=TENANT_ID,
+                                     network_id=network_id, ip_version=4,
+                                     cidr='10.0.0.0/8', gateway_ip='10.0.0.1',
+                                     enable_dhcp=True, shared=False))
+        for group_id in (sg_id, remote_sg_id):
+            session.add(sg_db.SecurityGroup(id=group_id, tenant_id=TENANT_ID,
+                                            name=group_id))
+        for ethertype in (constants.IPv4, constants.IPv6):
+            session.add(sg_db.SecurityGroupRule(
+                id=uuidutils.generate_uuid(), tenant_id=TENANT_ID,
+                security_group_id=sg_id, direction='egress',
+                ethertype=ethertype))
+            session.add(sg_db.SecurityGroupRule(
+                id=uuidutils.generate_uuid(), tenant_id=TENANT_ID,
+                security_group_id=sg_id, direction='ingress',
+                ethertype=ethertype, remote_group_id=remote_sg_id))
+
+    port_ids = []
+    with session.begin():
+        for index in range(device_count):
+            port_id = uuidutils.generate_uuid()
+            port_ids.append(port_id)
+            session.add(models_v2.Port(
+                id=port_id, tenant_id=TENANT_ID, network_id=network_id,
+                mac_address='fa:16:3e:%02x:%02x:%02x' % (
+                    index >> 16 & 0xff, index >> 8 & 0xff, index & 0xff),
+                admin_state_up=True, status='ACTIVE', device_id=port_id,
+                device_owner='compute:nova'))
+            session.add(models_v2.IPAllocation(
+                port_id=port_id, subnet_id=subnet_id, network_id=network_id,
+                ip_address=str(netaddr.IPAddress('10.0.0.2') + index)))
+            for group_id in (sg_id, remote_sg_id):
+                session.add(sg_db.SecurityGroupPortBinding(
+                    port_id=port_id, security_group_id=group_id))
+    return port_ids
+
+
+def measure(method, devices):
+    statements = []
+
+    def _count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = db_api.get_engine()
+    sa.event.listen(engine, 'before_cursor_execute', _count)
+    start = time.time()
+    try:
+        method(context.get_admin_context(), devices=devices)
+    finally:
+        sa.event.remove(engine, 'before_cursor_execute', _count)
+    return len(statements), time.time() - start
+
+
+def main(argv):
+    device_counts = [int(arg) for arg in argv[1:]] or DEFAULT_DEVICE_COUNTS
+    cfg.CONF.set_override('connection', 'sqlite://', 'database')
+    db_api.configure_db()
+    callback = BenchmarkCallback()
+    print('%8s %14s %14s %14s %14s' % ('devices', 'rules (sql)',
+                                       'rules (ms)', 'info (sql)',
+                                       'info (ms)'))
+    for device_count in device_counts:
+        devices = populate(db_api.get_session(), device_count)
+        rules_sql, rules_time = measure(
+            callback.security_group_rules_for_devices, devices)
+        info_sql, info_time = measure(
+            callback.security_group_info_for_devices, devices)
+        print('%8d %14d %14.2f %14d %14.2f' % (device_count,
+                                               rules_sql, rules_time * 1000,
+                                               info_sql, info_time * 1000))
+        db_api.clear_db()
+        db_api.configure_db()
+
+
+if __name__ == '__main__':
+    main(sys.argv)